@@ -9,12 +9,15 @@ import webview
 
 from . import __version__, APP_NAME
 from .bus import EventBus
-from .config import DATA_DIR, ProfileManager, DEFAULTS
+from .config import DATA_DIR, ProfileManager, DEFAULTS, touches
 from .input.gamepad import GamepadEngine
 from .input.global_hooks import GlobalHooks
 from .learn import LearnManager
 from .midi.backends import MidiPortManager
+from .midi.clock import MidiClock
+from .midi.scheduler import Scheduler
 from .midi.engine import MidiEngine
+from .profile_switch import ProfileSwitcher
 from .tools.base import ToolContext
 from .tools.registry import TOOL_CLASSES
 
@@ -34,11 +37,8 @@ class Api:
         return self.app.config.current()
 
     def set_config(self, patch: dict, tool_id: str = "") -> dict:
+        # 热应用由 config.changed 按变化路径驱动；tool_id 仅为兼容旧前端保留
         self.app.config.update(patch)
-        if "virtual_midi" in patch:
-            self.app.apply_virtual_midi()
-        if tool_id:
-            self.app.restart_tool(tool_id)
         self.app.push_state()
         return self.app.config.current()
 
@@ -54,9 +54,7 @@ class Api:
         return self.app.config.list_profiles()
 
     def profile_load(self, name: str) -> bool:
-        ok = self.app.config.load_profile(name)
-        self.app.reload_all()
-        return ok
+        return self.app.switcher.switch(name)
 
     def profile_new(self, name: str) -> bool:
         return self.app.config.new_profile(name)
@@ -76,11 +74,32 @@ class Api:
     # ---- MIDI ----
 
     def midi_refresh(self) -> dict:
+        """立即重新枚举系统 MIDI 端口（默认由后台定时刷新）"""
+        self.app.ports.refresh_outputs()
         return self.app.ports.state()
 
     def midi_select_output(self, name: str) -> bool:
         return self.app.ports.select_output(name)
 
+    def midi_panic(self) -> dict:
+        """释放所有正在发声的音符"""
+        released = self.app.midi.panic()
+        self.app.bus.emit("log", message=f"全部静音：释放 {released} 个音符")
+        return self.app.midi.note_stats()
+
+    def clock_transport(self, action: str, position: int = 0) -> dict:
+        """MIDI 时钟走带：start | stop | continue | locate(position=十六分音符)"""
+        clock = self.app.clock
+        if action == "start":
+            clock.start()
+        elif action == "stop":
+            clock.stop()
+        elif action == "continue":
+            clock.continue_()
+        elif action == "locate":
+            clock.song_position(int(position))
+        return clock.state()
+
     # ---- 手柄 ----
 
     def gamepad_detect(self) -> list:
@@ -96,6 +115,10 @@ class Api:
         """强制重新检测：重启引擎并重建手柄句柄（蓝牙链路休眠时使用）。"""
         return self.app.gamepad.restart()
 
+    def gamepad_stats(self) -> dict:
+        """当前手柄适配器开销统计（SDL 对账频率/耗时等）"""
+        return self.app.gamepad.adapter_stats()
+
     def gamepad_switch(self, joystick_id: int) -> bool:
         """切换手柄设备（按索引），自动重连"""
         self.app.gamepad.stop()
@@ -136,13 +159,16 @@ class App:
     def __init__(self, ui_path=None):
         self.bus = EventBus()
         self._log_lock = threading.Lock()
-        self.config = ProfileManager()
+        self.config = ProfileManager(bus=self.bus)
         self.config.migrate_legacy()   # 迁移旧版配置
         self.ports = MidiPortManager(self.bus)
         self.midi = MidiEngine(self.bus, self.ports, self.config.current)
+        self.clock = MidiClock(self.bus, self.midi, self.config.current)
+        self.scheduler = Scheduler(self.bus)
         self.hooks = GlobalHooks(self.bus)
         self.learn = LearnManager(self.bus)
         self.gamepad = GamepadEngine(self.bus, self.midi, self.config.current, self.learn)
+        self.switcher = ProfileSwitcher(self.bus, self.config, self.gamepad)
         self.tools = {}
         self.logs = []
         self._live_log_index = {}   # 实时日志 id -> self.logs 下标
@@ -162,6 +188,9 @@ class App:
         self.bus.subscribe("learn.state", self._on_learn_state)
         self.bus.subscribe("learn.result", self._on_learn_result)
         self.bus.subscribe("midi.activity", self._on_midi_activity)
+        self.bus.subscribe("midi.outputs", self._on_midi_outputs)
+        self.bus.subscribe("config.changed", self._on_config_changed)
+        self.bus.subscribe("profile.switched", self._on_profile_switched)
 
     def _on_log(self, message, log_id=None):
         self.logs.append(message)
@@ -207,6 +236,9 @@ class App:
         self.push_state(fragment={"virtual": {"available": available, "running": running,
                                               "error": error}})
 
+    def _on_midi_outputs(self, outputs):
+        self.push_state(fragment={"virtual": {"outputs": outputs}})
+
     def _on_sequencer_state(self, playing, step):
         self.push_state(fragment={"sequencer": {"playing": playing, "step": step}})
 
@@ -216,6 +248,29 @@ class App:
     def _on_midi_activity(self, kind):
         self.push_state(fragment={"midi_activity": {"kind": kind, "t": threading.get_ident() % 1000}})
 
+    def _on_config_changed(self, paths, config, profile=None):
+        """按变化路径热应用：只重建受影响的部分，工具优先就地应用而不是重启"""
+        if touches(paths, "virtual_midi"):
+            self.apply_virtual_midi()
+        if touches(paths, "midi", "destinations"):
+            self.apply_destinations()
+        if touches(paths, "clock"):
+            self.clock.apply_config()
+        by_tool = {}
+        for path in paths:
+            if path[0] != "tools":
+                continue
+            if len(path) == 1:
+                for cls in TOOL_CLASSES:
+                    by_tool.setdefault(cls.id, []).append(())
+            else:
+                by_tool.setdefault(path[1], []).append(path[2:])
+        for tool_id, sub in by_tool.items():
+            self.apply_tool_config(tool_id, sub)
+
+    def _on_profile_switched(self, name, ms, source):
+        self.push_state()
+
     def _on_learn_result(self, target, **result):
         """MIDI Learn 结果写入配置并提示"""
         cfg = self.config.current()
@@ -265,12 +320,18 @@ class App:
         vm = self.config.current()["virtual_midi"]
         if vm.get("enabled"):
             self.ports.start(vm.get("port_name", "Gamepad MIDI 1"),
-                             backend_name=vm.get("backend", "tevirtualmidi"))
+                             backend_name=vm.get("backend", "tevirtualmidi"),
+                             loopback_echo=vm.get("loopback_echo", False),
+                             ump_protocol=vm.get("ump_protocol", "midi1"))
         else:
             self.ports.stop()
             self.bus.emit("virtual.state", available=self.ports.backend.is_available(),
                           running=False, error="已停用")
 
+    def apply_destinations(self):
+        """按配置重建附加目的端口写线程（热应用）"""
+        self.ports.set_destinations(self.config.current()["midi"].get("destinations", []))
+
     def set_tool_enabled(self, tool_id: str, enabled: bool):
         self.config.update({"tools": {tool_id: {"enabled": bool(enabled)}}})
         if enabled:
@@ -285,7 +346,8 @@ class App:
         if cls is None:
             return
         ctx = ToolContext(self.bus, self.midi, self.hooks, self.learn, self.gamepad,
-                          self.config.current, self.config.update)
+                          self.config.current, self.config.update, clock=self.clock,
+                          scheduler=self.scheduler)
         tool = cls(ctx)
         tool.start()
         self.tools[tool_id] = tool
@@ -298,18 +360,25 @@ class App:
             cls = next((c for c in TOOL_CLASSES if c.id == tool_id), None)
             self.bus.emit("log", message=f"工具已停用：{getattr(cls, 'title', tool_id)}")
 
+    def apply_tool_config(self, tool_id: str, paths: list):
+        """工具配置变化（paths 为工具内相对路径）：启停随 enabled，其余交给工具热应用"""
+        if not self.config.current()["tools"].get(tool_id, {}).get("enabled"):
+            self.stop_tool(tool_id)
+            return
+        tool = self.tools.get(tool_id)
+        if tool is None:
+            self.start_tool(tool_id)
+            return
+        paths = [p for p in paths if p != ("enabled",)]
+        if paths and not tool.apply_config(paths):
+            self.restart_tool(tool_id)
+
     def restart_tool(self, tool_id: str):
         """配置变化后重启工具以应用新设置"""
         if tool_id in self.tools:
             self.stop_tool(tool_id)
             self.start_tool(tool_id)
 
-    def reload_all(self):
-        """Profile 切换后重建工具"""
-        for tid in list(self.tools):
-            self.stop_tool(tid)
-        self.start_all_enabled()
-
     def start_all_enabled(self):
         cfg = self.config.current()
         for cls in TOOL_CLASSES:
@@ -323,18 +392,30 @@ class App:
         vm = self.config.current()["virtual_midi"]
         if vm.get("enabled"):
             self.ports.start(vm.get("port_name", "Gamepad MIDI 1"),
-                             backend_name=vm.get("backend", "tevirtualmidi"))
+                             backend_name=vm.get("backend", "tevirtualmidi"),
+                             loopback_echo=vm.get("loopback_echo", False),
+                             ump_protocol=vm.get("ump_protocol", "midi1"))
+        self.apply_destinations()
+        self.clock.apply_config()
+        self.switcher.start()          # 预载全部 profile，接收组合键 / Program Change 切换
         # 手柄引擎常驻启动
         self.gamepad.start()
         self.start_all_enabled()
         self.bus.emit("log", message=f"{APP_NAME} {__version__} 已启动")
 
     def shutdown(self):
+        self.switcher.stop()
         for tid in list(self.tools):
             self.stop_tool(tid)
         self.gamepad.stop()
+        self.clock.close()
+        self.scheduler.close()
+        self.midi.close()
         self.ports.stop()
+        self.ports.set_destinations([])
+        self.ports.stop_refresh()
         self.hooks.stop()
+        self.config.close()     # 落盘尚未写出的配置修改
 
     # ---- 状态推送 ----
 
@@ -344,7 +425,12 @@ class App:
             "app_name": APP_NAME,
             "profiles": self.config.list_profiles(),
             "current_profile": self.config.current_name,
+            "profile_switch": self.switcher.state(),
             "ports": self.ports.state(),
+            "clock": self.clock.state(),
+            "shaper": self.midi.shaper_stats(),
+            "notes": self.midi.note_stats(),
+            "scheduler": self.scheduler.stats(),
             "gamepad": self._gamepad_state_snapshot(),
             "tools": self.tool_states(),
             "log": self.logs[-50:],
@@ -5,6 +5,7 @@ import json
 import os
 import sys
 import threading
+import time
 from pathlib import Path
 
 
@@ -18,6 +19,7 @@ elif sys.platform == "win32" and getattr(sys, "frozen", False):
 else:
     DATA_DIR = APP_DIR
 PROFILES_DIR = DATA_DIR / "profiles"
+CLIPS_DIR = DATA_DIR / "clips"          # 外部 .mid clip（profile 中以相对路径引用）
 LEGACY_CONFIG = APP_DIR / "gamepad_midi_config.json"
 
 
@@ -28,11 +30,31 @@ DEFAULTS = {
         "cc_min_delta": 1,       # CC 值变化超过该值才发送
         "smoothing": 0.0,        # CC EMA 平滑系数 0(关)..0.9
         "output_port": "",       # 输出端口名（空=自动：虚拟端口优先）
+        # 附加目的端口（与主输出同时发送，每端口独立写线程）：
+        # [{"port": 名称, "enabled": True, "types": [消息类型…], "channels": [1-16…],
+        #   "bandwidth": 字节/秒（0=不限；DIN 31.25 kbaud 约 3125）}]
+        "destinations": [],
+        # 输出整形：CC/弯音按 (通道, 控制器) 在 tick 内合并为最新值，音符/SysEx 优先
+        "shaper": {"enabled": True, "tick_ms": 5, "bandwidth": 0},
     },
     "virtual_midi": {
         "enabled": True,
         "port_name": "Gamepad MIDI 1",
-        "backend": "tevirtualmidi",   # 预留: "windows_midi_services"
+        "backend": "tevirtualmidi",   # tevirtualmidi | windows_midi_services | alsa_seq(Linux) | loopback | null
+        "loopback_echo": False,       # loopback 内核：输出回显为 midi.input
+        "ump_protocol": "midi1",      # Windows MIDI Services：midi1(类型2) | midi2(类型4 高分辨率)
+    },
+    "clock": {
+        "mode": "internal",   # internal | master(发送 24 PPQN 时钟) | slave(跟随外部时钟)
+        "bpm": 120.0,         # 主模式速度；从模式由外部时钟决定
+    },
+    # 演奏中切换 profile（全部 profile 预载在内存，切换不读盘、不重启未变化的工具）
+    "profile_switch": {
+        "combo": ["back"],            # 按住这些手柄按钮…
+        "buttons": {},                # …再按此按钮切换：{"button_a": "live", "button_b": "default"}
+        "program_change": True,       # 虚拟输入端口收到 Program Change 时切换
+        "pc_channel": 0,              # 0=任意通道，1-16
+        "programs": {},               # {"0": "default", "5": "live"}；未列出时按预设列表顺序
     },
     "gamepad": {
         "joystick_id": 0,
@@ -45,6 +67,7 @@ DEFAULTS = {
         "l3_button": -1,           # -1=自动(SDL映射/设备表)，>=0=手动指定原始按钮索引
         "r3_button": -1,
         "xy_center_deadzone": 0.05,
+        "sdl_reconcile_hz": 20.0,    # SDL 直读对账频率（事件覆盖后自动退避；0=每帧）
         "velocity_mode": "fixed",    # fixed | hold | random
         "velocity_fixed": 127,
         "velocity_min": 40,
@@ -88,15 +111,23 @@ DEFAULTS = {
         },
         "chord_arp": {
             "enabled": False,
+            "bpm": 120.0,          # 未跟随全局时钟时琶音的速度
+            # arp_div：每拍步数（4 = 十六分音符），0 = 按 arp_ms 自由速度；octaves：1-4 八度
             "pads": [
-                {"key": "1", "chord": [60, 64, 67], "arp": False, "arp_mode": "up", "arp_ms": 120},
-                {"key": "2", "chord": [57, 60, 64], "arp": False, "arp_mode": "up", "arp_ms": 120},
-                {"key": "3", "chord": [65, 69, 72], "arp": False, "arp_mode": "up", "arp_ms": 120},
-                {"key": "4", "chord": [55, 59, 62], "arp": False, "arp_mode": "up", "arp_ms": 120},
+                {"key": "1", "chord": [60, 64, 67], "arp": False, "arp_mode": "up", "arp_ms": 120,
+                 "arp_div": 0, "octaves": 1, "latch": False},
+                {"key": "2", "chord": [57, 60, 64], "arp": False, "arp_mode": "up", "arp_ms": 120,
+                 "arp_div": 0, "octaves": 1, "latch": False},
+                {"key": "3", "chord": [65, 69, 72], "arp": False, "arp_mode": "up", "arp_ms": 120,
+                 "arp_div": 0, "octaves": 1, "latch": False},
+                {"key": "4", "chord": [55, 59, 62], "arp": False, "arp_mode": "up", "arp_ms": 120,
+                 "arp_div": 0, "octaves": 1, "latch": False},
             ],
         },
         "hotkey_clip": {
             "enabled": False,
+            # 录制后处理：CC 抽稀（间隔 ms / 变化量，0 关闭）；quantize 为每拍网格数（0 不量化）
+            "record": {"thin_cc_ms": 0, "thin_cc_delta": 0, "quantize": 0, "bpm": 120.0},
             "clips": [
                 {
                     "name": "上行音阶",
@@ -116,12 +147,17 @@ DEFAULTS = {
             "enabled": False, "steps": 16, "bpm": 120.0, "swing": 0.0,
             "channel": 1, "modulate": "none",  # none | note | cc
             "modulate_cc": 74,
+            "modulate_source": "lx",    # 调制源：手柄逻辑轴 lx/ly/rx/ry/lt/rt
             "notes": [60, 62, 64, 65, 67, 69, 71, 72, 72, 71, 69, 67, 65, 64, 62, 60],
             "velocities": [100] * 16,
             "gates": [0.5] * 16,
             "on": [True, False, True, False, True, False, True, False,
                    True, False, True, False, True, False, True, False],
             "ccs": [None] * 16,
+            # pattern 库：上面一组为 0 号，patterns 中依次为 1、2…（各含 name 与同名字段列表）
+            "patterns": [],
+            "chain": [],                # 串联播放的 pattern 下标，每小节前进一格
+            "pattern_buttons": {},      # 手柄按钮名 -> "next" | "prev" | pattern 下标
         },
         "wheel_bend": {
             "enabled": False, "hotkey": ["ctrl", "shift"],
@@ -136,6 +172,9 @@ DEFAULTS = {
 }
 
 
+_MISSING = object()
+
+
 def deep_merge(base: dict, override: dict) -> dict:
     """递归合并 override 到 base 的副本上"""
     out = copy.deepcopy(base)
@@ -147,15 +186,103 @@ def deep_merge(base: dict, override: dict) -> dict:
     return out
 
 
+def merge_patch(base: dict, patch: dict, _prefix: tuple = ()) -> tuple:
+    """结构共享地合并补丁，返回 (新配置, 变化路径列表)。
+
+    只复制补丁经过的字典分支，其余子树与 base 共享同一对象；值未变化的键不产生路径，
+    整体无变化时原样返回 base。路径为键元组，如 ("gamepad", "cc_mappings", "left_stick_x")。
+    共享的前提是配置对象只读：修改一律经 update() 提交补丁。
+    """
+    out = None
+    paths = []
+    for k, v in patch.items():
+        old = base.get(k, _MISSING)
+        path = _prefix + (k,)
+        if isinstance(old, dict) and isinstance(v, dict):
+            new, sub = merge_patch(old, v, path)
+            if not sub:
+                continue
+            paths.extend(sub)
+        else:
+            if old is not _MISSING and type(old) is type(v) and old == v:
+                continue
+            new = copy.deepcopy(v)
+            paths.append(path)
+        if out is None:
+            out = dict(base)
+        out[k] = new
+    return (base if out is None else out), paths
+
+
+def diff_paths(old: dict, new: dict, _prefix: tuple = ()) -> list:
+    """两份配置间的变化路径（共享子树按对象身份直接跳过）"""
+    if old is new:
+        return []
+    paths = []
+    for k in old.keys() | new.keys():
+        a = old.get(k, _MISSING)
+        b = new.get(k, _MISSING)
+        if a is b:
+            continue
+        if isinstance(a, dict) and isinstance(b, dict):
+            paths.extend(diff_paths(a, b, _prefix + (k,)))
+        elif type(a) is not type(b) or a != b:
+            paths.append(_prefix + (k,))
+    return paths
+
+
+def touches(paths, *prefix) -> bool:
+    """paths 中是否有位于 prefix 之下（或整体替换了 prefix 所在分支）的变化"""
+    n = len(prefix)
+    return any(p[:n] == prefix or prefix[:len(p)] == p for p in paths)
+
+
+def share_equal(ref, new):
+    """把 new 中与 ref 相等的子树替换为 ref 的对象（预载的多份 profile 之间共享结构，
+    切换时 diff_paths 按身份跳过、工具按对象身份复用编译结果）"""
+    if not (isinstance(ref, dict) and isinstance(new, dict)):
+        return ref if type(ref) is type(new) and ref == new else new
+    out = {}
+    same = ref.keys() == new.keys()
+    for k, v in new.items():
+        r = ref.get(k, _MISSING)
+        out[k] = v if r is _MISSING else share_equal(r, v)
+        if out[k] is not r:
+            same = False
+    return ref if same else out
+
+
 class ProfileManager:
-    """多预设配置管理。current() 返回当前配置 dict（读线程安全）。"""
+    """多预设配置管理。current() 返回当前配置 dict（读线程安全）。
+
+    update() 只在内存中合并；落盘由后台写线程完成：首次修改后等待 SAVE_DEBOUNCE_S，
+    期间的连续修改合并为一次写入。写入走「临时文件 + fsync + 原子替换」，中途崩溃不会
+    留下半个 JSON。close() 时同步 flush() 未落盘的修改。
+
+    修改与切换均为结构共享（未变分支保持同一对象），并在总线上发出
+    config.changed(paths, config, profile)，各组件据变化路径就地热应用。
 
-    def __init__(self, profiles_dir: Path = PROFILES_DIR):
+    preload() 把 profile 解析、归一化后常驻内存（与当前配置共享相等子树）；
+    switch_profile() 对已预载的 profile 只交换当前配置引用，不读盘。"""
+
+    SAVE_DEBOUNCE_S = 0.5
+
+    def __init__(self, profiles_dir: Path = PROFILES_DIR, bus=None):
         self.profiles_dir = Path(profiles_dir)
+        self.bus = bus
         self.profiles_dir.mkdir(parents=True, exist_ok=True)
         self.current_name = "default"
         self._config = copy.deepcopy(DEFAULTS)
+        self._profiles = {}                      # profile 名 -> 内存中的配置（当前 + 预载）
         self._lock = threading.RLock()
+        self._write_lock = threading.Lock()      # 串行化写盘：快照在锁内取，后写者总是更新
+        self._save_cond = threading.Condition()
+        self._pending = set()                    # 待落盘的 profile 名
+        self._due = 0.0
+        self._writer = None
+        self._closed = False
+        self.last_error = ""
+        self.last_errors = []                    # 最近一次读取/导入的校验错误
         self._ensure_default_profile()
 
     # ---- 内部 ----
@@ -177,41 +304,189 @@ class ProfileManager:
             self.save_profile("default")
         self.load_profile("default")
 
+    def _read_profile(self, name: str):
+        """从磁盘读取、归一化并按 schema 校验（非法值按默认值修正并记录）；
+        不存在或损坏返回 None"""
+        try:
+            data = json.loads(self._profile_path(name).read_text(encoding="utf-8"))
+        except (json.JSONDecodeError, OSError):
+            return None
+        if not isinstance(data, dict):
+            return None
+        config, errors = self._validate(self._normalize(deep_merge(DEFAULTS, data)))
+        if errors:
+            self._report(f"预设 {name} 有 {len(errors)} 处配置无效，已按默认值修正", errors)
+        return config
+
+    def _validate(self, config: dict) -> tuple:
+        from .schema import validate     # schema 依赖 DEFAULTS，延迟导入避免循环
+        config, errors = validate(config)
+        self.last_errors = errors
+        return config, errors
+
+    def _report(self, title: str, errors: list):
+        if self.bus is None:
+            return
+        shown = errors[:8]
+        more = f"；…另有 {len(errors) - len(shown)} 处" if len(errors) > len(shown) else ""
+        self.bus.emit("log", message=f"{title}：" + "；".join(shown) + more)
+
+    @staticmethod
+    def _atomic_write(path: Path, data: dict):
+        """写临时文件并 fsync，再原子替换目标文件"""
+        text = json.dumps(data, ensure_ascii=False, indent=2)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def _write_profile(self, name: str):
+        with self._write_lock:
+            with self._lock:
+                cfg = self._profiles.get(name)
+            if cfg is None:
+                return
+            try:
+                self._atomic_write(self._profile_path(name), cfg)
+            except OSError as exc:
+                self.last_error = f"保存配置失败 {name}: {exc}"
+
+    # ---- 后台写盘 ----
+
+    def _mark_dirty(self, name: str):
+        with self._save_cond:
+            if not self._pending:
+                self._due = time.monotonic() + self.SAVE_DEBOUNCE_S
+                self._save_cond.notify()
+            self._pending.add(name)
+            if self._writer is None and not self._closed:
+                self._writer = threading.Thread(target=self._writer_loop, daemon=True,
+                                                name="profile_writer")
+                self._writer.start()
+
+    def _take_pending(self) -> set:
+        with self._save_cond:
+            names, self._pending = self._pending, set()
+        return names
+
+    def _writer_loop(self):
+        while True:
+            with self._save_cond:
+                while not self._pending and not self._closed:
+                    self._save_cond.wait()
+                if self._closed:
+                    return
+                remain = self._due - time.monotonic()
+                if remain > 0:
+                    self._save_cond.wait(remain)
+                    continue
+            for name in self._take_pending():
+                self._write_profile(name)
+
+    def flush(self) -> bool:
+        """同步写出尚未落盘的修改；有写出返回 True"""
+        names = self._take_pending()
+        for name in names:
+            self._write_profile(name)
+        return bool(names)
+
+    def close(self):
+        """停止写线程并落盘（程序退出时调用）"""
+        with self._save_cond:
+            self._closed = True
+            self._save_cond.notify()
+            writer = self._writer
+        if writer is not None and writer is not threading.current_thread():
+            writer.join(2.0)
+        self.flush()
+
     # ---- 读写 ----
 
     def current(self) -> dict:
         return self._config
 
-    def update(self, patch: dict):
-        """合并写入补丁并持久化"""
+    def _emit_changed(self, paths, config, profile):
+        if paths and self.bus is not None:
+            self.bus.emit("config.changed", paths=paths, config=config, profile=profile)
+
+    def _activate(self, name: str, config: dict):
+        with self._lock:
+            old = self._config
+            self._config = config
+            self._profiles[name] = config
+            self.current_name = name
+        self._emit_changed(diff_paths(old, config), config, name)
+
+    def update(self, patch: dict) -> list:
+        """合并补丁（立即生效），返回变化路径；落盘交给后台写线程合并执行"""
         with self._lock:
-            self._config = deep_merge(self._config, patch)
-            self.save_profile(self.current_name)
+            config, paths = merge_patch(self._config, patch)
+            if not paths:
+                return paths
+            name = self.current_name
+            self._config = config
+            self._profiles[name] = config
+            self._mark_dirty(name)
+        self._emit_changed(paths, config, name)
+        return paths
 
     def load_profile(self, name: str) -> bool:
-        path = self._profile_path(name)
-        if not path.exists():
+        """从磁盘重新读取并切换（内存中未落盘的修改先写出）"""
+        if not self._profile_path(name).exists():
+            return False
+        self.flush()
+        config = self._read_profile(name)
+        if config is None:
             return False
+        self._activate(name, share_equal(self._config, config))
+        return True
+
+    def preload(self, names=None) -> list:
+        """把 profile 预载到内存（已在内存中的保持不变），返回新预载的名字"""
+        loaded = []
+        for name in (self.list_profiles() if names is None else names):
+            if name in self._profiles:
+                continue
+            config = self._read_profile(name)
+            if config is None:
+                continue
+            with self._lock:
+                self._profiles.setdefault(name, share_equal(self._config, config))
+            loaded.append(name)
+        return loaded
+
+    def preloaded(self) -> list:
+        """内存中的 profile 名（排序），切换它们不读盘"""
         with self._lock:
-            try:
-                data = json.loads(path.read_text(encoding="utf-8"))
-            except (json.JSONDecodeError, OSError):
-                return False
-            self._config = self._normalize(deep_merge(DEFAULTS, data))
-            self.current_name = name
+            return sorted(self._profiles)
+
+    def switch_profile(self, name: str) -> bool:
+        """切换 profile：已预载时只交换内存中的配置（O(1)，不读盘），否则回退到 load_profile"""
+        config = self._profiles.get(name)
+        if config is None:
+            return self.load_profile(name)
+        if name != self.current_name:
+            self._activate(name, config)
         return True
 
     def save_profile(self, name: str):
-        path = self._profile_path(name)
-        path.write_text(json.dumps(self._config, ensure_ascii=False, indent=2),
-                        encoding="utf-8")
+        """立即（同步）把当前配置写入 name"""
+        with self._save_cond:
+            self._pending.discard(name)
+        with self._write_lock:
+            config = self._config
+            self._atomic_write(self._profile_path(name), config)
+        with self._lock:
+            self._profiles[name] = config
 
     def new_profile(self, name: str) -> bool:
         path = self._profile_path(name)
         if path.exists():
             return False
         self.save_profile(name)
-        return self.load_profile(name)
+        return self.switch_profile(name)
 
     def delete_profile(self, name: str) -> bool:
         if name == "default":
@@ -219,9 +494,12 @@ class ProfileManager:
         path = self._profile_path(name)
         if not path.exists():
             return False
+        with self._save_cond:
+            self._pending.discard(name)
         path.unlink()
+        self._profiles.pop(name, None)
         if self.current_name == name:
-            self.load_profile("default")
+            self.switch_profile("default")
         return True
 
     def list_profiles(self) -> list:
@@ -231,12 +509,25 @@ class ProfileManager:
         path = self._profile_path(name)
         if not path.exists():
             return {}
+        if name in self._pending:
+            self.flush()
         return json.loads(path.read_text(encoding="utf-8"))
 
     def import_profile(self, name: str, data: dict) -> bool:
-        merged = self._normalize(deep_merge(DEFAULTS, data))
-        self._profile_path(name).write_text(
-            json.dumps(merged, ensure_ascii=False, indent=2), encoding="utf-8")
+        """导入前按 schema 校验；有无效值时拒绝导入（错误见 last_errors 与日志）"""
+        if not isinstance(data, dict):
+            self.last_errors = [f"导入内容应为对象，实际为 {type(data).__name__}"]
+            self._report(f"导入预设 {name} 失败", self.last_errors)
+            return False
+        merged, errors = self._validate(self._normalize(deep_merge(DEFAULTS, data)))
+        if errors:
+            self._report(f"导入预设 {name} 失败，{len(errors)} 处配置无效", errors)
+            return False
+        if name == self.current_name:
+            self.flush()
+        self._atomic_write(self._profile_path(name), merged)
+        if name != self.current_name and name in self._profiles:
+            self._profiles[name] = share_equal(self._config, merged)   # 保持预载内容与文件一致
         return True
 
     # ---- 旧版迁移 ----
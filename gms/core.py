@@ -2,6 +2,7 @@
 全部无副作用，便于单元测试。"""
 
 import random
+from array import array
 
 
 def clamp(value, low, high):
@@ -70,6 +71,13 @@ def sequencer_step_duration_ms(bpm: float, steps: int, swing: float = 0.0, step_
     return base
 
 
+def sequencer_step_offset_beats(steps: int, swing: float = 0.0, step_index: int = 0) -> float:
+    """swing 相对网格的节拍偏移（与 sequencer_step_duration_ms 一致：奇数步提前）"""
+    if swing > 0 and step_index % 2 == 1:
+        return -(4.0 / steps) * swing
+    return 0.0
+
+
 def gate_duration_ms(step_ms: float, gate: float) -> float:
     """步内 gate 时长(0..1 比例)"""
     return step_ms * clamp(gate, 0.01, 1.0)
@@ -99,6 +107,102 @@ def clip_total_ms(events: list) -> float:
     return max(t + ev.get("duration", 0) for t, ev in times)
 
 
+# 编译后 clip 的状态类型（高 4 位）。SMF 导入与录制的 clip 保存完整状态字节（低 4 位为各事件
+# 自带通道）；profile 事件表不带通道，低 4 位为 0，发送时使用 clip/全局通道
+CLIP_STATUS = {"note_off": 0x80, "note_on": 0x90, "control_change": 0xB0, "pitchwheel": 0xE0}
+
+
+class CompiledClip:
+    """编译后的 clip：并行数组（时刻 ms / 状态 / 数据 1 / 数据 2）+ 预计算总长。
+    播放时只需游标遍历数组，不再排序或逐条读取事件 dict。"""
+
+    __slots__ = ("times", "status", "data1", "data2", "total_ms", "source", "channel")
+
+    def __init__(self, times, status, data1, data2, total_ms, source=None, channel=None):
+        self.times = times
+        self.status = status
+        self.data1 = data1
+        self.data2 = data2
+        self.total_ms = total_ms
+        self.source = source     # 编译来源：事件列表或 (文件路径, mtime)，判断是否需重编译
+        self.channel = channel   # 来源首个事件的通道 1-16；None 表示事件不带通道（profile 事件表）
+
+    def __len__(self):
+        return len(self.times)
+
+
+def compile_clip(events: list) -> CompiledClip:
+    """事件表 → CompiledClip。时刻与总长与 clip_event_times / clip_total_ms 一致；
+    未知类型的事件不产生输出，但其 duration 仍占用时间。弯音拆为 14 位 LSB/MSB。"""
+    times, status = array("d"), array("B")
+    data1, data2 = array("B"), array("B")
+    total = 0.0
+    for t, ev in clip_event_times(events):
+        total = max(total, t + ev.get("duration", 0))
+        kind = CLIP_STATUS.get(ev.get("type"))
+        if kind is None:
+            continue
+        if kind == 0xE0:
+            bend = int(clamp(int(ev.get("pitch", 0)) + 8192, 0, 16383))
+            d1, d2 = bend & 0x7F, bend >> 7
+        elif kind == 0xB0:
+            d1, d2 = int(ev["control"]), int(ev.get("value", 0))
+        else:
+            d1 = int(ev["note"])
+            d2 = int(ev.get("velocity", 100)) if kind == 0x90 else 0
+        times.append(float(t))
+        status.append(kind)
+        data1.append(d1 & 0x7F)
+        data2.append(d2 & 0x7F)
+    return CompiledClip(times, status, data1, data2, total, events)
+
+
+PATTERN_FIELDS = ("notes", "velocities", "gates", "on", "ccs")
+
+
+class CompiledPattern:
+    """编译后的音序器 pattern：按步数展开的定长数组（on=0 的步不发声，cc=-1 表示无 CC）。
+    切换 pattern 只替换引用；source 为各字段列表对象，用于判断是否需重编译。"""
+
+    __slots__ = ("on", "notes", "velocities", "gates", "ccs", "name", "source")
+
+    def __init__(self, on, notes, velocities, gates, ccs, name="", source=None):
+        self.on = on
+        self.notes = notes
+        self.velocities = velocities
+        self.gates = gates
+        self.ccs = ccs
+        self.name = name
+        self.source = source
+
+    def __len__(self):
+        return len(self.on)
+
+
+def pattern_source(pattern: dict, steps: int) -> tuple:
+    return (steps,) + tuple(pattern.get(f) for f in PATTERN_FIELDS)
+
+
+def compile_pattern(pattern: dict, steps: int) -> CompiledPattern:
+    """pattern dict（notes/velocities/gates/on/ccs）→ CompiledPattern。
+    缺省值与逐步读取时一致：超出 notes 长度的步关闭，力度 100，gate 0.5。"""
+    notes_in = pattern.get("notes", [])
+    on_in, vel_in = pattern.get("on", []), pattern.get("velocities", [])
+    gates_in, ccs_in = pattern.get("gates", []), pattern.get("ccs", [])
+    on, notes, vels = array("B"), array("B"), array("B")
+    gates, ccs = array("d"), array("h")
+    for i in range(steps):
+        playable = i < len(notes_in) and i < len(on_in) and bool(on_in[i])
+        on.append(1 if playable else 0)
+        notes.append(int(clamp(int(notes_in[i]), 0, 127)) if i < len(notes_in) else 0)
+        vels.append(int(clamp(int(vel_in[i]), 0, 127)) if i < len(vel_in) else 100)
+        gates.append(float(gates_in[i]) if i < len(gates_in) else 0.5)
+        cc = ccs_in[i] if i < len(ccs_in) else None
+        ccs.append(-1 if cc is None else int(clamp(int(cc), 0, 127)))
+    return CompiledPattern(on, notes, vels, gates, ccs, str(pattern.get("name", "")),
+                           pattern_source(pattern, steps))
+
+
 # ---------- MIDI 映射层规则 ----------
 
 
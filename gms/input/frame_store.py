@@ -0,0 +1,69 @@
+"""手柄帧发布：手柄线程处理完一帧后发布不可变快照，任意线程无锁读取。
+
+发布方先完整构造 ControllerFrame，再一次性替换 _latest 引用（CPython 中引用赋值是原子的）；
+读取方拿到的总是某一帧的完整内容，不会读到写了一半的帧，也不需要像 seqlock 那样重试。
+version 单调递增，读取方可据此判断是否有新帧。
+
+逻辑轴已按解析出的布局（axis_src）换算：lx/ly/rx/ry 为 -1..1（invert_y 时向上为正），
+lt/rt 为 0..1。工具经 source(name) 取得读取器，每次调用返回最新帧中的值。
+"""
+
+import time
+
+LOGICAL_AXES = ("lx", "ly", "rx", "ry", "lt", "rt")
+
+
+class ControllerFrame:
+    __slots__ = ("version", "t", "raw", "logical")
+
+    def __init__(self, version, t, raw, logical):
+        self.version = version
+        self.t = t              # time.monotonic() 发布时刻
+        self.raw = raw          # 原始帧：axes/buttons 为元组，另含 hat/nax/nbtn/source
+        self.logical = logical  # 逻辑轴名 -> 值
+
+    def axis(self, name, default=0.0) -> float:
+        return self.logical.get(name, default)
+
+
+class FrameStore:
+    def __init__(self):
+        self._latest = None
+        self._version = 0
+
+    def publish(self, raw: dict, logical: dict) -> ControllerFrame:
+        """仅由手柄线程调用"""
+        self._version += 1
+        frozen = {"axes": tuple(raw.get("axes", ())), "buttons": tuple(raw.get("buttons", ())),
+                  "hat": raw.get("hat"), "nax": raw.get("nax", 0),
+                  "nbtn": raw.get("nbtn", 0), "source": raw.get("source", "")}
+        frame = ControllerFrame(self._version, time.monotonic(), frozen, dict(logical))
+        self._latest = frame
+        return frame
+
+    def clear(self):
+        """手柄断开/引擎停止：读取方此后得到 None / 默认值"""
+        self._latest = None
+
+    def latest(self):
+        return self._latest
+
+    @property
+    def version(self) -> int:
+        frame = self._latest
+        return frame.version if frame is not None else 0
+
+    def value(self, name: str, default: float = 0.0) -> float:
+        frame = self._latest
+        return frame.logical.get(name, default) if frame is not None else default
+
+    def source(self, name: str):
+        """返回调制源读取器：无参调用得到逻辑轴 name 的最新值（无帧时为 0）"""
+        if name not in LOGICAL_AXES:
+            raise ValueError(f"未知调制源 {name}")
+
+        def read(store=self, name=name):
+            frame = store._latest
+            return frame.logical.get(name, 0.0) if frame is not None else 0.0
+
+        return read
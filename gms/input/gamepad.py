@@ -10,8 +10,11 @@ import time
 
 import pygame
 
-from .gamepad_devices import open_gamepad
+from .frame_store import FrameStore
+from .probe import AdapterProber
 
+from ..config import touches
+from ..schema import GamepadSettings, MidiSettings
 from ..core import (
     apply_deadzone, apply_curve, axis_to_cc_absolute_centered,
     velocity_random, velocity_hold_pressure, trigger_axis_to_value,
@@ -69,7 +72,9 @@ class GamepadEngine:
         self.running = False
         self.connected = False
         self.button_states = {}       # 按钮idx -> 是否按下
-        self._button_notes = {}       # 按钮idx -> 实际已发送的音符
+        # 按住的音符记录实际发送的 (音符, 通道)：映射或 profile 通道中途变化也能在原通道释放
+        self._button_notes = {}       # 按钮idx -> (音符, 通道)
+        self._held_notes = {}         # "lt"/"rt"/"hat" -> (音符, 通道)
         self.trigger_states = {"lt": False, "rt": False}
         self.last_hat = (0, 0)
         self.hold_start = {}          # 按钮idx -> 按下时刻(力度hold模式)
@@ -87,10 +92,17 @@ class GamepadEngine:
         self._unmapped_warned = set()
         self._active_mode = None
         self._frame = None
+        self.frames = FrameStore()    # 已处理帧的无锁发布（供其他线程读取）
         self._live_logs = {}          # cc_num -> 当前活动日志 id
         self._live_last_write = {}    # cc_num -> 最近一次写入时刻
         self._live_seq = 0            # 实时日志 id 递增序号
         self._trigger_signed_src = {} # source -> {lt/rt -> 是否 -1..1 语义}
+        self._applied_reconcile_hz = None
+        self._poll_ms = 5
+        self._rel_t = None            # 上一次相对模式处理的时刻（按实际经过时间缩放增量）
+        self._relayout = False        # 按钮覆盖配置变化：由手柄线程重新解析布局
+        self._prober = AdapterProber(bus)
+        bus.subscribe("config.changed", self._on_config_changed)
         pygame.init()
         pygame.joystick.init()
 
@@ -134,34 +146,54 @@ class GamepadEngine:
             self.bus.emit("log", message="手柄线程未及时退出，保留线程句柄避免重复启动")
         else:
             self._thread = None
-        cfg = self.get_config()["gamepad"]
+        self._prober.cancel()
+        cfg = self._settings()
         self._release_all(cfg)
         self._live_logs.clear()
         self._live_last_write.clear()
         self._close_joystick()
         self.joystick = None
         self._frame = None
+        self.frames.clear()
         self._joy_instance_id = None
         self.connected = False
         self.signal = "ok"
         self._last_joy_event = time.time()
         self.bus.emit("gamepad.state", connected=False, name="", axes=[], buttons=[],
-                      mode=cfg.get("mode", "relative"), running=False, layout={},
+                      mode=cfg.mode, running=False, layout={},
                       signal="ok", last_input_ago=0)
 
+    def _settings(self):
+        """当前手柄配置的类型化视图（同一配置段只转换一次）"""
+        return GamepadSettings.of(self.get_config()["gamepad"])
+
+    def _channel(self) -> int:
+        """按下音符时的实际通道（释放时沿用）"""
+        return MidiSettings.of(self.get_config()["midi"]).channel
+
     def button_key(self, idx: int):
         """原始按钮索引 -> 逻辑键（供 MIDI Learn / UI 使用）"""
         return self.button_key_map.get(int(idx))
 
     # ---- 主循环 ----
 
+    def _on_config_changed(self, paths, config, **_):
+        """热应用：轮询周期即时生效；L3/R3 覆盖变化时只重建按钮映射表，不重连手柄"""
+        if touches(paths, "midi", "poll_ms"):
+            self._poll_ms = MidiSettings.of(config["midi"]).poll_ms
+        if touches(paths, "gamepad", "l3_button") or touches(paths, "gamepad", "r3_button"):
+            self._relayout = True
+
     def _loop(self):
-        poll_ms = max(1, int(self.get_config()["midi"].get("poll_ms", 5)))
+        self._poll_ms = MidiSettings.of(self.get_config()["midi"]).poll_ms
         last_manage = 0.0
         while not self._stop.is_set():
             try:
                 self._poll_events()
-                cfg = self.get_config()["gamepad"]
+                cfg = self._settings()
+                if self._relayout and self.joystick is not None:
+                    self._relayout = False
+                    self._resolve_layout()
                 now = time.time()
                 if now - last_manage >= 0.25:
                     last_manage = now
@@ -170,7 +202,7 @@ class GamepadEngine:
                     self._stop.wait(0.5)
                     continue
                 self._capture_frame()
-                mode = cfg.get("mode", "relative")
+                mode = cfg.mode
                 self._announce_mode(mode, cfg)
                 if mode == "xy_absolute":
                     self._handle_xy_absolute(cfg)
@@ -179,11 +211,23 @@ class GamepadEngine:
                 self._handle_triggers(cfg)
                 self._handle_hat(cfg)
                 self._handle_buttons(cfg)
+                self._publish_frame(cfg)
                 self._push_state()
             except Exception as exc:
                 if self.running:
                     self.bus.emit("log", message=f"控制循环错误: {exc}")
-            self._stop.wait(poll_ms / 1000.0)
+            self._wait_frame(self._poll_ms / 1000.0)
+
+    def _wait_frame(self, timeout):
+        """帧间等待：适配器支持就绪通知（evdev epoll）时有输入即唤醒。"""
+        waiter = getattr(self.joystick, "wait_input", None)
+        if waiter is None or self._stop.is_set():
+            self._stop.wait(timeout)
+            return
+        try:
+            waiter(timeout)
+        except Exception:
+            self._stop.wait(timeout)
 
     # ---- 热插拔管理 ----
 
@@ -201,9 +245,11 @@ class GamepadEngine:
                 self._close_joystick()
                 self.joystick = None
                 self._frame = None
+                self.frames.clear()
                 self._joy_instance_id = None
                 self.connected = False
             else:
+                self._apply_reconcile_rate(cfg)
                 # 真实信号监控：超过 5s 无任何输入变化时，前端应显示
                 # 「无输入信号」而非虚假的「信号正常」。
                 ago = time.time() - self._last_joy_event
@@ -212,26 +258,29 @@ class GamepadEngine:
                     self.signal = new_signal
                     self.bus.emit("gamepad.state", **self.state_snapshot())
                 return
+        # 适配器打开在后台探测线程完成：本轮先取回上一次探测的结果
+        adapter = self._prober.poll()
+        if adapter is not None:
+            try:
+                self._attach_joystick(adapter)
+            except Exception as exc:
+                msg = f"手柄初始化失败: {exc}"
+                if msg != self._last_connect_error:
+                    self._last_connect_error = msg
+                    self.bus.emit("log", message=msg)
+            return
+        if self._prober.busy:
+            return
         if pygame.joystick.get_count() == 0:
-            native = open_gamepad(None, 0x045E, 0, prefer_sdl=False,
-                                  prefer_xinput=True)
-            if native is not None:
-                try:
-                    self._attach_joystick(native)
-                except Exception as exc:
-                    msg = f"手柄初始化失败: {exc}"
-                    if msg != self._last_connect_error:
-                        self._last_connect_error = msg
-                        self.bus.emit("log", message=msg)
-                return
+            self._prober.request(None, 0x045E, 0, prefer_sdl=False, prefer_xinput=True)
             if not self._waiting_emitted:
                 self._waiting_emitted = True
                 self.bus.emit("log", message="未检测到手柄：连接后自动启用…")
                 self.bus.emit("gamepad.state", connected=False, name="", axes=[],
-                              buttons=[], mode=cfg.get("mode", "relative"), running=True,
+                              buttons=[], mode=cfg.mode, running=True,
                               layout={})
             return
-        joy_id = int(cfg.get("joystick_id", 0))
+        joy_id = cfg.joystick_id
         joy_id = max(0, min(joy_id, pygame.joystick.get_count() - 1))
         try:
             source = pygame.joystick.Joystick(joy_id)
@@ -241,25 +290,50 @@ class GamepadEngine:
                 pid = int(source.get_product())
             except Exception:
                 vid, pid = self._vid_pid_from_guid(source.get_guid())
-            joystick = open_gamepad(source, vid, pid, prefer_sdl=True,
-                                    prefer_xinput=True)
-            self._attach_joystick(joystick)
+            self._prober.request(source, vid, pid, prefer_sdl=True, prefer_xinput=True,
+                                 reconcile_hz=self._reconcile_hz(cfg))
         except Exception as exc:
             msg = f"手柄初始化失败: {exc}"
             if msg != self._last_connect_error:
                 self._last_connect_error = msg
                 self.bus.emit("log", message=msg)
 
+    @staticmethod
+    def _reconcile_hz(cfg) -> float:
+        return cfg.sdl_reconcile_hz
+
+    def _apply_reconcile_rate(self, cfg):
+        """配置热应用：SDL 适配器对账频率变化时即时生效。"""
+        setter = getattr(self.joystick, "set_reconcile_rate", None)
+        hz = self._reconcile_hz(cfg)
+        if setter is not None and hz != self._applied_reconcile_hz:
+            self._applied_reconcile_hz = hz
+            setter(hz)
+
+    def adapter_stats(self) -> dict:
+        """当前适配器的开销统计 + 探测指标（连接耗时/失败次数/内核缓存）。"""
+        out = {"probe": self._prober.stats()}
+        stats = getattr(self.joystick, "stats", None)
+        if stats is None:
+            return out
+        try:
+            out.update({"backend": self.joystick.backend_name, **stats()})
+        except Exception:
+            pass
+        return out
+
     def _attach_joystick(self, joystick):
         """Install one complete adapter and resolve its logical layout."""
         try:
             self.joystick = joystick
             self._frame = None
+            self.frames.clear()
             self._joy_instance_id = joystick.get_instance_id()
             self._resolve_layout()
             self._waiting_emitted = False
             self._last_connect_error = ""
             self._hid_fault_strikes = 0
+            self._applied_reconcile_hz = self._reconcile_hz(self._settings())
             self.connected = True
             self.signal = "ok"
             self._last_joy_event = time.time()
@@ -279,6 +353,7 @@ class GamepadEngine:
                 pass
             self.joystick = None
             self._frame = None
+            self.frames.clear()
             self._joy_instance_id = None
             self.connected = False
             raise
@@ -307,6 +382,7 @@ class GamepadEngine:
         js = self.joystick
         if js is None:
             self._frame = None
+            self.frames.clear()
             return
         snap = getattr(js, "snapshot", None)
         if snap is not None:
@@ -324,6 +400,19 @@ class GamepadEngine:
                        "buttons": [bool(js.get_button(i)) for i in range(nbtn)],
                        "hat": hat, "nax": nax, "nbtn": nbtn, "source": "sdl"}
 
+    def _publish_frame(self, cfg):
+        """发布本帧：原始帧 + 按布局换算的逻辑轴（摇杆 -1..1，扳机 0..1）"""
+        f = self._frame
+        if f is None:
+            return
+        lx, ly, rx, ry = self._axes(cfg)
+        logical = {"lx": lx, "ly": ly, "rx": rx, "ry": ry}
+        for side in ("lt", "rt"):
+            phys = self.axis_src.get(side, DEFAULT_AXIS_SRC[side])
+            logical[side] = (self._trigger_value(side, f["axes"][phys], f["source"])
+                             if phys < f["nax"] else 0.0)
+        self.frames.publish(f, logical)
+
     def _frame_or_live(self):
         """测试/直接调用时帧未建立，退化为逐项直读。"""
         f = self._frame
@@ -361,7 +450,7 @@ class GamepadEngine:
 
     def _joystick_still_present(self) -> bool:
         try:
-            if getattr(self.joystick, "backend_name", "") == "XInput":
+            if getattr(self.joystick, "backend_name", "") in ("XInput", "Linux evdev"):
                 checker = getattr(self.joystick, "is_connected", None)
                 if checker is not None:
                     return bool(checker())
@@ -381,6 +470,7 @@ class GamepadEngine:
         self._close_joystick()
         self.joystick = None
         self._frame = None
+        self.frames.clear()
         self._joy_instance_id = None
         self.connected = False
         self.signal = "ok"
@@ -388,7 +478,7 @@ class GamepadEngine:
         self._waiting_emitted = False
         self.bus.emit("log", message="手柄已断开，等待重新连接…")
         self.bus.emit("gamepad.state", connected=False, name="", axes=[], buttons=[],
-                      mode=cfg.get("mode", "relative"), running=True, layout={})
+                      mode=cfg.mode, running=True, layout={})
 
     def _close_joystick(self):
         if self.joystick is None:
@@ -400,18 +490,13 @@ class GamepadEngine:
 
     def _release_all(self, cfg):
         """释放所有按住的音符（断开/停止时调用）"""
-        for note in list(self._button_notes.values()):
-            self.midi.note_off(note)
-        for side in ("lt", "rt"):
-            if self.trigger_states.get(side):
-                self._trigger_note_off(side)
-        hat_dir = {(0, 1): "dpad_up", (0, -1): "dpad_down",
-                   (-1, 0): "dpad_left", (1, 0): "dpad_right"}.get(self.last_hat)
-        if hat_dir and hat_dir in cfg["note_mappings"]:
-            self.midi.note_off(int(cfg["note_mappings"][hat_dir]))
+        for note, channel in list(self._button_notes.values()) + list(self._held_notes.values()):
+            self.midi.note_off(note, channel=channel)
         self.last_hat = (0, 0)
         self.button_states.clear()
         self._button_notes.clear()
+        self._held_notes.clear()
+        self._rel_t = None
         self.trigger_states = {"lt": False, "rt": False}
         self._trigger_signed_src = {}
         self.hold_start.clear()
@@ -427,7 +512,7 @@ class GamepadEngine:
         - SDL 事件：SDL_GameControllerMappingForGUID 描述的就是 SDL 自身的按钮序，
           直接采用；查不到时回退传统表。
         """
-        cfg = self.get_config()["gamepad"]
+        cfg = self._settings()
         try:
             guid_hex = self.joystick.get_guid()
         except Exception:
@@ -443,7 +528,8 @@ class GamepadEngine:
             ("one" in name or "bluetooth" in name or "ble" in name))
 
         backend_name = getattr(self.joystick, "backend_name", "")
-        if backend_name == "XInput":
+        if backend_name in ("XInput", "Linux evdev"):
+            # 原生适配器已按 XInput 语义序输出按钮/轴
             btn = dict(LEGACY_BUTTON_MAP)
             axes = dict(DEFAULT_AXIS_SRC)
         elif getattr(self.joystick, "standard_layout", False):
@@ -470,8 +556,7 @@ class GamepadEngine:
                         axes[logical] = raw
 
         # 手动覆盖（配置 >=0 时）
-        for key, idx in (("l3", int(cfg.get("l3_button", -1))),
-                         ("r3", int(cfg.get("r3_button", -1)))):
+        for key, idx in (("l3", cfg.l3_button), ("r3", cfg.r3_button)):
             if idx >= 0:
                 btn = {k: v for k, v in btn.items() if v != key}
                 btn[idx] = key
@@ -540,8 +625,8 @@ class GamepadEngine:
             return 0, 0
 
     def _l3_r3(self, cfg):
-        l3 = int(cfg.get("l3_button", -1))
-        r3 = int(cfg.get("r3_button", -1))
+        l3 = cfg.l3_button
+        r3 = cfg.r3_button
         if l3 < 0:
             l3 = next((i for i, k in self.button_key_map.items() if k == "l3"), 8)
         if r3 < 0:
@@ -550,27 +635,35 @@ class GamepadEngine:
 
     # ---- 摇杆：相对模式 ----
 
+    def _frame_scale(self) -> float:
+        """相对增量按帧长计：evdev 有输入即唤醒时一帧内可能处理多次，按距上次处理的
+        时间占 poll_ms 的比例缩放（上限 1 帧），灵敏度不随手柄上报频率变化"""
+        now = time.monotonic()
+        last, self._rel_t = self._rel_t, now
+        if last is None:
+            return 1.0
+        return min(1.0, (now - last) * 1000.0 / self._poll_ms)
+
     def _handle_relative(self, cfg):
         axes = self._axes(cfg)
-        mappings = cfg["cc_mappings"]
-        self._rel_axis(0, axes[0], cfg, mappings.get("left_stick_x"))
-        self._rel_axis(1, axes[1], cfg, mappings.get("left_stick_y"))
-        self._rel_axis(2, axes[2], cfg, mappings.get("right_stick_x"))
-        self._rel_axis(3, axes[3], cfg, mappings.get("right_stick_y"))
-
-    def _rel_axis(self, axis_idx, value, cfg, cc_num):
+        mappings = cfg.cc_mappings
+        scale = self._frame_scale()
+        self._rel_axis(0, axes[0], cfg, mappings.get("left_stick_x"), scale)
+        self._rel_axis(1, axes[1], cfg, mappings.get("left_stick_y"), scale)
+        self._rel_axis(2, axes[2], cfg, mappings.get("right_stick_x"), scale)
+        self._rel_axis(3, axes[3], cfg, mappings.get("right_stick_y"), scale)
+
+    def _rel_axis(self, axis_idx, value, cfg, cc_num, scale=1.0):
         if cc_num is None:
             return
         # MIDI Learn：学习 CC 时推动摇杆（超过阈值）即捕获
         if self.learn.active and self.learn.target.get("kind") == "cc" and abs(value) > 0.3:
             self.learn.handle(kind="axis", index=axis_idx)
             return
-        v = apply_deadzone(value, float(cfg.get("deadzone", 0.15)))
+        v = apply_deadzone(value, cfg.deadzone)
         if v == 0.0:
             return
-        delta = apply_curve(v, cfg.get("curve", "linear"),
-                            float(cfg.get("sensitivity", 3.0)),
-                            float(cfg.get("curve_exp", 2.0)))
+        delta = apply_curve(v, cfg.curve, cfg.sensitivity, cfg.curve_exp) * scale
         cur = self.cc_values.get(cc_num, 64.0)
         new = max(0.0, min(127.0, cur + delta))
         self.cc_values[cc_num] = new
@@ -581,7 +674,7 @@ class GamepadEngine:
         """按解析出的物理轴索引读取：返回 [lx, ly, rx, ry]（引擎顺序）"""
         f = self._frame_or_live()
         n = f["nax"]
-        invert = cfg.get("invert_y", True)
+        invert = cfg.invert_y
         out = []
         for logical, fallback in (("lx", 0), ("ly", 1), ("rx", 2), ("ry", 3)):
             phys = self.axis_src.get(logical, fallback)
@@ -616,8 +709,8 @@ class GamepadEngine:
     def _handle_xy_absolute(self, cfg):
         axes = self._axes(cfg)
         l3, r3 = self._l3_r3(cfg)
-        dz = float(cfg.get("xy_center_deadzone", 0.05))
-        mappings = cfg["cc_mappings"]
+        dz = cfg.xy_center_deadzone
+        mappings = cfg.cc_mappings
 
         l3_down = self._button_down(l3)
         r3_down = self._button_down(r3)
@@ -658,7 +751,7 @@ class GamepadEngine:
         state is also used by the UI so an unheld stick cannot appear to move.
         Relative mode has no gate, so both sticks are considered active.
         """
-        if cfg.get("mode", "relative") != "xy_absolute":
+        if cfg.mode != "xy_absolute":
             return {"left": True, "right": True}
         frame = frame or self._frame_or_live()
         l3, r3 = self._l3_r3(cfg)
@@ -680,10 +773,10 @@ class GamepadEngine:
         rt_raw = f["axes"][rt_i]
         lt_value = self._trigger_value("lt", lt_raw, f["source"])
         rt_value = self._trigger_value("rt", rt_raw, f["source"])
-        mode = cfg.get("trigger_mode", "note")
+        mode = cfg.trigger_mode
         if mode == "cc":
-            self.midi.cc_smoothed(int(cfg.get("trigger_cc_lt", 11)), trigger_axis_to_value(lt_value))
-            self.midi.cc_smoothed(int(cfg.get("trigger_cc_rt", 12)), trigger_axis_to_value(rt_value))
+            self.midi.cc_smoothed(cfg.trigger_cc_lt, trigger_axis_to_value(lt_value))
+            self.midi.cc_smoothed(cfg.trigger_cc_rt, trigger_axis_to_value(rt_value))
             return
         # note / velocity 模式
         threshold = 0.5 if mode == "note" else 0.05
@@ -716,16 +809,18 @@ class GamepadEngine:
         return max(0.0, min(1.0, float(raw)))
 
     def _trigger_note_on(self, side, cfg, velocity):
-        note = int(cfg["note_mappings"].get(side, 60))
+        note = cfg.note_mappings.get(side, 60)
         if velocity is None:
             velocity = self._velocity_for(cfg)
-        self.midi.note_on(note, velocity)
+        channel = self._channel()
+        self.midi.note_on(note, velocity, channel=channel)
+        self._held_notes[side] = (note, channel)
         self.bus.emit("log", message=f"{'左' if side=='lt' else '右'}扳机 -> 音符{note} vel={velocity}")
 
     def _trigger_note_off(self, side):
-        cfg = self.get_config()["gamepad"]
-        note = int(cfg["note_mappings"].get(side, 60))
-        self.midi.note_off(note)
+        held = self._held_notes.pop(side, None)
+        if held is not None:
+            self.midi.note_off(held[0], channel=held[1])
 
     # ---- 十字键 (hat) ----
 
@@ -735,25 +830,26 @@ class GamepadEngine:
             return
         if hat == self.last_hat:
             return
-        old_hat = self.last_hat
         self.last_hat = hat
         dir_map = {(0, 1): "dpad_up", (0, -1): "dpad_down",
                    (-1, 0): "dpad_left", (1, 0): "dpad_right"}
-        old_key = dir_map.get(old_hat)
-        if old_key and old_key in cfg["note_mappings"]:
-            self.midi.note_off(int(cfg["note_mappings"][old_key]))
+        held = self._held_notes.pop("hat", None)
+        if held is not None:
+            self.midi.note_off(held[0], channel=held[1])
         new_key = dir_map.get(hat)
-        if new_key and new_key in cfg["note_mappings"]:
-            note = int(cfg["note_mappings"][new_key])
+        if new_key and new_key in cfg.note_mappings:
+            note = cfg.note_mappings[new_key]
             velocity = self._velocity_for(cfg)
-            self.midi.note_on(note, velocity)
+            channel = self._channel()
+            self.midi.note_on(note, velocity, channel=channel)
+            self._held_notes["hat"] = (note, channel)
             self.bus.emit("log", message=f"十字键{new_key} -> 音符{note} vel={velocity}")
 
     # ---- 按钮 ----
 
     def _handle_buttons(self, cfg):
         # 坐标映射模式下 L3/R3 不触发音符
-        mode = cfg.get("mode", "relative")
+        mode = cfg.mode
         skip = set()
         if mode == "xy_absolute":
             l3, r3 = self._l3_r3(cfg)
@@ -774,7 +870,7 @@ class GamepadEngine:
             elif not pressed and was:
                 self.button_states[i] = False
                 self._button_released(i, cfg)
-            elif pressed and was and cfg.get("velocity_mode") == "hold":
+            elif pressed and was and cfg.velocity_mode == "hold":
                 self._button_hold(i, cfg)
 
     def _button_pressed(self, idx, cfg):
@@ -782,18 +878,21 @@ class GamepadEngine:
             self.learn.handle(kind="button", index=idx)
             return
         key = self.button_key(idx)
-        if key is None or key not in cfg["note_mappings"]:
+        # 广播按下事件：工具可把按钮绑定为运行时操作（如音序器 pattern 切换）
+        self.bus.emit("gamepad.button", index=idx, key=key)
+        if key is None or key not in cfg.note_mappings:
             if idx not in self._unmapped_warned:
                 self._unmapped_warned.add(idx)
                 self.bus.emit("log", message=(
                     f"按钮{idx} 无音符映射(key={key})，未发送 MIDI；"
                     f"请在设置中为 {key or '该按钮'} 绑定音符或检查按钮布局"))
             return
-        note = int(cfg["note_mappings"][key])
+        note = cfg.note_mappings[key]
         velocity = self._velocity_for(cfg)
         self.hold_start[idx] = time.time()
-        self._button_notes[idx] = note
-        self.midi.note_on(note, velocity)
+        channel = self._channel()
+        self._button_notes[idx] = (note, channel)
+        self.midi.note_on(note, velocity, channel=channel)
         self.bus.emit("log", message=f"按钮{idx}({key}) -> 音符{note} vel={velocity}")
 
     def _button_hold(self, idx, cfg):
@@ -802,42 +901,42 @@ class GamepadEngine:
         if start is None:
             return
         elapsed_ms = (time.time() - start) * 1000.0
-        vel = velocity_hold_pressure(elapsed_ms, int(cfg.get("velocity_min", 40)),
-                                     int(cfg.get("velocity_max", 127)))
-        note = self._button_notes.get(idx)
-        if note is None:
+        vel = velocity_hold_pressure(elapsed_ms, cfg.velocity_min, cfg.velocity_max)
+        held = self._button_notes.get(idx)
+        if held is None:
             return
-        self.midi.note_on(note, vel)
+        self.midi.restrike(held[0], vel, channel=held[1])
 
     def _button_released(self, idx, cfg):
         self.hold_start.pop(idx, None)
-        note = self._button_notes.pop(idx, None)
-        if note is None:
+        held = self._button_notes.pop(idx, None)
+        if held is None:
             return
-        self.midi.note_off(note)
+        self.midi.note_off(held[0], channel=held[1])
 
     def _velocity_for(self, cfg) -> int:
-        mode = cfg.get("velocity_mode", "fixed")
+        mode = cfg.velocity_mode
         if mode == "random":
-            return velocity_random(int(cfg.get("velocity_min", 40)),
-                                   int(cfg.get("velocity_max", 127)))
-        return int(cfg.get("velocity_fixed", 127))
+            return velocity_random(cfg.velocity_min, cfg.velocity_max)
+        return cfg.velocity_fixed
 
     # ---- 状态推送 ----
 
     def state_snapshot(self):
-        cfg = self.get_config()["gamepad"]
+        cfg = self._settings()
         if self.joystick is None:
             return {
                 "connected": False, "name": "", "axes": [], "buttons": [],
-                "mode": cfg.get("mode", "relative"), "running": self.running,
+                "mode": cfg.mode, "running": self.running,
                 "layout": {}, "signal": "ok", "last_input_ago": 0,
                 "xy_active": {"left": False, "right": False},
             }
-        f = self._frame_or_live()
+        # 优先读已发布的帧：UI 线程调用时不直接访问适配器
+        frame = self.frames.latest()
+        f = frame.raw if frame is not None else self._frame_or_live()
         raw_axes = list(f["axes"])
         xy_active = self._xy_active(cfg, f)
-        if cfg.get("mode", "relative") == "xy_absolute":
+        if cfg.mode == "xy_absolute":
             # Never leak an unheld stick's physical movement to the UI.  The
             # MIDI path still reads the original frame in _handle_xy_absolute.
             raw_axes[0] = raw_axes[0] if xy_active["left"] and len(raw_axes) > 0 else 0.0
@@ -861,7 +960,7 @@ class GamepadEngine:
             "name": self.joystick.get_name(),
             "axes": axes,
             "buttons": buttons,
-            "mode": cfg.get("mode", "relative"),
+            "mode": cfg.mode,
             "running": self.running,
             "layout": layout,
             "signal": self.signal,
@@ -1,13 +1,20 @@
-"""Windows gamepad device adapters.
+"""Native gamepad device adapters.
 
 Xbox-compatible controllers use the native XInput state as the primary live
 source. SDL is retained for discovery, hot-plug events, and non-XInput devices;
 HID remains an explicit fallback for devices that need semantic report decoding.
+On Linux, evdev nodes are read directly (non-blocking + epoll) without going
+through SDL's event pump.
 All adapters expose the small pygame Joystick surface used by GamepadEngine.
 """
 
 from __future__ import annotations
 
+import errno
+import glob
+import os
+import select
+import struct
 import threading
 import time
 import ctypes
@@ -197,7 +204,12 @@ class XInputJoystick:
     def init(self):
         return None
 
+    def release(self):
+        """Drop native resources but leave the SDL source open (XInput has none)."""
+        return None
+
     def quit(self):
+        self.release()
         if self._source is not None:
             self._source.quit()
 
@@ -249,7 +261,10 @@ class SdlEventJoystick:
     standard_layout = False
     backend_name = "SDL 事件"
 
-    def __init__(self, joystick):
+    RECONCILE_HZ = 20.0              # 直读对账基础频率
+    RECONCILE_MAX_INTERVAL = 1.0     # 事件覆盖全部索引后退避的上限（秒）
+
+    def __init__(self, joystick, reconcile_hz: float = RECONCILE_HZ):
         self._lock = threading.RLock()
         self._joystick = joystick
         self._instance_id = joystick.get_instance_id()
@@ -267,6 +282,13 @@ class SdlEventJoystick:
         self._event_axes_seen = set()
         self._event_buttons_seen = set()
         self._event_hat_seen = False
+        hz = float(reconcile_hz or 0.0)
+        self._reconcile_base = 1.0 / hz if hz > 0 else 0.0
+        self._reconcile_interval = self._reconcile_base
+        self._next_reconcile = 0.0
+        self._stats = {"reconcile_passes": 0, "reconcile_calls": 0,
+                       "reconcile_seconds": 0.0, "reconcile_hits": 0,
+                       "frames_skipped": 0}
 
     def process_event(self, event) -> bool:
         instance_id = getattr(event, "instance_id", None)
@@ -303,42 +325,107 @@ class SdlEventJoystick:
             return changed
 
     def poll_refresh(self):
-        """每帧直读 SDL 实时状态；最近收到过事件的索引保持事件值。"""
+        """帧热路径：未到对账时刻直接返回（事件已由 process_event 合并）。"""
+        now = time.monotonic()
+        if now < self._next_reconcile:
+            self._stats["frames_skipped"] += 1
+            return False
+        return self.reconcile(now)
+
+    def reconcile(self, now=None):
+        """低频对账：直读 SDL 实时状态补齐事件未覆盖的索引。
+
+        最近收到过事件的索引保持事件值。C 调用在锁外完成，只在合并时持锁；
+        事件覆盖全部索引后对账间隔逐次翻倍退避，直读发现新值时恢复基础频率。"""
+        started = time.perf_counter()
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            axes_seen = set(self._event_axes_seen)
+            buttons_seen = set(self._event_buttons_seen)
+            hat_seen = self._event_hat_seen
+            recent_axes = {i for i, ts in self._event_wins_axes.items()
+                           if now - ts < self._event_win_seconds}
+            recent_buttons = {i for i, ts in self._event_wins_buttons.items()
+                              if now - ts < self._event_win_seconds}
+        js = self._joystick
+        n = js.get_numaxes()
+        m = js.get_numbuttons()
+        has_hat = bool(js.get_numhats())
+        calls = 3
+        axis_reads = {}
+        for i in range(n):
+            if i in axes_seen or i in recent_axes:
+                continue
+            axis_reads[i] = float(js.get_axis(i))
+        button_reads = {}
+        for i in range(m):
+            if i in buttons_seen or i in recent_buttons:
+                continue
+            button_reads[i] = bool(js.get_button(i))
+        hat = None
+        if has_hat and not hat_seen:
+            hat = js.get_hat(0)
+        calls += len(axis_reads) + len(button_reads) + (hat is not None)
         with self._lock:
-            now = time.monotonic()
             changed = False
-            n = self._joystick.get_numaxes()
             self._ensure_axes(n)
-            for i in range(n):
+            self._ensure_buttons(m)
+            for i, value in axis_reads.items():
+                # 直读期间若事件已接管该索引，以事件值为准
                 if i in self._event_axes_seen:
                     continue
-                if now - self._event_wins_axes.get(i, 0.0) < self._event_win_seconds:
-                    continue
-                value = float(self._joystick.get_axis(i))
                 if self._axes[i] != value:
                     self._axes[i] = value
                     changed = True
-            m = self._joystick.get_numbuttons()
-            self._ensure_buttons(m)
-            for i in range(m):
+            for i, value in button_reads.items():
                 if i in self._event_buttons_seen:
                     continue
-                if now - self._event_wins_buttons.get(i, 0.0) < self._event_win_seconds:
-                    continue
-                value = bool(self._joystick.get_button(i))
                 if self._buttons[i] != value:
                     self._buttons[i] = value
                     changed = True
-            if self._joystick.get_numhats() and not self._event_hat_seen:
-                hat = self._joystick.get_hat(0)
-                if hat != self._hat:
-                    self._hat = hat
-                    changed = True
+            if hat is not None and not self._event_hat_seen and hat != self._hat:
+                self._hat = hat
+                changed = True
             self._changed = self._changed or changed
             if changed:
                 self._last_change = time.monotonic()
+            covered = (len(self._event_axes_seen) >= n and
+                       len(self._event_buttons_seen) >= m and
+                       (self._event_hat_seen or not has_hat))
+            if changed or not covered:
+                self._reconcile_interval = self._reconcile_base
+            else:
+                self._reconcile_interval = min(
+                    self.RECONCILE_MAX_INTERVAL,
+                    max(self._reconcile_base, self._reconcile_interval * 2.0))
+            self._next_reconcile = now + self._reconcile_interval
+            stats = self._stats
+            stats["reconcile_passes"] += 1
+            stats["reconcile_calls"] += calls
+            stats["reconcile_hits"] += int(changed)
+            stats["reconcile_seconds"] += time.perf_counter() - started
             return changed
 
+    def set_reconcile_rate(self, hz: float):
+        """运行时调整对账频率（<=0 表示每帧对账）。"""
+        with self._lock:
+            hz = float(hz or 0.0)
+            self._reconcile_base = 1.0 / hz if hz > 0 else 0.0
+            self._reconcile_interval = self._reconcile_base
+            self._next_reconcile = 0.0
+
+    def stats(self) -> dict:
+        """对账开销统计：次数、C 调用数、累计耗时、命中次数与当前间隔。"""
+        with self._lock:
+            out = dict(self._stats)
+            passes = out["reconcile_passes"]
+            out["reconcile_interval"] = self._reconcile_interval
+            out["reconcile_avg_us"] = (out["reconcile_seconds"] / passes * 1e6) if passes else 0.0
+            out["event_coverage"] = {
+                "axes": len(self._event_axes_seen), "buttons": len(self._event_buttons_seen),
+                "hat": self._event_hat_seen}
+            return out
+
     def consume_changed(self) -> bool:
         with self._lock:
             changed = self._changed
@@ -367,6 +454,9 @@ class SdlEventJoystick:
     def init(self):
         return None
 
+    def release(self):
+        return None
+
     def quit(self):
         self._joystick.quit()
 
@@ -690,8 +780,15 @@ class HidJoystick:
     def init(self):
         return None
 
+    def release(self):
+        """关闭 HID 句柄，保留 SDL 源（并行探测落选时使用）。"""
+        try:
+            self._device.close()
+        except Exception:
+            pass
+
     def quit(self):
-        self._device.close()
+        self.release()
         self._source.quit()
 
     def get_name(self):
@@ -732,29 +829,459 @@ class HidJoystick:
             return self._hat if index == 0 else (0, 0)
 
 
-def open_gamepad(source_joystick, vid: int, pid: int, prefer_sdl: bool = True,
-                 prefer_xinput: bool = True):
-    """Open the most reliable native source for the discovered controller."""
+# ---- Linux evdev ----------------------------------------------------------
+
+_EV_SYN, _EV_KEY, _EV_ABS = 0x00, 0x01, 0x03
+_SYN_REPORT, _SYN_DROPPED = 0, 3
+_ABS_X, _ABS_Y, _ABS_Z, _ABS_RX, _ABS_RY, _ABS_RZ = 0x00, 0x01, 0x02, 0x03, 0x04, 0x05
+_ABS_HAT0X, _ABS_HAT0Y = 0x10, 0x11
+_KEY_MAX = 0x2FF
+_ABS_MAX = 0x3F
+_BTN_DPAD = {0x220: (0, 1), 0x221: (0, -1), 0x222: (-1, 0), 0x223: (1, 0)}
+
+# struct input_event: struct timeval + __u16 type + __u16 code + __s32 value
+_INPUT_EVENT = struct.Struct("@llHHi")
+# struct input_absinfo: value, minimum, maximum, fuzz, flat, resolution
+_ABSINFO = struct.Struct("@6i")
+
+
+def _ioc(direction, nr, size):
+    return (direction << 30) | (size << 16) | (ord("E") << 8) | nr
+
+
+def _eviocgname(length):
+    return _ioc(2, 0x06, length)
+
+
+def _eviocgbit(ev, length):
+    return _ioc(2, 0x20 + ev, length)
+
+
+def _eviocgkey(length):
+    return _ioc(2, 0x18, length)
+
+
+def _eviocgabs(code):
+    return _ioc(2, 0x40 + code, _ABSINFO.size)
+
+
+_EVIOCGID = _ioc(2, 0x02, 8)
+_EVIOCSCLOCKID = _ioc(1, 0xA0, 4)
+_CLOCK_MONOTONIC = 1
+
+
+def _bits(buf):
+    return {i * 8 + bit for i, byte in enumerate(buf) for bit in range(8) if byte >> bit & 1}
+
+
+class EvdevJoystick:
+    """Direct Linux evdev reader (``/dev/input/event*``).
+
+    ``struct input_event`` records are read with non-blocking I/O; readiness is
+    tracked by epoll so an idle frame costs a single ``epoll_wait(0)``. Values
+    are committed atomically on ``SYN_REPORT`` and normalized from the node's
+    absinfo. Buttons and axes are exposed in XInput order, so the engine uses
+    the same layout table as the XInput adapter.
+    """
+
+    standard_layout = False
+    backend_name = "Linux evdev"
+
+    # XInput 序：A,B,X,Y,LB,RB,Back,Start,L3,R3,Guide
+    _BUTTON_CODES = (0x130, 0x131, 0x133, 0x134, 0x136, 0x137,
+                     0x13A, 0x13B, 0x13D, 0x13E, 0x13C)
+    # 引擎序：lx, ly, rx, ry, lt, rt
+    _AXIS_CODES = (_ABS_X, _ABS_Y, _ABS_RX, _ABS_RY, _ABS_Z, _ABS_RZ)
+    _TRIGGER_CODES = (_ABS_Z, _ABS_RZ)
+
+    def __init__(self, fd, name, absinfo, key_codes, source_joystick=None,
+                 path="", input_id=(0, 0, 0, 0)):
+        self._fd = fd
+        self._name = name
+        self._path = path
+        self._input_id = tuple(input_id)
+        self._source = source_joystick
+        self._lock = threading.RLock()
+        self._absinfo = dict(absinfo)   # code -> (minimum, maximum)
+        extra = sorted(set(key_codes) - set(self._BUTTON_CODES) - set(_BTN_DPAD))
+        self._button_index = {code: i for i, code in
+                              enumerate(self._BUTTON_CODES + tuple(extra))}
+        self._axis_index = {code: i for i, code in enumerate(self._AXIS_CODES)}
+        self._axes = [0.0, 0.0, 0.0, 0.0, 0.0, 0.0]
+        self._buttons = [False] * len(self._button_index)
+        self._hat_abs = [0, 0]
+        self._dpad = {code: False for code in _BTN_DPAD}
+        self._hat = (0, 0)
+        self._frame = []                # 当前 SYN_REPORT 之前累积的 (type, code, value)
+        self._dropped = False
+        self._partial = b""
+        self._changed = False
+        self._last_change = 0.0
+        self._last_event_time = 0.0     # 内核时间戳（CLOCK_MONOTONIC）
+        self._connected = True
+        self.events_read = 0
+        self.frames = 0
+        self.syn_dropped = 0
+        os.set_blocking(fd, False)
+        self._epoll = select.epoll()
+        self._epoll.register(fd, select.EPOLLIN | select.EPOLLERR | select.EPOLLHUP)
+
+    # ---- 打开 ----
+
+    @classmethod
+    def try_open(cls, source_joystick=None, vid: int = 0, pid: int = 0):
+        """Scan evdev nodes and open the first game controller that matches.
+
+        VID/PID are matched when both are known; otherwise the SDL source
+        name is used, and without a source the first gamepad node wins."""
+        if not sys.platform.startswith("linux"):
+            return None
+        want_name = ""
+        if source_joystick is not None and not (vid and pid):
+            try:
+                want_name = str(source_joystick.get_name()).strip().lower()
+            except Exception:
+                want_name = ""
+        for path in sorted(glob.glob("/dev/input/event*"),
+                           key=lambda p: int(p.rsplit("event", 1)[-1] or 0)):
+            try:
+                fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+            except OSError:
+                continue
+            try:
+                probe = cls._probe(fd)
+            except OSError:
+                probe = None
+            if probe is None:
+                os.close(fd)
+                continue
+            name, input_id, absinfo, keys = probe
+            if vid and pid and (input_id[1], input_id[2]) != (vid, pid):
+                os.close(fd)
+                continue
+            if want_name and want_name not in name.lower() and name.lower() not in want_name:
+                os.close(fd)
+                continue
+            try:
+                joystick = cls(fd, name, absinfo, keys, source_joystick, path, input_id)
+            except OSError:
+                os.close(fd)
+                continue
+            joystick._use_monotonic_clock()
+            joystick._resync()
+            return joystick
+        return None
+
+    @staticmethod
+    def _probe(fd):
+        """ioctl 查询能力位；非手柄节点返回 None。"""
+        import fcntl
+        ev_bits = _bits(fcntl.ioctl(fd, _eviocgbit(0, 4), bytes(4)))
+        if _EV_ABS not in ev_bits or _EV_KEY not in ev_bits:
+            return None
+        abs_codes = _bits(fcntl.ioctl(fd, _eviocgbit(_EV_ABS, (_ABS_MAX + 8) // 8),
+                                      bytes((_ABS_MAX + 8) // 8)))
+        keys = _bits(fcntl.ioctl(fd, _eviocgbit(_EV_KEY, (_KEY_MAX + 8) // 8),
+                                 bytes((_KEY_MAX + 8) // 8)))
+        # 手柄(BTN_GAMEPAD 0x130..)或摇杆(BTN_JOYSTICK 0x120..)且至少具备 X/Y 轴
+        if not {_ABS_X, _ABS_Y} <= abs_codes or not any(0x120 <= k <= 0x13F for k in keys):
+            return None
+        raw_name = fcntl.ioctl(fd, _eviocgname(256), bytes(256))
+        name = raw_name.split(b"\0", 1)[0].decode("utf-8", errors="replace")
+        input_id = struct.unpack("4H", fcntl.ioctl(fd, _EVIOCGID, bytes(8)))
+        absinfo = {}
+        for code in abs_codes:
+            info = _ABSINFO.unpack(fcntl.ioctl(fd, _eviocgabs(code), bytes(_ABSINFO.size)))
+            absinfo[code] = (info[1], info[2])
+        buttons = {k for k in keys if 0x100 <= k <= _KEY_MAX}
+        return name, input_id, absinfo, buttons
+
+    def _use_monotonic_clock(self):
+        """事件时间戳切换到 CLOCK_MONOTONIC，与 time.monotonic() 同一时基。"""
+        try:
+            import fcntl
+            fcntl.ioctl(self._fd, _EVIOCSCLOCKID, struct.pack("i", _CLOCK_MONOTONIC))
+        except (OSError, ImportError):
+            pass
+
+    def _resync(self):
+        """SYN_DROPPED 或初次打开后：用 EVIOCGABS/EVIOCGKEY 重读完整状态。"""
+        try:
+            import fcntl
+            key_buf = fcntl.ioctl(self._fd, _eviocgkey((_KEY_MAX + 8) // 8),
+                                  bytes((_KEY_MAX + 8) // 8))
+            values = {}
+            for code in self._absinfo:
+                info = _ABSINFO.unpack(fcntl.ioctl(self._fd, _eviocgabs(code),
+                                                   bytes(_ABSINFO.size)))
+                values[code] = info[0]
+        except (OSError, ImportError):
+            return False
+        pressed = _bits(key_buf)
+        frame = [(_EV_ABS, code, value) for code, value in values.items()]
+        frame += [(_EV_KEY, code, int(code in pressed))
+                  for code in (*self._button_index, *_BTN_DPAD)]
+        with self._lock:
+            return self._apply_frame(frame, time.monotonic())
+
+    # ---- 解码 ----
+
+    def _normalize(self, code, value):
+        low, high = self._absinfo.get(code, (-32768, 32767))
+        if high <= low:
+            return 0.0
+        ratio = (float(value) - low) / (high - low)
+        if code in self._TRIGGER_CODES:
+            return max(0.0, min(1.0, ratio))
+        return max(-1.0, min(1.0, ratio * 2.0 - 1.0))
+
+    def _apply_frame(self, frame, stamp):
+        """调用方须已持有 _lock。一次 SYN_REPORT 内的事件原子提交。"""
+        changed = False
+        hat_dirty = False
+        for ev_type, code, value in frame:
+            if ev_type == _EV_ABS:
+                idx = self._axis_index.get(code)
+                if idx is not None:
+                    v = self._normalize(code, value)
+                    if self._axes[idx] != v:
+                        self._axes[idx] = v
+                        changed = True
+                elif code in (_ABS_HAT0X, _ABS_HAT0Y):
+                    self._hat_abs[code - _ABS_HAT0X] = max(-1, min(1, int(value)))
+                    hat_dirty = True
+            elif ev_type == _EV_KEY:
+                idx = self._button_index.get(code)
+                if idx is not None:
+                    v = bool(value)
+                    if self._buttons[idx] != v:
+                        self._buttons[idx] = v
+                        changed = True
+                elif code in self._dpad:
+                    self._dpad[code] = bool(value)
+                    hat_dirty = True
+        if hat_dirty:
+            # evdev HAT0Y 向下为正；引擎/XInput 语义为上 = +1
+            x, y = self._hat_abs[0], -self._hat_abs[1]
+            for code, (dx, dy) in _BTN_DPAD.items():
+                if self._dpad[code]:
+                    x, y = x or dx, y or dy
+            if (x, y) != self._hat:
+                self._hat = (x, y)
+                changed = True
+        self.frames += 1
+        if changed:
+            self._changed = True
+            self._last_change = stamp
+        return changed
+
+    def feed(self, data: bytes) -> bool:
+        """解码一段 input_event 字节流（可含半条记录）；返回是否有状态变化。"""
+        data = self._partial + data
+        usable = len(data) - len(data) % _INPUT_EVENT.size
+        self._partial = data[usable:]
+        changed = False
+        with self._lock:
+            for sec, usec, ev_type, code, value in _INPUT_EVENT.iter_unpack(data[:usable]):
+                self.events_read += 1
+                if ev_type == _EV_SYN:
+                    if code == _SYN_DROPPED:
+                        # 内核缓冲溢出：丢弃到下一个 SYN_REPORT 为止，再整体重读
+                        self.syn_dropped += 1
+                        self._dropped = True
+                        self._frame.clear()
+                    elif code == _SYN_REPORT:
+                        stamp = sec + usec / 1e6
+                        self._last_event_time = stamp
+                        if self._dropped:
+                            self._dropped = False
+                            self._frame.clear()
+                            changed = self._resync() or changed
+                        else:
+                            changed = self._apply_frame(self._frame, stamp) or changed
+                            self._frame.clear()
+                elif not self._dropped:
+                    self._frame.append((ev_type, code, value))
+        return changed
+
+    # ---- 读取 ----
+
+    def _drain(self) -> bool:
+        changed = False
+        while True:
+            try:
+                data = os.read(self._fd, _INPUT_EVENT.size * 64)
+            except BlockingIOError:
+                break
+            except OSError as exc:
+                if exc.errno in (errno.ENODEV, errno.EBADF, errno.EIO):
+                    with self._lock:
+                        self._connected = False
+                break
+            if not data:
+                break
+            changed = self.feed(data) or changed
+            if len(data) < _INPUT_EVENT.size * 64:
+                break
+        return changed
+
+    def wait_input(self, timeout: float) -> bool:
+        """阻塞至多 timeout 秒等待输入就绪（替代固定轮询睡眠，降低延迟）。"""
+        try:
+            events = self._epoll.poll(max(0.0, timeout))
+        except (OSError, ValueError):
+            return False
+        for _, mask in events:
+            if mask & (select.EPOLLERR | select.EPOLLHUP):
+                with self._lock:
+                    self._connected = False
+        return bool(events)
+
+    def process_event(self, event) -> bool:
+        return False
+
+    def poll_refresh(self):
+        try:
+            events = self._epoll.poll(0)
+        except (OSError, ValueError):
+            return False
+        if not events:
+            return False
+        for _, mask in events:
+            if mask & (select.EPOLLERR | select.EPOLLHUP) and not mask & select.EPOLLIN:
+                with self._lock:
+                    self._connected = False
+                return False
+        return self._drain()
+
+    def consume_changed(self):
+        with self._lock:
+            changed = self._changed
+            self._changed = False
+            return changed
+
+    def snapshot(self):
+        with self._lock:
+            return (list(self._axes), list(self._buttons), self._hat,
+                    6, len(self._buttons), "evdev")
+
+    def last_change(self):
+        with self._lock:
+            return self._last_change
+
+    def last_event_time(self):
+        """最近一帧的内核时间戳（CLOCK_MONOTONIC 秒）。"""
+        with self._lock:
+            return self._last_event_time
+
+    def is_connected(self):
+        with self._lock:
+            return self._connected
+
+    def init(self):
+        return None
+
+    def release(self):
+        try:
+            self._epoll.close()
+        except Exception:
+            pass
+        try:
+            os.close(self._fd)
+        except OSError:
+            pass
+
+    def quit(self):
+        self.release()
+        if self._source is not None:
+            self._source.quit()
+
+    def get_name(self):
+        return self._name
+
+    def get_guid(self):
+        if self._source is not None:
+            return self._source.get_guid()
+        # SDL GUID 布局：bus, crc, VID, 0, PID, 0, version, 0（小端 16 位）
+        bus, vendor, product, version = self._input_id
+        return struct.pack("<8H", bus, 0, vendor, 0, product, 0, version, 0).hex()
+
+    def get_instance_id(self):
+        if self._source is not None:
+            return self._source.get_instance_id()
+        return 0x45560000 + (self._fd & 0xFFFF)
+
+    def get_numaxes(self):
+        return 6
+
+    def get_axis(self, index):
+        with self._lock:
+            return self._axes[index]
+
+    def get_numbuttons(self):
+        with self._lock:
+            return len(self._buttons)
+
+    def get_button(self, index):
+        with self._lock:
+            return self._buttons[index]
+
+    def get_numhats(self):
+        return 1
+
+    def get_hat(self, index):
+        with self._lock:
+            return self._hat if index == 0 else (0, 0)
+
+
+def _open_hid(source_joystick, vid, pid):
+    devices = hid.HidDeviceFilter(vendor_id=vid, product_id=pid).get_devices()
+    for device in devices:
+        try:
+            return HidJoystick(device, source_joystick)
+        except Exception:
+            try:
+                device.close()
+            except Exception:
+                pass
+    return None
+
+
+def gamepad_candidates(source_joystick, vid: int, pid: int, prefer_sdl: bool = True,
+                       prefer_xinput: bool = True, prefer_evdev: bool = True,
+                       reconcile_hz: float = SdlEventJoystick.RECONCILE_HZ):
+    """Return ``[(backend, opener), ...]`` in priority order.
+
+    Each opener returns an adapter or None when the backend does not see the
+    device. ``open_gamepad`` runs them in order; the probe worker runs them
+    concurrently and keeps the highest-priority success."""
     name = ""
     try:
         name = str(source_joystick.get_name()).lower()
     except Exception:
         pass
     looks_like_xbox = source_joystick is None or vid == 0x045E or "xbox" in name
+    candidates = []
     if prefer_xinput and looks_like_xbox:
-        joystick = XInputJoystick.try_open(source_joystick)
-        if joystick is not None:
-            return joystick
+        candidates.append(("xinput", lambda: XInputJoystick.try_open(source_joystick)))
+    if prefer_evdev and sys.platform.startswith("linux"):
+        candidates.append(("evdev", lambda: EvdevJoystick.try_open(source_joystick, vid, pid)))
     if source_joystick is None:
-        return None
+        return candidates
     if hid is not None and vid and pid and (not prefer_sdl or looks_like_xbox):
-        devices = hid.HidDeviceFilter(vendor_id=vid, product_id=pid).get_devices()
-        for device in devices:
-            try:
-                return HidJoystick(device, source_joystick)
-            except Exception:
-                try:
-                    device.close()
-                except Exception:
-                    pass
-    return SdlEventJoystick(source_joystick)
+        candidates.append(("hid", lambda: _open_hid(source_joystick, vid, pid)))
+    candidates.append(("sdl", lambda: SdlEventJoystick(source_joystick,
+                                                       reconcile_hz=reconcile_hz)))
+    return candidates
+
+
+def open_gamepad(source_joystick, vid: int, pid: int, prefer_sdl: bool = True,
+                 prefer_xinput: bool = True, prefer_evdev: bool = True,
+                 reconcile_hz: float = SdlEventJoystick.RECONCILE_HZ):
+    """Open the most reliable native source for the discovered controller."""
+    for _, opener in gamepad_candidates(source_joystick, vid, pid, prefer_sdl,
+                                        prefer_xinput, prefer_evdev, reconcile_hz):
+        joystick = opener()
+        if joystick is not None:
+            return joystick
+    return None
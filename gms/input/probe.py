@@ -0,0 +1,218 @@
+"""手柄适配器后台探测：并发尝试候选内核（带超时）+ 按 VID/PID 记忆上次成功的内核。
+
+探测在独立工作线程中进行，不阻塞手柄主循环：慢速 HID 打开（如蓝牙设备）
+只会让结果晚到，而不会卡住轮询。上次成功的内核（last-known-good）单独优先
+尝试，命中即返回；未命中时其余候选并发执行，按优先级取第一个成功者，
+落选与超时后才返回的适配器一律 release()，不泄漏原生句柄。
+"""
+
+import threading
+import time
+
+from .gamepad_devices import gamepad_candidates
+
+
+def _release(adapter):
+    if adapter is None:
+        return
+    release = getattr(adapter, "release", None)
+    try:
+        if release is not None:
+            release()
+    except Exception:
+        pass
+
+
+class _Attempt:
+    """单个候选内核的打开尝试（daemon 线程；超时后被放弃也能自行回收）。"""
+
+    def __init__(self, backend, opener):
+        self.backend = backend
+        self._opener = opener
+        self._lock = threading.Lock()
+        self.done = threading.Event()
+        self.result = None
+        self.error = ""
+        self.elapsed = 0.0
+        self._abandoned = False
+        self._thread = threading.Thread(target=self._run, daemon=True,
+                                        name=f"probe_{backend}")
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        started = time.perf_counter()
+        result = None
+        try:
+            result = self._opener()
+        except Exception as exc:
+            self.error = f"{type(exc).__name__}: {exc}"
+        self.elapsed = time.perf_counter() - started
+        with self._lock:
+            if self._abandoned:
+                _release(result)
+                result = None
+            self.result = result
+        self.done.set()
+
+    def take(self):
+        with self._lock:
+            result, self.result = self.result, None
+            return result
+
+    def abandon(self):
+        with self._lock:
+            self._abandoned = True
+            result, self.result = self.result, None
+        _release(result)
+
+
+def probe_gamepad(candidates, preferred=None, timeout=3.0):
+    """并发探测候选内核。返回 (adapter, backend, failures)。
+
+    failures 为 [(backend, 原因)]：异常与超时计入；候选未发现设备不算失败。"""
+    failures = []
+    order = list(candidates)
+    if preferred:
+        first = [c for c in order if c[0] == preferred]
+        if first:
+            attempt = _Attempt(*first[0]).start()
+            if attempt.done.wait(timeout):
+                adapter = attempt.take()
+                if adapter is not None:
+                    return adapter, preferred, failures
+                if attempt.error:
+                    failures.append((preferred, attempt.error))
+            else:
+                attempt.abandon()
+                failures.append((preferred, f"超时 {timeout:.1f}s"))
+            order = [c for c in order if c[0] != preferred]
+    attempts = [_Attempt(backend, opener).start() for backend, opener in order]
+    deadline = time.monotonic() + timeout
+    winner = None
+    for attempt in attempts:
+        if winner is not None:
+            attempt.abandon()
+            continue
+        if not attempt.done.wait(max(0.0, deadline - time.monotonic())):
+            attempt.abandon()
+            failures.append((attempt.backend, f"超时 {timeout:.1f}s"))
+            continue
+        adapter = attempt.take()
+        if adapter is not None:
+            winner = (adapter, attempt.backend)
+        elif attempt.error:
+            failures.append((attempt.backend, attempt.error))
+    if winner is None:
+        return None, "", failures
+    return winner[0], winner[1], failures
+
+
+class AdapterProber:
+    """手柄主循环的探测代理：request() 立即返回，结果由 poll() 在主循环线程取回。"""
+
+    PROBE_TIMEOUT = 3.0
+    IDLE_RETRY = 1.0      # 上次未发现设备时的最小重试间隔（秒）
+
+    def __init__(self, bus, timeout: float = PROBE_TIMEOUT):
+        self.bus = bus
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._thread = None
+        self._result = None          # (adapter, backend, key, elapsed)
+        self._generation = 0
+        self._last_empty = 0.0
+        self._last_failure_msg = ""
+        self._lkg = {}               # (vid, pid) -> 上次成功的内核
+        self._stats = {"probes": 0, "connected": 0, "failures": {},
+                       "last_connect_ms": 0.0, "max_connect_ms": 0.0}
+
+    @property
+    def busy(self) -> bool:
+        thread = self._thread
+        return thread is not None and thread.is_alive()
+
+    def request(self, source_joystick, vid: int, pid: int, **options) -> bool:
+        """后台发起一次探测；已有探测进行中、结果未取或重试过快时返回 False。"""
+        with self._lock:
+            if self.busy or self._result is not None:
+                return False
+            if source_joystick is None and time.monotonic() - self._last_empty < self.IDLE_RETRY:
+                return False
+            generation = self._generation
+            self._thread = threading.Thread(
+                target=self._run, args=(generation, source_joystick, vid, pid, options),
+                daemon=True, name="gamepad_probe")
+            self._thread.start()
+        return True
+
+    def _run(self, generation, source_joystick, vid, pid, options):
+        key = (int(vid or 0), int(pid or 0))
+        started = time.perf_counter()
+        try:
+            candidates = gamepad_candidates(source_joystick, vid, pid, **options)
+            adapter, backend, failures = probe_gamepad(
+                candidates, preferred=self._lkg.get(key), timeout=self.timeout)
+        except Exception as exc:
+            adapter, backend, failures = None, "", [("probe", f"{type(exc).__name__}: {exc}")]
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            stale = generation != self._generation
+            stats = self._stats
+            stats["probes"] += 1
+            for name, _ in failures:
+                stats["failures"][name] = stats["failures"].get(name, 0) + 1
+            if adapter is None:
+                self._last_empty = time.monotonic()
+            elif not stale:
+                self._lkg[key] = backend
+                self._result = (adapter, backend, key, elapsed)
+                stats["connected"] += 1
+                stats["last_connect_ms"] = elapsed * 1000.0
+                stats["max_connect_ms"] = max(stats["max_connect_ms"], elapsed * 1000.0)
+        if stale:
+            _release(adapter)
+            return
+        if failures:
+            msg = "手柄探测失败：" + "；".join(f"{name} {reason}" for name, reason in failures)
+            if msg != self._last_failure_msg:
+                self._last_failure_msg = msg
+                self.bus.emit("log", message=msg)
+        if adapter is not None:
+            self.bus.emit("log", message=(
+                f"手柄探测：{backend} 用时 {elapsed * 1000.0:.0f}ms"
+                f"（VID {key[0]:04X} PID {key[1]:04X}）"))
+
+    def poll(self):
+        """取回已完成的探测结果（适配器）；无结果返回 None。"""
+        with self._lock:
+            result, self._result = self._result, None
+        return result[0] if result else None
+
+    def wait(self, timeout: float) -> bool:
+        """等待进行中的探测结束（测试/重新检测用）。"""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        return not self.busy
+
+    def cancel(self):
+        """作废进行中的探测与未取走的结果（引擎停止时调用）。"""
+        with self._lock:
+            self._generation += 1
+            result, self._result = self._result, None
+        if result:
+            _release(result[0])
+
+    def preferred_backend(self, vid: int, pid: int):
+        return self._lkg.get((int(vid or 0), int(pid or 0)))
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self._stats)
+            out["failures"] = dict(self._stats["failures"])
+            out["cache"] = {f"{vid:04X}:{pid:04X}": backend
+                            for (vid, pid), backend in self._lkg.items()}
+            return out
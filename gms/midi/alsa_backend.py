@@ -0,0 +1,328 @@
+"""Linux ALSA 音序器虚拟端口内核（ctypes 直调 libasound，无第三方绑定）。
+
+每个虚拟端口对应一个独立的音序器客户端 + 一个双向简单端口（可读可写、
+可被订阅），DAW / aconnect 中显示为 "Gamepad MIDI Studio:<端口名>"。
+输出：原始字节经 snd_midi_event 编码为音序器事件；单条消息走
+snd_seq_event_output_direct（不排队、不经输出缓冲），一次写入多条消息时
+先批量入缓冲再一次 drain，减少系统调用。
+输入：后台线程 poll 音序器描述符，事件经 snd_midi_event 解码回原始字节后
+交给 on_input 回调。
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import sys
+import threading
+
+from .backends import VirtualMidiBackend
+
+# ---- libasound 常量 ----
+
+SND_SEQ_OPEN_DUPLEX = 3
+SND_SEQ_NONBLOCK = 1
+
+SND_SEQ_PORT_CAP_READ = 1 << 0
+SND_SEQ_PORT_CAP_WRITE = 1 << 1
+SND_SEQ_PORT_CAP_DUPLEX = 1 << 4
+SND_SEQ_PORT_CAP_SUBS_READ = 1 << 5
+SND_SEQ_PORT_CAP_SUBS_WRITE = 1 << 6
+SND_SEQ_PORT_TYPE_MIDI_GENERIC = 1 << 1
+SND_SEQ_PORT_TYPE_SOFTWARE = 1 << 16
+SND_SEQ_PORT_TYPE_APPLICATION = 1 << 20
+
+PORT_CAPS = (SND_SEQ_PORT_CAP_READ | SND_SEQ_PORT_CAP_WRITE | SND_SEQ_PORT_CAP_DUPLEX
+             | SND_SEQ_PORT_CAP_SUBS_READ | SND_SEQ_PORT_CAP_SUBS_WRITE)
+PORT_TYPE = (SND_SEQ_PORT_TYPE_MIDI_GENERIC | SND_SEQ_PORT_TYPE_SOFTWARE
+             | SND_SEQ_PORT_TYPE_APPLICATION)
+
+SND_SEQ_EVENT_NONE = 255          # 编码器未凑满一条消息
+SND_SEQ_QUEUE_DIRECT = 253        # 不经队列直接投递
+SND_SEQ_ADDRESS_SUBSCRIBERS = 254
+SND_SEQ_ADDRESS_UNKNOWN = 253
+
+CLIENT_NAME = b"Gamepad MIDI Studio"
+ENCODER_BUFSIZE = 256             # 编码器内部缓冲（SysEx 按此分块）
+DECODE_BUFSIZE = 4096
+
+
+# ---- 结构体 ----
+
+class SndSeqAddr(ctypes.Structure):
+    _fields_ = [("client", ctypes.c_ubyte), ("port", ctypes.c_ubyte)]
+
+
+class SndSeqEvent(ctypes.Structure):
+    """snd_seq_event_t（28 字节）。时间戳与数据联合体按原样保留字节，
+    具体内容由 snd_midi_event 编解码，Python 侧只设置寻址字段。"""
+
+    _fields_ = [
+        ("type", ctypes.c_ubyte),
+        ("flags", ctypes.c_ubyte),
+        ("tag", ctypes.c_ubyte),
+        ("queue", ctypes.c_ubyte),
+        ("time", ctypes.c_uint32 * 2),
+        ("source", SndSeqAddr),
+        ("dest", SndSeqAddr),
+        ("data", ctypes.c_ubyte * 12),
+    ]
+
+
+class PollFd(ctypes.Structure):
+    _fields_ = [("fd", ctypes.c_int), ("events", ctypes.c_short),
+                ("revents", ctypes.c_short)]
+
+
+def _load_libasound():
+    name = ctypes.util.find_library("asound") or "libasound.so.2"
+    lib = ctypes.CDLL(name)
+    vp, pvp = ctypes.c_void_p, ctypes.POINTER(ctypes.c_void_p)
+    ev_p = ctypes.POINTER(SndSeqEvent)
+    sigs = {
+        "snd_seq_open": (ctypes.c_int, [pvp, ctypes.c_char_p, ctypes.c_int, ctypes.c_int]),
+        "snd_seq_close": (ctypes.c_int, [vp]),
+        "snd_seq_client_id": (ctypes.c_int, [vp]),
+        "snd_seq_set_client_name": (ctypes.c_int, [vp, ctypes.c_char_p]),
+        "snd_seq_create_simple_port": (
+            ctypes.c_int, [vp, ctypes.c_char_p, ctypes.c_uint, ctypes.c_uint]),
+        "snd_seq_delete_simple_port": (ctypes.c_int, [vp, ctypes.c_int]),
+        "snd_seq_event_output": (ctypes.c_int, [vp, ev_p]),
+        "snd_seq_event_output_direct": (ctypes.c_int, [vp, ev_p]),
+        "snd_seq_drain_output": (ctypes.c_int, [vp]),
+        "snd_seq_event_input": (ctypes.c_int, [vp, ctypes.POINTER(ev_p)]),
+        "snd_seq_poll_descriptors_count": (ctypes.c_int, [vp, ctypes.c_short]),
+        "snd_seq_poll_descriptors": (
+            ctypes.c_int, [vp, ctypes.POINTER(PollFd), ctypes.c_uint, ctypes.c_short]),
+        "snd_midi_event_new": (ctypes.c_int, [ctypes.c_size_t, pvp]),
+        "snd_midi_event_free": (None, [vp]),
+        "snd_midi_event_no_status": (None, [vp, ctypes.c_int]),
+        "snd_midi_event_reset_encode": (None, [vp]),
+        "snd_midi_event_encode": (ctypes.c_long, [vp, vp, ctypes.c_long, ev_p]),
+        "snd_midi_event_decode": (ctypes.c_long, [vp, vp, ctypes.c_long, ev_p]),
+        "snd_strerror": (ctypes.c_char_p, [ctypes.c_int]),
+    }
+    for fn, (restype, argtypes) in sigs.items():
+        func = getattr(lib, fn)
+        func.restype = restype
+        func.argtypes = argtypes
+    return lib
+
+
+class AlsaSeqPort:
+    """ALSA 虚拟端口句柄：客户端、端口号、编解码器与输入线程。"""
+
+    def __init__(self, seq, client: int, port: int, encoder, decoder):
+        self.seq = seq
+        self.client = client
+        self.port = port
+        self.encoder = encoder
+        self.decoder = decoder
+        self.event = SndSeqEvent()        # 预分配输出事件，发送路径不再分配
+        self.lock = threading.Lock()
+        self.closing = False
+        self.thread = None
+        self.wake_r = -1
+        self.wake_w = -1
+
+    @property
+    def address(self) -> str:
+        return f"{self.client}:{self.port}"
+
+    def __bool__(self):
+        return not self.closing
+
+
+class AlsaSeqBackend(VirtualMidiBackend):
+    """ALSA 音序器内核（Linux）。"""
+
+    name = "alsa_seq"
+    label = "ALSA 音序器"
+
+    def __init__(self):
+        self._lib = None
+        self._err = ""
+        if not sys.platform.startswith("linux"):
+            self._err = "ALSA 音序器仅支持 Linux"
+            return
+        try:
+            lib = _load_libasound()
+        except (OSError, AttributeError) as exc:
+            self._err = f"未找到 libasound：{exc}"
+            return
+        # 探测 /dev/snd/seq 是否可用（snd-seq 模块未加载或无权限时给出原因）
+        seq = ctypes.c_void_p()
+        rc = lib.snd_seq_open(ctypes.byref(seq), b"default",
+                              SND_SEQ_OPEN_DUPLEX, SND_SEQ_NONBLOCK)
+        if rc < 0:
+            self._err = f"无法打开 ALSA 音序器：{self._strerror(lib, rc)}"
+            return
+        lib.snd_seq_close(seq)
+        self._lib = lib
+
+    @staticmethod
+    def _strerror(lib, rc: int) -> str:
+        try:
+            msg = lib.snd_strerror(rc)
+            return msg.decode("utf-8", errors="replace") if msg else str(rc)
+        except Exception:
+            return os.strerror(-rc) if rc < 0 else str(rc)
+
+    @property
+    def error(self) -> str:
+        return self._err
+
+    def is_available(self) -> bool:
+        return self._lib is not None
+
+    # ---- 端口 ----
+
+    def create_port(self, port_name: str, on_input=None):
+        if not self.is_available():
+            raise RuntimeError(self._err or "内核不可用")
+        lib = self._lib
+        seq = ctypes.c_void_p()
+        rc = lib.snd_seq_open(ctypes.byref(seq), b"default",
+                              SND_SEQ_OPEN_DUPLEX, SND_SEQ_NONBLOCK)
+        if rc < 0:
+            raise RuntimeError(f"打开 ALSA 音序器失败：{self._strerror(lib, rc)}")
+        encoder, decoder = ctypes.c_void_p(), ctypes.c_void_p()
+        try:
+            lib.snd_seq_set_client_name(seq, CLIENT_NAME)
+            port = lib.snd_seq_create_simple_port(
+                seq, port_name.encode("utf-8"), PORT_CAPS, PORT_TYPE)
+            if port < 0:
+                raise RuntimeError(
+                    f"创建 ALSA 端口 '{port_name}' 失败：{self._strerror(lib, port)}")
+            if lib.snd_midi_event_new(ENCODER_BUFSIZE, ctypes.byref(encoder)) < 0 \
+                    or lib.snd_midi_event_new(DECODE_BUFSIZE, ctypes.byref(decoder)) < 0:
+                raise RuntimeError("创建 ALSA MIDI 编解码器失败")
+            lib.snd_midi_event_no_status(decoder, 1)   # 解码输出总带状态字节
+        except Exception:
+            for dev in (encoder, decoder):
+                if dev:
+                    lib.snd_midi_event_free(dev)
+            lib.snd_seq_close(seq)
+            raise
+        handle = AlsaSeqPort(seq, lib.snd_seq_client_id(seq), port, encoder, decoder)
+        ev = handle.event
+        ev.queue = SND_SEQ_QUEUE_DIRECT
+        ev.source.port = port
+        ev.dest.client = SND_SEQ_ADDRESS_SUBSCRIBERS
+        ev.dest.port = SND_SEQ_ADDRESS_UNKNOWN
+        if on_input is not None:
+            handle.wake_r, handle.wake_w = os.pipe()
+            handle.thread = threading.Thread(
+                target=self._input_loop, args=(handle, on_input),
+                daemon=True, name=f"alsa_in_{handle.address}")
+            handle.thread.start()
+        return handle
+
+    def close_port(self, handle) -> None:
+        if handle is None or handle.closing:
+            return
+        handle.closing = True
+        if handle.wake_w >= 0:
+            try:
+                os.write(handle.wake_w, b"\0")
+            except OSError:
+                pass
+        thread = handle.thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(1.0)
+        lib = self._lib
+        with handle.lock:
+            try:
+                lib.snd_seq_delete_simple_port(handle.seq, handle.port)
+                lib.snd_midi_event_free(handle.encoder)
+                lib.snd_midi_event_free(handle.decoder)
+                lib.snd_seq_close(handle.seq)
+            except Exception:
+                pass
+        for fd in (handle.wake_r, handle.wake_w):
+            if fd >= 0:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+        handle.wake_r = handle.wake_w = -1
+
+    # ---- 输出 ----
+
+    def send(self, handle, data) -> bool:
+        """编码原始字节并输出。单条消息直发；多条消息批量入缓冲后一次 drain。"""
+        if not handle or not data:
+            return False
+        data = bytes(data)
+        total = len(data)
+        lib = self._lib
+        with handle.lock:
+            if handle.closing:
+                return False
+            ev = handle.event
+            ev_ref = ctypes.byref(ev)
+            base = ctypes.cast(ctypes.c_char_p(data), ctypes.c_void_p).value
+            lib.snd_midi_event_reset_encode(handle.encoder)
+            offset = 0
+            queued = 0
+            ok = True
+            while offset < total:
+                used = lib.snd_midi_event_encode(
+                    handle.encoder, base + offset, total - offset, ev_ref)
+                if used <= 0:
+                    ok = False
+                    break
+                offset += used
+                if ev.type == SND_SEQ_EVENT_NONE:
+                    continue   # 消息未完整（截断的数据），丢弃残余
+                ev.queue = SND_SEQ_QUEUE_DIRECT
+                ev.source.port = handle.port
+                ev.dest.client = SND_SEQ_ADDRESS_SUBSCRIBERS
+                ev.dest.port = SND_SEQ_ADDRESS_UNKNOWN
+                if queued == 0 and offset >= total:
+                    return lib.snd_seq_event_output_direct(handle.seq, ev_ref) >= 0
+                rc = lib.snd_seq_event_output(handle.seq, ev_ref)
+                if rc == -errno.EAGAIN:
+                    # 输出缓冲已满：先排空再重试一次
+                    lib.snd_seq_drain_output(handle.seq)
+                    rc = lib.snd_seq_event_output(handle.seq, ev_ref)
+                if rc < 0:
+                    ok = False
+                    break
+                queued += 1
+            if queued:
+                ok = lib.snd_seq_drain_output(handle.seq) >= 0 and ok
+            return ok and queued > 0
+
+    # ---- 输入 ----
+
+    def _input_loop(self, handle, on_input):
+        lib = self._lib
+        count = lib.snd_seq_poll_descriptors_count(handle.seq, select.POLLIN)
+        pfds = (PollFd * max(1, count))()
+        count = lib.snd_seq_poll_descriptors(handle.seq, pfds, count, select.POLLIN)
+        poller = select.poll()
+        for i in range(max(0, count)):
+            poller.register(pfds[i].fd, select.POLLIN)
+        poller.register(handle.wake_r, select.POLLIN)
+        ev_ptr = ctypes.POINTER(SndSeqEvent)()
+        buf = (ctypes.c_ubyte * DECODE_BUFSIZE)()
+        while not handle.closing:
+            try:
+                poller.poll(500)
+            except InterruptedError:
+                continue
+            while not handle.closing:
+                rc = lib.snd_seq_event_input(handle.seq, ctypes.byref(ev_ptr))
+                if rc == -errno.ENOSPC:
+                    continue   # 内核输入队列溢出：丢弃溢出部分继续读
+                if rc < 0 or not ev_ptr:
+                    break
+                n = lib.snd_midi_event_decode(handle.decoder, buf, DECODE_BUFSIZE, ev_ptr)
+                if n <= 0:
+                    continue   # 非 MIDI 事件（端口订阅通知等）
+                try:
+                    on_input(ctypes.string_at(buf, n))
+                except Exception:
+                    pass
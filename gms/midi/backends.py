@@ -4,7 +4,10 @@ teVirtualMIDI 为 loopMIDI 同款底层驱动（签名驱动，Win7-11）。
 
 import ctypes
 import os
+import queue
 import sys
+import threading
+import time
 from ctypes import wintypes
 from pathlib import Path
 
@@ -41,6 +44,8 @@ class VirtualMidiBackend:
     """虚拟 MIDI 端口内核接口。实现二（Windows MIDI Services）预留。"""
 
     name = "base"
+    label = "base"        # 日志/界面显示名
+    input_direct = False  # True：on_input 已在非驱动线程调用，可同步派发不经输入队列
 
     def is_available(self) -> bool:
         return False
@@ -55,11 +60,27 @@ class VirtualMidiBackend:
     def send(self, handle, data: bytes) -> bool:
         raise NotImplementedError
 
+    def send_many(self, handle, chunks) -> bool:
+        """发送多条完整消息；内核支持时合并为一次写入，缺省逐条发送"""
+        results = [self.send(handle, chunk) for chunk in chunks if chunk]
+        return bool(results) and all(results)
+
+
+# teVirtualMIDI 端口标志
+TE_VM_FLAGS_PARSE_RX = 1   # 驱动把输入拆成完整消息再回调
+TE_VM_FLAGS_PARSE_TX = 2   # 驱动解析输出：一次 SendData 可含多条消息
+
+# 不小于该长度的 bytearray（大块 SysEx）经 from_buffer 共享内存发送；更短的消息
+# 一次 bytes() 小拷贝比导出缓冲便宜得多（3 字节消息约 60ns 对 300ns）
+ZERO_COPY_MIN = 32 * 1024
+
 
 class TeVirtualMidiBackend(VirtualMidiBackend):
     """teVirtualMIDI 内核（ctypes 直调，无第三方 Python 绑定）"""
 
     name = "tevirtualmidi"
+    label = "teVirtualMIDI"
+    _coalesce = True   # 驱动拒绝合并写入时置 False，退回逐条发送
 
     def __init__(self):
         self._dll = None
@@ -105,13 +126,14 @@ class TeVirtualMidiBackend(VirtualMidiBackend):
                                   ctypes.c_uint32, ctypes.c_uint32)
             def _cb(port_handle, data_ptr, length, instance):
                 try:
-                    on_input(bytes(bytearray(data_ptr[i] for i in range(length))))
+                    # 驱动回调线程内只做一次拷贝 + 入队，尽快返回
+                    on_input(ctypes.string_at(data_ptr, length))
                 except Exception:
                     pass
             self._callback = CB(_cb)
             callback = ctypes.cast(self._callback, ctypes.c_void_p)
         handle = self._dll.virtualMIDICreatePortEx2(
-            port_name, "Gamepad MIDI Studio", callback, 0, 0, 65536, 0)
+            port_name, "Gamepad MIDI Studio", callback, 0, 0, 65536, TE_VM_FLAGS_PARSE_TX)
         if not handle:
             raise RuntimeError(f"创建虚拟端口 '{port_name}' 失败（可能端口名已被占用）")
         return handle
@@ -126,23 +148,54 @@ class TeVirtualMidiBackend(VirtualMidiBackend):
     def send(self, handle, data) -> bool:
         if not handle or not data:
             return False
-        # mido.Message.bytes() 返回 bytearray，而 create_string_buffer 只接受 bytes
-        data = bytes(data)
-        buf = ctypes.create_string_buffer(data, len(data))
-        return bool(self._dll.virtualMIDISendData(handle, buf, len(data)))
+        n = len(data)
+        if type(data) is not bytes:
+            if n >= ZERO_COPY_MIN and isinstance(data, bytearray):
+                data = (ctypes.c_ubyte * n).from_buffer(data)
+            else:
+                # mido.Message.bytes() 返回 list/bytearray；c_void_p 直接引用 bytes 内部存储
+                data = bytes(data)
+        return bool(self._dll.virtualMIDISendData(handle, data, n))
+
+    def send_many(self, handle, chunks) -> bool:
+        """多条消息打包为一次写入（端口以 PARSE_TX 创建，由驱动拆分）"""
+        chunks = [c for c in chunks if c]
+        if not handle or not chunks:
+            return False
+        if len(chunks) == 1 or not self._coalesce:
+            return super().send_many(handle, chunks)
+        packed = b"".join(c if isinstance(c, (bytes, bytearray)) else bytes(c) for c in chunks)
+        if self._dll.virtualMIDISendData(handle, packed, len(packed)):
+            return True
+        # 旧版驱动不支持 PARSE_TX：逐条成功则说明是合并写入被拒，之后不再合并
+        ok = super().send_many(handle, chunks)
+        if ok:
+            self._coalesce = False
+        return ok
 
 
 # ---- 端口管理 ----
 
 class MidiPortManager:
-    """管理虚拟端口（双内核）+ 系统端口输出。"""
+    """管理虚拟端口（多内核）+ 系统端口输出。"""
+
+    # 首选内核不可用时按此顺序回退（各平台仅其一可用）
+    FALLBACK_ORDER = ("tevirtualmidi", "alsa_seq")
+    OUTPUTS_REFRESH_S = 5.0   # 系统输出端口列表后台刷新间隔
+    INPUT_QUEUE_SIZE = 4096   # 虚拟端口输入队列（满时丢弃新数据并计数）
+    INPUT_BATCH = 64          # 输入线程每次唤醒最多派发的消息数
 
     def __init__(self, bus):
         self.bus = bus
         from .wms_backend import WindowsMidiServicesBackend
+        from .alsa_backend import AlsaSeqBackend
+        from .loopback_backend import LoopbackBackend, NullBackend
         self.backends = {
             "tevirtualmidi": TeVirtualMidiBackend(),
             "windows_midi_services": WindowsMidiServicesBackend(),
+            "alsa_seq": AlsaSeqBackend(),
+            "loopback": LoopbackBackend(),
+            "null": NullBackend(),
         }
         self.backend = self.backends["tevirtualmidi"]
         self.virtual_handle = None
@@ -150,31 +203,52 @@ class MidiPortManager:
         self._mido_out = None
         self._mido_out_name = ""
         self._started = False
+        # 系统输出端口枚举缓存：state() 只读缓存，枚举在后台线程/显式刷新时进行
+        self._outputs = None
+        self._outputs_at = 0.0
+        self._enum_lock = threading.Lock()       # 串行化 pygame.midi 初始化/枚举/打开
+        self._refresh_stop = threading.Event()
+        self._refresh_thread = None
+        # 虚拟端口输入：驱动回调只入队，由输入线程批量派发 midi.input
+        self._input_queue = queue.Queue(maxsize=self.INPUT_QUEUE_SIZE)
+        self._input_thread = None
+        self._input_stats = {"received": 0, "dispatched": 0, "dropped": 0, "max_batch": 0}
+        # 附加目的端口（midi.destinations），每端口独立写线程
+        from .fanout import FanOut
+        self.fanout = FanOut(open_lock=self._enum_lock)
 
     # ---- 生命周期 ----
 
-    def start(self, port_name: str, backend_name: str | None = None):
+    def start(self, port_name: str, backend_name: str | None = None,
+              loopback_echo: bool | None = None, ump_protocol: str | None = None):
         """按指定内核（缺省 tevirtualmidi）创建虚拟端口"""
         self._started = True
         self.virtual_name = port_name
         if backend_name in self.backends:
             self.backend = self.backends[backend_name]
+        if loopback_echo is not None:
+            self.backends["loopback"].echo = bool(loopback_echo)
+        if ump_protocol in ("midi1", "midi2"):
+            self.backends["windows_midi_services"].protocol = ump_protocol
         self._open_virtual(port_name)
 
     def stop(self):
         self.close_output()
         self._close_virtual()
+        self._stop_input_thread()
         self._started = False
 
     def _open_virtual(self, port_name: str):
         self._close_virtual()
         if not self.backend.is_available():
-            # 首选内核不可用时尝试回退 teVirtualMIDI
-            fallback = self.backends["tevirtualmidi"]
-            if self.backend.name != "tevirtualmidi" and fallback.is_available():
+            # 首选内核不可用时按 FALLBACK_ORDER 回退到本平台可用的内核
+            fallback = next((self.backends[name] for name in self.FALLBACK_ORDER
+                             if name != self.backend.name
+                             and self.backends[name].is_available()), None)
+            if fallback is not None:
                 self.bus.emit("log", message=(
                     f"内核 {self.backend.name} 不可用：{self.backend.error}；"
-                    f"已回退 teVirtualMIDI"))
+                    f"已回退 {fallback.label}"))
                 self.backend = fallback
             else:
                 self.bus.emit("log", message=(
@@ -182,15 +256,85 @@ class MidiPortManager:
                 self.bus.emit("virtual.state", available=False, running=False,
                               error=self.backend.error)
                 return
+        if self.backend.input_direct:
+            on_input = self._dispatch_input
+        else:
+            on_input = self._enqueue_input
+            self._ensure_input_thread()
         try:
-            self.virtual_handle = self.backend.create_port(
-                port_name, on_input=lambda data: self.bus.emit("midi.input", data=data))
+            self.virtual_handle = self.backend.create_port(port_name, on_input=on_input)
             self.bus.emit("log", message=f"虚拟MIDI端口已创建：{port_name}")
             self.bus.emit("virtual.state", available=True, running=True, error="")
         except RuntimeError as exc:
             self.bus.emit("log", message=f"虚拟MIDI端口创建失败：{exc}")
             self.bus.emit("virtual.state", available=True, running=False, error=str(exc))
 
+    # ---- 输入 ----
+
+    def _enqueue_input(self, data: bytes):
+        """驱动回调线程调用：只入队，不解析不派发"""
+        self._input_stats["received"] += 1
+        try:
+            self._input_queue.put_nowait(data)
+        except queue.Full:
+            self._input_stats["dropped"] += 1
+
+    def _dispatch_input(self, data: bytes):
+        self._input_stats["dispatched"] += 1
+        self.bus.emit("midi.input", data=data)
+
+    def _ensure_input_thread(self):
+        thread = self._input_thread
+        if thread is not None and thread.is_alive():
+            return
+        self._input_thread = threading.Thread(
+            target=self._input_loop, daemon=True, name="midi_input")
+        self._input_thread.start()
+
+    def _input_loop(self):
+        q = self._input_queue
+        while True:
+            data = q.get()
+            if data is None:
+                return
+            batch = [data]
+            while len(batch) < self.INPUT_BATCH:
+                try:
+                    data = q.get_nowait()
+                except queue.Empty:
+                    break
+                if data is None:
+                    self._dispatch_batch(batch)
+                    return
+                batch.append(data)
+            self._dispatch_batch(batch)
+
+    def _dispatch_batch(self, batch):
+        stats = self._input_stats
+        stats["max_batch"] = max(stats["max_batch"], len(batch))
+        for data in batch:
+            try:
+                self._dispatch_input(data)
+            except Exception:
+                pass
+
+    def _stop_input_thread(self):
+        thread = self._input_thread
+        if thread is None:
+            return
+        try:
+            self._input_queue.put(None, timeout=1.0)
+        except queue.Full:
+            pass
+        if thread is not threading.current_thread():
+            thread.join(1.0)
+        self._input_thread = None
+
+    def input_stats(self) -> dict:
+        out = dict(self._input_stats)
+        out["queue"] = self._input_queue.qsize()
+        return out
+
     def _close_virtual(self):
         if self.virtual_handle:
             self.backend.close_port(self.virtual_handle)
@@ -199,18 +343,23 @@ class MidiPortManager:
     # ---- 输出 ----
 
     @staticmethod
-    def output_names() -> list:
-        """枚举系统 MIDI 输出端口。
+    def _enumerate_outputs() -> list:
+        """枚举系统 MIDI 输出端口（慢：可能重新初始化 MIDI 子系统）。
 
         mido 的 pygame backend 把设备名硬编码为 UTF-8 解码，而 Windows
         MMSystem 返回 ANSI(GBK) 字节：中文端口名（如 teVirtualMIDI 中文名）
         会让 mido.get_output_names() 抛 UnicodeDecodeError。这里自行枚举并
-        按 UTF-8 -> GBK 顺序容错解码。"""
+        按 UTF-8 -> GBK 顺序容错解码。
+
+        pygame.midi 已初始化（系统端口输出正在使用）时不再 init/quit，
+        否则 quit() 会把已打开的输出一并关闭。"""
         if mido is None:
             return []
         try:
             import pygame.midi
-            pygame.midi.init()
+            owns = not pygame.midi.get_init()
+            if owns:
+                pygame.midi.init()
             try:
                 names = []
                 for i in range(pygame.midi.get_count()):
@@ -231,13 +380,56 @@ class MidiPortManager:
                     names.append(name)
                 return names
             finally:
-                try:
-                    pygame.midi.quit()
-                except Exception:
-                    pass
+                if owns:
+                    try:
+                        pygame.midi.quit()
+                    except Exception:
+                        pass
         except Exception:
             return []
 
+    def refresh_outputs(self) -> list:
+        """立即重新枚举系统输出端口并更新缓存；列表变化时广播 midi.outputs。"""
+        with self._enum_lock:
+            names = self._enumerate_outputs()
+            changed = names != self._outputs
+            self._outputs = names
+            self._outputs_at = time.monotonic()
+        if changed:
+            self.bus.emit("midi.outputs", outputs=list(names))
+        return list(names)
+
+    def output_names(self) -> list:
+        """系统输出端口（缓存）。首次调用同步枚举一次并启动后台刷新。"""
+        if self._outputs is None:
+            self.refresh_outputs()
+        self._ensure_refresher()
+        return list(self._outputs)
+
+    def _ensure_refresher(self):
+        thread = self._refresh_thread
+        if thread is not None and thread.is_alive():
+            return
+        self._refresh_stop.clear()
+        self._refresh_thread = threading.Thread(
+            target=self._refresh_loop, daemon=True, name="midi_outputs_refresh")
+        self._refresh_thread.start()
+
+    def _refresh_loop(self):
+        while not self._refresh_stop.wait(self.OUTPUTS_REFRESH_S):
+            try:
+                self.refresh_outputs()
+            except Exception:
+                pass
+
+    def stop_refresh(self):
+        """停止后台端口刷新（应用退出时调用）。"""
+        self._refresh_stop.set()
+        thread = self._refresh_thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(1.0)
+        self._refresh_thread = None
+
     def select_output(self, name: str) -> bool:
         """打开系统端口输出（虚拟端口运行时无需调用）"""
         self.close_output()
@@ -246,7 +438,8 @@ class MidiPortManager:
         if mido is None:
             return False
         try:
-            self._mido_out = mido.open_output(name)
+            with self._enum_lock:
+                self._mido_out = mido.open_output(name)
             self._mido_out_name = name
             return True
         except Exception as exc:
@@ -262,7 +455,21 @@ class MidiPortManager:
             self._mido_out = None
             self._mido_out_name = ""
 
+    def set_destinations(self, destinations) -> None:
+        """热应用附加目的端口配置（midi.destinations）"""
+        self.fanout.configure(destinations)
+
     def send_message(self, msg) -> bool:
+        """主输出同步直发，并扇出到匹配的附加目的端口（异步写线程）"""
+        ok = self._send_primary(msg)
+        fanout = getattr(self, "fanout", None)
+        if fanout is not None and fanout._writers:
+            # 已作为主输出的端口不重复发送
+            skip = (self._mido_out_name, self.virtual_name if self.virtual_handle else "")
+            ok = fanout.dispatch(msg, skip=skip) > 0 or ok
+        return ok
+
+    def _send_primary(self, msg) -> bool:
         """优先走虚拟端口（低延迟直发原始字节），否则走已选系统端口"""
         if self.virtual_handle:
             try:
@@ -283,6 +490,12 @@ class MidiPortManager:
             return bool(self.backend.send(self.virtual_handle, data))
         return False
 
+    def send_many(self, chunks) -> bool:
+        """一次发送多条原始消息（仅虚拟端口；内核支持时合并为一次写入）"""
+        if self.virtual_handle:
+            return bool(self.backend.send_many(self.virtual_handle, chunks))
+        return False
+
     def state(self) -> dict:
         return {
             "virtual_available": self.backend.is_available(),
@@ -290,6 +503,8 @@ class MidiPortManager:
             "virtual_port": self.virtual_name,
             "virtual_error": getattr(self.backend, "error", ""),
             "virtual_backend": self.backend.name,
+            "virtual_stats": (self.virtual_handle.stats()
+                              if hasattr(self.virtual_handle, "stats") else {}),
             "backends": {
                 name: {
                     "available": b.is_available(),
@@ -299,4 +514,6 @@ class MidiPortManager:
             },
             "outputs": self.output_names(),
             "selected_output": self._mido_out_name,
+            "destinations": self.fanout.stats(),
+            "input": self.input_stats(),
         }
@@ -0,0 +1,357 @@
+"""MIDI 时钟：共享节拍时间线 + 24 PPQN 主/从同步。
+
+Timeline：节拍位置 ↔ 单调时钟时间的线性映射（锚点 + BPM）。改速时在当前时刻
+重新锚定，之前的节拍位置不受影响；工具按"节拍位置"排程，而不是累加 sleep，
+因此不会随发送/调度延迟逐步漂移。
+
+MidiClock 三种模式（config.clock.mode）：
+  internal：自由运行的内部时间线，不收发 MIDI 时钟
+  master：按 clock.bpm 绝对时间排程发送 0xF8（24 PPQN），并发送
+          开始(0xFA)/继续(0xFB)/停止(0xFC)/歌曲位置(0xF2)
+  slave：跟随 midi.input 上的外部时钟。对最近一段时钟脉冲做最小二乘直线
+         拟合估算速度与相位，抑制输入抖动；长间隔视为断流重新拟合
+"""
+
+import math
+import threading
+import time
+from collections import deque
+
+PPQN = 24
+
+CLOCK = 0xF8
+START = 0xFA
+CONTINUE = 0xFB
+STOP = 0xFC
+SONG_POSITION = 0xF2
+
+
+class Timeline:
+    """节拍时间线：beat(t) = anchor_beat + (t - anchor_t) * bpm / 60"""
+
+    MIN_BPM = 20.0
+    MAX_BPM = 400.0
+
+    def __init__(self, bpm: float = 120.0, running: bool = True):
+        self._lock = threading.RLock()
+        self._bpm = self._clamp_bpm(bpm)
+        self._anchor_t = time.monotonic()
+        self._anchor_beat = 0.0
+        self._running = running
+        self.epoch = 0          # 开始/定位时递增：排程方据此重新对齐
+
+    @classmethod
+    def _clamp_bpm(cls, bpm) -> float:
+        return max(cls.MIN_BPM, min(cls.MAX_BPM, float(bpm)))
+
+    @property
+    def bpm(self) -> float:
+        return self._bpm
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def beat(self, t: float | None = None) -> float:
+        """t 时刻（缺省为现在）的节拍位置；停止时返回停止处的位置"""
+        with self._lock:
+            if not self._running:
+                return self._anchor_beat
+            if t is None:
+                t = time.monotonic()
+            return self._anchor_beat + (t - self._anchor_t) * self._bpm / 60.0
+
+    def time_of_beat(self, beat: float) -> float | None:
+        """节拍位置对应的单调时钟时间；时间线停止时返回 None"""
+        with self._lock:
+            if not self._running:
+                return None
+            return self._anchor_t + (beat - self._anchor_beat) * 60.0 / self._bpm
+
+    def beat_seconds(self) -> float:
+        return 60.0 / self._bpm
+
+    def set_bpm(self, bpm: float):
+        """改速：在当前时刻重新锚定，已走过的节拍位置保持连续"""
+        with self._lock:
+            bpm = self._clamp_bpm(bpm)
+            if bpm == self._bpm:
+                return
+            now = time.monotonic()
+            if self._running:
+                self._anchor_beat = self.beat(now)
+                self._anchor_t = now
+            self._bpm = bpm
+
+    def locate(self, beat: float, t: float | None = None):
+        """把 t 时刻（缺省现在）定位到给定节拍位置"""
+        with self._lock:
+            self._anchor_t = time.monotonic() if t is None else t
+            self._anchor_beat = float(beat)
+            self.epoch += 1
+
+    def next_beat(self, grid: float = 1.0) -> float:
+        """当前位置之后最近的 grid 整数倍节拍位置"""
+        pos = self.beat()
+        return math.ceil(pos / grid - 1e-9) * grid
+
+    def wait_for_beat(self, beat: float, stop_event: threading.Event,
+                      max_slice: float = 0.05) -> bool:
+        """阻塞到节拍位置到达。分片等待，期间改速/跟随外部时钟都会被重新计算。
+        stop_event 置位时返回 False；时间线暂停期间持续等待。"""
+        while not stop_event.is_set():
+            target = self.time_of_beat(beat)
+            if target is None:
+                stop_event.wait(0.005)
+                continue
+            remain = target - time.monotonic()
+            if remain <= 0:
+                return True
+            stop_event.wait(min(remain, max_slice))
+        return False
+
+
+class MidiClock(Timeline):
+    """全局 MIDI 时钟（主/从/内部）。工具通过 ToolContext.clock 访问。"""
+
+    SLAVE_WINDOW = 48        # 拟合窗口：最近 2 拍的时钟脉冲
+    SLAVE_GAP_S = 0.5        # 脉冲间隔超过该值视为断流
+    START_LEAD_S = 0.005     # 主模式：开始消息与第一个时钟脉冲的间隔
+
+    def __init__(self, bus, midi, get_config=None):
+        super().__init__(120.0, running=True)
+        self.bus = bus
+        self.midi = midi
+        self.get_config = get_config
+        self.mode = "internal"
+        self._gen = 0
+        self._thread = None
+        self._stop_evt = threading.Event()
+        self._ticks = deque(maxlen=self.SLAVE_WINDOW)   # (脉冲序号, 到达时间)
+        self._tick_index = -1
+        self._subscribed = False
+        self.stats = {"ticks_sent": 0, "ticks_received": 0, "max_late_ms": 0.0,
+                      "jitter_ms": 0.0}
+
+    # ---- 配置 ----
+
+    def apply_config(self, cfg: dict | None = None):
+        if cfg is None:
+            cfg = self.get_config().get("clock", {}) if self.get_config else {}
+        mode = cfg.get("mode", "internal")
+        if mode not in ("internal", "master", "slave"):
+            mode = "internal"
+        if mode != "slave":
+            self.set_bpm(float(cfg.get("bpm", 120.0)))
+        if mode != self.mode:
+            self.set_mode(mode)
+
+    def set_mode(self, mode: str):
+        self._halt_master()
+        self._unsubscribe()
+        self.mode = mode
+        with self._lock:
+            if mode == "slave":
+                # 等待外部开始/时钟
+                self._anchor_beat = self.beat()
+                self._running = False
+                self._ticks.clear()
+                self._tick_index = -1
+                self.bus.subscribe("midi.input", self._on_input)
+                self._subscribed = True
+            else:
+                self._anchor_beat = self.beat() if self._running else self._anchor_beat
+                self._anchor_t = time.monotonic()
+                self._running = mode == "internal"
+            self.epoch += 1
+        self._emit_state()
+
+    def close(self):
+        self._halt_master()
+        self._unsubscribe()
+
+    def _unsubscribe(self):
+        if self._subscribed:
+            self.bus.unsubscribe("midi.input", self._on_input)
+            self._subscribed = False
+
+    # ---- 走带控制（主模式发送对应消息；内部模式只移动时间线） ----
+
+    def start(self):
+        """从头开始（位置 0）"""
+        if self.mode == "slave":
+            return
+        self._halt_master()
+        with self._lock:
+            self._anchor_t = time.monotonic() + (self.START_LEAD_S if self.mode == "master" else 0.0)
+            self._anchor_beat = 0.0
+            self._running = True
+            self.epoch += 1
+        if self.mode == "master":
+            self._send(START)
+            self._launch_master()
+        self._emit_state()
+
+    def continue_(self):
+        if self.mode == "slave" or self._running:
+            return
+        with self._lock:
+            self._anchor_t = time.monotonic() + (self.START_LEAD_S if self.mode == "master" else 0.0)
+            self._running = True
+            self.epoch += 1
+        if self.mode == "master":
+            self._send(CONTINUE)
+            self._launch_master()
+        self._emit_state()
+
+    def stop(self):
+        if self.mode == "slave":
+            return
+        self._halt_master()
+        with self._lock:
+            self._anchor_beat = self.beat()
+            self._running = False
+        if self.mode == "master":
+            self._send(STOP)
+        self._emit_state()
+
+    def song_position(self, sixteenths: int):
+        """定位到歌曲位置（以十六分音符计）。主模式下发送 0xF2。
+
+        MIDI 规范只允许在停止状态发送 SPP：主模式走带中定位时先停止、发送 SPP，再从新位置
+        继续（Stop → SPP → Continue）。"""
+        sixteenths = max(0, min(0x3FFF, int(sixteenths)))
+        resume = self.mode == "master" and self._running
+        if resume:
+            self.stop()
+        with self._lock:
+            self._anchor_beat = sixteenths / 4.0
+            self._anchor_t = time.monotonic()
+            self.epoch += 1
+        if self.mode == "master":
+            self._send(SONG_POSITION, sixteenths & 0x7F, sixteenths >> 7)
+        if resume:
+            self.continue_()
+
+    # ---- 主模式：绝对时间排程的时钟脉冲 ----
+
+    def _send(self, *data):
+        send = getattr(self.midi, "send_raw", None)
+        if send is not None:
+            send(bytes(data))
+
+    def _launch_master(self):
+        self._gen += 1
+        self._stop_evt = threading.Event()
+        self._thread = threading.Thread(target=self._master_loop,
+                                        args=(self._gen, self._stop_evt),
+                                        daemon=True, name="midi_clock")
+        self._thread.start()
+
+    def _halt_master(self):
+        self._stop_evt.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(1.0)
+        self._thread = None
+
+    def _master_loop(self, gen, stop_evt):
+        tick = math.ceil(self.beat(self._anchor_t) * PPQN - 1e-9)
+        while not stop_evt.is_set() and gen == self._gen:
+            if not self.wait_for_beat(tick / PPQN, stop_evt, max_slice=0.01):
+                break
+            target = self.time_of_beat(tick / PPQN)
+            self._send(CLOCK)
+            self.stats["ticks_sent"] += 1
+            if target is not None:
+                late = (time.monotonic() - target) * 1000.0
+                if late > self.stats["max_late_ms"]:
+                    self.stats["max_late_ms"] = late
+            tick += 1
+
+    # ---- 从模式：跟随外部时钟 ----
+
+    def _on_input(self, data):
+        if not data:
+            return
+        status = data[0]
+        now = time.monotonic()
+        if status == CLOCK:
+            self._on_tick(now)
+        elif status == START:
+            with self._lock:
+                self._tick_index = -1
+                self._ticks.clear()
+                self._anchor_beat = 0.0
+                self._running = False     # 第一个脉冲到达时才开始走
+                self.epoch += 1
+            self._emit_state()
+        elif status == CONTINUE:
+            with self._lock:
+                self._tick_index = round(self._anchor_beat * PPQN) - 1
+                self._ticks.clear()
+                self._running = False
+            self._emit_state()
+        elif status == STOP:
+            with self._lock:
+                self._anchor_beat = self.beat(now)
+                self._running = False
+                self._ticks.clear()
+            self._emit_state()
+        elif status == SONG_POSITION and len(data) >= 3:
+            sixteenths = data[1] | (data[2] << 7)
+            with self._lock:
+                self._anchor_beat = sixteenths / 4.0
+                self._tick_index = sixteenths * 6 - 1
+                self._ticks.clear()
+                self.epoch += 1
+
+    def _on_tick(self, now: float):
+        self.stats["ticks_received"] += 1
+        with self._lock:
+            ticks = self._ticks
+            if ticks and now - ticks[-1][1] > self.SLAVE_GAP_S:
+                ticks.clear()
+            self._tick_index += 1
+            ticks.append((self._tick_index, now))
+            was_running = self._running
+            if len(ticks) < 3:
+                # 数据不足：用当前速度按脉冲位置对齐
+                self._anchor_t = now
+                self._anchor_beat = self._tick_index / PPQN
+                self._running = True
+            else:
+                slope, intercept, jitter = _fit(ticks)
+                if slope > 0:
+                    self._bpm = self._clamp_bpm(60.0 / (slope * PPQN))
+                    # 相位取拟合直线在当前脉冲处的值：抑制单个脉冲的到达抖动
+                    self._anchor_t = intercept + slope * self._tick_index
+                    self._anchor_beat = self._tick_index / PPQN
+                    self.stats["jitter_ms"] = jitter * 1000.0
+                self._running = True
+        if not was_running:
+            self._emit_state()
+
+    # ---- 状态 ----
+
+    def _emit_state(self):
+        self.bus.emit("clock.state", **self.state())
+
+    def state(self) -> dict:
+        return {"mode": self.mode, "running": self._running,
+                "bpm": round(self._bpm, 2), "beat": round(self.beat(), 3)}
+
+
+def _fit(points):
+    """最小二乘拟合 t = intercept + slope * index，返回 (slope, intercept, 残差 RMS)"""
+    n = len(points)
+    sx = sum(i for i, _ in points)
+    sy = sum(t for _, t in points)
+    mx, my = sx / n, sy / n
+    sxx = sum((i - mx) ** 2 for i, _ in points)
+    if sxx <= 0:
+        return 0.0, my, 0.0
+    slope = sum((i - mx) * (t - my) for i, t in points) / sxx
+    intercept = my - slope * mx
+    resid = sum((t - (intercept + slope * i)) ** 2 for i, t in points) / n
+    return slope, intercept, math.sqrt(resid)
@@ -1,6 +1,19 @@
-"""MIDI 输出引擎：统一通道、消息发送、CC 平滑、事件广播"""
+"""MIDI 输出引擎：统一通道、消息发送、CC 平滑、输出整形、事件广播。
 
+发声矩阵：按 (通道, 音高) 记录 note_on 引用计数（16×128 的 array('H')），所有来源
+（手柄、打击垫、琶音、Clip、音序器、映射层）共用。只在 0→1 时发 note_on、1→0 时发
+note_off：重叠来源不会互相切断，多余的 note_off 被丢弃。panic() 按发声集合逐一释放。
+计数只在短暂持锁时更新，发送在锁外进行；同一槽位的消息经槽位队列按计数顺序发出
+（先到者负责依次发完队列），端口 I/O 与事件回调不会阻塞其他音高。
+输出经端口管理器扇出到全部目标，矩阵按引擎这一路输出计数。"""
+
+import threading
 import time
+from array import array
+from collections import deque
+
+from ..schema import MidiSettings
+from .shaper import MessageShaper
 
 try:
     import mido
@@ -8,6 +21,9 @@ except Exception:
     mido = None
 
 
+NOTE_SLOTS = 16 * 128
+
+
 class MidiEngine:
     def __init__(self, bus, port_manager, config_getter):
         self.bus = bus
@@ -15,12 +31,23 @@ class MidiEngine:
         self.get_config = config_getter
         self._smooth = {}      # (channel, cc) -> current value
         self._last_sent = {}   # (channel, cc) -> last int sent
+        self.shaper = MessageShaper()
+        self._flusher = None   # 合并积压存在时运行的补发线程
+        self._flush_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._notes = array("H", bytes(2 * NOTE_SLOTS))   # 通道*128+音高 -> 引用计数
+        self._sounding = set()                           # 计数非零的槽位
+        self._slot_queues = {}                           # 槽位 -> 待发消息（存在即有线程在发送）
+        self._notes_lock = threading.RLock()
 
     # ---- 基础发送 ----
 
+    def _settings(self):
+        return MidiSettings.of(self.get_config()["midi"])
+
     def _channel(self, channel):
         if channel is None:
-            channel = int(self.get_config()["midi"].get("channel", 1))
+            channel = self._settings().channel
         return max(0, min(15, channel - 1))
 
     def send_message(self, msg_type: str, channel=None, **fields):
@@ -32,12 +59,172 @@ class MidiEngine:
         except Exception as exc:
             self.bus.emit("log", message=f"消息构造失败 {msg_type}: {exc}")
             return
+        if msg_type in ("note_on", "note_off"):
+            self._send_note(msg)
+            return
+        self._submit(msg)
+
+    def _submit(self, msg):
+        shaper_cfg = self._settings().shaper
+        if not shaper_cfg.enabled:
+            self._deliver(msg)
+            return
+        self.shaper.configure(shaper_cfg.tick_ms / 1000.0, shaper_cfg.bandwidth)
+        for ready in self.shaper.offer(msg):
+            self._deliver(ready)
+        if self.shaper.pending:
+            self._ensure_flusher()
+
+    # ---- 发声矩阵 ----
+
+    def _send_note(self, msg):
+        """引用计数门控：持锁更新计数并排入槽位队列，锁外发送"""
+        slot = msg.channel * 128 + msg.note
+        on = msg.type == "note_on" and msg.velocity > 0
+        with self._notes_lock:
+            count = self._notes[slot]
+            if on:
+                if count < 0xFFFF:
+                    self._notes[slot] = count + 1
+                if count:
+                    return
+                self._sounding.add(slot)
+            else:
+                if not count:
+                    return
+                self._notes[slot] = count - 1
+                if count > 1:
+                    return
+                self._sounding.discard(slot)
+            owner = self._enqueue(slot, msg)
+        if owner:
+            self._drain_slot(slot, msg)
+
+    def _enqueue(self, slot, msg) -> bool:
+        """（需持有 _notes_lock）该槽位已有线程在发送时排队并返回 False；
+        否则登记队列并返回 True，由调用方在锁外调用 _drain_slot"""
+        queue = self._slot_queues.get(slot)
+        if queue is not None:
+            queue.append(msg)
+            return False
+        self._slot_queues[slot] = deque()
+        return True
+
+    def _drain_slot(self, slot, msg):
+        """发出 msg 及发送期间同一槽位排入的消息（保持计数顺序）"""
+        try:
+            while True:
+                self._submit(msg)
+                with self._notes_lock:
+                    queue = self._slot_queues[slot]
+                    if not queue:
+                        del self._slot_queues[slot]
+                        return
+                    msg = queue.popleft()
+        except BaseException:
+            with self._notes_lock:
+                self._slot_queues.pop(slot, None)
+            raise
+
+    def restrike(self, note: int, velocity: int, channel=None) -> bool:
+        """已在发声的音符以新力度重发 note_on，不增加引用（按住力度随时间变化等）"""
+        if mido is None:
+            return False
+        ch = self._channel(channel)
+        slot = ch * 128 + int(note)
+        msg = mido.Message("note_on", channel=ch, note=int(note),
+                           velocity=max(1, min(127, int(velocity))))
+        with self._notes_lock:
+            if not self._notes[slot]:
+                return False
+            owner = self._enqueue(slot, msg)
+        if owner:
+            self._drain_slot(slot, msg)
+        return True
+
+    def panic(self) -> int:
+        """释放全部正在发声的音符（每个一次 note_off），计数清零；返回释放数"""
+        owned = []
+        with self._notes_lock:
+            slots = sorted(self._sounding)
+            self._sounding.clear()
+            for slot in slots:
+                self._notes[slot] = 0
+            if mido is not None:
+                for slot in slots:
+                    msg = mido.Message("note_off", channel=slot >> 7, note=slot & 0x7F,
+                                       velocity=0)
+                    if self._enqueue(slot, msg):
+                        owned.append((slot, msg))
+        for slot, msg in owned:
+            self._drain_slot(slot, msg)
+        return len(slots)
+
+    def is_sounding(self, note: int, channel=None) -> bool:
+        return self._notes[self._channel(channel) * 128 + int(note)] > 0
+
+    def note_stats(self) -> dict:
+        """正在发声的音符数（总数 / 按通道 1-16）"""
+        with self._notes_lock:
+            per_channel = {}
+            for slot in self._sounding:
+                ch = (slot >> 7) + 1
+                per_channel[ch] = per_channel.get(ch, 0) + 1
+        return {"sounding": sum(per_channel.values()), "channels": per_channel}
+
+    def _deliver(self, msg):
+        fields = msg.dict()
+        for key in ("type", "channel", "time"):
+            fields.pop(key, None)
         if not self.ports.send_message(msg):
             self.bus.emit("log", message=(
-                f"MIDI 发送失败: {msg_type} {fields}（虚拟端口未就绪或无输出端口）"))
+                f"MIDI 发送失败: {msg.type} {fields}（虚拟端口未就绪或无输出端口）"))
             return
-        self.bus.emit("midi.event", type=msg_type, channel=ch, fields=dict(fields))
-        self.bus.emit("midi.activity", kind=msg_type)
+        self.bus.emit("midi.event", type=msg.type, channel=msg.channel, fields=fields)
+        self.bus.emit("midi.activity", kind=msg.type)
+
+    # ---- 输出整形：合并积压的补发 ----
+
+    def _ensure_flusher(self):
+        with self._flush_lock:
+            if self._flusher is None and not self._closed.is_set():
+                self._flusher = threading.Thread(target=self._flush_loop, daemon=True,
+                                                 name="midi_shaper")
+                self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            with self._flush_lock:
+                wait = self.shaper.wait_time()
+                if wait is None or self._closed.is_set():
+                    self._flusher = None
+                    return
+            if wait > 0:
+                self._closed.wait(wait)
+            for msg in self.shaper.due():
+                self._deliver(msg)
+
+    def close(self):
+        """停止补发线程并送出积压的最终值"""
+        self._closed.set()
+        flusher = self._flusher
+        if flusher is not None and flusher is not threading.current_thread():
+            flusher.join(1.0)
+        for msg in self.shaper.flush():
+            self._deliver(msg)
+
+    def shaper_stats(self) -> dict:
+        return self.shaper.stats()
+
+    def send_raw(self, data: bytes) -> bool:
+        """发送无通道的系统消息原始字节（时钟/走带/歌曲位置）；不广播 midi.event"""
+        if mido is None:
+            return False
+        try:
+            msg = mido.Message.from_bytes(bytes(data))
+        except Exception:
+            return False
+        return self.ports.send_message(msg)
 
     def note_on(self, note: int, velocity: int = 100, channel=None):
         self.send_message("note_on", channel=channel, note=int(note), velocity=int(velocity))
@@ -55,10 +242,10 @@ class MidiEngine:
 
     def cc_smoothed(self, control: int, target: int, channel=None, smoothing: float | None = None):
         """带 EMA 平滑的 CC 发送；值变化小于 cc_min_delta 时不发送"""
-        cfg = self.get_config()["midi"]
+        cfg = self._settings()
         if smoothing is None:
-            smoothing = float(cfg.get("smoothing", 0.0))
-        min_delta = int(cfg.get("cc_min_delta", 1))
+            smoothing = cfg.smoothing
+        min_delta = cfg.cc_min_delta
         ch = self._channel(channel)
         key = (ch, int(control))
         target = int(target)
@@ -0,0 +1,292 @@
+"""多目的地输出扇出：每个目的端口一个独立写线程 + 有界队列。
+
+主输出（虚拟端口 / 已选系统端口）仍在调用线程同步直发；midi.destinations
+中配置的附加端口经各自的 PortWriter 异步写出，慢速 USB MIDI 接口只会让
+自己的队列变深，不会拖慢其他目的地。队列满时丢弃新消息并计数，但 note_off
+（含力度 0 的 note_on）总是越过容量限制入队，避免目的地硬件卡音；端口打不开时清空
+的积压或写出失败的消息中若有 note_off，端口恢复后在相应通道补发 All Notes Off。
+
+写线程积压时，连续控制器（CC/弯音）在 MessageShaper 中合并为最新值；配置 bandwidth
+后按字节预算限速（DIN 端口），音符与 SysEx 总是优先写出。
+
+目的地配置：
+    {"port": "USB MIDI 1", "enabled": True,
+     "types": ["note_on", "note_off"],   # 空 = 全部消息类型
+     "channels": [1, 2],                 # 空 = 全部通道（1-16；无通道消息总是放行）
+     "bandwidth": 3125}                  # 字节/秒，0 = 不限速
+"""
+
+import queue
+import threading
+import time
+
+ALL_NOTES_OFF = 123
+RATE_WINDOW_S = 1.0
+
+from .shaper import MessageShaper
+
+try:
+    import mido
+except Exception:
+    mido = None
+
+
+def _is_note_off(msg) -> bool:
+    kind = getattr(msg, "type", None)
+    return kind == "note_off" or (kind == "note_on" and msg.velocity == 0)
+
+
+class PortWriter:
+    """单个目的端口的写线程。端口在写线程内打开，打开慢不阻塞调用方。"""
+
+    QUEUE_SIZE = 1024
+    RETRY_OPEN_S = 2.0
+
+    TICK_S = 0.005
+
+    def __init__(self, port_name: str, open_port=None, open_lock=None,
+                 types=(), channels=(), queue_size: int = QUEUE_SIZE,
+                 bandwidth: float = 0.0):
+        self.port_name = port_name
+        self._open_port = open_port or (lambda name: mido.open_output(name))
+        self._open_lock = open_lock or threading.Lock()
+        # 队列本身不设上限：容量在 put() 中按 queue_size 检查，note_off 可越过
+        self.queue_size = queue_size
+        self._queue = queue.Queue()
+        self._stuck = set()         # 有 note_off 未能写出的通道（0-15）：恢复后补发 All Notes Off
+        self._port = None
+        self._stop = threading.Event()
+        self.shaper = MessageShaper(self.TICK_S, bandwidth)
+        self.set_filter(types, channels)
+        self.sent = 0
+        self.errors = 0
+        self.dropped = 0
+        self.last_error = ""
+        self.max_write_ms = 0.0
+        # 速率窗口由写线程滚动：(上一窗口起点, 当时的 sent), (当前窗口起点, 当时的 sent)
+        now = time.monotonic()
+        self._rate_marks = ((now, 0), (now, 0))
+        self._thread = threading.Thread(target=self._run, daemon=True,
+                                        name=f"midi_out_{port_name}")
+        self._thread.start()
+
+    def set_filter(self, types=(), channels=()):
+        self.types = frozenset(types or ())
+        # 配置为 1-16，mido 为 0-15
+        self.channels = frozenset(int(c) - 1 for c in (channels or ()))
+
+    def accepts(self, msg) -> bool:
+        if self.types and msg.type not in self.types:
+            return False
+        if self.channels:
+            channel = getattr(msg, "channel", None)
+            if channel is not None and channel not in self.channels:
+                return False
+        return True
+
+    def put(self, msg) -> bool:
+        # 容量按"已接收未写出"计：写线程取走但尚在整形批次中的消息也占位
+        if self._queue.unfinished_tasks >= self.queue_size and not _is_note_off(msg):
+            self.dropped += 1
+            return False
+        self._queue.put_nowait(msg)
+        return True
+
+    def _ensure_open(self) -> bool:
+        if self._port is not None:
+            return True
+        try:
+            with self._open_lock:
+                self._port = self._open_port(self.port_name)
+            self.last_error = ""
+        except Exception as exc:
+            self.errors += 1
+            self.last_error = f"打开失败：{exc}"
+            return False
+        if self._stuck:
+            self._send_all_notes_off()          # 重新打开：清掉之前丢失 note_off 的通道
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._roll_rate()
+            if not self._ensure_open():
+                # 端口暂不可用：清空积压，稍后重试
+                self._discard_pending()
+                self._stop.wait(self.RETRY_OPEN_S)
+                continue
+            wait = self.shaper.wait_time()
+            try:
+                msg = self._queue.get(timeout=0.5 if wait is None else max(wait, 0.0005))
+            except queue.Empty:
+                msg = False
+            # 一次取走当前全部积压交给整形器：写得慢时同一控制器只保留最新值
+            batch = [] if msg is False else [msg]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            ready = []
+            stop = False
+            for item in batch:
+                if item is None:
+                    stop = True
+                else:
+                    ready.extend(self.shaper.offer(item))
+            ready.extend(self.shaper.flush() if stop else self.shaper.due())
+            if self._stuck and ready:
+                self._send_all_notes_off()          # 端口恢复可写：先补发再写新消息
+            for item in ready:
+                self._write(item)
+            for _ in batch:
+                self._queue.task_done()
+            if stop:
+                break
+        self._close_port()
+
+    def _write(self, msg) -> bool:
+        started = time.perf_counter()
+        try:
+            self._port.send(msg)
+            self.sent += 1
+            ok = True
+        except Exception as exc:
+            self.errors += 1
+            self.last_error = str(exc)
+            self._mark_lost(msg)
+            ok = False
+        self.max_write_ms = max(self.max_write_ms,
+                                (time.perf_counter() - started) * 1000.0)
+        return ok
+
+    def _mark_lost(self, msg):
+        if _is_note_off(msg):
+            self._stuck.add(msg.channel)
+
+    def _send_all_notes_off(self):
+        """在丢过 note_off 的通道上补发 All Notes Off（写失败的通道留待下次）"""
+        if mido is None:
+            self._stuck.clear()
+            return
+        for channel in sorted(self._stuck):
+            msg = mido.Message("control_change", channel=channel, control=ALL_NOTES_OFF,
+                               value=0)
+            if not self._write(msg):
+                return
+            self._stuck.discard(channel)
+
+    def _discard_pending(self):
+        for msg in self.shaper.flush():
+            self.dropped += 1
+            self._mark_lost(msg)
+        while True:
+            try:
+                msg = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if msg is not None:
+                self.dropped += 1
+                self._mark_lost(msg)
+            self._queue.task_done()
+
+    def _roll_rate(self):
+        """写线程每轮调用：当前窗口满 RATE_WINDOW_S 后滚动（stats() 只读不改）"""
+        now = time.monotonic()
+        _, current = self._rate_marks
+        if now - current[0] >= RATE_WINDOW_S:
+            self._rate_marks = (current, (now, self.sent))
+
+    def _close_port(self):
+        if self._port is not None:
+            try:
+                self._port.close()
+            except Exception:
+                pass
+            self._port = None
+
+    def close(self, timeout: float = 1.0):
+        self._stop.set()
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass
+        if self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def wait_idle(self, timeout: float = 1.0) -> bool:
+        """等待队列排空（测试用）。"""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks or self.shaper.pending:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.001)
+        return True
+
+    def stats(self) -> dict:
+        (t0, sent0), _ = self._rate_marks      # 上一窗口起点：覆盖最近 1-2 秒
+        elapsed = time.monotonic() - t0
+        rate = (self.sent - sent0) / elapsed if elapsed > 0 else 0.0
+        return {"port": self.port_name, "open": self._port is not None,
+                "queue": self._queue.unfinished_tasks, "sent": self.sent,
+                "rate": round(rate, 1), "errors": self.errors,
+                "dropped": self.dropped, "max_write_ms": round(self.max_write_ms, 3),
+                "last_error": self.last_error,
+                "coalesced": self.shaper.coalesced,
+                "ratio": self.shaper.stats()["ratio"],
+                "bandwidth": self.shaper.bandwidth,
+                "types": sorted(self.types),
+                "channels": sorted(c + 1 for c in self.channels)}
+
+
+class FanOut:
+    """按 midi.destinations 维护 PortWriter 集合并分发消息。"""
+
+    def __init__(self, open_port=None, open_lock=None):
+        self._open_port = open_port
+        self._open_lock = open_lock
+        self._writers = {}          # port_name -> PortWriter
+        self._lock = threading.Lock()
+
+    def configure(self, destinations) -> None:
+        """热应用目的地配置：保留同名写线程（仅更新过滤），关闭移除的端口。"""
+        wanted = {}
+        for dest in destinations or ():
+            name = str(dest.get("port", "")).strip()
+            if name and dest.get("enabled", True):
+                wanted[name] = dest
+        with self._lock:
+            removed = [w for name, w in self._writers.items() if name not in wanted]
+            writers = {}
+            for name, dest in wanted.items():
+                writer = self._writers.get(name)
+                if writer is None:
+                    writer = PortWriter(name, self._open_port, self._open_lock,
+                                        dest.get("types"), dest.get("channels"),
+                                        bandwidth=float(dest.get("bandwidth", 0)))
+                else:
+                    writer.set_filter(dest.get("types"), dest.get("channels"))
+                    writer.shaper.configure(bandwidth=float(dest.get("bandwidth", 0)))
+                writers[name] = writer
+            self._writers = writers
+        for writer in removed:
+            writer.close()
+
+    def dispatch(self, msg, skip=()) -> int:
+        """把消息投递给所有匹配的写线程，返回接受的目的地数量。"""
+        accepted = 0
+        for name, writer in self._writers.items():
+            if name in skip or not writer.accepts(msg):
+                continue
+            if writer.put(msg):
+                accepted += 1
+        return accepted
+
+    def close(self):
+        self.configure([])
+
+    def writers(self) -> dict:
+        return dict(self._writers)
+
+    def stats(self) -> list:
+        return [w.stats() for w in self._writers.values()]
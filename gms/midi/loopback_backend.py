@@ -0,0 +1,199 @@
+"""进程内 loopback / null 内核：不依赖任何驱动，测试与吞吐量测量用。
+
+loopback：输出字节写入预分配的环形缓冲（字节环 + 消息索引环，发送路径
+不分配对象），可选择把每条消息回显为 midi.input（echo），用于在任意平台上
+跑通 MidiEngine → MidiPortManager → 映射层 全链路。
+null：只计数，不保存数据，用于测量输出栈自身开销。
+"""
+
+import threading
+from array import array
+
+from .backends import VirtualMidiBackend
+
+
+class LoopbackPort:
+    """loopback 端口句柄：环形缓冲 + 读游标。
+
+    字节环容量 capacity，消息索引环 slots 条；写满后覆盖最旧数据，
+    未读即被覆盖的消息计入 overruns。"""
+
+    def __init__(self, name: str, capacity: int, slots: int, on_input=None):
+        self.name = name
+        self.capacity = capacity
+        self.slots = slots
+        self.on_input = on_input
+        self.buf = bytearray(capacity)
+        self._view = memoryview(self.buf)
+        self.starts = array("Q", bytes(8 * slots))   # 消息起点（绝对字节序号）
+        self.lengths = array("I", bytes(4 * slots))
+        self.written = 0          # 累计消息数
+        self.bytes_written = 0    # 累计字节数（写游标）
+        self.read_seq = 0         # drain() 读游标
+        self.dropped = 0          # 超过环容量被拒收的消息
+        self.overruns = 0         # 未读即被覆盖的消息
+        self.closed = False
+        self._echo = threading.local()     # 重入保护按线程：只拦本线程回调里的再次发送
+        self.lock = threading.Lock()
+
+    def __bool__(self):
+        return not self.closed
+
+    def write(self, data) -> bool:
+        n = len(data)
+        with self.lock:
+            if n > self.capacity:
+                self.dropped += 1
+                return False
+            if self.closed:
+                return False
+            pos = self.bytes_written % self.capacity
+            first = min(n, self.capacity - pos)
+            self._view[pos:pos + first] = data[:first]
+            if first < n:
+                self._view[0:n - first] = data[first:]
+            slot = self.written % self.slots
+            self.starts[slot] = self.bytes_written
+            self.lengths[slot] = n
+            self.written += 1
+            self.bytes_written += n
+        return True
+
+    def echoing(self) -> bool:
+        return getattr(self._echo, "active", False)
+
+    def _valid(self, seq: int) -> bool:
+        if seq < self.written - self.slots:
+            return False
+        return self.starts[seq % self.slots] >= self.bytes_written - self.capacity
+
+    def _read(self, seq: int) -> bytes:
+        slot = seq % self.slots
+        pos = self.starts[slot] % self.capacity
+        n = self.lengths[slot]
+        first = min(n, self.capacity - pos)
+        if first == n:
+            return bytes(self._view[pos:pos + n])
+        return bytes(self._view[pos:]) + bytes(self._view[:n - first])
+
+    def drain(self) -> list:
+        """取出上次 drain 之后写入且仍在环中的消息（按写入顺序）。"""
+        with self.lock:
+            out = []
+            for seq in range(self.read_seq, self.written):
+                if self._valid(seq):
+                    out.append(self._read(seq))
+                else:
+                    self.overruns += 1
+            self.read_seq = self.written
+            return out
+
+    def stats(self) -> dict:
+        return {"messages": self.written, "bytes": self.bytes_written,
+                "pending": self.written - self.read_seq,
+                "dropped": self.dropped, "overruns": self.overruns}
+
+
+class LoopbackBackend(VirtualMidiBackend):
+    """进程内 loopback 内核。echo=True 时输出回显为端口输入。"""
+
+    name = "loopback"
+    label = "Loopback（进程内）"
+    input_direct = True     # 回显发生在发送线程，同步派发（重入保护依赖于此）
+
+    CAPACITY = 1 << 16      # 字节环容量
+    SLOTS = 1 << 13         # 消息索引环条数
+
+    def __init__(self, echo: bool = False, capacity: int = CAPACITY, slots: int = SLOTS):
+        self.echo = echo
+        self.capacity = capacity
+        self.slots = slots
+        self.last_port = None   # 最近创建的端口（测试/基准读取用）
+
+    @property
+    def error(self) -> str:
+        return ""
+
+    def is_available(self) -> bool:
+        return True
+
+    def create_port(self, port_name: str, on_input=None):
+        self.last_port = LoopbackPort(port_name, self.capacity, self.slots, on_input)
+        return self.last_port
+
+    def close_port(self, handle) -> None:
+        if handle is not None:
+            with handle.lock:
+                handle.closed = True
+
+    def send(self, handle, data) -> bool:
+        if not handle or not data:
+            return False
+        if not isinstance(data, (bytes, bytearray)):
+            data = bytes(data)
+        if not handle.write(data):
+            return False
+        # 回显：映射层等订阅者可能在回调里再次发送，重入时只写环不再回显，避免反馈环
+        if self.echo and handle.on_input is not None and not handle.echoing():
+            handle._echo.active = True
+            try:
+                handle.on_input(bytes(data))
+            except Exception:
+                pass
+            finally:
+                handle._echo.active = False
+        return True
+
+
+class NullPort:
+    """null 端口句柄：只计数（多个写线程并发发送时计数持锁累加）。"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.messages = 0
+        self.bytes = 0
+        self.closed = False
+        self.lock = threading.Lock()
+
+    def __bool__(self):
+        return not self.closed
+
+    def count(self, n: int):
+        with self.lock:
+            self.messages += 1
+            self.bytes += n
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"messages": self.messages, "bytes": self.bytes}
+
+
+class NullBackend(VirtualMidiBackend):
+    """丢弃全部输出、仅计数的内核（测量输出栈开销）。"""
+
+    name = "null"
+    label = "Null（仅计数）"
+
+    def __init__(self):
+        self.last_port = None
+
+    @property
+    def error(self) -> str:
+        return ""
+
+    def is_available(self) -> bool:
+        return True
+
+    def create_port(self, port_name: str, on_input=None):
+        self.last_port = NullPort(port_name)
+        return self.last_port
+
+    def close_port(self, handle) -> None:
+        if handle is not None:
+            handle.closed = True
+
+    def send(self, handle, data) -> bool:
+        if not handle or not data:
+            return False
+        handle.count(len(data))
+        return True
@@ -0,0 +1,158 @@
+"""表演录制：midi.event → 预分配类型数组（纳秒单调时刻 / 状态 / 数据 1 / 数据 2）。
+
+数组按 CHUNK 条分块增长，录制期间每条消息只写 4 个数组槽位，不创建 dict。
+停止后可选后处理：
+  - CC 抽稀：同一 (通道, 控制器) 相对上一保留点的间隔 < thin_ms 且变化 < thin_delta 时丢弃
+    （被丢弃段的最后一个值在下一保留点前补回，保证落点正确）
+  - 网格量化：note_on 吸附到最近网格，对应 note_off 平移同样距离（保持时值）
+结果为 CompiledClip，可直接写成 .mid（smf.write_clip）。
+"""
+
+import threading
+import time
+from array import array
+
+from ..core import CompiledClip
+
+CHUNK = 4096
+
+_STATUS = {"note_off": 0x80, "note_on": 0x90, "control_change": 0xB0, "pitchwheel": 0xE0}
+
+
+class PerformanceRecorder:
+    def __init__(self, chunk: int = CHUNK):
+        self.chunk = chunk
+        self._lock = threading.Lock()
+        self._reset()
+        self.recording = False
+
+    def _reset(self):
+        self.t_ns = array("q", bytes(8 * self.chunk))
+        self.status = array("B", bytes(self.chunk))
+        self.data1 = array("B", bytes(self.chunk))
+        self.data2 = array("B", bytes(self.chunk))
+        self.count = 0
+        self.start_ns = time.monotonic_ns()
+        self.stop_ns = None
+
+    def _grow(self):
+        n = self.chunk
+        self.t_ns.frombytes(bytes(8 * n))
+        self.status.frombytes(bytes(n))
+        self.data1.frombytes(bytes(n))
+        self.data2.frombytes(bytes(n))
+
+    # ---- 录制 ----
+
+    def start(self):
+        with self._lock:
+            self._reset()
+            self.recording = True
+
+    def stop(self):
+        with self._lock:
+            if self.recording:
+                self.recording = False
+                self.stop_ns = time.monotonic_ns()
+
+    def on_event(self, type, channel, fields):
+        """midi.event 订阅回调"""
+        kind = _STATUS.get(type)
+        if kind is None or not self.recording:
+            return
+        if kind == 0xE0:
+            bend = int(fields.get("pitch", 0)) + 8192
+            d1, d2 = bend & 0x7F, (bend >> 7) & 0x7F
+        elif kind == 0xB0:
+            d1, d2 = int(fields["control"]), int(fields["value"])
+        else:
+            d1 = int(fields["note"])
+            d2 = int(fields.get("velocity", 0)) if kind == 0x90 else 0
+            if kind == 0x90 and d2 == 0:
+                kind = 0x80
+        now = time.monotonic_ns()
+        with self._lock:
+            if not self.recording:
+                return
+            i = self.count
+            if i >= len(self.status):
+                self._grow()
+            self.t_ns[i] = now
+            self.status[i] = kind | (int(channel or 0) & 0x0F)
+            self.data1[i] = d1 & 0x7F
+            self.data2[i] = d2 & 0x7F
+            self.count = i + 1
+
+    def __len__(self):
+        return self.count
+
+    # ---- 后处理 ----
+
+    def to_clip(self, thin_ms: float = 0.0, thin_delta: int = 0,
+                quantize_ms: float = 0.0) -> CompiledClip:
+        """生成 CompiledClip（时刻为相对录制开始的毫秒；保留各消息的完整状态字节，
+        clip.channel 为首条消息的通道 1-16；clip 长度到停止录制为止）"""
+        with self._lock:
+            n = self.count
+            start = self.start_ns
+            end_ns = self.stop_ns if self.stop_ns is not None else time.monotonic_ns()
+            keep = _thin_cc(self.t_ns, self.status, self.data1, self.data2, n,
+                            thin_ms, thin_delta)
+            times = array("d", ((self.t_ns[i] - start) / 1e6 for i in keep))
+            status = array("B", (self.status[i] for i in keep))
+            data1 = array("B", (self.data1[i] for i in keep))
+            data2 = array("B", (self.data2[i] for i in keep))
+        if quantize_ms > 0:
+            times, status, data1, data2 = _quantize_notes(times, status, data1, data2,
+                                                          quantize_ms)
+        channel = (status[0] & 0x0F) + 1 if len(status) else None
+        total = max(times[-1] if len(times) else 0.0, (end_ns - start) / 1e6)
+        return CompiledClip(times, status, data1, data2, total, channel=channel)
+
+
+def _thin_cc(t_ns, status, data1, data2, n, thin_ms, thin_delta) -> list:
+    """返回保留的下标。非 CC 全部保留；CC 按 (状态, 控制器) 相对上一保留点抽稀：
+    间隔小于 thin_ms 且变化小于 thin_delta 时丢弃（参数 ≤0 表示该条件不限制）。"""
+    if thin_ms <= 0 and thin_delta <= 0:
+        return list(range(n))
+    window = int(thin_ms * 1e6)
+    keep = []
+    last = {}        # (状态, 控制器) -> (保留时刻, 保留值)
+    held = {}        # (状态, 控制器) -> 被跳过的最新下标（段末补回）
+    for i in range(n):
+        st = status[i]
+        if st & 0xF0 != 0xB0:
+            keep.append(i)
+            continue
+        key = (st, data1[i])
+        prev = last.get(key)
+        if (prev is not None and (window <= 0 or t_ns[i] - prev[0] < window)
+                and (thin_delta <= 0 or abs(data2[i] - prev[1]) < thin_delta)):
+            held[key] = i
+            continue
+        pending = held.pop(key, None)
+        if pending is not None:
+            keep.append(pending)
+        keep.append(i)
+        last[key] = (t_ns[i], data2[i])
+    keep.extend(held.values())
+    keep.sort()
+    return keep
+
+
+def _quantize_notes(times, status, data1, data2, grid_ms):
+    """note_on 吸附到最近网格，匹配的 note_off 平移同样距离；返回按时刻重排的数组"""
+    shift = {}       # (通道, 音符) -> 平移毫秒
+    moved = array("d", times)
+    for i in range(len(times)):
+        kind = status[i] & 0xF0
+        key = (status[i] & 0x0F, data1[i])
+        if kind == 0x90:
+            snapped = round(times[i] / grid_ms) * grid_ms
+            shift[key] = snapped - times[i]
+            moved[i] = snapped
+        elif kind == 0x80 and key in shift:
+            moved[i] = max(0.0, times[i] + shift.pop(key))
+    order = sorted(range(len(moved)), key=lambda i: (moved[i], i))
+    return (array("d", (moved[i] for i in order)), array("B", (status[i] for i in order)),
+            array("B", (data1[i] for i in order)), array("B", (data2[i] for i in order)))
@@ -0,0 +1,132 @@
+"""中央时间线调度器：单线程最小堆，工具提交带绝对时间戳的事件。
+
+替代各工具自带的 sleep 线程（音序器、每个琶音键、每个 Clip 各一个）：
+  - at(when, fn, ...)：when 为 time.monotonic() 绝对时刻；按 (时刻, 提交序号) 出堆，
+    同一时刻的事件保持提交顺序（先排 note_off 再排下一个 note_on 即可保证先关后开）
+  - 提前 LOOKAHEAD_S 从条件变量醒来，再用 time.sleep 精确补足剩余时间，
+    降低粗粒度定时器带来的迟到
+  - cancel(owner)：撤销某个所有者的全部待发事件。与派发互斥——返回后该所有者
+    不会再有回调运行，调用方随即关闭自己记录的音符即可
+  - stats()：派发数、迟到统计（最大/平均/超过 LATE_MS 的次数）
+回调在调度线程上运行，应只做短小的 MIDI 发送与重新排程，不可阻塞。
+"""
+
+import heapq
+import itertools
+import threading
+import time
+
+
+class Scheduler:
+    LOOKAHEAD_S = 0.002     # 提前醒来的时间，剩余部分精确 sleep
+    LATE_MS = 1.0           # 超过该迟到即计入 late
+
+    def __init__(self, bus=None, name: str = "scheduler"):
+        self.bus = bus
+        self.name = name
+        self._heap = []                     # [when, seq, owner, fn, args]
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._dispatch_lock = threading.RLock()
+        self._thread = None
+        self._closed = False
+        self.dispatched = 0
+        self.cancelled = 0
+        self.errors = 0
+        self.late = 0
+        self.max_late_ms = 0.0
+        self._late_sum_ms = 0.0
+
+    # ---- 提交 / 撤销 ----
+
+    def at(self, when: float, fn, *args, owner=None) -> int:
+        seq = next(self._seq)
+        with self._cond:
+            if self._closed:
+                return seq
+            heapq.heappush(self._heap, [when, seq, owner, fn, args])
+            if self._heap[0][1] == seq:
+                self._cond.notify()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True, name=self.name)
+                self._thread.start()
+        return seq
+
+    def after(self, delay: float, fn, *args, owner=None) -> int:
+        return self.at(time.monotonic() + delay, fn, *args, owner=owner)
+
+    def cancel(self, owner) -> int:
+        """撤销 owner 的全部待发事件，返回撤销数。等待进行中的派发结束后才返回。"""
+        with self._dispatch_lock:
+            with self._cond:
+                kept = [e for e in self._heap if e[2] != owner]
+                removed = len(self._heap) - len(kept)
+                if removed:
+                    heapq.heapify(kept)
+                    self._heap = kept
+                    self.cancelled += removed
+                return removed
+
+    def pending(self, owner=None) -> int:
+        with self._cond:
+            if owner is None:
+                return len(self._heap)
+            return sum(1 for e in self._heap if e[2] == owner)
+
+    def close(self, timeout: float = 1.0):
+        with self._cond:
+            self._closed = True
+            self._heap.clear()
+            self._cond.notify()
+            thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+
+    # ---- 调度线程 ----
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed:
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    wait = self._heap[0][0] - time.monotonic() - self.LOOKAHEAD_S
+                    if wait <= 0:
+                        break
+                    self._cond.wait(wait)
+                if self._closed:
+                    return
+                remain = self._heap[0][0] - time.monotonic()
+            if remain > 0:
+                time.sleep(remain)
+            self._dispatch_due()
+
+    def _dispatch_due(self):
+        while True:
+            with self._dispatch_lock:
+                with self._cond:
+                    now = time.monotonic()
+                    if self._closed or not self._heap or self._heap[0][0] > now:
+                        return
+                    when, _, _, fn, args = heapq.heappop(self._heap)
+                late_ms = (now - when) * 1000.0
+                self.dispatched += 1
+                self._late_sum_ms += late_ms
+                if late_ms > self.max_late_ms:
+                    self.max_late_ms = late_ms
+                if late_ms > self.LATE_MS:
+                    self.late += 1
+                try:
+                    fn(*args)
+                except Exception as exc:
+                    self.errors += 1
+                    if self.bus is not None:
+                        self.bus.emit("log", message=f"调度事件执行失败：{exc}")
+
+    def stats(self) -> dict:
+        n = self.dispatched
+        return {"pending": len(self._heap), "dispatched": n,
+                "cancelled": self.cancelled, "errors": self.errors,
+                "late": self.late, "max_late_ms": round(self.max_late_ms, 3),
+                "avg_late_ms": round(self._late_sum_ms / n, 3) if n else 0.0}
@@ -0,0 +1,150 @@
+"""输出整形：连续控制器合并 + 带宽预算。
+
+摇杆在 1-5ms 轮询下每轴每秒可产生数百条 CC/弯音，DIN 端口（31.25 kbaud ≈ 3125 字节/秒）
+跟不上。整形器把连续消息按 (类型, 通道, 控制器) 合并为每个 tick 内的最新值：
+  - 某键空闲（距上次发送 ≥ tick 且无积压）时立即发送，孤立的变化没有额外延迟
+  - 同一 tick 内的后续更新只保留最新值，tick 到期后由调用方 due() 取出
+  - 音符、SysEx、开关/RPN 类控制器属于有序消息，总是立即放行（可透支预算）
+  - bandwidth>0 时以字节令牌桶限速，连续消息在预算不足时继续等待并被合并
+"""
+
+import threading
+import time
+
+# 开关/序列型控制器：丢弃中间值会改变语义（踏板、Bank Select、RPN/NRPN、通道模式），逐条发送
+ORDERED_CONTROLS = frozenset((0, 6, 32, 38, *range(64, 70), *range(96, 102), *range(120, 128)))
+
+CONTINUOUS_TYPES = frozenset(("control_change", "pitchwheel"))
+
+
+def coalesce_key(msg):
+    """连续消息的合并键；有序消息返回 None"""
+    kind = msg.type
+    if kind not in CONTINUOUS_TYPES:
+        return None
+    if kind == "control_change":
+        if msg.control in ORDERED_CONTROLS:
+            return None
+        return (kind, msg.channel, msg.control)
+    return (kind, msg.channel, -1)
+
+
+class MessageShaper:
+    """单个目的地的合并/限速状态（线程安全，本身不持有线程）。"""
+
+    def __init__(self, tick: float = 0.005, bandwidth: float = 0.0):
+        self._lock = threading.Lock()
+        self._pending = {}      # 合并键 -> 最新消息（保持首次积压的顺序）
+        self._last = {}         # 合并键 -> 上次发送时刻
+        self.tick = 0.0
+        self.bandwidth = 0.0
+        self.burst = 0.0
+        self._tokens = 0.0
+        self._refill_t = None
+        self.offered = 0
+        self.sent = 0
+        self.coalesced = 0
+        self.configure(tick, bandwidth)
+
+    def configure(self, tick: float = None, bandwidth: float = None):
+        """tick 秒；bandwidth 字节/秒（0 = 不限速）"""
+        with self._lock:
+            if tick is not None:
+                self.tick = max(0.0, float(tick))
+            if bandwidth is not None and float(bandwidth) != self.bandwidth:
+                self.bandwidth = max(0.0, float(bandwidth))
+                # 允许约 20ms 的突发，至少容纳一条 3 字节消息
+                self.burst = max(3.0, self.bandwidth * 0.02)
+                self._tokens = self.burst
+
+    # ---- 令牌桶 ----
+
+    def _refill(self, now):
+        if self.bandwidth > 0 and self._refill_t is not None:
+            self._tokens = min(self.burst,
+                               self._tokens + (now - self._refill_t) * self.bandwidth)
+        self._refill_t = now
+
+    def _affordable(self, cost) -> bool:
+        return self.bandwidth <= 0 or self._tokens >= cost
+
+    def _spend(self, key, msg, now):
+        if self.bandwidth > 0:
+            self._tokens -= len(msg.bytes())
+        if key is not None:
+            self._last[key] = now
+        self.sent += 1
+
+    # ---- 入口 ----
+
+    def offer(self, msg, now: float | None = None) -> list:
+        """提交一条消息，返回应立即发送的消息（0 或 1 条）"""
+        if now is None:
+            now = time.monotonic()
+        key = coalesce_key(msg)
+        with self._lock:
+            self.offered += 1
+            self._refill(now)
+            if key is None:
+                self._spend(None, msg, now)      # 有序消息优先，可透支预算
+                return [msg]
+            if key in self._pending:
+                self.coalesced += 1
+                self._pending[key] = msg
+                return []
+            if (now - self._last.get(key, -1e9) >= self.tick
+                    and self._affordable(len(msg.bytes()))):
+                self._spend(key, msg, now)
+                return [msg]
+            self._pending[key] = msg
+            return []
+
+    def due(self, now: float | None = None) -> list:
+        """取出 tick 已到期且预算允许的合并消息（按积压顺序）"""
+        if now is None:
+            now = time.monotonic()
+        out = []
+        with self._lock:
+            if not self._pending:
+                return out
+            self._refill(now)
+            for key, msg in list(self._pending.items()):
+                if now - self._last.get(key, -1e9) < self.tick:
+                    continue
+                if not self._affordable(len(msg.bytes())):
+                    break
+                del self._pending[key]
+                self._spend(key, msg, now)
+                out.append(msg)
+        return out
+
+    def wait_time(self, now: float | None = None):
+        """距下一条积压消息可发送的秒数；无积压返回 None"""
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            if not self._pending:
+                return None
+            earliest = min(self._last.get(key, -1e9) for key in self._pending) + self.tick
+            wait = max(0.0, earliest - now)
+            if self.bandwidth > 0 and self._tokens < 3:
+                wait = max(wait, (3 - self._tokens) / self.bandwidth)
+            return wait
+
+    def flush(self) -> list:
+        """不计预算取出全部积压（关闭前调用，保证最终值送达）"""
+        with self._lock:
+            out = list(self._pending.values())
+            self._pending.clear()
+            self.sent += len(out)
+            return out
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def stats(self) -> dict:
+        return {"offered": self.offered, "sent": self.sent,
+                "coalesced": self.coalesced, "pending": len(self._pending),
+                "ratio": round(self.offered / self.sent, 2) if self.sent else 1.0,
+                "bandwidth": self.bandwidth}
@@ -0,0 +1,307 @@
+"""标准 MIDI 文件（SMF type 0/1）流式读写。
+
+读取：先只扫描块头得到各 MTrk 的偏移与长度，再为每个音轨打开独立的缓冲读取器，
+用 heapq.merge 按 tick 归并（同 tick 时音轨序号小者在前，tempo 通常在音轨 0），
+边归并边按 tempo 表把 tick 换算为毫秒。整个文件不会一次性读入内存。
+写入：单次遍历写出 MTrk，块长度在 close() 时回填；type 1 为「速度音轨 + 数据音轨」。
+
+只处理通道消息；SysEx 与除 tempo 外的元事件被跳过。缺少 end-of-track 的音轨在块末尾
+视为结束；事件在中途被截断（或文件短于块头声明的长度）时抛出 SmfError。
+"""
+
+import heapq
+import struct
+from array import array
+
+from ..core import CLIP_STATUS, CompiledClip
+
+BLOCK = 1 << 16
+DEFAULT_PPQ = 480
+DEFAULT_TEMPO = 500000          # 微秒/四分音符（120 BPM）
+
+_DATA_LEN = {0x80: 2, 0x90: 2, 0xA0: 2, 0xB0: 2, 0xC0: 1, 0xD0: 1, 0xE0: 2}
+_CLIP_KINDS = frozenset(CLIP_STATUS.values())
+
+
+class SmfError(ValueError):
+    """文件不是合法的 SMF 或结构损坏"""
+
+
+class _ChunkReader:
+    """在文件的 [offset, offset+length) 区间内按块缓冲读取"""
+
+    def __init__(self, path, offset: int, length: int):
+        self._f = open(path, "rb")
+        self._f.seek(offset)
+        self._remain = length
+        self._buf = b""
+        self._pos = 0
+
+    def _fill(self):
+        if self._remain <= 0:
+            raise EOFError
+        data = self._f.read(min(BLOCK, self._remain))
+        if not data:
+            raise SmfError("文件短于音轨块声明的长度")
+        self._remain -= len(data)
+        self._buf, self._pos = data, 0
+
+    def byte(self) -> int:
+        if self._pos >= len(self._buf):
+            self._fill()
+        b = self._buf[self._pos]
+        self._pos += 1
+        return b
+
+    def skip(self, n: int):
+        while n > 0:
+            avail = len(self._buf) - self._pos
+            if avail <= 0:
+                self._fill()
+                continue
+            step = min(avail, n)
+            self._pos += step
+            n -= step
+
+    def read(self, n: int) -> bytes:
+        out = bytearray()
+        while len(out) < n:
+            if self._pos >= len(self._buf):
+                self._fill()
+            take = self._buf[self._pos:self._pos + n - len(out)]
+            self._pos += len(take)
+            out += take
+        return bytes(out)
+
+    def vlq(self) -> int:
+        value = 0
+        for _ in range(4):
+            b = self.byte()
+            value = (value << 7) | (b & 0x7F)
+            if not b & 0x80:
+                return value
+        raise SmfError("变长数值超过 4 字节")
+
+    def close(self):
+        self._f.close()
+
+
+def read_header(path):
+    """返回 (format, division, [(offset, length), ...])，只读块头不读音轨内容"""
+    tracks = []
+    with open(path, "rb") as f:
+        head = f.read(14)
+        if len(head) < 14 or head[:4] != b"MThd":
+            raise SmfError("缺少 MThd 头")
+        size, fmt, ntracks, division = struct.unpack(">IHHH", head[4:14])
+        if fmt not in (0, 1):
+            raise SmfError(f"不支持的 SMF 格式 {fmt}")
+        f.seek(8 + size)
+        while len(tracks) < ntracks:
+            chunk = f.read(8)
+            if len(chunk) < 8:
+                break
+            kind, length = chunk[:4], struct.unpack(">I", chunk[4:])[0]
+            if kind == b"MTrk":
+                tracks.append((f.tell(), length))
+            f.seek(length, 1)
+    return fmt, division, tracks
+
+
+def _track_events(path, index, offset, length):
+    """单音轨事件流：(绝对 tick, 音轨序号, 事件序号, 种类, 数据)"""
+    reader = _ChunkReader(path, offset, length)
+    tick = 0
+    seq = 0
+    running = 0
+    try:
+        while True:
+            try:
+                tick += reader.vlq()
+                b = reader.byte()
+            except EOFError:
+                return
+            try:
+                if b == 0xFF:
+                    meta = reader.byte()
+                    size = reader.vlq()
+                    if meta == 0x51 and size == 3:
+                        data = reader.read(3)
+                        event = ("tempo", (data[0] << 16) | (data[1] << 8) | data[2])
+                    elif meta == 0x2F:
+                        yield tick, index, seq, "end", 0
+                        return
+                    else:
+                        reader.skip(size)
+                        event = None
+                elif b in (0xF0, 0xF7):
+                    reader.skip(reader.vlq())
+                    running = 0
+                    event = None
+                else:
+                    if b & 0x80:
+                        running = b
+                        d1 = reader.byte()
+                    elif running:
+                        d1 = b
+                    else:
+                        raise SmfError("数据字节前没有状态字节")
+                    kind = running & 0xF0
+                    d2 = reader.byte() if _DATA_LEN.get(kind, 0) == 2 else 0
+                    event = ("msg", (running, d1, d2))
+            except EOFError:
+                raise SmfError(f"音轨 {index} 在事件中途截断") from None
+            if event is not None:
+                yield (tick, index, seq) + event
+            seq += 1
+    finally:
+        reader.close()
+
+
+def iter_events(path):
+    """按时间顺序产出 (毫秒, 状态字节, 数据 1, 数据 2)；最后产出 (末尾毫秒, None, 0, 0)"""
+    _, division, tracks = read_header(path)
+    if division & 0x8000:
+        # SMPTE：高字节为负的帧率，低字节为每帧 tick
+        fps = 256 - (division >> 8)
+        ms_per_tick = 1000.0 / (fps * (division & 0xFF))
+        tempo_based = False
+    else:
+        ppq = division or DEFAULT_PPQ
+        ms_per_tick = DEFAULT_TEMPO / 1000.0 / ppq
+        tempo_based = True
+    streams = [_track_events(path, i, off, length) for i, (off, length) in enumerate(tracks)]
+    last_tick, last_ms = 0, 0.0
+    end_ms = 0.0
+    for tick, _, _, kind, value in heapq.merge(*streams):
+        last_ms += (tick - last_tick) * ms_per_tick
+        last_tick = tick
+        if kind == "tempo":
+            if tempo_based and value > 0:
+                ms_per_tick = value / 1000.0 / ppq
+        elif kind == "end":
+            end_ms = max(end_ms, last_ms)
+        else:
+            yield last_ms, value[0], value[1], value[2]
+    yield max(end_ms, last_ms), None, 0, 0
+
+
+def check_file(path):
+    """完整遍历一遍所有音轨（不保留事件），结构损坏时抛出 SmfError；返回 read_header 的结果"""
+    header = read_header(path)
+    for _ in iter_events(path):
+        pass
+    return header
+
+
+def read_clip(path):
+    """把 SMF 流式读入 CompiledClip。保留各事件的完整状态字节（含通道），文件中首个
+    通道（1-16）记入 clip.channel；力度 0 的 note_on 记为同通道的 note_off。"""
+    times, status = array("d"), array("B")
+    data1, data2 = array("B"), array("B")
+    channel = None
+    total = 0.0
+    for ms, st, d1, d2 in iter_events(path):
+        if st is None:
+            total = ms
+            break
+        kind = st & 0xF0
+        if kind not in _CLIP_KINDS:
+            continue
+        if channel is None:
+            channel = (st & 0x0F) + 1
+        if kind == 0x90 and d2 == 0:
+            st = 0x80 | (st & 0x0F)
+        times.append(ms)
+        status.append(st)
+        data1.append(d1 & 0x7F)
+        data2.append(d2 & 0x7F)
+    return CompiledClip(times, status, data1, data2, total, channel=channel)
+
+
+def _vlq(value: int) -> bytes:
+    out = bytearray([value & 0x7F])
+    value >>= 7
+    while value:
+        out.insert(0, 0x80 | (value & 0x7F))
+        value >>= 7
+    return bytes(out)
+
+
+class SmfWriter:
+    """流式写出 SMF。add() 按时间顺序追加通道消息（毫秒），close() 回填音轨长度。"""
+
+    def __init__(self, path, fmt: int = 0, ppq: int = DEFAULT_PPQ, bpm: float = 120.0):
+        if fmt not in (0, 1):
+            raise SmfError(f"不支持的 SMF 格式 {fmt}")
+        self.ppq = ppq
+        tempo = int(round(60000000.0 / bpm))
+        self._ticks_per_ms = ppq * 1000.0 / tempo
+        self._f = open(path, "wb")
+        self._f.write(b"MThd" + struct.pack(">IHHH", 6, fmt, 1 if fmt == 0 else 2, ppq))
+        tempo_event = b"\x00\xFF\x51\x03" + tempo.to_bytes(3, "big")
+        if fmt == 1:
+            conductor = tempo_event + b"\x00\xFF\x2F\x00"
+            self._f.write(b"MTrk" + struct.pack(">I", len(conductor)) + conductor)
+        self._f.write(b"MTrk\x00\x00\x00\x00")
+        self._len_pos = self._f.tell() - 4
+        self._size = 0
+        self._last_tick = 0
+        self._running = 0
+        self._buf = bytearray()
+        if fmt == 0:
+            self._emit(tempo_event)
+
+    def _emit(self, data: bytes):
+        self._buf += data
+        self._size += len(data)
+        if len(self._buf) >= BLOCK:
+            self._f.write(self._buf)
+            self._buf.clear()
+
+    def _delta(self, ms: float) -> bytes:
+        tick = max(self._last_tick, int(round(ms * self._ticks_per_ms)))
+        delta = tick - self._last_tick
+        self._last_tick = tick
+        return _vlq(delta)
+
+    def add(self, ms: float, status: int, d1: int, d2: int = 0):
+        out = bytearray(self._delta(ms))
+        if status != self._running:
+            out.append(status)
+            self._running = status
+        out.append(d1 & 0x7F)
+        if _DATA_LEN.get(status & 0xF0, 0) == 2:
+            out.append(d2 & 0x7F)
+        self._emit(bytes(out))
+
+    def close(self, end_ms: float | None = None):
+        if self._f is None:
+            return
+        self._emit(self._delta(end_ms or 0.0) + b"\xFF\x2F\x00")
+        self._f.write(self._buf)
+        self._f.seek(self._len_pos)
+        self._f.write(struct.pack(">I", self._size))
+        self._f.close()
+        self._f = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_clip(path, clip: CompiledClip, channel=None, fmt: int = 0):
+    """CompiledClip → SMF；channel 为 1-16 时覆盖所有事件的通道，None 保留各事件自带的
+    通道（不带通道的 clip 写通道 1）"""
+    with SmfWriter(path, fmt=fmt) as writer:
+        if channel:
+            ch = (int(channel) - 1) & 0x0F
+            for i in range(len(clip)):
+                writer.add(clip.times[i], (clip.status[i] & 0xF0) | ch,
+                           clip.data1[i], clip.data2[i])
+        else:
+            for i in range(len(clip)):
+                writer.add(clip.times[i], clip.status[i], clip.data1[i], clip.data2[i])
+        writer.close(clip.total_ms)
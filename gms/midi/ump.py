@@ -0,0 +1,281 @@
+"""UMP（Universal MIDI Packet）纯 Python 编解码。
+
+编码：MIDI 1.0 字节流 → UMP 字（32 位整数列表）
+  - protocol="midi1"：通道消息 → 类型 2（32 位 MIDI 1.0 通道消息）
+  - protocol="midi2"：通道消息 → 类型 4（64 位 MIDI 2.0 通道消息，
+    力度 16 位、控制器/压力/弯音 32 位，按 MIDI 2.0 规范的 min-center-max 放大）
+  - 系统公共/实时 → 类型 1；SysEx → 类型 3（SysEx7，每包 6 字节分块）
+解码：UMP 字 → MIDI 1.0 字节消息（类型 4 高分辨率值按规范缩小），
+SysEx 分块在 UmpDecoder 中按 group 拼接。
+"""
+
+MT_UTILITY = 0x0
+MT_SYSTEM = 0x1
+MT_MIDI1_CV = 0x2
+MT_SYSEX7 = 0x3
+MT_MIDI2_CV = 0x4
+
+SYSEX_COMPLETE = 0x0
+SYSEX_START = 0x1
+SYSEX_CONTINUE = 0x2
+SYSEX_END = 0x3
+
+# 消息类型 -> 包长度（字）
+_PACKET_WORDS = (1, 1, 1, 2, 2, 4, 1, 1, 2, 2, 2, 3, 3, 4, 4, 4)
+
+# 系统消息数据字节数（F0/F7 由 SysEx 路径处理）
+_SYSTEM_DATA_LEN = {0xF1: 1, 0xF2: 2, 0xF3: 1}
+
+
+def packet_words(first_word: int) -> int:
+    """按首字的消息类型返回该 UMP 包的字数"""
+    return _PACKET_WORDS[(first_word >> 28) & 0xF]
+
+
+def scale_up(value: int, src_bits: int, dst_bits: int) -> int:
+    """MIDI 2.0 min-center-max 放大：0→0，中心→中心，最大→最大"""
+    scale_bits = dst_bits - src_bits
+    shifted = value << scale_bits
+    center = 1 << (src_bits - 1)
+    if value <= center:
+        return shifted
+    repeat_bits = src_bits - 1
+    repeat = value & ((1 << repeat_bits) - 1)
+    if scale_bits > repeat_bits:
+        repeat <<= scale_bits - repeat_bits
+    else:
+        repeat >>= repeat_bits - scale_bits
+    while repeat:
+        shifted |= repeat
+        repeat >>= repeat_bits
+    return shifted
+
+
+def scale_down(value: int, src_bits: int, dst_bits: int) -> int:
+    return value >> (src_bits - dst_bits)
+
+
+# ---- 编码 ----
+
+def midi1_channel_voice(group: int, status: int, data1: int = 0, data2: int = 0) -> int:
+    """类型 2：32 位 MIDI 1.0 通道消息"""
+    return ((MT_MIDI1_CV << 28) | ((group & 0xF) << 24) | ((status & 0xFF) << 16)
+            | ((data1 & 0x7F) << 8) | (data2 & 0x7F))
+
+
+def system_message(group: int, status: int, data1: int = 0, data2: int = 0) -> int:
+    """类型 1：系统公共/实时消息"""
+    return ((MT_SYSTEM << 28) | ((group & 0xF) << 24) | ((status & 0xFF) << 16)
+            | ((data1 & 0x7F) << 8) | (data2 & 0x7F))
+
+
+def midi2_channel_voice(group: int, opcode: int, channel: int, index: int = 0,
+                        extra: int = 0, data: int = 0) -> tuple:
+    """类型 4：64 位 MIDI 2.0 通道消息（opcode 为状态高 4 位）"""
+    word0 = ((MT_MIDI2_CV << 28) | ((group & 0xF) << 24) | ((opcode & 0xF) << 20)
+             | ((channel & 0xF) << 16) | ((index & 0xFF) << 8) | (extra & 0xFF))
+    return word0, data & 0xFFFFFFFF
+
+
+def midi2_note_on(group: int, channel: int, note: int, velocity16: int,
+                  attr_type: int = 0, attr: int = 0) -> tuple:
+    return midi2_channel_voice(group, 0x9, channel, note, attr_type,
+                               ((velocity16 & 0xFFFF) << 16) | (attr & 0xFFFF))
+
+
+def midi2_note_off(group: int, channel: int, note: int, velocity16: int = 0,
+                   attr_type: int = 0, attr: int = 0) -> tuple:
+    return midi2_channel_voice(group, 0x8, channel, note, attr_type,
+                               ((velocity16 & 0xFFFF) << 16) | (attr & 0xFFFF))
+
+
+def midi2_control_change(group: int, channel: int, control: int, value32: int) -> tuple:
+    return midi2_channel_voice(group, 0xB, channel, control, 0, value32)
+
+
+def midi2_pitch_bend(group: int, channel: int, value32: int) -> tuple:
+    return midi2_channel_voice(group, 0xE, channel, 0, 0, value32)
+
+
+def _midi1_to_midi2(group: int, status: int, d1: int, d2: int) -> tuple:
+    opcode, channel = status >> 4, status & 0xF
+    if opcode == 0x9 and d2 == 0:
+        return midi2_note_off(group, channel, d1, scale_up(0x40, 7, 16))
+    if opcode in (0x8, 0x9):
+        return midi2_channel_voice(group, opcode, channel, d1, 0, scale_up(d2, 7, 16) << 16)
+    if opcode == 0xA:
+        return midi2_channel_voice(group, 0xA, channel, d1, 0, scale_up(d2, 7, 32))
+    if opcode == 0xB:
+        return midi2_control_change(group, channel, d1, scale_up(d2, 7, 32))
+    if opcode == 0xC:
+        return midi2_channel_voice(group, 0xC, channel, 0, 0, (d1 & 0x7F) << 24)
+    if opcode == 0xD:
+        return midi2_channel_voice(group, 0xD, channel, 0, 0, scale_up(d1, 7, 32))
+    # 0xE 弯音：14 位（LSB, MSB）→ 32 位
+    return midi2_pitch_bend(group, channel, scale_up((d2 << 7) | d1, 14, 32))
+
+
+def sysex7_packets(group: int, payload: bytes) -> list:
+    """SysEx 数据（不含 F0/F7）按 6 字节分块为类型 3 包，返回平铺字列表"""
+    chunks = [payload[i:i + 6] for i in range(0, len(payload), 6)] or [b""]
+    words = []
+    last = len(chunks) - 1
+    for i, chunk in enumerate(chunks):
+        if last == 0:
+            status = SYSEX_COMPLETE
+        elif i == 0:
+            status = SYSEX_START
+        elif i == last:
+            status = SYSEX_END
+        else:
+            status = SYSEX_CONTINUE
+        b = bytes(chunk) + bytes(6 - len(chunk))
+        words.append((MT_SYSEX7 << 28) | ((group & 0xF) << 24) | (status << 20)
+                     | (len(chunk) << 16) | (b[0] << 8) | b[1])
+        words.append((b[2] << 24) | (b[3] << 16) | (b[4] << 8) | b[5])
+    return words
+
+
+def encode(data, group: int = 0, protocol: str = "midi1") -> list:
+    """MIDI 1.0 字节流（可含多条消息、running status）→ UMP 字列表"""
+    data = bytes(data)
+    words = []
+    i, n = 0, len(data)
+    running = 0
+    while i < n:
+        b = data[i]
+        if b == 0xF0:
+            end = data.find(b"\xF7", i + 1)
+            if end < 0:
+                end = n
+            words.extend(sysex7_packets(group, data[i + 1:end]))
+            i = end + 1
+            running = 0
+            continue
+        if b >= 0xF8:                      # 实时消息：单字节，不影响 running status
+            words.append(system_message(group, b))
+            i += 1
+            continue
+        if b >= 0xF1:
+            size = _SYSTEM_DATA_LEN.get(b, 0)
+            args = data[i + 1:i + 1 + size]
+            if len(args) < size:
+                break
+            words.append(system_message(group, b, *args))
+            i += 1 + size
+            running = 0
+            continue
+        if b & 0x80:
+            running = b
+            i += 1
+        elif not running:
+            i += 1                         # 无状态的孤立数据字节
+            continue
+        size = 1 if (running & 0xF0) in (0xC0, 0xD0) else 2
+        args = data[i:i + size]
+        if len(args) < size:
+            break
+        d1 = args[0]
+        d2 = args[1] if size == 2 else 0
+        i += size
+        if protocol == "midi2":
+            words.extend(_midi1_to_midi2(group, running, d1, d2))
+        else:
+            words.append(midi1_channel_voice(group, running, d1, d2))
+    return words
+
+
+# ---- 解码 ----
+
+class UmpDecoder:
+    """UMP 字 → MIDI 1.0 字节消息。SysEx7 分块按 group 拼接，跨 feed 调用保持状态。"""
+
+    def __init__(self):
+        self._sysex = {}      # group -> bytearray
+
+    def feed(self, words) -> list:
+        words = list(words)
+        out = []
+        i, n = 0, len(words)
+        while i < n:
+            size = packet_words(words[i])
+            packet = words[i:i + size]
+            i += size
+            if len(packet) < size:
+                break
+            msg = self._decode_packet(packet)
+            if msg:
+                out.extend(msg)
+        return out
+
+    def _decode_packet(self, packet) -> list:
+        w0 = packet[0]
+        mt = (w0 >> 28) & 0xF
+        group = (w0 >> 24) & 0xF
+        status = (w0 >> 16) & 0xFF
+        if mt == MT_SYSTEM:
+            size = _SYSTEM_DATA_LEN.get(status, 0)
+            return [bytes([status, (w0 >> 8) & 0x7F, w0 & 0x7F][:1 + size])]
+        if mt == MT_MIDI1_CV:
+            size = 2 if (status & 0xF0) in (0xC0, 0xD0) else 3
+            return [bytes([status, (w0 >> 8) & 0x7F, w0 & 0x7F][:size])]
+        if mt == MT_SYSEX7:
+            return self._sysex_chunk(group, packet)
+        if mt == MT_MIDI2_CV:
+            return self._midi2_to_midi1(packet)
+        return []
+
+    def _sysex_chunk(self, group, packet) -> list:
+        w0, w1 = packet
+        form = (w0 >> 20) & 0xF
+        count = min(6, (w0 >> 16) & 0xF)
+        raw = bytes([(w0 >> 8) & 0xFF, w0 & 0xFF, (w1 >> 24) & 0xFF,
+                     (w1 >> 16) & 0xFF, (w1 >> 8) & 0xFF, w1 & 0xFF])[:count]
+        if form == SYSEX_COMPLETE:
+            self._sysex.pop(group, None)
+            return [b"\xF0" + raw + b"\xF7"]
+        if form == SYSEX_START:
+            self._sysex[group] = bytearray(raw)
+            return []
+        buf = self._sysex.get(group)
+        if buf is None:
+            return []                      # 丢失起始包：丢弃残片
+        buf.extend(raw)
+        if form == SYSEX_END:
+            del self._sysex[group]
+            return [b"\xF0" + bytes(buf) + b"\xF7"]
+        return []
+
+    @staticmethod
+    def _midi2_to_midi1(packet) -> list:
+        w0, w1 = packet
+        opcode = (w0 >> 20) & 0xF
+        channel = (w0 >> 16) & 0xF
+        index = (w0 >> 8) & 0xFF
+        if opcode in (0x8, 0x9):
+            velocity = scale_down(w1 >> 16, 16, 7)
+            if opcode == 0x9 and velocity == 0:
+                velocity = 1               # MIDI 2.0 力度非零但缩小后为 0：仍是 note on
+            return [bytes([(opcode << 4) | channel, index & 0x7F, velocity])]
+        if opcode == 0xA:
+            return [bytes([0xA0 | channel, index & 0x7F, scale_down(w1, 32, 7)])]
+        if opcode == 0xB:
+            return [bytes([0xB0 | channel, index & 0x7F, scale_down(w1, 32, 7)])]
+        if opcode == 0xC:
+            out = []
+            if w0 & 0x1:                   # bank valid
+                out.append(bytes([0xB0 | channel, 0, (w1 >> 8) & 0x7F]))
+                out.append(bytes([0xB0 | channel, 32, w1 & 0x7F]))
+            out.append(bytes([0xC0 | channel, (w1 >> 24) & 0x7F]))
+            return out
+        if opcode == 0xD:
+            return [bytes([0xD0 | channel, scale_down(w1, 32, 7)])]
+        if opcode == 0xE:
+            bend = scale_down(w1, 32, 14)
+            return [bytes([0xE0 | channel, bend & 0x7F, bend >> 7])]
+        return []                          # 注册/相对控制器、逐音符消息等无 MIDI 1.0 对应
+
+
+def decode(words) -> list:
+    """一次性解码（无跨调用 SysEx 状态）"""
+    return UmpDecoder().feed(words)
@@ -14,6 +14,7 @@ from pathlib import Path
 from ctypes import wintypes
 
 from .backends import VirtualMidiBackend
+from .ump import UmpDecoder, encode as ump_encode, packet_words
 
 # 可能的 Python 投影模块名（pywinrt 扁平命名 / winsdk 风格）
 PROJECTION_MODULES = [
@@ -94,10 +95,17 @@ class WindowsMidiServicesBackend(VirtualMidiBackend):
     """Windows MIDI Services 内核。可用时创建 loopback 端点。"""
 
     name = "windows_midi_services"
+    label = "Windows MIDI Services"
 
-    def __init__(self):
+    SEND_IMMEDIATELY = 0   # MidiClock.TimestampConstantSendImmediately
+    protocol = "midi1"     # midi1：类型 2 包；midi2：类型 4 高分辨率包
+    group = 0
+
+    def __init__(self, protocol: str = "midi1", group: int = 0):
         self._err = ""
         self._mod = None
+        self.protocol = protocol
+        self.group = group
         self._check()
 
     # ---- 检测 ----
@@ -176,8 +184,16 @@ class WindowsMidiServicesBackend(VirtualMidiBackend):
             if hasattr(conn, "open"):
                 conn.open()
             if on_input is not None and hasattr(conn, "message_received"):
-                conn.message_received += lambda sender, args: on_input(
-                    bytes(args.message.to_bytes()) if hasattr(args.message, "to_bytes") else b"")
+                decoder = UmpDecoder()
+
+                def _on_message(sender, args):
+                    try:
+                        for msg in decoder.feed(_event_words(args)):
+                            on_input(msg)
+                    except Exception:
+                        pass
+
+                conn.message_received += _on_message
 
         return {
             "manager": manager,
@@ -207,21 +223,70 @@ class WindowsMidiServicesBackend(VirtualMidiBackend):
         except Exception:
             pass
 
-    def send(self, handle, data: bytes) -> bool:
+    def send(self, handle, data) -> bool:
+        """MIDI 1.0 字节（可含多条消息/SysEx）编码为 UMP 后批量发送"""
         if not handle or not data:
             return False
-        try:
-            conn = handle.get("conn")
-            if conn is None:
-                return False
-            # 优先 MessageBuilder；退化用 raw UMP 发送
-            if hasattr(conn, "send_message"):
-                # 尝试用 UMP 消息（MIDI1 消息转换为 UMP 由 SDK 处理）
-                if hasattr(conn, "send_word") and len(data) in (1, 2, 3):
-                    word = int.from_bytes(data, "big")
-                    conn.send_word(word)
-                    return True
-                return False
+        conn = handle.get("conn")
+        if conn is None:
+            return False
+        words = ump_encode(data, group=self.group, protocol=self.protocol)
+        if not words:
             return False
+        try:
+            return self._send_words(conn, words)
         except Exception:
             return False
+
+    def send_many(self, handle, chunks) -> bool:
+        chunks = [bytes(c) for c in chunks if c]
+        return bool(chunks) and self.send(handle, b"".join(chunks))
+
+    def _send_words(self, conn, words) -> bool:
+        # 首选一次提交全部字（SDK 按包头自行拆包）
+        send_list = getattr(conn, "send_multiple_messages_word_list", None)
+        if send_list is not None:
+            return _send_ok(send_list(self.SEND_IMMEDIATELY, words))
+        send_words = getattr(conn, "send_single_message_words", None)
+        if send_words is not None:
+            i = 0
+            while i < len(words):
+                size = packet_words(words[i])
+                if not _send_ok(send_words(self.SEND_IMMEDIATELY, *words[i:i + size])):
+                    return False
+                i += size
+            return True
+        # 旧投影：仅支持单字发送，只能发 32 位包
+        send_word = getattr(conn, "send_word", None)
+        if send_word is None or any(packet_words(w) != 1 for w in words):
+            return False
+        for word in words:
+            send_word(word)
+        return True
+
+
+def _send_ok(result) -> bool:
+    """SDK 返回 MidiSendMessageResults 标志（0 = Succeeded）；部分投影返回 bool/None"""
+    if result is None or isinstance(result, bool):
+        return result is not False
+    try:
+        return int(result) == 0
+    except (TypeError, ValueError):
+        return bool(result)
+
+
+def _event_words(args) -> list:
+    """从 MessageReceived 事件参数取出 UMP 字（兼容不同投影的取法）"""
+    fill = getattr(args, "fill_words", None)
+    if fill is not None:
+        res = fill()
+        if isinstance(res, tuple) and res:
+            count, words = res[0], res[1:]
+            return list(words[:count])
+    get_packet = getattr(args, "get_message_packet", None)
+    if get_packet is not None:
+        return list(get_packet().get_all_words())
+    word = getattr(args, "peek_first_word", None)
+    if word is not None:
+        return [word()]
+    return []
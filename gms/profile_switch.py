@@ -0,0 +1,90 @@
+"""演奏中切换 profile：手柄组合键 / MIDI Program Change → ProfileManager.switch_profile。
+
+启动时预载全部 profile；已预载的切换只交换当前配置引用，随后由 config.changed 按变化路径
+热应用，配置未变的工具继续运行。按住的音符由各来源记下实际发出的 (音符, 通道) 并在原通道
+释放，切换到 midi.channel 不同的 profile 也不会卡音。
+每次切换测量从触发到热应用完成的耗时，写入日志并发出 profile.switched(name, ms, source)。
+"""
+
+import time
+
+
+class ProfileSwitcher:
+    def __init__(self, bus, config, gamepad=None):
+        self.bus = bus
+        self.config = config
+        self.gamepad = gamepad
+        self.last_switch_ms = None
+        self.switches = 0
+        self._subscribed = False
+
+    def start(self):
+        self.config.preload()
+        if not self._subscribed:
+            self.bus.subscribe("gamepad.button", self._on_gamepad_button)
+            self.bus.subscribe("midi.input", self._on_midi_input)
+            self._subscribed = True
+
+    def stop(self):
+        if self._subscribed:
+            self.bus.unsubscribe("gamepad.button", self._on_gamepad_button)
+            self.bus.unsubscribe("midi.input", self._on_midi_input)
+            self._subscribed = False
+
+    def switch(self, name: str, source: str = "界面") -> bool:
+        if name == self.config.current_name:
+            return True
+        hot = name in self.config.preloaded()
+        t0 = time.perf_counter()
+        if not self.config.switch_profile(name):
+            self.bus.emit("log", message=f"切换预设失败：{name} 不存在")
+            return False
+        ms = (time.perf_counter() - t0) * 1000.0
+        self.last_switch_ms = ms
+        self.switches += 1
+        self.bus.emit("profile.switched", name=name, ms=ms, source=source)
+        self.bus.emit("log", message=(f"预设切换 → {name}（{source}，{ms:.2f} ms"
+                                      f"{'' if hot else '，未预载：从磁盘加载'}）"))
+        return True
+
+    def state(self) -> dict:
+        ms = self.last_switch_ms
+        return {"last_ms": None if ms is None else round(ms, 3), "switches": self.switches}
+
+    # ---- 触发源 ----
+
+    def _cfg(self) -> dict:
+        return self.config.current().get("profile_switch", {})
+
+    def _held_keys(self) -> set:
+        gamepad = self.gamepad
+        if gamepad is None:
+            return set()
+        return {gamepad.button_key(i) for i, down in list(gamepad.button_states.items()) if down}
+
+    def _on_gamepad_button(self, index, key):
+        cfg = self._cfg()
+        target = cfg.get("buttons", {}).get(key)
+        if not target:
+            return
+        if not set(cfg.get("combo", [])) <= self._held_keys():
+            return
+        self.switch(target, source="手柄")
+
+    def _on_midi_input(self, data):
+        if len(data) < 2 or data[0] & 0xF0 != 0xC0:
+            return
+        cfg = self._cfg()
+        if not cfg.get("program_change", True):
+            return
+        channel = int(cfg.get("pc_channel", 0) or 0)
+        if channel and (data[0] & 0x0F) + 1 != channel:
+            return
+        program = data[1] & 0x7F
+        name = cfg.get("programs", {}).get(str(program))
+        if name is None:
+            names = self.config.preloaded()
+            if program >= len(names):
+                return
+            name = names[program]
+        self.switch(name, source=f"Program Change {program}")
@@ -0,0 +1,409 @@
+"""配置 schema：校验 profile，并把配置段转换为带槽位的类型化运行时对象。
+
+磁盘上的 JSON 格式不变，本模块只描述各键的类型与取值范围（默认值仍以 config.DEFAULTS 为准）：
+  - validate(config) -> (clean, errors)：逐键检查，错误带完整路径（如 "gamepad.deadzone"、
+    "tools.keyboard_pads.pads[2].note"）。类型错误的值换成默认值，越界数值夹到范围内，
+    未知键原样保留；没有问题的分支保持原对象（结构共享不受影响）。
+    列表元素：按位置对齐的列表（音序器各步）换成 DEFAULTS 同位置的值或 fill，其余列表
+    丢弃该元素；字典值换成 DEFAULTS 中同键的值，没有则删除该键
+  - GamepadSettings / MidiSettings / VirtualMidiSettings / 各工具的 Settings：
+    of(section) 把配置段转换为 __slots__ 对象，属性即转换好的值，热路径直接读属性。
+    同一配置段对象只转换一次（配置只读，修改经 update() 产生新对象）
+"""
+
+import copy
+
+from .core import clamp
+
+_MISSING = object()
+_DROP = object()        # 列表中无法修正的条目：整条丢弃
+
+
+# ---- 值类型 ----
+
+class Int:
+    __slots__ = ("lo", "hi")
+
+    def __init__(self, lo=None, hi=None):
+        self.lo = lo
+        self.hi = hi
+
+    def check(self, value, default, path, errors):
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or \
+                (isinstance(value, float) and not value.is_integer()):
+            errors.append(f"{path}: 应为整数，实际为 {value!r}")
+            return default
+        v = int(value)
+        lo = v if self.lo is None else self.lo
+        hi = v if self.hi is None else self.hi
+        if not lo <= v <= hi:
+            errors.append(f"{path}: 超出范围 {self.lo}..{self.hi}，实际为 {v}")
+            v = clamp(v, lo, hi)
+        return value if v == value and type(value) is int else v
+
+
+class Float:
+    __slots__ = ("lo", "hi")
+
+    def __init__(self, lo=None, hi=None):
+        self.lo = lo
+        self.hi = hi
+
+    def check(self, value, default, path, errors):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            errors.append(f"{path}: 应为数值，实际为 {value!r}")
+            return default
+        v = float(value)
+        lo = v if self.lo is None else self.lo
+        hi = v if self.hi is None else self.hi
+        if not lo <= v <= hi:
+            errors.append(f"{path}: 超出范围 {self.lo}..{self.hi}，实际为 {v}")
+            return float(clamp(v, lo, hi))
+        return value            # JSON 中的整数保持原样，运行时对象里转为 float
+
+    @staticmethod
+    def runtime(value):
+        return float(value)
+
+
+class Bool:
+    __slots__ = ()
+
+    def check(self, value, default, path, errors):
+        if not isinstance(value, bool):
+            errors.append(f"{path}: 应为 true/false，实际为 {value!r}")
+            return default
+        return value
+
+
+class Str:
+    __slots__ = ("choices",)
+
+    def __init__(self, *choices):
+        self.choices = choices
+
+    def check(self, value, default, path, errors):
+        if not isinstance(value, str):
+            errors.append(f"{path}: 应为字符串，实际为 {value!r}")
+            return default
+        if self.choices and value not in self.choices:
+            errors.append(f"{path}: 应为 {' | '.join(self.choices)} 之一，实际为 {value!r}")
+            return default
+        return value
+
+
+class Opt:
+    """可为 null 的值"""
+    __slots__ = ("kind",)
+
+    def __init__(self, kind):
+        self.kind = kind
+
+    def check(self, value, default, path, errors):
+        if value is None:
+            return None
+        return self.kind.check(value, default, path, errors)
+
+
+class Any:
+    __slots__ = ()
+
+    def check(self, value, default, path, errors):
+        return value
+
+
+class List:
+    """列表；item 为元素类型（None 不检查元素）。运行时对象中为元组。
+    给出 fill 时按位置对齐：无效元素换成默认列表同位置的值（超出时为 fill），否则丢弃"""
+    __slots__ = ("item", "fill")
+
+    def __init__(self, item=None, fill=_DROP):
+        self.item = item
+        self.fill = fill
+
+    def _element_default(self, default, i):
+        if self.fill is _DROP:
+            return _DROP
+        if isinstance(default, list) and i < len(default):
+            return default[i]
+        return self.fill
+
+    def check(self, value, default, path, errors):
+        if not isinstance(value, list):
+            errors.append(f"{path}: 应为列表，实际为 {type(value).__name__}")
+            return copy.deepcopy(default)
+        if self.item is None:
+            return value
+        out = None
+        for i, v in enumerate(value):
+            c = self.item.check(v, self._element_default(default, i), f"{path}[{i}]", errors)
+            if c is not v and out is None:
+                out = list(value[:i])
+            if out is not None and c is not _DROP:
+                out.append(c)
+        return value if out is None else out
+
+    @staticmethod
+    def runtime(value):
+        return tuple(value)
+
+
+class Map:
+    """字符串键字典；value 为值类型。无效值换成默认字典中同键的值，没有则删除该键"""
+    __slots__ = ("value",)
+
+    def __init__(self, value=None):
+        self.value = value
+
+    def check(self, value, default, path, errors):
+        if not isinstance(value, dict):
+            errors.append(f"{path}: 应为对象，实际为 {type(value).__name__}")
+            return copy.deepcopy(default)
+        if self.value is None:
+            return value
+        defaults = default if isinstance(default, dict) else {}
+        out = None
+        for k, v in value.items():
+            c = self.value.check(v, defaults.get(k, _DROP), f"{path}.{k}", errors)
+            if c is not v:
+                if out is None:
+                    out = dict(value)
+                if c is _DROP:
+                    del out[k]
+                else:
+                    out[k] = c
+        return value if out is None else out
+
+
+class Record:
+    """列表中的条目对象：只检查出现的键，缺省键由使用方取默认"""
+    __slots__ = ("fields",)
+
+    def __init__(self, **fields):
+        self.fields = fields
+
+    def check(self, value, default, path, errors):
+        if not isinstance(value, dict):
+            errors.append(f"{path}: 应为对象，实际为 {type(value).__name__}")
+            return _DROP
+        return _check_fields(self.fields, value, {}, path, errors)
+
+
+class Section:
+    """嵌套配置段（运行时为对应 Settings 对象）"""
+    __slots__ = ("cls",)
+
+    def __init__(self, cls):
+        self.cls = cls
+
+    def check(self, value, default, path, errors):
+        if not isinstance(value, dict):
+            errors.append(f"{path}: 应为对象，实际为 {type(value).__name__}")
+            return copy.deepcopy(default)
+        return _check_fields(self.cls.FIELDS, value, default or {}, path, errors)
+
+    def runtime(self, value):
+        return self.cls.of(value)
+
+
+def _check_fields(fields, value, defaults, path, errors):
+    out = None
+    for name, kind in fields.items():
+        v = value.get(name, _MISSING)
+        if v is _MISSING:
+            continue
+        c = kind.check(v, defaults.get(name), f"{path}.{name}", errors)
+        if c is not v:
+            if out is None:
+                out = dict(value)
+            if c is None and name not in defaults:
+                del out[name]
+            else:
+                out[name] = c
+    return value if out is None else out
+
+
+# ---- 运行时对象 ----
+
+class Settings:
+    """配置段的类型化视图。子类声明 FIELDS（键 -> 值类型）与 PATH（在 DEFAULTS 中的位置），
+    __slots__ 由 settings_class() 按 FIELDS 生成。"""
+
+    __slots__ = ()
+    FIELDS = {}
+    PATH = ()
+
+    @classmethod
+    def defaults(cls) -> dict:
+        from .config import DEFAULTS     # config 依赖本模块做校验，这里延迟导入
+        node = DEFAULTS
+        for key in cls.PATH:
+            node = node.get(key, {})
+        return node
+
+    @classmethod
+    def build(cls, section: dict):
+        """校验并转换（不缓存）；非法值按默认值处理"""
+        defaults = cls.defaults()
+        clean = _check_fields(cls.FIELDS, section, defaults, ".".join(cls.PATH), [])
+        obj = object.__new__(cls)
+        for name, kind in cls.FIELDS.items():
+            v = clean.get(name, _MISSING)
+            if v is _MISSING:
+                v = defaults.get(name)
+            runtime = getattr(kind, "runtime", None)
+            setattr(obj, name, runtime(v) if runtime is not None and v is not None else v)
+        return obj
+
+    @classmethod
+    def of(cls, section: dict):
+        """同一配置段对象只转换一次"""
+        cached = cls._cache
+        if cached[0] is section:
+            return cached[1]
+        obj = cls.build(section)
+        cls._cache = (section, obj)
+        return obj
+
+    def __repr__(self):
+        body = ", ".join(f"{k}={getattr(self, k)!r}" for k in self.FIELDS)
+        return f"{type(self).__name__}({body})"
+
+
+def settings_class(name: str, path: tuple, **fields):
+    return type(name, (Settings,), {"__slots__": tuple(fields), "FIELDS": fields,
+                                    "PATH": path, "_cache": (None, None)})
+
+
+MIDI_CHANNEL = Int(1, 16)
+NOTE = Int(0, 127)
+CC = Int(0, 127)
+VELOCITY = Int(1, 127)
+BPM = Float(20.0, 400.0)        # 与 Timeline.MIN_BPM/MAX_BPM 一致
+
+ShaperSettings = settings_class(
+    "ShaperSettings", ("midi", "shaper"),
+    enabled=Bool(), tick_ms=Float(0.5, 100.0), bandwidth=Float(0.0))
+
+MidiSettings = settings_class(
+    "MidiSettings", ("midi",),
+    channel=MIDI_CHANNEL, poll_ms=Int(1, 100), cc_min_delta=Int(0, 127),
+    smoothing=Float(0.0, 0.99), output_port=Str(),
+    destinations=List(Record(port=Str(), enabled=Bool(), types=List(Str()),
+                             channels=List(MIDI_CHANNEL), bandwidth=Float(0.0))),
+    shaper=Section(ShaperSettings))
+
+VirtualMidiSettings = settings_class(
+    "VirtualMidiSettings", ("virtual_midi",),
+    enabled=Bool(), port_name=Str(),
+    backend=Str("tevirtualmidi", "windows_midi_services", "alsa_seq", "loopback", "null"),
+    loopback_echo=Bool(), ump_protocol=Str("midi1", "midi2"))
+
+ClockSettings = settings_class(
+    "ClockSettings", ("clock",),
+    mode=Str("internal", "master", "slave"), bpm=BPM)
+
+ProfileSwitchSettings = settings_class(
+    "ProfileSwitchSettings", ("profile_switch",),
+    combo=List(Str()), buttons=Map(Str()), program_change=Bool(),
+    pc_channel=Int(0, 16), programs=Map(Str()))
+
+GamepadSettings = settings_class(
+    "GamepadSettings", ("gamepad",),
+    joystick_id=Int(0), mode=Str("relative", "xy_absolute"),
+    sensitivity=Float(0.0, 100.0), deadzone=Float(0.0, 0.95),
+    curve=Str("linear", "exponential"), curve_exp=Float(0.1, 10.0), invert_y=Bool(),
+    l3_button=Int(-1), r3_button=Int(-1), xy_center_deadzone=Float(0.0, 0.95),
+    sdl_reconcile_hz=Float(0.0, 1000.0),
+    velocity_mode=Str("fixed", "hold", "random"), velocity_fixed=VELOCITY,
+    velocity_min=VELOCITY, velocity_max=VELOCITY,
+    trigger_mode=Str("note", "cc", "velocity"), trigger_cc_lt=CC, trigger_cc_rt=CC,
+    cc_mappings=Map(CC), note_mappings=Map(NOTE))
+
+
+# 音序器各步的列表按步对齐：无效元素换成同位置默认值，超出默认长度时取与 compile_pattern
+# 一致的缺省（关闭、力度 100、gate 0.5、无 CC）
+STEP_LISTS = {"notes": List(NOTE, fill=60), "velocities": List(VELOCITY, fill=100),
+              "gates": List(Float(0.0, 1.0), fill=0.5), "on": List(Bool(), fill=False),
+              "ccs": List(Opt(CC), fill=None)}
+
+
+def _tool(name, tool_id, **fields):
+    return settings_class(name, ("tools", tool_id), enabled=Bool(), **fields)
+
+
+TOOL_SETTINGS = {cls.PATH[1]: cls for cls in (
+    _tool("MouseXYSettings", "mouse_xy", hotkey=List(Str()), cc_x=CC, cc_y=CC,
+          invert_y=Bool()),
+    _tool("ScreenXYPadSettings", "screen_xy_pad", cc_x=CC, cc_y=CC, invert_y=Bool()),
+    _tool("KeyboardPadsSettings", "keyboard_pads", suppress=Bool(),
+          velocity_mode=Str("fixed", "random"), velocity_fixed=VELOCITY,
+          pads=List(Record(key=Str(), note=NOTE))),
+    _tool("ChordArpSettings", "chord_arp", bpm=BPM,
+          pads=List(Record(key=Str(), chord=List(NOTE), arp=Bool(),
+                           arp_mode=Str("up", "down", "updown", "random"),
+                           arp_ms=Int(30, 5000), arp_div=Float(0.0, 32.0),
+                           octaves=Int(1, 4), latch=Bool()))),
+    _tool("HotkeyClipSettings", "hotkey_clip",
+          record=Map(), clips=List(Record(name=Str(), hotkey=Str(), loop=Bool(),
+                                          channel=Opt(MIDI_CHANNEL), file=Str(),
+                                          events=List(Record(type=Str(), t=Float(0.0)))))),
+    _tool("StepSequencerSettings", "step_sequencer", steps=Int(1, 64),
+          bpm=BPM, swing=Float(0.0, 1.0), channel=MIDI_CHANNEL,
+          modulate=Str("none", "note", "cc"), modulate_cc=CC,
+          modulate_source=Str("lx", "ly", "rx", "ry", "lt", "rt"),
+          patterns=List(Record(name=Str(), **STEP_LISTS)),
+          chain=List(Int(0)), pattern_buttons=Map(Any()), **STEP_LISTS),
+    _tool("WheelBendSettings", "wheel_bend", hotkey=List(Str()), mode=Str("pitch", "cc"),
+          cc=CC, step_size=Int(1, 8192)),
+    _tool("MidiMapperSettings", "midi_mapper", rules=List(Record(action=Str()))),
+)}
+
+SECTIONS = {"midi": MidiSettings, "virtual_midi": VirtualMidiSettings,
+            "clock": ClockSettings, "profile_switch": ProfileSwitchSettings,
+            "gamepad": GamepadSettings}
+
+
+def tool_settings(tool_id: str, section: dict):
+    cls = TOOL_SETTINGS.get(tool_id)
+    return cls.of(section) if cls is not None else None
+
+
+def validate(config: dict) -> tuple:
+    """校验整份 profile，返回 (修正后的配置, 错误列表)；无问题时原样返回 config"""
+    from .config import DEFAULTS
+    errors = []
+    out = None
+
+    def put(key, value):
+        nonlocal out
+        if out is None:
+            out = dict(config)
+        out[key] = value
+
+    for key, cls in SECTIONS.items():
+        section = config.get(key, _MISSING)
+        if section is _MISSING:
+            continue
+        clean = Section(cls).check(section, DEFAULTS[key], key, errors)
+        if clean is not section:
+            put(key, clean)
+    tools = config.get("tools", _MISSING)
+    if isinstance(tools, dict):
+        fixed = None
+        for tool_id, cls in TOOL_SETTINGS.items():
+            section = tools.get(tool_id, _MISSING)
+            if section is _MISSING:
+                continue
+            clean = Section(cls).check(section, DEFAULTS["tools"][tool_id],
+                                       f"tools.{tool_id}", errors)
+            if clean is not section:
+                if fixed is None:
+                    fixed = dict(tools)
+                fixed[tool_id] = clean
+        if fixed is not None:
+            put("tools", fixed)
+    elif tools is not _MISSING:
+        errors.append(f"tools: 应为对象，实际为 {type(tools).__name__}")
+        put("tools", copy.deepcopy(DEFAULTS["tools"]))
+    return (config if out is None else out), errors
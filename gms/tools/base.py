@@ -1,8 +1,12 @@
 """工具基类与上下文"""
 
+from ..midi.scheduler import Scheduler
+from ..schema import MidiSettings, tool_settings
+
 
 class ToolContext:
-    def __init__(self, bus, midi, hooks, learn, gamepad, get_config, update_config):
+    def __init__(self, bus, midi, hooks, learn, gamepad, get_config, update_config,
+                 clock=None, scheduler=None):
         self.bus = bus
         self.midi = midi
         self.hooks = hooks
@@ -10,10 +14,36 @@ class ToolContext:
         self.gamepad = gamepad
         self.get_config = get_config
         self.update_config = update_config
+        self.clock = clock      # MidiClock：共享节拍时间线（可为 None）
+        # 中央调度器：工具提交定时事件而不是各自起 sleep 线程
+        self.scheduler = scheduler if scheduler is not None else Scheduler(bus)
+
+    def shared_clock(self):
+        """主/从模式下返回全局时钟；内部模式或无时钟返回 None（工具自由运行）"""
+        clock = self.clock
+        if clock is not None and clock.mode != "internal":
+            return clock
+        return None
+
+    def mod_source(self, name: str):
+        """手柄调制源读取器（逻辑轴 lx/ly/rx/ry/lt/rt，读已发布帧，无锁）；无手柄时恒为 0"""
+        frames = getattr(self.gamepad, "frames", None)
+        if frames is None:
+            return lambda: 0.0
+        return frames.source(name)
 
     def tool_cfg(self, tool_id: str) -> dict:
         return self.get_config()["tools"].get(tool_id, {})
 
+    def default_channel(self) -> int:
+        """当前 profile 的默认 MIDI 通道（1-16）。按住的音符应在按下时记下实际通道，
+        释放时沿用——演奏中切换到通道不同的 profile 也不会卡音"""
+        return MidiSettings.of(self.get_config()["midi"]).channel
+
+    def tool_settings(self, tool_id: str):
+        """工具配置的类型化视图（属性即校验、转换后的值；同一配置段只转换一次）"""
+        return tool_settings(tool_id, self.tool_cfg(tool_id))
+
 
 class Tool:
     """工具基类。id 对应 config.tools 键名。"""
@@ -32,6 +62,11 @@ class Tool:
     def stop(self):
         pass
 
+    def apply_config(self, paths: list) -> bool:
+        """就地应用配置变化（paths 为工具内相对路径元组，() 表示整体替换）。
+        返回 False 时由应用重启本工具。"""
+        return False
+
     def get_state(self) -> dict:
         return {}
 
@@ -1,4 +1,13 @@
-"""和弦 / 琶音器：一键和弦或按速度循环琶音"""
+"""和弦 / 琶音器：一键和弦或按速度循环琶音。
+
+所有按住的琶音键由同一条调度链驱动（_tick）：每次只排一个事件，时刻为各键下一步的
+最早者，到点后依次推进所有到期的键——按住再多键也只占调度器上的一个待发事件。
+  - 步长：pad["arp_div"] 为每拍步数（4 = 十六分音符），速度取全局时钟（主/从模式，
+    步点落在时钟网格上），否则取工具的 bpm；arp_div 为 0 时沿用自由速度 arp_ms
+  - 序列在按下时按 (和弦, 模式, 八度数) 预先生成；随机模式预生成若干轮乱序
+  - latch：按一下开始、再按一下停止，松开不停
+多个键重叠在同一音高时由 MidiEngine 的发声矩阵计数，最后一个释放者才真正发出 note_off。
+"""
 
 import random
 import threading
@@ -6,6 +15,8 @@ import time
 
 from .base import Tool
 
+RANDOM_CYCLES = 8       # 随机模式预生成的乱序轮数
+
 
 class ChordArp(Tool):
     id = "chord_arp"
@@ -15,8 +26,13 @@ class ChordArp(Tool):
 
     def __init__(self, ctx):
         super().__init__(ctx)
-        self.playing = {}   # key -> {"pad":..., "notes": set, "thread":..., "stop": bool}
+        self.playing = {}   # key -> {"pad":..., "notes": set, "channel"}；琶音键另有 seq/idx/next/period
         self._registered = False
+        self._lock = threading.RLock()
+        self._down = set()  # 物理按住的键（过滤自动重复）
+        self._seq_cache = {}
+        self._pads = (None, {})     # (配置视图, 键 -> pad)：配置变化时才重建
+        self._gen = 0       # 调度链代号：重排后旧链上的事件自行作废
 
     def start(self):
         if not self._registered:
@@ -26,10 +42,18 @@ class ChordArp(Tool):
     def stop(self):
         for key in list(self.playing):
             self._release(key)
+        self._down.clear()
+
+    def apply_config(self, paths):
+        # pads 在按键时读取；已按住的键沿用按下时的 pad 直到释放
+        return True
 
     def _on_key(self, ks, pressed):
-        cfg = self.ctx.tool_cfg(self.id)
-        pads = {p["key"]: p for p in cfg.get("pads", [])}
+        cfg = self.ctx.tool_settings(self.id)
+        seen, pads = self._pads
+        if seen is not cfg:
+            pads = {p["key"]: p for p in cfg.pads if "key" in p}
+            self._pads = (cfg, pads)
         if self.ctx.learn.active:
             if self.ctx.learn.target.get("kind") in ("pad_key", "chord_key"):
                 self.ctx.learn.handle(kind="key", key=ks)
@@ -39,62 +63,146 @@ class ChordArp(Tool):
         if pad is None:
             return False
         if ks in pressed:
-            self._press(ks, pad)
+            if ks in self._down:            # 自动重复
+                return False
+            self._down.add(ks)
+            if pad.get("latch") and ks in self.playing:
+                self._release(ks)
+            else:
+                self._press(ks, pad)
         else:
-            self._release(ks)
+            self._down.discard(ks)
+            if not pad.get("latch"):
+                self._release(ks)
         return False
 
+    # ---- 按下 / 释放 ----
+
     def _press(self, key, pad):
-        if key in self.playing:
-            return
-        notes = [int(n) for n in pad.get("chord", [])]
-        arp = bool(pad.get("arp", False))
+        # pad 为校验后的条目（出现的键已是正确类型）；去重：每个音高只开一次，
+        # 释放时与 notes 集合一一对应
+        notes = list(dict.fromkeys(pad.get("chord", ())))
         if not notes:
             return
+        arp = pad.get("arp", False)
+        with self._lock:
+            if key in self.playing:     # 已在发声：不碰调度链
+                return
         if arp:
-            thread = threading.Thread(target=self._arp_loop, args=(key, notes, pad),
-                                      daemon=True, name=f"arp_{key}")
-            self.playing[key] = {"pad": pad, "notes": set(), "thread": thread, "stop": False}
-            thread.start()
-        else:
-            for n in notes:
-                self.ctx.midi.note_on(n, 100)
-            self.playing[key] = {"pad": pad, "notes": set(notes), "thread": None, "stop": False}
-
-    def _arp_loop(self, key, notes, pad):
-        mode = pad.get("arp_mode", "up")
-        ms = max(30, int(pad.get("arp_ms", 120)))
-        idx = 0
-        while True:
-            state = self.playing.get(key)
-            if not state or state.get("stop"):
-                break
-            seq = self._arp_sequence(notes, mode)
-            if not seq:
-                break
-            n = seq[idx % len(seq)]
-            self.ctx.midi.note_on(n, 100)
-            state["notes"].add(n)
-            time.sleep(ms / 1000.0)
-            self.ctx.midi.note_off(n)
-            state["notes"].discard(n)
-            idx += 1
-            time.sleep(0.001)
-
-    @staticmethod
-    def _arp_sequence(notes, mode):
-        if mode == "down":
-            return list(reversed(notes))
-        if mode == "updown":
-            return notes + list(reversed(notes))[1:-1]
-        if mode == "random":
-            return random.sample(notes, len(notes))
-        return notes
+            # cancel 会等待进行中的 _tick，不能在持锁时调用
+            self.ctx.scheduler.cancel(self._owner())
+        with self._lock:
+            if key in self.playing:
+                if arp:
+                    self._reschedule()  # 期间被别处按下：接回刚撤销的调度链
+                return
+            channel = self.ctx.default_channel()    # 按下时的通道，释放与后续琶音步沿用
+            if not arp:
+                for n in notes:
+                    self.ctx.midi.note_on(n, 100, channel=channel)
+                self.playing[key] = {"pad": pad, "notes": set(notes), "channel": channel}
+                return
+            state = {"pad": pad, "notes": set(), "channel": channel, "sounding": None, "idx": 0,
+                     "seq": self._arp_sequence(notes, pad.get("arp_mode", "up"),
+                                               pad.get("octaves", 1))}
+            self._place_first_step(state, pad)
+            self.playing[key] = state
+            self._reschedule()
 
     def _release(self, key):
-        state = self.playing.pop(key, None)
-        if not state:
+        self.ctx.scheduler.cancel(self._owner())
+        with self._lock:
+            state = self.playing.pop(key, None)
+            if state:
+                for n in state.get("notes", set()):
+                    self.ctx.midi.note_off(n, channel=state["channel"])
+            self._reschedule()
+
+    # ---- 时间 ----
+
+    def _owner(self):
+        return (self.id, "tick")
+
+    def _place_first_step(self, state, pad):
+        """确定步长与第一步时刻：跟随全局时钟时对齐到下一个步长网格"""
+        div = pad.get("arp_div", 0)
+        now = time.monotonic()
+        if div <= 0:
+            state["period"] = pad.get("arp_ms", 120) / 1000.0
+            state["next"] = now
+            return
+        clock = self.ctx.shared_clock()
+        if clock is not None and clock.running:
+            state["clock"] = clock
+            state["step_beats"] = 1.0 / div
+            state["beat"] = clock.next_beat(state["step_beats"])
+            state["period"] = clock.beat_seconds() / div
+            state["next"] = clock.time_of_beat(state["beat"])
             return
-        state["stop"] = True
-        for n in state.get("notes", set()):
-            self.ctx.midi.note_off(n)
\ No newline at end of file
+        bpm = self.ctx.tool_settings(self.id).bpm
+        state["period"] = 60.0 / bpm / div
+        state["next"] = now
+
+    @staticmethod
+    def _advance(state):
+        clock = state.get("clock")
+        if clock is not None:
+            state["beat"] += state["step_beats"]
+            t = clock.time_of_beat(state["beat"])
+            if t is not None:
+                state["next"] = t
+                return
+        state["next"] += state["period"]
+
+    def _reschedule(self):
+        """按最早到期的琶音键重新排程唯一的一个 tick（需持有 _lock）"""
+        self._gen += 1
+        due = [s["next"] for s in self.playing.values() if "seq" in s]
+        if due:
+            self.ctx.scheduler.at(min(due), self._tick, self._gen, owner=self._owner())
+
+    def _tick(self, gen):
+        with self._lock:
+            if gen != self._gen:
+                return
+            now = time.monotonic() + self.ctx.scheduler.LOOKAHEAD_S
+            for state in self.playing.values():
+                if "seq" not in state or state["next"] > now:
+                    continue
+                # 先关后开：同一键的上一音先释放
+                prev = state["sounding"]
+                if prev is not None:
+                    state["notes"].discard(prev)
+                    self.ctx.midi.note_off(prev, channel=state["channel"])
+                seq = state["seq"]
+                n = seq[state["idx"] % len(seq)]
+                state["idx"] += 1
+                self.ctx.midi.note_on(n, 100, channel=state["channel"])
+                state["sounding"] = n
+                state["notes"].add(n)
+                self._advance(state)
+            self._reschedule()
+
+    # ---- 序列 ----
+
+    def _arp_sequence(self, notes, mode, octaves=1):
+        octaves = max(1, min(4, int(octaves)))
+        if mode == "random":
+            pool = [n + 12 * o for o in range(octaves) for n in notes]
+            seq = []
+            for _ in range(RANDOM_CYCLES):
+                seq.extend(random.sample(pool, len(pool)))
+            return [n for n in seq if 0 <= n <= 127] or notes
+        cache_key = (tuple(notes), mode, octaves)
+        seq = self._seq_cache.get(cache_key)
+        if seq is None:
+            up = [n + 12 * o for o in range(octaves) for n in notes]
+            up = [n for n in up if 0 <= n <= 127] or notes
+            if mode == "down":
+                seq = list(reversed(up))
+            elif mode == "updown":
+                seq = up + list(reversed(up))[1:-1]
+            else:
+                seq = up
+            self._seq_cache[cache_key] = seq
+        return seq
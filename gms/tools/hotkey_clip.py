@@ -1,9 +1,21 @@
-"""全局热键触发 MIDI Clip：预设事件序列播放 + 表演录制"""
+"""全局热键触发 MIDI Clip：预设事件序列播放 + 表演录制。
+clip 设 "sync": true 且时钟为主/从模式时，在下一拍起播并按整拍长度循环。
+clip 在配置变更（工具启动）时编译为并行数组（compile_clip），播放与循环只移动游标。
+clip 可用 "file" 引用外部 .mid（相对路径基于 CLIPS_DIR），首次触发时才流式读取。
+录制写入预分配类型数组（PerformanceRecorder），停止时按 record 配置抽稀 CC / 量化，
+结果写成 CLIPS_DIR 下的 .mid 并以文件引用加入 clip 列表。"""
 
-import threading
+import math
+import re
+import shutil
 import time
+from collections import Counter
+from pathlib import Path
 
-from ..core import clip_event_times, clip_total_ms
+from ..config import CLIPS_DIR
+from ..core import CompiledClip, compile_clip
+from ..midi.recorder import PerformanceRecorder
+from ..midi.smf import SmfError, check_file, read_clip, write_clip
 from .base import Tool
 
 
@@ -16,15 +28,55 @@ class HotkeyClip(Tool):
     def __init__(self, ctx):
         super().__init__(ctx)
         self._registered = False
-        self._players = {}   # clip名 -> {"thread":..., "stop":..., "notes": set}
-        self._recording = False
-        self._rec_events = []
-        self._rec_start = 0.0
-        self._rec_sub = None
+        self._hotkeys = ()   # 已注册的 (clip名, 热键)
+        self._players = {}   # clip名 -> 播放状态（编译结果、起点、已按下音符）；事件由中央调度器派发
+        self._compiled = {}  # clip名 -> CompiledClip
+        self._recorder = PerformanceRecorder()
+        self._rec_subscribed = False
 
     def start(self):
+        self._compile_all()
         self._sync_hotkeys()
 
+    def _compile_all(self):
+        clips = self.ctx.tool_cfg(self.id).get("clips", [])
+        self._compiled = {}
+        for clip in clips:
+            if not clip.get("file"):       # 外部文件 clip 延迟到首次触发时加载
+                self._compiled_for(clip)
+
+    @staticmethod
+    def _clip_path(clip) -> Path:
+        path = Path(clip["file"]).expanduser()
+        return path if path.is_absolute() else CLIPS_DIR / path
+
+    def _compiled_for(self, clip):
+        """取 clip 的编译结果；事件表对象或外部文件（路径/mtime）变化时重新编译"""
+        name = clip.get("name", "clip")
+        compiled = self._compiled.get(name)
+        if clip.get("file"):
+            path = self._clip_path(clip)
+            try:
+                source = (str(path), path.stat().st_mtime_ns)
+                if compiled is None or compiled.source != source:
+                    compiled = read_clip(path)
+                    compiled.source = source
+            except (OSError, SmfError) as exc:
+                self.ctx.bus.emit("log", message=f"Clip 文件读取失败 {path}: {exc}")
+                return CompiledClip([], [], [], [], 0.0)
+        else:
+            events = clip.get("events", [])
+            if compiled is None or compiled.source is not events:
+                compiled = compile_clip(events)
+        self._compiled[name] = compiled
+        return compiled
+
+    def _current_clip(self, name):
+        for clip in self.ctx.tool_cfg(self.id).get("clips", []):
+            if clip.get("name", "clip") == name:
+                return clip
+        return None
+
     def stop(self):
         for name in list(self._players):
             self._stop_player(name)
@@ -32,12 +84,27 @@ class HotkeyClip(Tool):
 
     def _sync_hotkeys(self):
         if not self._registered:
-            cfg = self.ctx.tool_cfg(self.id)
-            for clip in cfg.get("clips", []):
+            clips = self.ctx.tool_cfg(self.id).get("clips", [])
+            for clip in clips:
                 if clip.get("hotkey"):
                     self.ctx.hooks.add_hotkey(clip["hotkey"], lambda c=clip: self._toggle(c))
+            self._hotkeys = self._hotkey_specs(clips)
             self._registered = True
 
+    @staticmethod
+    def _hotkey_specs(clips):
+        return tuple((c.get("name", "clip"), str(c["hotkey"])) for c in clips if c.get("hotkey"))
+
+    def apply_config(self, paths):
+        """事件表对象未变的 clip 沿用编译结果；热键无法注销，热键集合变化时需重启"""
+        clips = self.ctx.tool_cfg(self.id).get("clips", [])
+        if self._registered and self._hotkey_specs(clips) != self._hotkeys:
+            return False
+        for clip in clips:
+            if not clip.get("file"):
+                self._compiled_for(clip)
+        return True
+
     # ---- 播放 ----
 
     def _toggle(self, clip):
@@ -45,106 +112,172 @@ class HotkeyClip(Tool):
         if name in self._players:
             self._stop_player(name)
         else:
-            self._start_player(name, clip)
+            # 热键闭包持有注册时的 clip；以当前配置中的同名 clip 为准
+            self._start_player(name, self._current_clip(name) or clip)
+
+    def _owner(self, name):
+        return (self.id, name)
 
     def _start_player(self, name, clip):
-        thread = threading.Thread(target=self._play_loop, args=(name, clip),
-                                  daemon=True, name=f"clip_{name}")
-        self._players[name] = {"thread": thread, "stop": False, "notes": set()}
-        thread.start()
-
-    def _play_loop(self, name, clip):
-        events = clip.get("events", [])
-        if not events:
+        compiled = self._compiled_for(clip)
+        if not len(compiled):
             return
-        channel = clip.get("channel")
-        loop = bool(clip.get("loop", False))
+        # clip 指定通道时覆盖全部事件；否则沿用事件自带的通道（SMF/录制），
+        # 不带通道的 profile 事件表使用全局通道。None 表示按事件通道发送
+        channel = clip.get("channel") or (self.ctx.default_channel()
+                                          if compiled.channel is None else None)
+        state = {"clip": clip, "channel": channel,
+                 "compiled": compiled,
+                 "notes": Counter(), "clock": None}    # (音高, 通道) -> 未释放的 note_on 次数
+        clock = self.ctx.shared_clock()
+        if clip.get("sync") and clock is not None:
+            state["clock"] = clock
+            state["start_beat"] = clock.next_beat(1.0)
+            state["bpm"] = clock.bpm
+        else:
+            state["t0"] = time.monotonic()
+        self._players[name] = state
+        self._schedule_event(name, state, 0)
+
+    def _event_time(self, state, t_ms):
+        """clip 内相对毫秒 → 绝对时刻；同步 clip 按本轮起始拍与速度换算（时钟停止时为 None）"""
+        clock = state["clock"]
+        if clock is None:
+            return state["t0"] + t_ms / 1000.0
+        return clock.time_of_beat(state["start_beat"] + t_ms / 60000.0 * state["bpm"])
+
+    def _schedule_event(self, name, state, i):
+        """游标式播放：每次只向调度器提交下一个事件（或本轮结束点）"""
+        compiled = state["compiled"]
+        if i < len(compiled):
+            when = self._event_time(state, compiled.times[i])
+            fn, args = self._fire, (name, state, i)
+        else:
+            when = self._event_time(state, compiled.total_ms)
+            fn, args = self._pass_end, (name, state)
+        owner = self._owner(name)
+        if when is None:
+            # 外部时钟暂停：稍后重试
+            self.ctx.scheduler.after(0.01, self._schedule_event, name, state, i, owner=owner)
+            return
+        self.ctx.scheduler.at(when, fn, *args, owner=owner)
+
+    def _fire(self, name, state, i):
+        """发送游标处的事件，以及同一时刻（或已经到期）的后续事件，再排程下一个"""
+        if self._players.get(name) is not state:
+            return
+        compiled = state["compiled"]
+        times = compiled.times
+        n = len(times)
+        t = times[i]
+        now = time.monotonic()
         while True:
-            state = self._players.get(name)
-            if not state or state["stop"]:
+            self._send_compiled(compiled, i, state)
+            i += 1
+            if i >= n:
                 break
-            schedule = clip_event_times(events)
-            total = clip_total_ms(events)
-            t0 = time.time()
-            for t_ms, ev in schedule:
-                state = self._players.get(name)
-                if not state or state["stop"]:
+            if times[i] != t:
+                when = self._event_time(state, times[i])
+                if when is None or when > now:
                     break
-                wait = t0 + t_ms / 1000.0 - time.time()
-                if wait > 0:
-                    time.sleep(wait)
-                self._send_event(ev, channel, name)
-            remain = t0 + total / 1000.0 - time.time()
-            if remain > 0:
-                time.sleep(remain)
-            state = self._players.get(name)
-            if not state or state["stop"]:
-                break
-            if not loop:
-                self._players.pop(name, None)
-                break
+        self._schedule_event(name, state, i)
+
+    def _pass_end(self, name, state):
+        if self._players.get(name) is not state:
+            return
+        total = state["compiled"].total_ms
+        if not state["clip"].get("loop", False) or total <= 0:
+            self._players.pop(name, None)
+            return
+        clock = state["clock"]
+        if clock is None:
+            state["t0"] += total / 1000.0      # 按上一轮的理论终点续接，不累积延迟
+        else:
+            # 同步 clip 按整拍长度循环
+            state["start_beat"] += max(1, math.ceil(total / 60000.0 * state["bpm"] - 1e-6))
+            state["bpm"] = clock.bpm
+        self._schedule_event(name, state, 0)
 
-    def _send_event(self, ev, channel, name):
-        t = ev.get("type")
-        if t == "note_on":
-            self.ctx.midi.note_on(int(ev["note"]), int(ev.get("velocity", 100)), channel=channel)
-            self._players[name]["notes"].add(int(ev["note"]))
-        elif t == "note_off":
-            self.ctx.midi.note_off(int(ev["note"]), channel=channel)
-            self._players[name]["notes"].discard(int(ev["note"]))
-        elif t == "control_change":
-            self.ctx.midi.cc(int(ev["control"]), int(ev.get("value", 0)), channel=channel)
+    def _send_compiled(self, compiled, i, state):
+        status, d1, d2 = compiled.status[i], compiled.data1[i], compiled.data2[i]
+        kind = status & 0xF0
+        channel = state["channel"] or (status & 0x0F) + 1
+        midi = self.ctx.midi
+        if kind == 0x90:
+            midi.note_on(d1, d2, channel=channel)
+            state["notes"][(d1, channel)] += 1
+        elif kind == 0x80:
+            midi.note_off(d1, channel=channel)
+            notes = state["notes"]
+            key = (d1, channel)
+            if notes[key] > 1:
+                notes[key] -= 1
+            else:
+                notes.pop(key, None)
+        elif kind == 0xB0:
+            midi.cc(d1, d2, channel=channel)
+        elif kind == 0xE0:
+            midi.pitch_bend(((d2 << 7) | d1) - 8192, channel=channel)
 
     def _stop_player(self, name):
         state = self._players.pop(name, None)
         if not state:
             return
-        state["stop"] = True
-        for note in state["notes"]:
-            self.ctx.midi.note_off(note)
+        self.ctx.scheduler.cancel(self._owner(name))
+        # 同音高重叠的 note_on 各占一次引用：每个未释放的 note_on 补一个 note_off
+        for (note, channel), count in state["notes"].items():
+            for _ in range(count):
+                self.ctx.midi.note_off(note, channel=channel)
 
     # ---- 录制 ----
 
     def _stop_record_silent(self):
-        self._recording = False
-        if self._rec_sub:
-            self.ctx.bus.unsubscribe("midi.event", self._rec_sub)
-            self._rec_sub = None
+        self._recorder.stop()
+        if self._rec_subscribed:
+            self.ctx.bus.unsubscribe("midi.event", self._recorder.on_event)
+            self._rec_subscribed = False
 
-    def _record_events(self, type, channel, fields):
-        if type not in ("note_on", "note_off", "control_change", "pitchwheel"):
+    def _record_start(self):
+        if self._recorder.recording:
+            return
+        self._recorder.start()
+        if not self._rec_subscribed:
+            self.ctx.bus.subscribe("midi.event", self._recorder.on_event)
+            self._rec_subscribed = True
+
+    def _record_stop(self, cfg):
+        """停止录制：后处理后写成 .mid，clip 列表只保存文件引用"""
+        if not self._recorder.recording:
+            return
+        self._stop_record_silent()
+        rec = cfg.get("record", {})
+        quantize = float(rec.get("quantize", 0) or 0)
+        grid_ms = 0.0
+        if quantize > 0:
+            clock = self.ctx.shared_clock()
+            bpm = clock.bpm if clock is not None else float(rec.get("bpm", 120.0))
+            grid_ms = 60000.0 / bpm / quantize
+        compiled = self._recorder.to_clip(thin_ms=float(rec.get("thin_cc_ms", 0) or 0),
+                                          thin_delta=int(rec.get("thin_cc_delta", 0) or 0),
+                                          quantize_ms=grid_ms)
+        clips = list(cfg.get("clips", []))
+        name = "录制 " + str(len(clips) + 1)
+        path = self._unique_clip_file(name)
+        try:
+            write_clip(path, compiled)
+        except (OSError, SmfError) as exc:
+            self.ctx.bus.emit("log", message=f"保存录制失败 {path}: {exc}")
             return
-        t_ms = int((time.time() - self._rec_start) * 1000)
-        if type == "note_on":
-            self._rec_events.append({"type": type, "note": fields["note"],
-                                     "velocity": fields.get("velocity", 100), "t": t_ms})
-        elif type == "note_off":
-            self._rec_events.append({"type": type, "note": fields["note"], "t": t_ms})
-        elif type == "control_change":
-            self._rec_events.append({"type": type, "control": fields["control"],
-                                     "value": fields["value"], "t": t_ms})
-        elif type == "pitchwheel":
-            self._rec_events.append({"type": type, "pitch": fields["pitch"], "t": t_ms})
+        clips.append({"name": name, "hotkey": "", "loop": False, "channel": None,
+                      "file": path.name})
+        self.ctx.update_config({"tools": {self.id: {"clips": clips}}})
 
     def action(self, name: str, payload: dict) -> dict:
         cfg = self.ctx.tool_cfg(self.id)
         if name == "record_start":
-            if not self._recording:
-                self._recording = True
-                self._rec_events = []
-                self._rec_start = time.time()
-                self._rec_sub = self.ctx.bus.subscribe("midi.event", self._record_events)
+            self._record_start()
         elif name == "record_stop":
-            if self._recording:
-                self._recording = False
-                if self._rec_sub:
-                    self.ctx.bus.unsubscribe("midi.event", self._rec_sub)
-                    self._rec_sub = None
-                events = self._rec_events
-                clips = list(cfg.get("clips", []))
-                clips.append({"name": "录制 " + str(len(clips) + 1), "hotkey": "",
-                              "loop": False, "channel": None, "events": events})
-                self.ctx.update_config({"tools": {self.id: {"clips": clips}}})
+            self._record_stop(cfg)
         elif name == "play":
             for clip in cfg.get("clips", []):
                 if clip.get("name") == payload.get("name"):
@@ -152,10 +285,71 @@ class HotkeyClip(Tool):
         elif name == "stop_all":
             for cname in list(self._players):
                 self._stop_player(cname)
+        elif name == "import_smf":
+            self._import_smf(payload, cfg)
+        elif name == "export_smf":
+            self._export_smf(payload, cfg)
         return self.get_state()
 
+    # ---- SMF 导入 / 导出 ----
+
+    @staticmethod
+    def _file_name(name: str) -> str:
+        return (re.sub(r'[\\/:*?"<>|\s]+', "_", name).strip("._") or "clip") + ".mid"
+
+    def _unique_clip_file(self, name: str) -> Path:
+        CLIPS_DIR.mkdir(parents=True, exist_ok=True)
+        path = CLIPS_DIR / self._file_name(name)
+        n = 2
+        while path.exists():
+            path = path.with_name(f"{path.stem.rsplit('~', 1)[0]}~{n}.mid")
+            n += 1
+        return path
+
+    def _import_smf(self, payload, cfg):
+        """复制 .mid 到 CLIPS_DIR 并以文件引用加入 clip 列表（导入时只流式校验一遍，
+        事件在触发时再加载）"""
+        src = Path(str(payload.get("path", ""))).expanduser()
+        try:
+            check_file(src)
+        except (OSError, SmfError) as exc:
+            self.ctx.bus.emit("log", message=f"导入 MIDI 文件失败 {src}: {exc}")
+            return
+        clips = list(cfg.get("clips", []))
+        name = str(payload.get("name") or src.stem)
+        dest = self._unique_clip_file(name)
+        shutil.copyfile(src, dest)
+        clips.append({"name": name, "hotkey": str(payload.get("hotkey", "")),
+                      "loop": bool(payload.get("loop", False)), "channel": None,
+                      "file": dest.name})
+        self.ctx.update_config({"tools": {self.id: {"clips": clips}}})
+
+    def _export_smf(self, payload, cfg):
+        """导出 clip 为 SMF。link=True 时写入 CLIPS_DIR 并把 clip 改为文件引用（移出 profile）"""
+        clips = list(cfg.get("clips", []))
+        index = next((i for i, c in enumerate(clips) if c.get("name") == payload.get("name")),
+                     None)
+        if index is None:
+            return
+        clip = clips[index]
+        compiled = self._compiled_for(clip)
+        link = bool(payload.get("link", False))
+        path = (self._unique_clip_file(clip.get("name", "clip")) if link
+                else Path(str(payload.get("path", ""))).expanduser())
+        try:
+            write_clip(path, compiled, clip.get("channel"),
+                       fmt=int(payload.get("format", 0)))
+        except (OSError, SmfError) as exc:
+            self.ctx.bus.emit("log", message=f"导出 MIDI 文件失败 {path}: {exc}")
+            return
+        if link:
+            linked = {k: v for k, v in clip.items() if k != "events"}
+            linked["file"] = path.name
+            clips[index] = linked
+            self.ctx.update_config({"tools": {self.id: {"clips": clips}}})
+
     def get_state(self) -> dict:
         return {
             "playing": [name for name in self._players],
-            "recording": self._recording,
+            "recording": self._recorder.recording,
         }
\ No newline at end of file
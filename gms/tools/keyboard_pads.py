@@ -11,8 +11,9 @@ class KeyboardPads(Tool):
 
     def __init__(self, ctx):
         super().__init__(ctx)
-        self.held = {}  # key -> note
+        self.held = {}  # key -> (note, channel)：在按下时的通道上释放
         self._registered = False
+        self._pads = (None, {})     # (配置视图, 键 -> pad)：配置变化时才重建
 
     def start(self):
         if not self._registered:
@@ -20,13 +21,19 @@ class KeyboardPads(Tool):
             self._registered = True
 
     def stop(self):
-        for note in list(self.held.values()):
-            self.ctx.midi.note_off(note)
+        for note, channel in list(self.held.values()):
+            self.ctx.midi.note_off(note, channel=channel)
         self.held.clear()
 
+    def apply_config(self, paths):
+        return True     # 映射在按键时读取
+
     def _on_key(self, ks, pressed):
-        cfg = self.ctx.tool_cfg(self.id)
-        pads = {p["key"]: p for p in cfg.get("pads", [])}
+        cfg = self.ctx.tool_settings(self.id)
+        seen, pads = self._pads
+        if seen is not cfg:
+            pads = {p["key"]: p for p in cfg.pads if "key" in p}
+            self._pads = (cfg, pads)
         if self.ctx.learn.active:
             if self.ctx.learn.target.get("kind") in ("pad_key", "chord_key"):
                 self.ctx.learn.handle(kind="key", key=ks)
@@ -36,19 +43,21 @@ class KeyboardPads(Tool):
         if pad is None:
             return False
         if ks in pressed:
+            if ks in self.held:         # 自动重复：音符已按下
+                return cfg.suppress
             note = int(pad["note"])
-            self.held[ks] = note
+            channel = self.ctx.default_channel()
+            self.held[ks] = (note, channel)
             vel = self._velocity(cfg)
-            self.ctx.midi.note_on(note, vel)
+            self.ctx.midi.note_on(note, vel, channel=channel)
         else:
-            note = self.held.pop(ks, None)
-            if note is not None:
-                self.ctx.midi.note_off(note)
-        return bool(cfg.get("suppress", False))
+            held = self.held.pop(ks, None)
+            if held is not None:
+                self.ctx.midi.note_off(held[0], channel=held[1])
+        return cfg.suppress
 
     def _velocity(self, cfg) -> int:
-        mode = cfg.get("velocity_mode", "fixed")
-        if mode == "random":
+        if cfg.velocity_mode == "random":
             import random
             return random.randint(40, 127)
-        return int(cfg.get("velocity_fixed", 100))
\ No newline at end of file
+        return cfg.velocity_fixed
\ No newline at end of file
@@ -1,4 +1,5 @@
-"""MIDI 映射层：虚拟输入端口 → 规则链 → 输出端口（中间件）"""
+"""MIDI 映射层：虚拟输入端口 → 规则链 → 输出端口（中间件）。
+规则在启动与 rules 配置变化时取一次快照，收到消息时不再查配置。"""
 
 from ..core import apply_mapper_rules
 from .base import Tool
@@ -12,21 +13,33 @@ class MidiMapper(Tool):
 
     def __init__(self, ctx):
         super().__init__(ctx)
-        self._sub = None
+        self._subscribed = False
+        self._rules = ()
         self.routed = 0
 
     def start(self):
-        if self._sub is None:
-            self._sub = self.ctx.bus.subscribe("midi.input", self._on_input)
+        self._compile_rules()
+        if not self._subscribed:
+            self.ctx.bus.subscribe("midi.input", self._on_input)
+            self._subscribed = True
 
     def stop(self):
-        if self._sub is not None:
-            self.ctx.bus.unsubscribe("midi.input", self._sub)
-            self._sub = None
+        if self._subscribed:
+            self.ctx.bus.unsubscribe("midi.input", self._on_input)
+            self._subscribed = False
+
+    def apply_config(self, paths):
+        if any(p[:1] in ((), ("rules",)) for p in paths):
+            self._compile_rules()
+        return True
+
+    def _compile_rules(self):
+        """过滤掉无 action 的规则并冻结为元组（规则对象本身只读，可直接共享）"""
+        rules = self.ctx.tool_cfg(self.id).get("rules", [])
+        self._rules = tuple(r for r in rules if isinstance(r, dict) and r.get("action"))
 
     def _on_input(self, data: bytes):
-        cfg = self.ctx.tool_cfg(self.id)
-        rules = cfg.get("rules", [])
+        rules = self._rules
         try:
             import mido
             msg = mido.Message.from_bytes(bytes(data))
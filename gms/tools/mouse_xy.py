@@ -33,24 +33,26 @@ class MouseXY(Tool):
             self._thread.join(timeout=1.0)
             self._thread = None
 
+    def apply_config(self, paths):
+        return True     # 采样线程每轮读取配置
+
     def _loop(self):
         while not self._stop.is_set():
             try:
-                cfg = self.ctx.tool_cfg(self.id)
-                hotkey = cfg.get("hotkey", ["ctrl", "alt"])
-                active = self.ctx.hooks.is_active(hotkey)
+                cfg = self.ctx.tool_settings(self.id)
+                active = self.ctx.hooks.is_active(cfg.hotkey)
                 if active:
                     x, y = get_cursor_pos()
                     w, h = get_screen_size()
                     cx = int(round(clamp(x / max(1, w) * 127, 0, 127)))
                     cy_raw = y / max(1, h) * 127
-                    if cfg.get("invert_y", True):
+                    if cfg.invert_y:
                         cy_raw = 127 - cy_raw
                     cy = int(round(clamp(cy_raw, 0, 127)))
                     if self._last != (cx, cy):
                         self._last = (cx, cy)
-                        self.ctx.midi.cc_smoothed(int(cfg.get("cc_x", 5)), cx)
-                        self.ctx.midi.cc_smoothed(int(cfg.get("cc_y", 6)), cy)
+                        self.ctx.midi.cc_smoothed(cfg.cc_x, cx)
+                        self.ctx.midi.cc_smoothed(cfg.cc_y, cy)
                     self._active = True
                 else:
                     self._active = False
@@ -15,16 +15,19 @@ class ScreenXYPad(Tool):
         self.x = 64
         self.y = 64
 
+    def apply_config(self, paths):
+        return True
+
     def action(self, name: str, payload: dict) -> dict:
-        cfg = self.ctx.tool_cfg(self.id)
+        cfg = self.ctx.tool_settings(self.id)
         if name == "set_xy":
             self.x = int(round(clamp(payload.get("x", 64), 0, 127)))
             y_raw = int(round(clamp(payload.get("y", 64), 0, 127)))
             self.y = y_raw
-            if cfg.get("invert_y", True):
+            if cfg.invert_y:
                 y_raw = 127 - y_raw
-            self.ctx.midi.cc_smoothed(int(cfg.get("cc_x", 7)), self.x)
-            self.ctx.midi.cc_smoothed(int(cfg.get("cc_y", 8)), y_raw)
+            self.ctx.midi.cc_smoothed(cfg.cc_x, self.x)
+            self.ctx.midi.cc_smoothed(cfg.cc_y, y_raw)
         return self.get_state()
 
     def get_state(self) -> dict:
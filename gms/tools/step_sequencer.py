@@ -1,12 +1,26 @@
-"""步进音序器：8/16/32 步循环，支持摇杆实时调制"""
+"""步进音序器：8/16/32 步循环，支持摇杆实时调制（经手柄帧发布读取调制源，不跨线程访问适配器）。
+时钟为主/从模式时跟随全局 MIDI 时钟，否则按自身 bpm 自由运行。
+步进与 note_off 都作为定时事件提交给中央调度器：每步时刻由网格节拍位置换算（含 swing），
+note_off 时刻由该步的理论时刻加 gate 得出，二者互不阻塞，迟到与发送耗时不会累积。
 
-import threading
+Pattern 库：第 0 个 pattern 为工具配置顶层的 notes/velocities/gates/on/ccs（界面编辑的那一组），
+其后依次为 cfg["patterns"]。全部预编译为 CompiledPattern，切换只改下标：
+  - select_pattern / next_pattern / prev_pattern 排队，在下一小节（第 0 步）生效
+  - chain：按列表循环串联 pattern，每小节前进一格；运行时设置不写入 profile
+  - pattern_buttons：手柄按钮（gamepad.button 事件）→ "next" / "prev" / pattern 下标"""
 
-from ..core import sequencer_step_duration_ms, gate_duration_ms, clamp
+import time
+from collections import deque
+
+from ..core import (compile_pattern, pattern_source, sequencer_step_duration_ms,
+                    sequencer_step_offset_beats, gate_duration_ms, clamp)
+from ..midi.clock import Timeline
 from .base import Tool
 
 
 class StepSequencer(Tool):
+    MEASURE_WINDOW = 33     # 速度测量窗口：最近的无 swing 偏移步（实际派发时刻）
+
     id = "step_sequencer"
     title = "步进音序器"
     category = "序列工具"
@@ -14,17 +28,44 @@ class StepSequencer(Tool):
 
     def __init__(self, ctx):
         super().__init__(ctx)
-        self._thread = None
-        self._stop = threading.Event()
         self.playing = False
         self.step = -1
-        self._notes_on = set()
+        self._notes_on = set()          # 已发声的 (音符, 通道)：停止时在原通道释放
+        self._timeline_obj = None
+        self._shared = False
+        self._epoch = None
+        self._grid = 0.0
+        self._marks = deque(maxlen=self.MEASURE_WINDOW)   # (网格节拍, 实际时刻)
+        self._late_max_ms = 0.0
+        self._bank = []          # CompiledPattern 列表
+        self._current = 0        # 正在播放的 pattern 下标
+        self._queued = None      # 下一小节切换到的下标
+        self._chain = None       # 运行时串联（None = 使用配置 chain）
+        self._chain_pos = 0
+        self._bar_started = False
+        self._subscribed = False
+        self._mod = None         # 调制源读取器（播放开始时按配置解析）
 
     def start(self):
-        pass  # 由 UI 播放按钮启动
+        # 播放由 UI 播放按钮启动；这里预编译 pattern 库并接收手柄按钮
+        self._compile_bank(self.ctx.tool_cfg(self.id))
+        if not self._subscribed:
+            self.ctx.bus.subscribe("gamepad.button", self._on_gamepad_button)
+            self._subscribed = True
 
     def stop(self):
         self._stop_playback()
+        if self._subscribed:
+            self.ctx.bus.unsubscribe("gamepad.button", self._on_gamepad_button)
+            self._subscribed = False
+
+    def apply_config(self, paths):
+        """就地应用：pattern 库按字段对象身份只重编译变化者，调制源下次读取时重新解析；
+        bpm/steps/swing 等每步读取，无需处理"""
+        self._compile_bank(self.ctx.tool_cfg(self.id))
+        if any(p[:1] in ((), ("modulate_source",)) for p in paths):
+            self._mod = None
+        return True
 
     # ---- 播放控制 ----
 
@@ -36,91 +77,233 @@ class StepSequencer(Tool):
             self._stop_playback()
         elif name == "toggle_step":
             self._toggle_step(int(payload.get("index", 0)))
+        elif name == "select_pattern":
+            self.select_pattern(int(payload.get("index", 0)))
+        elif name == "next_pattern":
+            self.select_pattern(self._target_index() + 1)
+        elif name == "prev_pattern":
+            self.select_pattern(self._target_index() - 1)
+        elif name == "chain":
+            chain = payload.get("chain")
+            self._chain = None if chain is None else [int(i) for i in chain]
+            self._chain_pos = 0
         elif name == "set_mod":
             pass  # 调制值直接实时读摇杆
         return self.get_state()
 
     def _start_playback(self):
-        if self._thread:
+        if self.playing:
             return
         self.playing = True
-        self._stop.clear()
-        self._thread = threading.Thread(target=self._loop, daemon=True, name="sequencer")
-        self._thread.start()
+        self._timeline_obj, self._shared = self._timeline(self.ctx.tool_cfg(self.id))
+        # 私有时间线从第 0 步立即开始；共享时钟则对齐到它的下一个网格位置
+        self._epoch = None if self._shared else self._timeline_obj.epoch
+        self._grid = 0.0
+        self._marks.clear()
+        self._late_max_ms = 0.0
+        self.step = 0
+        cfg = self.ctx.tool_cfg(self.id)
+        self._compile_bank(cfg)
+        chain = self._active_chain(cfg)
+        if chain:
+            self._chain_pos = 0
+            self._current = chain[0]
+        if self._queued is not None:
+            self._current, self._queued = self._queued, None
+        self._bar_started = False
+        self._mod = None
+        self._schedule_next()
 
     def _stop_playback(self):
         self.playing = False
-        self._stop.set()
-        if self._thread:
-            self._thread.join(timeout=1.0)
-            self._thread = None
+        self.ctx.scheduler.cancel(self.id)
         self.step = -1
-        for n in self._notes_on:
-            self.ctx.midi.note_off(n)
+        for n, channel in self._notes_on:
+            self.ctx.midi.note_off(n, channel=channel)
         self._notes_on.clear()
         self.ctx.bus.emit("sequencer.state", playing=False, step=-1)
 
-    # ---- 主循环 ----
+    # ---- Pattern 库 ----
 
-    def _loop(self):
-        cfg = self.ctx.tool_cfg(self.id)
+    def _pattern_dicts(self, cfg):
+        return [cfg] + list(cfg.get("patterns", []))
+
+    def _compile_bank(self, cfg):
+        """编译全部 pattern；字段列表对象未变的沿用旧结果"""
         steps = int(cfg.get("steps", 16))
-        self.step = 0
-        while not self._stop.is_set():
-            cfg = self.ctx.tool_cfg(self.id)
-            steps = int(cfg.get("steps", steps))
-            step_ms = sequencer_step_duration_ms(float(cfg.get("bpm", 120)), steps,
-                                                 float(cfg.get("swing", 0.0)), self.step)
-            self._play_step(self.step, cfg)
-            self.ctx.bus.emit("sequencer.state", playing=True, step=self.step)
-            self._stop.wait(step_ms / 1000.0)
-            self.step = (self.step + 1) % steps
-
-    def _play_step(self, idx, cfg):
-        channel = cfg.get("channel")
-        on = cfg.get("on", [])[idx] if idx < len(cfg.get("on", [])) else False
-        if not on:
+        old = self._bank
+        bank = []
+        for i, pattern in enumerate(self._pattern_dicts(cfg)):
+            if i < len(old) and old[i].source == pattern_source(pattern, steps):
+                bank.append(old[i])
+            else:
+                bank.append(compile_pattern(pattern, steps))
+        self._bank = bank
+        if self._current >= len(bank):
+            self._current = 0
+
+    def _pattern_for(self, cfg, index):
+        """取当前 pattern；界面编辑过（字段列表对象变化）时只重编译这一个"""
+        patterns = self._pattern_dicts(cfg)
+        if not 0 <= index < len(patterns):
+            index = 0
+        steps = int(cfg.get("steps", 16))
+        if index >= len(self._bank) or len(self._bank) != len(patterns):
+            self._compile_bank(cfg)
+        elif self._bank[index].source != pattern_source(patterns[index], steps):
+            self._bank[index] = compile_pattern(patterns[index], steps)
+        return self._bank[index]
+
+    def _active_chain(self, cfg):
+        chain = self._chain if self._chain is not None else cfg.get("chain", [])
+        count = len(self._bank)
+        return [int(i) for i in chain if 0 <= int(i) < count]
+
+    def _target_index(self):
+        return self._queued if self._queued is not None else self._current
+
+    def select_pattern(self, index):
+        """排队切换（越界循环）；播放中在下一小节生效，停止时立即生效"""
+        count = len(self._bank) or 1
+        index %= count
+        if self.playing:
+            self._queued = index
+        else:
+            self._current, self._queued = index, None
+
+    def _on_gamepad_button(self, index, key, **_):
+        binding = self.ctx.tool_cfg(self.id).get("pattern_buttons", {}).get(key)
+        if binding is None:
             return
-        notes = cfg.get("notes", [])
-        if idx >= len(notes):
+        if binding == "next":
+            self.select_pattern(self._target_index() + 1)
+        elif binding == "prev":
+            self.select_pattern(self._target_index() - 1)
+        else:
+            self.select_pattern(int(binding))
+
+    def _bar_boundary(self, cfg):
+        """小节起点：应用排队的切换，否则按串联前进"""
+        if self._queued is not None:
+            self._current, self._queued = self._queued, None
+            chain = self._active_chain(cfg)
+            if self._current in chain:
+                self._chain_pos = chain.index(self._current)
             return
-        note = int(notes[idx])
-        vels = cfg.get("velocities", [])
-        vel = int(vels[idx]) if idx < len(vels) else 100
-        gates = cfg.get("gates", [])
-        gate = float(gates[idx]) if idx < len(gates) else 0.5
+        chain = self._active_chain(cfg)
+        if chain:
+            self._chain_pos = (self._chain_pos + 1) % len(chain)
+            self._current = chain[self._chain_pos]
 
-        modulate = cfg.get("modulate", "none")
+    # ---- 排程 ----
+
+    def _timeline(self, cfg):
+        """主/从模式跟随全局时钟（主模式未运行时启动它）；内部模式使用私有时间线"""
+        clock = self.ctx.shared_clock()
+        if clock is not None:
+            if clock.mode == "master" and not clock.running:
+                clock.start()
+            return clock, True
+        return Timeline(float(cfg.get("bpm", 120))), False
+
+    def _schedule_next(self):
+        """计算下一个网格位置的绝对时刻并提交给调度器"""
+        if not self.playing:
+            return
+        # 配置只在步边界读取一次，本步内（含 note_off）都使用这份类型化视图
+        cfg = self.ctx.tool_cfg(self.id)
+        settings = self.ctx.tool_settings(self.id)
+        steps = settings.steps
+        base = 4.0 / steps
+        timeline = self._timeline_obj
+        if not self._shared:
+            timeline.set_bpm(settings.bpm)
+        if timeline.epoch != self._epoch:
+            # 开始/定位：对齐到下一个网格位置
+            self._epoch = timeline.epoch
+            self._grid = timeline.next_beat(base)
+            self._marks.clear()
+        self.step = round(self._grid / base) % steps
+        if self.step == 0:
+            if self._bar_started:
+                self._bar_boundary(cfg)
+            self._bar_started = True
+        pattern = self._pattern_for(cfg, self._current)
+        # 按节拍位置排程（而非累加 sleep）：swing 只偏移本步，不累积误差
+        offset = sequencer_step_offset_beats(steps, settings.swing, self.step)
+        when = timeline.time_of_beat(self._grid + offset)
+        if when is None:
+            # 外部时钟暂停：稍后重试
+            self.ctx.scheduler.after(0.01, self._schedule_next, owner=self.id)
+            return
+        self.ctx.scheduler.at(when, self._fire_step, self.step, base, settings, pattern, when,
+                              offset == 0, owner=self.id)
+
+    def _fire_step(self, idx, base, settings, pattern, when, on_grid):
+        if not self.playing:
+            return
+        now = time.monotonic()
+        self._late_max_ms = max(self._late_max_ms, (now - when) * 1000.0)
+        if on_grid:
+            self._marks.append((self._grid, now))
+        self._play_step(idx, settings, pattern, self._timeline_obj.bpm, when)
+        self.ctx.bus.emit("sequencer.state", playing=True, step=idx)
+        self._grid += base
+        self._schedule_next()
+
+    def measured_bpm(self):
+        """由实际派发时刻测得的速度（窗口内首末两步的节拍差 / 时间差）"""
+        if len(self._marks) < 2:
+            return None
+        (b0, t0), (b1, t1) = self._marks[0], self._marks[-1]
+        if t1 <= t0:
+            return None
+        return (b1 - b0) * 60.0 / (t1 - t0)
+
+    def _play_step(self, idx, settings, pattern, bpm=None, when=None):
+        channel = settings.channel
+        if idx >= len(pattern) or not pattern.on[idx]:
+            return
+        note = pattern.notes[idx]
+        vel = pattern.velocities[idx]
+        gate = pattern.gates[idx]
+
+        modulate = settings.modulate
         if modulate == "note":
             note = int(clamp(note + round(self._read_stick() * 12), 0, 127))
         elif modulate == "cc":
             mod = self._read_stick()
-            self.ctx.midi.cc(int(cfg.get("modulate_cc", 74)),
+            self.ctx.midi.cc(settings.modulate_cc,
                              int(round(clamp(64 + mod * 63, 0, 127))), channel=channel)
 
-        step_ms = sequencer_step_duration_ms(float(cfg.get("bpm", 120)), len(cfg.get("on", [16])),
-                                             float(cfg.get("swing", 0.0)), idx)
+        if bpm is None:
+            bpm = settings.bpm
+        if when is None:
+            when = time.monotonic()
+        step_ms = sequencer_step_duration_ms(bpm, settings.steps, settings.swing, idx)
         dur_ms = gate_duration_ms(step_ms, gate)
         self.ctx.midi.note_on(note, vel, channel=channel)
-        self._notes_on.add(note)
-        self._stop.wait(dur_ms / 1000.0)
-        if self._stop.is_set():
-            return
-        self.ctx.midi.note_off(note, channel=channel)
-        self._notes_on.discard(note)
+        self._notes_on.add((note, channel))
+        step_cc = pattern.ccs[idx] if pattern.ccs[idx] >= 0 else None
+        # gate 终点从本步理论时刻算起，与步进推进相互独立
+        self.ctx.scheduler.at(when + dur_ms / 1000.0, self._step_off, note, channel, step_cc,
+                              owner=self.id)
 
-        ccs = cfg.get("ccs", [])
-        if idx < len(ccs) and ccs[idx] is not None:
-            self.ctx.midi.cc(int(ccs[idx]), 64, channel=channel)
+    def _step_off(self, note, channel, step_cc):
+        self.ctx.midi.note_off(note, channel=channel)
+        self._notes_on.discard((note, channel))
+        if step_cc is not None:
+            self.ctx.midi.cc(int(step_cc), 64, channel=channel)
 
     def _read_stick(self) -> float:
-        gp = self.ctx.gamepad
-        if gp and gp.joystick is not None:
+        if self._mod is None:
             try:
-                return gp.joystick.get_axis(0)
-            except Exception:
-                return 0.0
-        return 0.0
+                self._mod = self.ctx.mod_source(
+                    self.ctx.tool_cfg(self.id).get("modulate_source", "lx"))
+            except ValueError as exc:
+                self.ctx.bus.emit("log", message=f"音序器调制源无效：{exc}")
+                self._mod = self.ctx.mod_source("lx")
+        return self._mod()
 
     def _toggle_step(self, idx):
         cfg = self.ctx.tool_cfg(self.id)
@@ -131,5 +314,16 @@ class StepSequencer(Tool):
 
     def get_state(self) -> dict:
         cfg = self.ctx.tool_cfg(self.id)
-        return {"playing": self.playing, "step": self.step,
-                "bpm": cfg.get("bpm", 120), "steps": cfg.get("steps", 16)}
\ No newline at end of file
+        state = {"playing": self.playing, "step": self.step,
+                 "bpm": cfg.get("bpm", 120), "steps": cfg.get("steps", 16),
+                 "pattern": self._current, "queued": self._queued,
+                 "patterns": [p.name or str(i) for i, p in enumerate(self._bank)],
+                 "chain": self._active_chain(cfg), "chain_pos": self._chain_pos,
+                 "bpm_measured": None, "bpm_error": None,
+                 "late_max_ms": round(self._late_max_ms, 3)}
+        measured = self.measured_bpm() if self.playing else None
+        if measured is not None:
+            target = self._timeline_obj.bpm
+            state["bpm_measured"] = round(measured, 3)
+            state["bpm_error"] = round(measured - target, 3)
+        return state
\ No newline at end of file
@@ -25,17 +25,20 @@ class WheelBend(Tool):
         self.pitch = 0
         self.cc_value = 64
 
+    def apply_config(self, paths):
+        return True     # 每次滚动读取配置
+
     def _on_scroll(self, dy):
-        cfg = self.ctx.tool_cfg(self.id)
-        if not self.ctx.hooks.is_active(cfg.get("hotkey", ["ctrl", "shift"])):
+        cfg = self.ctx.tool_settings(self.id)
+        if not self.ctx.hooks.is_active(cfg.hotkey):
             return
         step = 1 if dy > 0 else -1
-        if cfg.get("mode", "pitch") == "pitch":
-            self.pitch = pitch_bend_from_wheel(step, int(cfg.get("step_size", 341)), self.pitch)
+        if cfg.mode == "pitch":
+            self.pitch = pitch_bend_from_wheel(step, cfg.step_size, self.pitch)
             self.ctx.midi.pitch_bend(self.pitch)
         else:
-            self.cc_value = int(round(clamp(self.cc_value + step * int(cfg.get("step_size", 4)), 0, 127)))
-            self.ctx.midi.cc(int(cfg.get("cc", 74)), self.cc_value)
+            self.cc_value = int(round(clamp(self.cc_value + step * cfg.step_size, 0, 127)))
+            self.ctx.midi.cc(cfg.cc, self.cc_value)
 
     def get_state(self) -> dict:
         return {"pitch": self.pitch, "cc": self.cc_value}
\ No newline at end of file
@@ -351,8 +351,8 @@ function renderMain() {
 
   // 虚拟端口卡片
   const portsInfo = state.app.ports || {};
-  const bkNames = { tevirtualmidi: "teVirtualMIDI（loopMIDI 同源）", windows_midi_services: "Windows MIDI Services" };
-  const cV = card("虚拟 MIDI 端口", "双内核：teVirtualMIDI 默认，Windows MIDI Services 备选（Win11 24H2+）");
+  const bkNames = { tevirtualmidi: "teVirtualMIDI（loopMIDI 同源）", windows_midi_services: "Windows MIDI Services", alsa_seq: "ALSA 音序器（Linux）", loopback: "Loopback（进程内测试）", null: "Null（仅计数）" };
+  const cV = card("虚拟 MIDI 端口", "teVirtualMIDI 默认，Windows MIDI Services 备选（Win11 24H2+），Linux 使用 ALSA 音序器");
   const vRow = el("div", "row wrap");
   vRow.appendChild(el("span", "badge " + (portsInfo.virtual_running ? "ok" : portsInfo.virtual_available ? "warn" : "err"),
     portsInfo.virtual_running ? "运行中" : portsInfo.virtual_available ? "未运行" : "内核不可用"));
@@ -512,6 +512,10 @@ function renderPlay() {
     rowE.appendChild(toggleInput(p.arp, async v => savePatch({ tools: { chord_arp: { pads: t4.pads.map((q, j) => j === i ? Object.assign({}, q, { arp: v }) : q) } } }, "chord_arp")));
     rowE.appendChild(el("span", "muted", "琶音"));
     rowE.appendChild(selectInput({ up: "上行", down: "下行", updown: "上下行", random: "随机" }, p.arp_mode, async v => savePatch({ tools: { chord_arp: { pads: t4.pads.map((q, j) => j === i ? Object.assign({}, q, { arp_mode: v }) : q) } } }, "chord_arp")));
+    rowE.appendChild(selectInput({ 0: "自由", 1: "1/4", 2: "1/8", 3: "1/8T", 4: "1/16", 6: "1/16T", 8: "1/32" }, p.arp_div || 0, async v => savePatch({ tools: { chord_arp: { pads: t4.pads.map((q, j) => j === i ? Object.assign({}, q, { arp_div: Number(v) }) : q) } } }, "chord_arp")));
+    rowE.appendChild(field("八度", numberInput(p.octaves || 1, 1, 4, v => savePatch({ tools: { chord_arp: { pads: t4.pads.map((q, j) => j === i ? Object.assign({}, q, { octaves: Math.max(1, Math.min(4, v)) }) : q) } } }, "chord_arp"), "52px")));
+    rowE.appendChild(toggleInput(p.latch, async v => savePatch({ tools: { chord_arp: { pads: t4.pads.map((q, j) => j === i ? Object.assign({}, q, { latch: v }) : q) } } }, "chord_arp")));
+    rowE.appendChild(el("span", "muted", "锁定"));
     const lb = el("button", "btn learn small", "学习");
     lb.onclick = () => api("learn_start", { kind: "chord_key", index: i });
     rowE.appendChild(lb);
@@ -586,6 +590,11 @@ function renderSeq() {
   stopBtn.onclick = () => api("tool_action", "step_sequencer", "stop", {});
   ctrl.appendChild(playBtn);
   ctrl.appendChild(stopBtn);
+  if ((t2.patterns || []).length) {
+    const patOpts = { 0: "0 · 主 pattern" };
+    t2.patterns.forEach((p, i) => { patOpts[i + 1] = (i + 1) + " · " + (p.name || "pattern"); });
+    ctrl.appendChild(field("Pattern（下一小节切换）", selectInput(patOpts, 0, async v => api("tool_action", "step_sequencer", "select_pattern", { index: parseInt(v, 10) }))));
+  }
   const editBtn = el("button", "btn" + (seqEdit.mode ? " primary" : ""), seqEdit.mode ? "✎ 编辑中（点击格子选择）" : "✎ 编辑音序");
   editBtn.onclick = () => {
     seqEdit.mode = !seqEdit.mode;
@@ -852,6 +861,10 @@ function renderSettings() {
     plist.appendChild(chip);
   });
   c1.appendChild(plist);
+  const sw = state.app.profile_switch || {};
+  if (sw.last_ms != null) {
+    c1.appendChild(el("span", "muted", "上次切换耗时 " + sw.last_ms.toFixed(2) + " ms（共 " + sw.switches + " 次；按住组合键+按钮或 Program Change 触发）"));
+  }
   grid.appendChild(c1);
 
   const c2 = card("MIDI", "通道与输出");
@@ -862,6 +875,9 @@ function renderSettings() {
   (state.app.ports.outputs || []).forEach(p => { portOpts[p] = p; });
   const portSel = selectInput(portOpts, state.app.ports.selected_output || "", async v => api("midi_select_output", v));
   mRow.appendChild(field("系统输出端口（备选）", portSel));
+  const panicBtn = el("button", "btn small", "全部静音");
+  panicBtn.onclick = () => api("midi_panic");
+  mRow.appendChild(panicBtn);
   c2.appendChild(mRow);
   grid.appendChild(c2);
 
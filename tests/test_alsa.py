@@ -0,0 +1,231 @@
+"""ALSA 音序器内核测试：模拟 libasound 验证事件寻址、直发/批量输出、输入解码与回退"""
+
+import ctypes
+import errno
+import os
+import threading
+import unittest
+
+from gms.bus import EventBus
+from gms.midi.alsa_backend import (
+    AlsaSeqBackend,
+    SndSeqEvent,
+    SND_SEQ_ADDRESS_SUBSCRIBERS,
+    SND_SEQ_ADDRESS_UNKNOWN,
+    SND_SEQ_EVENT_NONE,
+    SND_SEQ_QUEUE_DIRECT,
+)
+from gms.midi.backends import MidiPortManager
+
+
+def _msg_len(status: int) -> int:
+    if status >= 0xF0:
+        return 1
+    return 2 if (status & 0xF0) in (0xC0, 0xD0) else 3
+
+
+class FakeAsound:
+    """模拟 libasound：编码器按 MIDI 消息长度切分，输出事件与 drain 均被记录。"""
+
+    def __init__(self):
+        self.direct = []
+        self.queued = []
+        self.drains = 0
+        self.inbox = []
+        self.current = b""
+        self.closed = []
+        self.r, self.w = os.pipe()
+
+    # ---- 客户端/端口 ----
+    def snd_seq_open(self, ref, name, mode, flags):
+        ref._obj.value = 0x1000
+        return 0
+
+    def snd_seq_close(self, seq):
+        self.closed.append(seq.value)
+        return 0
+
+    def snd_seq_client_id(self, seq):
+        return 128
+
+    def snd_seq_set_client_name(self, seq, name):
+        return 0
+
+    def snd_seq_create_simple_port(self, seq, name, caps, type_):
+        return 0
+
+    def snd_seq_delete_simple_port(self, seq, port):
+        return 0
+
+    def snd_strerror(self, rc):
+        return b"fake error"
+
+    # ---- 编解码 ----
+    def snd_midi_event_new(self, size, ref):
+        ref._obj.value = 0x2000 + size
+        return 0
+
+    def snd_midi_event_free(self, dev):
+        pass
+
+    def snd_midi_event_no_status(self, dev, on):
+        pass
+
+    def snd_midi_event_reset_encode(self, dev):
+        pass
+
+    def snd_midi_event_encode(self, dev, addr, count, ev_ref):
+        data = ctypes.string_at(addr, count)
+        ev = ev_ref._obj
+        need = _msg_len(data[0])
+        if count < need:
+            ev.type = SND_SEQ_EVENT_NONE
+            return count
+        ev.type = data[0] >> 4
+        ev.data[0:need] = list(data[:need])
+        return need
+
+    def snd_midi_event_decode(self, dev, buf, size, ev_ptr):
+        ctypes.memmove(buf, self.current, len(self.current))
+        return len(self.current)
+
+    # ---- 输出 ----
+    @staticmethod
+    def _snapshot(ev_ref):
+        ev = ev_ref._obj
+        n = _msg_len(ev.data[0])
+        return {"data": bytes(ev.data[:n]), "queue": ev.queue,
+                "source": ev.source.port, "dest": (ev.dest.client, ev.dest.port)}
+
+    def snd_seq_event_output_direct(self, seq, ev_ref):
+        self.direct.append(self._snapshot(ev_ref))
+        return 1
+
+    def snd_seq_event_output(self, seq, ev_ref):
+        self.queued.append(self._snapshot(ev_ref))
+        return len(self.queued)
+
+    def snd_seq_drain_output(self, seq):
+        self.drains += 1
+        return 0
+
+    # ---- 输入 ----
+    def push(self, data: bytes):
+        self.inbox.append(data)
+        os.write(self.w, b"\0")
+
+    def snd_seq_poll_descriptors_count(self, seq, events):
+        return 1
+
+    def snd_seq_poll_descriptors(self, seq, pfds, count, events):
+        pfds[0].fd = self.r
+        pfds[0].events = events
+        return 1
+
+    def snd_seq_event_input(self, seq, ptr_ref):
+        if not self.inbox:
+            try:
+                os.read(self.r, 64)
+            except OSError:
+                pass
+            return -errno.EAGAIN
+        self.current = self.inbox.pop(0)
+        ptr_ref._obj.contents = SndSeqEvent()
+        return len(self.inbox)
+
+
+def make_backend():
+    backend = AlsaSeqBackend.__new__(AlsaSeqBackend)
+    backend._lib = FakeAsound()
+    backend._err = ""
+    return backend
+
+
+class TestAlsaEvent(unittest.TestCase):
+    def test_event_struct_matches_snd_seq_event_t(self):
+        self.assertEqual(ctypes.sizeof(SndSeqEvent), 28)
+
+
+class TestAlsaSend(unittest.TestCase):
+    def setUp(self):
+        self.backend = make_backend()
+        self.lib = self.backend._lib
+        self.handle = self.backend.create_port("GMS ALSA Test")
+
+    def tearDown(self):
+        self.backend.close_port(self.handle)
+
+    def test_single_message_goes_direct_to_subscribers(self):
+        self.assertTrue(self.backend.send(self.handle, bytearray([0x90, 60, 100])))
+        self.assertEqual(self.lib.queued, [])
+        self.assertEqual(self.lib.drains, 0)
+        ev = self.lib.direct[0]
+        self.assertEqual(ev["data"], b"\x90\x3c\x64")
+        self.assertEqual(ev["queue"], SND_SEQ_QUEUE_DIRECT)
+        self.assertEqual(ev["dest"], (SND_SEQ_ADDRESS_SUBSCRIBERS, SND_SEQ_ADDRESS_UNKNOWN))
+        self.assertEqual(ev["source"], self.handle.port)
+
+    def test_multiple_messages_batched_with_one_drain(self):
+        data = b"\x90\x3c\x64\xc0\x05\xb0\x07\x7f"
+        self.assertTrue(self.backend.send(self.handle, data))
+        self.assertEqual(self.lib.direct, [])
+        self.assertEqual([e["data"] for e in self.lib.queued],
+                         [b"\x90\x3c\x64", b"\xc0\x05", b"\xb0\x07\x7f"])
+        self.assertEqual(self.lib.drains, 1)
+
+    def test_truncated_message_not_sent(self):
+        self.assertFalse(self.backend.send(self.handle, b"\x90\x3c"))
+        self.assertEqual(self.lib.direct, [])
+
+    def test_send_empty_or_closed_returns_false(self):
+        self.assertFalse(self.backend.send(self.handle, b""))
+        self.assertFalse(self.backend.send(None, b"\x90\x3c\x64"))
+        self.backend.close_port(self.handle)
+        self.assertFalse(self.handle)
+        self.assertFalse(self.backend.send(self.handle, b"\x90\x3c\x64"))
+
+
+class TestAlsaInput(unittest.TestCase):
+    def test_input_events_decoded_to_callback(self):
+        backend = make_backend()
+        received = []
+        got = threading.Event()
+
+        def on_input(data):
+            received.append(data)
+            if len(received) == 2:
+                got.set()
+
+        handle = backend.create_port("GMS ALSA In", on_input=on_input)
+        try:
+            backend._lib.push(b"\x90\x40\x50")
+            backend._lib.push(b"\x80\x40\x00")
+            self.assertTrue(got.wait(2.0))
+            self.assertEqual(received, [b"\x90\x40\x50", b"\x80\x40\x00"])
+        finally:
+            backend.close_port(handle)
+        self.assertFalse(handle.thread.is_alive())
+        self.assertEqual(backend._lib.closed, [0x1000])
+
+
+class TestAlsaFallback(unittest.TestCase):
+    def test_unavailable_backend_falls_back_to_alsa(self):
+        bus = EventBus()
+        logs = []
+        bus.subscribe("log", lambda message: logs.append(message))
+        pm = MidiPortManager(bus)
+        if pm.backends["tevirtualmidi"].is_available():
+            self.skipTest("本机 teVirtualMIDI 可用，回退顺序优先 teVirtualMIDI")
+        pm.backends["alsa_seq"] = make_backend()
+        pm.start("GMS ALSA Fallback", backend_name="windows_midi_services")
+        try:
+            self.assertEqual(pm.backend.name, "alsa_seq")
+            self.assertTrue(pm.virtual_handle)
+            self.assertTrue(any("ALSA" in m for m in logs))
+            self.assertIn("alsa_seq", pm.state()["backends"])
+        finally:
+            pm.stop()
+
+
+if __name__ == "__main__":
+    unittest.main()
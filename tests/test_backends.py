@@ -46,6 +46,49 @@ class TestTeVirtualMidiSend(unittest.TestCase):
         self.assertFalse(backend.send(None, b""))
         self.assertFalse(backend.send(object(), b""))
 
+    def test_send_accepts_list_without_string_buffer(self):
+        """mido 新版 bytes() 返回 list；发送路径不再逐条分配 create_string_buffer。"""
+        from unittest import mock
+        backend = make_backend()
+        with mock.patch("ctypes.create_string_buffer", side_effect=AssertionError):
+            self.assertTrue(backend.send(object(), [0x90, 60, 100]))
+        self.assertEqual(backend._dll.calls[0][1], b"\x90\x3c\x64")
+
+    def test_large_bytearray_shared_not_copied(self):
+        import ctypes
+        from gms.midi.backends import ZERO_COPY_MIN
+        backend = make_backend()
+        seen = []
+        backend._dll.virtualMIDISendData = lambda h, buf, n: seen.append(buf) or 1
+        sysex = bytearray([0xF0]) + bytearray(ZERO_COPY_MIN) + bytearray([0xF7])
+        self.assertTrue(backend.send(object(), sysex))
+        self.assertEqual(ctypes.addressof(seen[0]),
+                         ctypes.addressof((ctypes.c_ubyte * 1).from_buffer(sysex)))
+
+    def test_send_many_coalesces_into_one_call(self):
+        backend = make_backend()
+        ok = backend.send_many(object(), [[0x90, 60, 100], bytearray([0x90, 64, 100]), b"\xc0\x05"])
+        self.assertTrue(ok)
+        self.assertEqual(len(backend._dll.calls), 1)
+        _, data, length = backend._dll.calls[0]
+        self.assertEqual(data, b"\x90\x3c\x64\x90\x40\x64\xc0\x05")
+        self.assertEqual(length, 8)
+
+    def test_send_many_falls_back_when_driver_rejects_packed_write(self):
+        backend = make_backend()
+        calls = []
+
+        def send_data(handle, buf, length):
+            calls.append(bytes(buf[:length]))
+            return 1 if length <= 3 else 0   # 旧驱动：只接受单条消息
+
+        backend._dll.virtualMIDISendData = send_data
+        self.assertTrue(backend.send_many(object(), [b"\x90\x3c\x64", b"\x80\x3c\x00"]))
+        self.assertEqual(calls, [b"\x90\x3c\x64\x80\x3c\x00", b"\x90\x3c\x64", b"\x80\x3c\x00"])
+        calls.clear()
+        backend.send_many(object(), [b"\x90\x3c\x64", b"\x80\x3c\x00"])
+        self.assertEqual(len(calls), 2)   # 之后不再尝试合并
+
 
 class TestPortManagerMidoPath(unittest.TestCase):
     def test_send_message_with_mido_message(self):
@@ -68,5 +111,127 @@ class TestPortManagerMidoPath(unittest.TestCase):
         self.assertEqual(length, 3)
 
 
+class TestOutputEnumerationCache(unittest.TestCase):
+    def setUp(self):
+        from unittest import mock
+        from gms.midi.backends import MidiPortManager
+        self.names = ["Port A"]
+        self.calls = 0
+
+        def enumerate_outputs():
+            self.calls += 1
+            return list(self.names)
+
+        patcher = mock.patch.object(MidiPortManager, "_enumerate_outputs",
+                                    staticmethod(enumerate_outputs))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.bus = EventBus()
+        self.pm = MidiPortManager(self.bus)
+        self.pm.OUTPUTS_REFRESH_S = 60.0
+        self.addCleanup(self.pm.stop_refresh)
+
+    def test_state_answered_from_cache(self):
+        self.assertEqual(self.pm.state()["outputs"], ["Port A"])
+        self.names.append("Port B")
+        self.assertEqual(self.pm.state()["outputs"], ["Port A"])
+        self.assertEqual(self.calls, 1)
+
+    def test_refresh_now_updates_cache_and_notifies(self):
+        seen = []
+        self.bus.subscribe("midi.outputs", lambda outputs: seen.append(outputs))
+        self.pm.output_names()
+        self.names.append("Port B")
+        self.assertEqual(self.pm.refresh_outputs(), ["Port A", "Port B"])
+        self.assertEqual(self.pm.state()["outputs"], ["Port A", "Port B"])
+        self.pm.refresh_outputs()   # 未变化：不再广播
+        self.assertEqual(seen, [["Port A"], ["Port A", "Port B"]])
+
+    def test_background_refresh_picks_up_changes(self):
+        import threading
+        self.pm.OUTPUTS_REFRESH_S = 0.01
+        changed = threading.Event()
+        self.bus.subscribe("midi.outputs",
+                           lambda outputs: changed.set() if "Port C" in outputs else None)
+        self.pm.output_names()
+        self.names.append("Port C")
+        self.assertTrue(changed.wait(2.0))
+        self.assertIn("Port C", self.pm.output_names())
+
+
+class TestVirtualInputQueue(unittest.TestCase):
+    def test_callback_copies_with_string_at(self):
+        import ctypes
+        backend = make_backend()
+        created = {}
+
+        def create(name, vendor, callback, *args):
+            created["cb"] = callback
+            return 1
+
+        backend._dll.virtualMIDICreatePortEx2 = create
+        received = []
+        backend.create_port("GMS In", on_input=received.append)
+        raw = (ctypes.c_ubyte * 3)(0x90, 60, 100)
+        backend._callback(None, raw, 3, 0)
+        self.assertEqual(received, [b"\x90\x3c\x64"])
+        self.assertIsInstance(received[0], bytes)
+
+    def test_driver_input_dispatched_off_callback_thread(self):
+        import threading
+        from gms.midi.backends import MidiPortManager, VirtualMidiBackend
+
+        class CallbackBackend(VirtualMidiBackend):
+            name = "cb"
+            error = ""
+
+            def is_available(self):
+                return True
+
+            def create_port(self, port_name, on_input=None):
+                self.on_input = on_input
+                return object()
+
+            def close_port(self, handle):
+                pass
+
+        bus = EventBus()
+        pm = MidiPortManager(bus)
+        pm.backends["cb"] = CallbackBackend()
+        seen = []
+        done = threading.Event()
+        gate = threading.Event()
+
+        def on_midi_input(data):
+            gate.wait(2.0)   # 慢订阅者（映射层）不应阻塞驱动回调
+            seen.append((data, threading.current_thread().name))
+            if len(seen) == 100:
+                done.set()
+
+        bus.subscribe("midi.input", on_midi_input)
+        pm.start("GMS In", backend_name="cb")
+        try:
+            for n in range(100):
+                pm.backends["cb"].on_input(bytes([0x90, n, 100]))
+            self.assertEqual(seen, [])
+            gate.set()
+            self.assertTrue(done.wait(2.0))
+            self.assertEqual([d for d, _ in seen], [bytes([0x90, n, 100]) for n in range(100)])
+            self.assertEqual({t for _, t in seen}, {"midi_input"})
+            stats = pm.input_stats()
+            self.assertEqual(stats["received"], 100)
+            self.assertGreater(stats["max_batch"], 1)
+        finally:
+            pm.stop()
+
+    def test_full_queue_drops_and_counts(self):
+        from gms.midi.backends import MidiPortManager
+        pm = MidiPortManager(EventBus())
+        pm._input_queue.maxsize = 2
+        for n in range(5):
+            pm._enqueue_input(bytes([0x90, n, 1]))
+        self.assertEqual(pm.input_stats()["dropped"], 3)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,149 @@
+"""琶音引擎测试：单一 tick 链、按拍分步跟随时钟、八度与预生成序列、latch、开关对称"""
+
+import threading
+import time
+import unittest
+from unittest import mock
+
+from gms.bus import EventBus
+from gms.config import DEFAULTS, deep_merge
+from gms.midi.clock import Timeline
+from gms.midi.scheduler import Scheduler
+from gms.tools.base import ToolContext
+from gms.tools.chord_arpeggiator import RANDOM_CYCLES, ChordArp
+
+
+class FakeMidi:
+    def __init__(self):
+        self.events = []
+        self.lock = threading.Lock()
+
+    def note_on(self, note, velocity=100, channel=None):
+        with self.lock:
+            self.events.append((time.monotonic(), "on", note))
+
+    def note_off(self, note, channel=None):
+        with self.lock:
+            self.events.append((time.monotonic(), "off", note))
+
+    def kinds(self):
+        with self.lock:
+            return [ev[1:] for ev in self.events]
+
+
+def wait_until(pred, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not pred() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return pred()
+
+
+def held(kinds):
+    """每个音高以最后一条消息为准（重叠发声只发一次 note_off）"""
+    last = {}
+    for kind, n in kinds:
+        last[n] = kind
+    return {n for n, kind in last.items() if kind == "on"}
+
+
+class TestChordArp(unittest.TestCase):
+    def setUp(self):
+        self.cfg = deep_merge(DEFAULTS, {"tools": {"chord_arp": {"bpm": 120.0}}})
+        bus = EventBus()
+        self.ctx = ToolContext(bus, FakeMidi(), None, mock.Mock(active=False), None,
+                               lambda: self.cfg, None, scheduler=Scheduler(bus))
+        self.addCleanup(self.ctx.scheduler.close)
+        self.arp = ChordArp(self.ctx)
+        self.addCleanup(self.arp.stop)
+
+    def test_sequences_precomputed_with_octaves(self):
+        up = self.arp._arp_sequence([60, 64], "up", 2)
+        self.assertEqual(up, [60, 64, 72, 76])
+        self.assertIs(self.arp._arp_sequence([60, 64], "up", 2), up)
+        self.assertEqual(self.arp._arp_sequence([60, 64, 67], "updown"), [60, 64, 67, 64])
+        rnd = self.arp._arp_sequence([60, 64, 67], "random")
+        self.assertEqual(len(rnd), 3 * RANDOM_CYCLES)
+        for i in range(0, len(rnd), 3):
+            self.assertEqual(sorted(rnd[i:i + 3]), [60, 64, 67])
+
+    def test_held_pads_share_one_pending_tick(self):
+        for i in range(6):
+            self.arp._press(str(i), {"chord": [60 + i], "arp": True, "arp_ms": 40})
+        self.assertEqual(self.ctx.scheduler.pending(), 1)
+        self.assertTrue(wait_until(lambda: len(self.ctx.midi.kinds()) >= 18))
+        self.assertLessEqual(self.ctx.scheduler.pending(), 1)
+        for i in range(6):
+            self.arp._release(str(i))
+        self.assertEqual(self.ctx.scheduler.pending(), 0)
+        self.assertEqual(held(self.ctx.midi.kinds()), set())
+
+    def test_repeated_press_keeps_tick_chain(self):
+        pad = {"chord": [60, 64], "arp": True, "arp_ms": 40}
+        self.arp._press("1", pad)
+        with mock.patch.object(self.ctx.scheduler, "cancel") as cancel:
+            self.arp._press("1", pad)               # 已按住：不撤销调度链
+        cancel.assert_not_called()
+        self.assertEqual(self.ctx.scheduler.pending(), 1)
+        self.assertTrue(wait_until(lambda: len(self.ctx.midi.kinds()) >= 5))
+        self.arp._release("1")
+
+    def test_division_follows_shared_clock(self):
+        timeline = Timeline(bpm=300.0)      # 一拍 200ms，1/8 = 100ms
+        timeline.mode = "master"
+        self.ctx.clock = timeline
+        self.arp._press("1", {"chord": [60, 64], "arp": True, "arp_div": 2})
+        first = self.arp.playing["1"]["beat"]
+        self.assertEqual(first % 0.5, 0.0)
+        self.assertTrue(wait_until(
+            lambda: sum(1 for e in self.ctx.midi.events if e[1] == "on") >= 4))
+        self.arp._release("1")
+        ons = [e[0] for e in self.ctx.midi.events if e[1] == "on"]
+        self.assertAlmostEqual(ons[0], timeline.time_of_beat(first), delta=0.01)
+        self.assertAlmostEqual(ons[3] - ons[0], 0.3, delta=0.02)
+
+    def test_division_uses_tool_bpm_without_clock(self):
+        self.cfg["tools"]["chord_arp"]["bpm"] = 240.0     # 1/4 = 250ms，1/16 = 62.5ms
+        self.arp._press("1", {"chord": [60], "arp": True, "arp_div": 4})
+        self.assertAlmostEqual(self.arp.playing["1"]["period"], 0.0625)
+        self.arp._release("1")
+
+    def test_pads_come_from_validated_settings(self):
+        self.cfg["tools"]["chord_arp"]["pads"] = [
+            {"key": "w", "chord": [60], "arp": True, "arp_ms": 5, "octaves": 9}]
+        self.arp._on_key("w", {"w"})
+        state = self.arp.playing["w"]
+        self.assertAlmostEqual(state["period"], 0.03)       # arp_ms 夹到 30
+        self.assertEqual(state["seq"], [60, 72, 84, 96])    # octaves 夹到 4
+        self.arp._on_key("w", set())
+
+    def test_each_pad_releases_its_own_notes(self):
+        # 重叠音高的计数由 MidiEngine 发声矩阵负责，工具只需对称地开/关自己的音符
+        self.arp._press("a", {"chord": [60, 64]})
+        self.arp._press("b", {"chord": [64, 67]})
+        self.arp._release("a")
+        self.arp._release("b")
+        kinds = self.ctx.midi.kinds()
+        for n in (60, 64, 67):
+            self.assertEqual(kinds.count(("on", n)), kinds.count(("off", n)))
+
+    def test_repeated_pitch_in_chord_is_released(self):
+        self.arp._press("a", {"chord": [60, 64, 60]})
+        self.arp._release("a")
+        kinds = self.ctx.midi.kinds()
+        self.assertEqual(kinds[:2], [("on", 60), ("on", 64)])
+        self.assertEqual(sorted(kinds[2:]), [("off", 60), ("off", 64)])
+
+    def test_latch_toggles_and_ignores_autorepeat(self):
+        self.cfg["tools"]["chord_arp"]["pads"] = [{"key": "q", "chord": [60], "latch": True}]
+        self.arp._on_key("q", {"q"})
+        self.arp._on_key("q", {"q"})            # 自动重复
+        self.arp._on_key("q", set())            # 松开：保持
+        self.assertIn("q", self.arp.playing)
+        self.assertEqual(self.ctx.midi.kinds(), [("on", 60)])
+        self.arp._on_key("q", {"q"})            # 再按：停止
+        self.assertNotIn("q", self.arp.playing)
+        self.assertEqual(self.ctx.midi.kinds(), [("on", 60), ("off", 60)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,170 @@
+"""MIDI 时钟测试：时间线改速连续性、主模式时钟脉冲排程、从模式速度拟合与走带消息"""
+
+import random
+import threading
+import time
+import unittest
+
+from gms.bus import EventBus
+from gms.midi.clock import (
+    CLOCK,
+    CONTINUE,
+    PPQN,
+    SONG_POSITION,
+    START,
+    STOP,
+    MidiClock,
+    Timeline,
+)
+from gms.tools.base import ToolContext
+
+
+class FakeMidi:
+    """记录 send_raw 的字节与发送时刻"""
+
+    def __init__(self):
+        self.sent = []
+
+    def send_raw(self, data):
+        self.sent.append((bytes(data), time.monotonic()))
+        return True
+
+
+class TestTimeline(unittest.TestCase):
+    def test_set_bpm_keeps_position_continuous(self):
+        tl = Timeline(120.0)
+        tl.locate(4.0, t=time.monotonic() - 1.0)    # 1 秒前位于第 4 拍
+        before = tl.beat()
+        tl.set_bpm(60.0)
+        after = tl.beat()
+        self.assertAlmostEqual(before, 6.0, delta=0.05)
+        self.assertAlmostEqual(after, before, delta=0.05)
+        self.assertEqual(tl.bpm, 60.0)
+
+    def test_time_of_beat_inverts_beat(self):
+        tl = Timeline(90.0)
+        now = time.monotonic()
+        tl.locate(0.0, t=now)
+        self.assertAlmostEqual(tl.time_of_beat(3.0), now + 2.0, places=6)
+        self.assertAlmostEqual(tl.beat(now + 2.0), 3.0, places=6)
+
+    def test_stopped_timeline_has_no_schedule(self):
+        tl = Timeline(120.0, running=False)
+        self.assertIsNone(tl.time_of_beat(1.0))
+        stop = threading.Event()
+        stop.set()
+        self.assertFalse(tl.wait_for_beat(1.0, stop))
+
+    def test_bpm_clamped(self):
+        self.assertEqual(Timeline(5).bpm, Timeline.MIN_BPM)
+        self.assertEqual(Timeline(1000).bpm, Timeline.MAX_BPM)
+
+
+class TestMasterClock(unittest.TestCase):
+    def test_start_sends_start_then_ticks_on_grid(self):
+        bus = EventBus()
+        midi = FakeMidi()
+        clock = MidiClock(bus, midi)
+        clock.apply_config({"mode": "master", "bpm": 300.0})   # 每脉冲约 8.3ms
+        try:
+            clock.start()
+            deadline = time.monotonic() + 2.0
+            while len(midi.sent) < 1 + PPQN and time.monotonic() < deadline:
+                time.sleep(0.01)
+            clock.stop()
+        finally:
+            clock.close()
+        kinds = [d[0] for d, _ in midi.sent]
+        self.assertEqual(kinds[0], START)
+        self.assertEqual(kinds[-1], STOP)
+        ticks = [t for d, t in midi.sent if d[0] == CLOCK]
+        self.assertGreaterEqual(len(ticks), PPQN)
+        # 按绝对时间排程：一拍（24 脉冲）的跨度应接近 0.2 秒，不随发送次数累积误差
+        span = ticks[PPQN - 1] - ticks[0]
+        self.assertAlmostEqual(span, 23 * 60.0 / 300.0 / PPQN, delta=0.03)
+        self.assertEqual(clock.stats["ticks_sent"], len(ticks))
+
+    def test_song_position_sent_and_located(self):
+        midi = FakeMidi()
+        clock = MidiClock(EventBus(), midi)
+        clock.apply_config({"mode": "master", "bpm": 120.0})
+        clock.song_position(200)
+        self.assertEqual(midi.sent[-1][0], bytes([SONG_POSITION, 200 & 0x7F, 200 >> 7]))
+        self.assertAlmostEqual(clock.beat(), 50.0, delta=0.01)
+        clock.close()
+
+    def test_song_position_while_running_stops_first(self):
+        midi = FakeMidi()
+        clock = MidiClock(EventBus(), midi)
+        clock.apply_config({"mode": "master", "bpm": 120.0})
+        clock.start()
+        clock.song_position(64)
+        try:
+            transport = [d for d, _ in midi.sent if d[0] != CLOCK]
+            self.assertEqual(transport, [bytes([START]), bytes([STOP]),
+                                         bytes([SONG_POSITION, 64, 0]), bytes([CONTINUE])])
+            self.assertTrue(clock.running)
+            self.assertAlmostEqual(clock.time_of_beat(16.0) - time.monotonic(),
+                                   clock.START_LEAD_S, delta=0.02)
+        finally:
+            clock.close()
+
+
+class TestSlaveClock(unittest.TestCase):
+    def setUp(self):
+        self.bus = EventBus()
+        self.clock = MidiClock(self.bus, FakeMidi())
+        self.clock.apply_config({"mode": "slave"})
+
+    def tearDown(self):
+        self.clock.close()
+
+    def test_tempo_estimated_through_jitter(self):
+        rng = random.Random(7)
+        interval = 60.0 / 132.0 / PPQN
+        t0 = time.monotonic()
+        self.bus.emit("midi.input", data=bytes([START]))
+        for i in range(96):
+            self.clock._on_tick(t0 + i * interval + rng.uniform(-0.001, 0.001))
+        self.assertTrue(self.clock.running)
+        self.assertAlmostEqual(self.clock.bpm, 132.0, delta=0.5)
+        # 拟合相位：第 96 个脉冲对应第 4 拍
+        self.assertAlmostEqual(self.clock.beat(t0 + 96 * interval), 4.0, delta=0.02)
+        self.assertLess(self.clock.stats["jitter_ms"], 1.0)
+
+    def test_stop_freezes_and_song_position_relocates(self):
+        self.bus.emit("midi.input", data=bytes([START]))
+        self.bus.emit("midi.input", data=bytes([CLOCK]))
+        self.assertTrue(self.clock.running)
+        self.bus.emit("midi.input", data=bytes([STOP]))
+        self.assertFalse(self.clock.running)
+        self.bus.emit("midi.input", data=bytes([SONG_POSITION, 16, 0]))
+        self.assertAlmostEqual(self.clock.beat(), 4.0)
+        self.bus.emit("midi.input", data=bytes([CONTINUE]))
+        self.bus.emit("midi.input", data=bytes([CLOCK]))
+        self.assertTrue(self.clock.running)
+        self.assertAlmostEqual(self.clock.beat(), 4.0, delta=0.01)
+
+    def test_transport_ignored_in_slave_mode(self):
+        self.clock.start()
+        self.assertFalse(self.clock.running)
+
+    def test_internal_mode_unsubscribes(self):
+        self.clock.apply_config({"mode": "internal", "bpm": 100.0})
+        self.bus.emit("midi.input", data=bytes([STOP]))
+        self.assertTrue(self.clock.running)
+        self.assertEqual(self.clock.bpm, 100.0)
+
+
+class TestToolContextClock(unittest.TestCase):
+    def test_shared_clock_only_when_synced(self):
+        clock = MidiClock(EventBus(), FakeMidi())
+        ctx = ToolContext(None, None, None, None, None, dict, None, clock=clock)
+        self.assertIsNone(ctx.shared_clock())
+        clock.set_mode("slave")
+        self.assertIs(ctx.shared_clock(), clock)
+        clock.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,10 +2,13 @@
 
 import json
 import tempfile
+import time
 import unittest
 from pathlib import Path
+from unittest import mock
 
-from gms.config import ProfileManager, DEFAULTS, deep_merge
+from gms.bus import EventBus
+from gms.config import ProfileManager, DEFAULTS, deep_merge, diff_paths, merge_patch, touches
 
 
 class TestProfileManager(unittest.TestCase):
@@ -14,6 +17,7 @@ class TestProfileManager(unittest.TestCase):
         self.pm = ProfileManager(Path(self.tmp.name))
 
     def tearDown(self):
+        self.pm.close()
         self.tmp.cleanup()
 
     def test_default_profile_created(self):
@@ -22,9 +26,45 @@ class TestProfileManager(unittest.TestCase):
 
     def test_update_persist(self):
         self.pm.update({"gamepad": {"sensitivity": 5.0}})
+        self.pm.flush()
         pm2 = ProfileManager(Path(self.tmp.name))
         self.assertEqual(pm2.current()["gamepad"]["sensitivity"], 5.0)
 
+    def test_updates_coalesce_into_one_write(self):
+        writes = []
+        real = ProfileManager._atomic_write
+        self.pm.SAVE_DEBOUNCE_S = 0.05
+        with mock.patch.object(ProfileManager, "_atomic_write",
+                               side_effect=lambda p, d: (writes.append(d), real(p, d))):
+            for i in range(50):
+                self.pm.update({"midi": {"channel": i % 16 + 1}})
+            self.assertEqual(self.pm.current()["midi"]["channel"], 50 % 16)   # 内存立即生效
+            deadline = time.monotonic() + 2.0
+            while not writes and time.monotonic() < deadline:
+                time.sleep(0.01)
+            time.sleep(0.1)
+        self.assertEqual(len(writes), 1)
+        self.assertEqual(writes[0]["midi"]["channel"], 50 % 16)
+        data = json.loads((Path(self.tmp.name) / "default.json").read_text(encoding="utf-8"))
+        self.assertEqual(data["midi"]["channel"], 50 % 16)
+        self.assertEqual(list(Path(self.tmp.name).glob("*.tmp")), [])
+
+    def test_close_flushes_pending(self):
+        self.pm.SAVE_DEBOUNCE_S = 60.0
+        self.pm.update({"midi": {"channel": 7}})
+        path = Path(self.tmp.name) / "default.json"
+        self.assertEqual(json.loads(path.read_text(encoding="utf-8"))["midi"]["channel"], 1)
+        self.pm.close()
+        self.assertEqual(json.loads(path.read_text(encoding="utf-8"))["midi"]["channel"], 7)
+        self.assertFalse(self.pm.flush())
+
+    def test_switch_flushes_before_loading(self):
+        self.pm.SAVE_DEBOUNCE_S = 60.0
+        self.pm.new_profile("live")
+        self.pm.update({"midi": {"channel": 9}})
+        self.pm.load_profile("default")
+        self.assertEqual(self.pm.export_profile("live")["midi"]["channel"], 9)
+
     def test_new_and_switch(self):
         self.assertTrue(self.pm.new_profile("live"))
         self.assertEqual(self.pm.current_name, "live")
@@ -75,5 +115,69 @@ class TestProfileManager(unittest.TestCase):
         self.assertEqual(cfg["gamepad"]["note_mappings"]["button_b"], 62)  # 其余保持默认
 
 
+class TestStructuralSharing(unittest.TestCase):
+    def test_merge_patch_shares_untouched_branches(self):
+        base = deep_merge(DEFAULTS, {})
+        new, paths = merge_patch(base, {"gamepad": {"cc_mappings": {"left_stick_x": 20}}})
+        self.assertEqual(paths, [("gamepad", "cc_mappings", "left_stick_x")])
+        self.assertIsNot(new, base)
+        self.assertIsNot(new["gamepad"], base["gamepad"])
+        self.assertIs(new["gamepad"]["note_mappings"], base["gamepad"]["note_mappings"])
+        self.assertIs(new["tools"], base["tools"])
+        self.assertEqual(base["gamepad"]["cc_mappings"]["left_stick_x"], 1)   # 原配置不变
+
+    def test_unchanged_values_produce_no_paths(self):
+        base = deep_merge(DEFAULTS, {})
+        same, paths = merge_patch(base, {"midi": {"channel": 1}, "gamepad": {}})
+        self.assertIs(same, base)
+        self.assertEqual(paths, [])
+        _, paths = merge_patch(base, {"midi": {"channel": True}})    # True == 1 但类型不同
+        self.assertEqual(paths, [("midi", "channel")])
+
+    def test_patch_values_are_copied(self):
+        rules = [{"action": "channel", "to": 2}]
+        new, _ = merge_patch(deep_merge(DEFAULTS, {}), {"tools": {"midi_mapper": {"rules": rules}}})
+        rules[0]["to"] = 9
+        self.assertEqual(new["tools"]["midi_mapper"]["rules"][0]["to"], 2)
+
+    def test_diff_and_touches(self):
+        base = deep_merge(DEFAULTS, {})
+        new, _ = merge_patch(base, {"clock": {"bpm": 90.0}, "extra": {"a": 1}})
+        self.assertEqual(sorted(diff_paths(base, new)), [("clock", "bpm"), ("extra",)])
+        self.assertTrue(touches([("clock", "bpm")], "clock"))
+        self.assertTrue(touches([("tools",)], "tools", "midi_mapper", "rules"))
+        self.assertFalse(touches([("midi", "channel")], "midi", "destinations"))
+
+
+class TestConfigChanged(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.bus = EventBus()
+        self.events = []
+        self.bus.subscribe("config.changed", lambda **kw: self.events.append(kw))
+        self.pm = ProfileManager(Path(self.tmp.name), bus=self.bus)
+
+    def tearDown(self):
+        self.pm.close()
+        self.tmp.cleanup()
+
+    def test_update_emits_exact_paths(self):
+        paths = self.pm.update({"midi": {"channel": 3, "poll_ms": 5}})
+        self.assertEqual(paths, [("midi", "channel")])
+        self.assertEqual(len(self.events), 1)
+        self.assertEqual(self.events[0]["paths"], [("midi", "channel")])
+        self.assertIs(self.events[0]["config"], self.pm.current())
+        self.pm.update({"midi": {"channel": 3}})              # 无变化：不发事件
+        self.assertEqual(len(self.events), 1)
+
+    def test_profile_switch_emits_diff(self):
+        self.pm.new_profile("live")
+        self.pm.update({"tools": {"chord_arp": {"bpm": 100.0}}})
+        self.events.clear()
+        self.pm.load_profile("default")
+        self.assertEqual(self.events[0]["paths"], [("tools", "chord_arp", "bpm")])
+        self.assertEqual(self.events[0]["profile"], "default")
+
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
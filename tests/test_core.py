@@ -6,7 +6,7 @@ from gms.core import (
     clamp, apply_deadzone, apply_curve, axis_to_cc_absolute,
     axis_to_cc_absolute_centered, velocity_hold_pressure, trigger_axis_to_value,
     pitch_bend_from_wheel, sequencer_step_duration_ms, gate_duration_ms,
-    clip_event_times, clip_total_ms, apply_mapper_rules,
+    clip_event_times, clip_total_ms, compile_clip, apply_mapper_rules,
 )
 
 
@@ -91,6 +91,26 @@ class TestClip(unittest.TestCase):
     def test_total(self):
         self.assertEqual(clip_total_ms(self.EVENTS), 250)
 
+    def test_compiled_matches_event_times(self):
+        compiled = compile_clip(self.EVENTS)
+        self.assertEqual(list(compiled.times), [0, 100, 150, 250])
+        self.assertEqual(list(compiled.status), [0x90, 0x80, 0x90, 0x80])
+        self.assertEqual(list(compiled.data1), [60, 60, 62, 62])
+        self.assertEqual(list(compiled.data2), [100, 0, 100, 0])
+        self.assertEqual(compiled.total_ms, clip_total_ms(self.EVENTS))
+        self.assertIs(compiled.source, self.EVENTS)
+
+    def test_compiled_cc_pitch_and_unknown(self):
+        compiled = compile_clip([
+            {"type": "pitchwheel", "pitch": -8192, "t": 20},
+            {"type": "control_change", "control": 7, "value": 90, "t": 0},
+            {"type": "aftertouch", "value": 5, "t": 30, "duration": 40},
+        ])
+        self.assertEqual(list(compiled.times), [0, 20])
+        self.assertEqual(list(compiled.status), [0xB0, 0xE0])
+        self.assertEqual((compiled.data1[1], compiled.data2[1]), (0, 0))
+        self.assertEqual(compiled.total_ms, 70)
+
 
 class TestMapper(unittest.TestCase):
     def test_channel_forward(self):
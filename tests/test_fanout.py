@@ -0,0 +1,223 @@
+"""多目的地扇出测试：按类型/通道路由、慢端口隔离、计数与热应用"""
+
+import threading
+import time
+import unittest
+from unittest import mock
+
+import mido
+
+from gms.bus import EventBus
+from gms.midi.backends import MidiPortManager
+from gms.midi.fanout import FanOut
+
+
+class FakePort:
+    def __init__(self, name, delay=0.0, gate=None):
+        self.name = name
+        self.delay = delay
+        self.gate = gate
+        self.sent = []
+        self.closed = False
+
+    def send(self, msg):
+        if self.gate is not None:
+            self.gate.wait(2.0)
+        if self.delay:
+            time.sleep(self.delay)
+        self.sent.append(bytes(msg.bytes()))
+
+    def close(self):
+        self.closed = True
+
+
+class PortFactory:
+    def __init__(self, **specs):
+        self.specs = specs
+        self.ports = {}
+
+    def __call__(self, name):
+        if name not in self.specs:
+            raise OSError(f"unknown port {name}")
+        self.ports[name] = FakePort(name, **self.specs[name])
+        return self.ports[name]
+
+
+def note(n, channel=0):
+    return mido.Message("note_on", note=n, velocity=100, channel=channel)
+
+
+class TestFanOut(unittest.TestCase):
+    def test_routes_by_type_and_channel(self):
+        factory = PortFactory(synth={}, daw={})
+        fan = FanOut(open_port=factory)
+        fan.configure([
+            {"port": "daw"},
+            {"port": "synth", "types": ["note_on"], "channels": [2]},
+        ])
+        try:
+            fan.dispatch(note(60, channel=0))
+            fan.dispatch(note(62, channel=1))
+            fan.dispatch(mido.Message("control_change", channel=1, control=7, value=1))
+            for w in fan.writers().values():
+                self.assertTrue(w.wait_idle(2.0))
+            self.assertEqual(len(factory.ports["daw"].sent), 3)
+            self.assertEqual(factory.ports["synth"].sent, [b"\x91\x3e\x64"])
+        finally:
+            fan.close()
+        self.assertTrue(factory.ports["daw"].closed)
+
+    def test_backlogged_cc_coalesced_notes_kept(self):
+        gate = threading.Event()
+        factory = PortFactory(din={"gate": gate})
+        fan = FanOut(open_port=factory)
+        fan.configure([{"port": "din", "bandwidth": 3125}])
+        try:
+            writer = fan.writers()["din"]
+            fan.dispatch(note(60))
+            time.sleep(0.05)                     # 写线程阻塞在第一条音符上
+            for v in range(100):
+                fan.dispatch(mido.Message("control_change", control=1, value=v))
+            fan.dispatch(note(62))
+            gate.set()
+            self.assertTrue(writer.wait_idle(2.0))
+            sent = factory.ports["din"].sent
+            self.assertEqual(sent[0], b"\x90\x3c\x64")
+            self.assertIn(b"\x90\x3e\x64", sent)
+            self.assertEqual(sent[-1], b"\xb0\x01\x63")
+            self.assertLess(len(sent), 10)
+            stats = writer.stats()
+            self.assertGreater(stats["ratio"], 10)
+            self.assertEqual(stats["bandwidth"], 3125)
+        finally:
+            fan.close()
+
+    def test_slow_port_does_not_delay_others(self):
+        gate = threading.Event()
+        factory = PortFactory(slow={"gate": gate}, fast={})
+        fan = FanOut(open_port=factory)
+        fan.configure([{"port": "slow"}, {"port": "fast"}])
+        try:
+            for n in range(20):
+                self.assertEqual(fan.dispatch(note(n)), 2)
+            fast = fan.writers()["fast"]
+            self.assertTrue(fast.wait_idle(2.0))
+            self.assertEqual(len(factory.ports["fast"].sent), 20)
+            slow_stats = fan.writers()["slow"].stats()
+            self.assertGreaterEqual(slow_stats["queue"], 18)
+            self.assertEqual(slow_stats["sent"], 0)
+        finally:
+            gate.set()
+            fan.close()
+
+    def test_full_queue_counts_drops_and_open_failure_counts_errors(self):
+        gate = threading.Event()
+        factory = PortFactory(slow={"gate": gate})
+        fan = FanOut(open_port=factory)
+        fan.configure([{"port": "slow"}, {"port": "missing"}])
+        try:
+            writer = fan.writers()["slow"]
+            for n in range(writer.queue_size + 10):
+                fan.dispatch(note(n % 128))
+            self.assertGreaterEqual(writer.stats()["dropped"], 9)
+            missing = fan.writers()["missing"]
+            for _ in range(100):
+                if missing.errors:
+                    break
+                time.sleep(0.01)
+            self.assertIn("打开失败", missing.stats()["last_error"])
+        finally:
+            gate.set()
+            fan.close()
+
+    def test_note_off_passes_full_queue(self):
+        gate = threading.Event()
+        factory = PortFactory(slow={"gate": gate})
+        fan = FanOut(open_port=factory)
+        fan.configure([{"port": "slow"}])
+        try:
+            writer = fan.writers()["slow"]
+            for n in range(writer.queue_size + 5):
+                fan.dispatch(note(n % 128))
+            dropped = writer.stats()["dropped"]
+            off = mido.Message("note_off", note=60, channel=3)
+            self.assertEqual(fan.dispatch(off), 1)
+            self.assertEqual(writer.stats()["dropped"], dropped)
+            gate.set()
+            self.assertTrue(writer.wait_idle(2.0))
+            self.assertEqual(factory.ports["slow"].sent[-1], bytes(off.bytes()))
+        finally:
+            gate.set()
+            fan.close()
+
+    def test_lost_note_off_sends_all_notes_off_on_recovery(self):
+        factory = PortFactory(flaky={})
+        fan = FanOut(open_port=factory)
+        fan.configure([{"port": "flaky"}])
+        try:
+            writer = fan.writers()["flaky"]
+            fan.dispatch(note(60, channel=2))
+            self.assertTrue(writer.wait_idle(2.0))
+            port = factory.ports["flaky"]
+            real_send = port.send
+            port.send = mock.Mock(side_effect=OSError("usb unplugged"))
+            fan.dispatch(mido.Message("note_off", note=60, channel=2))
+            self.assertTrue(writer.wait_idle(2.0))
+            port.send = real_send
+            fan.dispatch(note(64, channel=0))
+            self.assertTrue(writer.wait_idle(2.0))
+            self.assertEqual(port.sent, [b"\x92\x3c\x64", b"\xb2\x7b\x00", b"\x90\x40\x64"])
+        finally:
+            fan.close()
+
+    def test_stats_polling_does_not_reset_rate(self):
+        factory = PortFactory(a={})
+        fan = FanOut(open_port=factory)
+        fan.configure([{"port": "a"}])
+        try:
+            writer = fan.writers()["a"]
+            for n in range(20):
+                fan.dispatch(note(n))
+            self.assertTrue(writer.wait_idle(2.0))
+            first = writer.stats()["rate"]
+            self.assertGreater(first, 0)
+            self.assertGreater(writer.stats()["rate"], first / 2)
+        finally:
+            fan.close()
+
+    def test_reconfigure_keeps_existing_writer(self):
+        factory = PortFactory(a={}, b={})
+        fan = FanOut(open_port=factory)
+        fan.configure([{"port": "a"}, {"port": "b"}])
+        try:
+            writer_a = fan.writers()["a"]
+            fan.configure([{"port": "a", "types": ["note_on"]}, {"port": "b", "enabled": False}])
+            self.assertIs(fan.writers()["a"], writer_a)
+            self.assertEqual(writer_a.types, frozenset({"note_on"}))
+            self.assertNotIn("b", fan.writers())
+        finally:
+            fan.close()
+
+
+class TestPortManagerFanOut(unittest.TestCase):
+    def test_virtual_port_and_hardware_port_both_receive(self):
+        pm = MidiPortManager(EventBus())
+        factory = PortFactory(synth={})
+        pm.fanout = FanOut(open_port=factory)
+        pm.start("GMS Fanout", backend_name="loopback")
+        pm.set_destinations([{"port": "synth"}, {"port": "GMS Fanout"}])
+        try:
+            self.assertTrue(pm.send_message(note(64)))
+            self.assertTrue(pm.fanout.writers()["synth"].wait_idle(2.0))
+            self.assertEqual(pm.virtual_handle.drain(), [b"\x90\x40\x64"])
+            self.assertEqual(factory.ports["synth"].sent, [b"\x90\x40\x64"])
+            # 与虚拟端口同名的目的地不重复发送
+            self.assertEqual(pm.fanout.writers()["GMS Fanout"].sent, 0)
+            self.assertEqual(pm.state()["destinations"][0]["port"], "synth")
+        finally:
+            pm.set_destinations([])
+            pm.stop()
+
+
+if __name__ == "__main__":
+    unittest.main()
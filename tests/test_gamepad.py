@@ -10,6 +10,7 @@ from gms.bus import EventBus
 from gms.input.gamepad import GamepadEngine
 from gms.input.gamepad_devices import SdlEventJoystick
 from gms.learn import LearnManager
+from gms.schema import GamepadSettings
 from gms.core import axis_to_cc_absolute
 
 
@@ -73,6 +74,11 @@ class FakeMidi:
         self.calls.append(("pitch", value14))
 
 
+def gs(cfg):
+    """测试里就地改过的配置段：每次重新转换（不走 of() 的缓存）"""
+    return GamepadSettings.build(cfg["gamepad"])
+
+
 def make_engine(config_override=None):
     bus = EventBus()
     cfg = {
@@ -109,7 +115,7 @@ class TestCoordinateAbsoluteMode(unittest.TestCase):
         cfg["gamepad"]["mode"] = "xy_absolute"
         eng.joystick._axes[0] = 0.5   # 左摇杆X
         eng.joystick._buttons[8] = True  # L3 按下
-        eng._handle_xy_absolute(cfg["gamepad"])
+        eng._handle_xy_absolute(gs(cfg))
         expected = axis_to_cc_absolute(0.5)  # 95
         self.assertIn(("cc", 1, expected), midi.calls)
 
@@ -118,11 +124,11 @@ class TestCoordinateAbsoluteMode(unittest.TestCase):
         cfg["gamepad"]["mode"] = "xy_absolute"
         eng.joystick._axes[0] = 0.5
         eng.joystick._buttons[8] = True
-        eng._handle_xy_absolute(cfg["gamepad"])
+        eng._handle_xy_absolute(gs(cfg))
         n1 = len(midi.calls)
         eng.joystick._buttons[8] = False  # 松开
         eng.joystick._axes[0] = 0.0       # 回正
-        eng._handle_xy_absolute(cfg["gamepad"])
+        eng._handle_xy_absolute(gs(cfg))
         self.assertEqual(len(midi.calls), n1)  # 不再发送
 
     def test_center_deadzone(self):
@@ -130,7 +136,7 @@ class TestCoordinateAbsoluteMode(unittest.TestCase):
         cfg["gamepad"]["mode"] = "xy_absolute"
         eng.joystick._axes[0] = 0.02
         eng.joystick._buttons[8] = True
-        eng._handle_xy_absolute(cfg["gamepad"])
+        eng._handle_xy_absolute(gs(cfg))
         self.assertIn(("cc", 1, 64), midi.calls)
 
     def test_r3_controls_right_stick(self):
@@ -138,7 +144,7 @@ class TestCoordinateAbsoluteMode(unittest.TestCase):
         cfg["gamepad"]["mode"] = "xy_absolute"
         eng.joystick._axes[2] = -0.5
         eng.joystick._buttons[9] = True  # R3
-        eng._handle_xy_absolute(cfg["gamepad"])
+        eng._handle_xy_absolute(gs(cfg))
         self.assertIn(("cc", 3, axis_to_cc_absolute(-0.5)), midi.calls)
 
     def test_absolute_mode_does_not_trigger_relative(self):
@@ -146,7 +152,7 @@ class TestCoordinateAbsoluteMode(unittest.TestCase):
         cfg["gamepad"]["mode"] = "xy_absolute"
         eng.joystick._axes[0] = 0.5
         # L3 未按下：不产生任何 CC
-        eng._handle_xy_absolute(cfg["gamepad"])
+        eng._handle_xy_absolute(gs(cfg))
         self.assertEqual(midi.calls, [])
 
     def test_snapshot_gates_unheld_sticks_in_absolute_mode(self):
@@ -184,20 +190,29 @@ class TestRelativeMode(unittest.TestCase):
     def test_stick_creates_cc_delta(self):
         eng, midi, cfg = make_engine()
         eng.joystick._axes[0] = 0.5  # 大于死区
-        eng._handle_relative(cfg["gamepad"])
+        eng._handle_relative(gs(cfg))
         # 64 + 0.5*3.0 = 65.5 -> 66
         self.assertTrue(any(c[0] == "cc" and c[1] == 1 for c in midi.calls))
 
     def test_deadzone_no_output(self):
         eng, midi, cfg = make_engine()
         eng.joystick._axes[0] = 0.05  # 死区内
-        eng._handle_relative(cfg["gamepad"])
+        eng._handle_relative(gs(cfg))
         self.assertEqual(midi.calls, [])
 
+    def test_events_within_one_frame_add_one_frame_delta(self):
+        # evdev 有输入即唤醒：一帧内处理多次，累计增量仍约为一帧（64 + 0.5*3.0）
+        eng, midi, cfg = make_engine()
+        eng._poll_ms = 1000
+        eng.joystick._axes[0] = 0.5
+        for _ in range(50):
+            eng._handle_relative(gs(cfg))
+        self.assertAlmostEqual(eng.cc_values[1], 65.5, delta=0.1)
+
     def test_center_returns_no_change(self):
         eng, midi, cfg = make_engine()
         eng.joystick._axes[0] = 0.0
-        eng._handle_relative(cfg["gamepad"])
+        eng._handle_relative(gs(cfg))
         self.assertEqual(midi.calls, [])
 
 
@@ -205,33 +220,43 @@ class TestHat(unittest.TestCase):
     def test_hat_dpad_up_note(self):
         eng, midi, cfg = make_engine()
         eng.joystick._hat = (0, 1)   # 十字键上
-        eng._handle_hat(cfg["gamepad"])
+        eng._handle_hat(gs(cfg))
         self.assertIn(("note_on", 67, 127), midi.calls)  # dpad_up=67
 
     def test_hat_release_off(self):
         eng, midi, cfg = make_engine()
         eng.joystick._hat = (1, 0)   # 右
-        eng._handle_hat(cfg["gamepad"])
+        eng._handle_hat(gs(cfg))
         self.assertIn(("note_on", 72, 127), midi.calls)
         eng.joystick._hat = (0, 0)   # 回中
-        eng._handle_hat(cfg["gamepad"])
+        eng._handle_hat(gs(cfg))
         self.assertIn(("note_off", 72), midi.calls)
 
     def test_hat_switch_direction(self):
         eng, midi, cfg = make_engine()
         eng.joystick._hat = (0, -1)  # 下
-        eng._handle_hat(cfg["gamepad"])
+        eng._handle_hat(gs(cfg))
         self.assertIn(("note_on", 69, 127), midi.calls)
         eng.joystick._hat = (-1, 0)  # 左
-        eng._handle_hat(cfg["gamepad"])
+        eng._handle_hat(gs(cfg))
         self.assertIn(("note_off", 69), midi.calls)
         self.assertIn(("note_on", 71, 127), midi.calls)
 
+    def test_release_uses_sent_note_after_mapping_change(self):
+        # 演奏中切换 profile：松开时释放按下时实际发出的音符
+        eng, midi, cfg = make_engine()
+        eng.joystick._hat = (0, 1)
+        eng._handle_hat(gs(cfg))
+        cfg["gamepad"]["note_mappings"] = dict(cfg["gamepad"]["note_mappings"], dpad_up=40)
+        eng.joystick._hat = (0, 0)
+        eng._handle_hat(gs(cfg))
+        self.assertEqual(midi.calls, [("note_on", 67, 127), ("note_off", 67)])
+
     def test_hat_in_xy_mode_still_works(self):
         eng, midi, cfg = make_engine()
         cfg["gamepad"]["mode"] = "xy_absolute"
         eng.joystick._hat = (0, 1)
-        eng._handle_hat(cfg["gamepad"])
+        eng._handle_hat(gs(cfg))
         self.assertTrue(any(c[0] == "note_on" for c in midi.calls))
 
 
@@ -239,10 +264,10 @@ class TestButtonsAndTriggers(unittest.TestCase):
     def test_button_note_on_off(self):
         eng, midi, cfg = make_engine()
         eng.joystick._buttons[0] = True
-        eng._handle_buttons(cfg["gamepad"])
+        eng._handle_buttons(gs(cfg))
         self.assertIn(("note_on", 60, 127), midi.calls)
         eng.joystick._buttons[0] = False
-        eng._handle_buttons(cfg["gamepad"])
+        eng._handle_buttons(gs(cfg))
         self.assertIn(("note_off", 60), midi.calls)
 
     def test_learn_button_captured(self):
@@ -251,19 +276,19 @@ class TestButtonsAndTriggers(unittest.TestCase):
         eng.bus.subscribe("learn.result", lambda **kw: results.append(kw))
         eng.learn.start({"kind": "note", "key": "button_a"})
         eng.joystick._buttons[8] = True  # L3
-        eng._handle_buttons(cfg["gamepad"])
+        eng._handle_buttons(gs(cfg))
         self.assertEqual(len(results), 1)
         self.assertEqual(results[0]["index"], 8)
         eng.joystick._buttons[8] = False
-        eng._handle_buttons(cfg["gamepad"])
+        eng._handle_buttons(gs(cfg))
         self.assertEqual(midi.calls, [])  # 学习按下与松开都静默
 
     def test_unmapped_button_does_not_default_to_note_60(self):
         eng, midi, cfg = make_engine()
         eng.joystick._buttons[8] = True  # L3 默认未映射音符
-        eng._handle_buttons(cfg["gamepad"])
+        eng._handle_buttons(gs(cfg))
         eng.joystick._buttons[8] = False
-        eng._handle_buttons(cfg["gamepad"])
+        eng._handle_buttons(gs(cfg))
         self.assertEqual(midi.calls, [])
 
     def test_learn_axis_captured(self):
@@ -272,7 +297,7 @@ class TestButtonsAndTriggers(unittest.TestCase):
         eng.bus.subscribe("learn.result", lambda **kw: results.append(kw))
         eng.learn.start({"kind": "cc", "key": "left_stick_x"})
         eng.joystick._axes[0] = 0.6
-        eng._handle_relative(cfg["gamepad"])
+        eng._handle_relative(gs(cfg))
         self.assertEqual(len(results), 1)
         self.assertEqual(results[0]["index"], 0)
 
@@ -280,34 +305,34 @@ class TestButtonsAndTriggers(unittest.TestCase):
         eng, midi, cfg = make_engine()
         cfg["gamepad"]["trigger_mode"] = "cc"
         eng.joystick._axes[4] = 1.0  # LT 全按
-        eng._handle_triggers(cfg["gamepad"])
+        eng._handle_triggers(gs(cfg))
         self.assertIn(("cc", 11, 127), midi.calls)
 
     def test_trigger_velocity_mode(self):
         eng, midi, cfg = make_engine()
         cfg["gamepad"]["trigger_mode"] = "velocity"
         eng.joystick._axes[4] = 1.0
-        eng._handle_triggers(cfg["gamepad"])
+        eng._handle_triggers(gs(cfg))
         self.assertTrue(any(c[0] == "note_on" and c[1] == 77 and c[2] == 127 for c in midi.calls))
 
     def test_signed_trigger_range_is_normalized(self):
         eng, midi, cfg = make_engine()
         cfg["gamepad"]["trigger_mode"] = "cc"
         eng.joystick._axes[4] = -1.0
-        eng._handle_triggers(cfg["gamepad"])
+        eng._handle_triggers(gs(cfg))
         self.assertIn(("cc", 11, 0), midi.calls)
         eng.joystick._axes[4] = 0.0
-        eng._handle_triggers(cfg["gamepad"])
+        eng._handle_triggers(gs(cfg))
         self.assertIn(("cc", 11, 64), midi.calls)
         eng.joystick._axes[4] = 1.0
-        eng._handle_triggers(cfg["gamepad"])
+        eng._handle_triggers(gs(cfg))
         self.assertIn(("cc", 11, 127), midi.calls)
 
     def test_xy_mode_skips_l3_r3_notes(self):
         eng, midi, cfg = make_engine()
         cfg["gamepad"]["mode"] = "xy_absolute"
         eng.joystick._buttons[8] = True
-        eng._handle_buttons(cfg["gamepad"])
+        eng._handle_buttons(gs(cfg))
         self.assertEqual(midi.calls, [])
 
 
@@ -323,10 +348,11 @@ class TestSdlEndToEnd(unittest.TestCase):
         def consume(event):
             adapter.process_event(event)
             eng._capture_frame()
-            eng._handle_relative(cfg["gamepad"])
-            eng._handle_triggers(cfg["gamepad"])
-            eng._handle_hat(cfg["gamepad"])
-            eng._handle_buttons(cfg["gamepad"])
+            eng._rel_t = None           # 每个事件模拟独立的一帧（相对增量按帧长计）
+            eng._handle_relative(gs(cfg))
+            eng._handle_triggers(gs(cfg))
+            eng._handle_hat(gs(cfg))
+            eng._handle_buttons(gs(cfg))
 
         consume(SimpleNamespace(type=pygame.JOYBUTTONDOWN, instance_id=0, button=0))
         consume(SimpleNamespace(type=pygame.JOYBUTTONUP, instance_id=0, button=0))
@@ -355,6 +381,16 @@ class TestSdlEndToEnd(unittest.TestCase):
 
 
 class TestLayoutAndHotplug(unittest.TestCase):
+    def test_config_changed_hot_applies(self):
+        eng, midi, cfg = make_engine()
+        eng.bus.emit("config.changed", paths=[("gamepad", "sensitivity")], config=cfg)
+        self.assertFalse(eng._relayout)
+        cfg["midi"] = dict(cfg["midi"], poll_ms=2)     # update() 产生新配置段
+        eng.bus.emit("config.changed", paths=[("midi", "poll_ms"), ("gamepad", "l3_button")],
+                     config=cfg)
+        self.assertEqual(eng._poll_ms, 2)
+        self.assertTrue(eng._relayout)
+
     def test_xinput_layout_uses_native_button_order(self):
         eng, midi, cfg = make_engine()
         eng.joystick.backend_name = "XInput"
@@ -402,20 +438,20 @@ class TestLayoutAndHotplug(unittest.TestCase):
         # 按住实际 L3(8) -> 左摇杆绝对映射
         eng.joystick._axes[0] = 0.5
         eng.joystick._buttons[8] = True
-        eng._handle_xy_absolute(cfg["gamepad"])
+        eng._handle_xy_absolute(gs(cfg))
         self.assertIn(("cc", 1, axis_to_cc_absolute(0.5)), midi.calls)
         # 按住实际 R3(9) -> 右摇杆绝对映射
         eng.joystick._buttons[8] = False
         eng.joystick._buttons[9] = True
         eng.joystick._axes[2] = -0.5
-        eng._handle_xy_absolute(cfg["gamepad"])
+        eng._handle_xy_absolute(gs(cfg))
         self.assertIn(("cc", 3, axis_to_cc_absolute(-0.5)), midi.calls)
         # Guide(10) 不得误触发左摇杆
         eng.joystick._buttons[9] = False
         eng.joystick._buttons[10] = True
         n = len(midi.calls)
         eng.joystick._axes[0] = -0.5
-        eng._handle_xy_absolute(cfg["gamepad"])
+        eng._handle_xy_absolute(gs(cfg))
         self.assertEqual(len(midi.calls), n)
 
     def test_sdl_layout_one_family_without_mapping_falls_back_legacy(self):
@@ -484,7 +520,7 @@ class TestLayoutAndHotplug(unittest.TestCase):
         self.assertEqual(eng.button_key_map[6], "button_back")
         cfg["gamepad"]["trigger_mode"] = "cc"
         eng.joystick._axes[2] = 1.0    # 物理轴2 = LT
-        eng._handle_triggers(cfg["gamepad"])
+        eng._handle_triggers(gs(cfg))
         self.assertIn(("cc", 11, 127), midi.calls)
 
     def test_manage_joystick_waiting_then_connect(self):
@@ -498,12 +534,18 @@ class TestLayoutAndHotplug(unittest.TestCase):
         adapter = SdlEventJoystick(fake)
         with mock.patch.object(pygame.joystick, "get_count", side_effect=[0, 1, 1]), \
                 mock.patch.object(pygame.joystick, "Joystick", return_value=fake), \
-                mock.patch("gms.input.gamepad.open_gamepad", side_effect=[None, adapter]):
-            eng._manage_joystick(cfg["gamepad"])   # 无手柄：等待
+                mock.patch("gms.input.probe.gamepad_candidates",
+                           side_effect=[[], [("sdl", lambda: adapter)]]):
+            eng._manage_joystick(gs(cfg))   # 无手柄：等待
+            self.assertTrue(eng._prober.wait(1.0))
             self.assertIsNone(eng.joystick)
             self.assertTrue(any("连接后自动启用" in m for m in logs))
-            eng._manage_joystick(cfg["gamepad"])   # 手柄出现：自动连接
-        self.assertIsNotNone(eng.joystick)
+            eng._prober._last_empty = 0.0
+            eng._manage_joystick(gs(cfg))   # 手柄出现：后台探测
+            self.assertIsNone(eng.joystick)        # 探测不阻塞主循环
+            self.assertTrue(eng._prober.wait(1.0))
+            eng._manage_joystick(gs(cfg))   # 取回结果：自动连接
+        self.assertIs(eng.joystick, adapter)
         self.assertTrue(eng.connected)
         self.assertTrue(any(s.get("connected") for s in states))
 
@@ -513,8 +555,11 @@ class TestLayoutAndHotplug(unittest.TestCase):
         native = FakeJoystick()
         native.backend_name = "XInput"
         with mock.patch.object(pygame.joystick, "get_count", return_value=0), \
-                mock.patch("gms.input.gamepad.open_gamepad", return_value=native):
-            eng._manage_joystick(cfg["gamepad"])
+                mock.patch("gms.input.probe.gamepad_candidates",
+                           return_value=[("xinput", lambda: native)]):
+            eng._manage_joystick(gs(cfg))
+            self.assertTrue(eng._prober.wait(1.0))
+            eng._manage_joystick(gs(cfg))
         self.assertIs(eng.joystick, native)
         self.assertTrue(eng.connected)
         self.assertEqual(eng.button_key_map[8], "l3")
@@ -528,16 +573,18 @@ class TestLayoutAndHotplug(unittest.TestCase):
         fake = FakeJoystick()
         with mock.patch.object(pygame.joystick, "get_count", return_value=1), \
                 mock.patch.object(pygame.joystick, "Joystick", return_value=fake):
-            eng._manage_joystick(cfg["gamepad"])
+            eng._manage_joystick(gs(cfg))
+            self.assertTrue(eng._prober.wait(5.0))
+            eng._manage_joystick(gs(cfg))
         self.assertIsNotNone(eng.joystick)
         self.assertEqual(eng._hid_fault_strikes, 0)
 
     def test_lost_releases_notes(self):
         eng, midi, cfg = make_engine()
         eng.joystick._buttons[0] = True
-        eng._handle_buttons(cfg["gamepad"])
+        eng._handle_buttons(gs(cfg))
         self.assertIn(("note_on", 60, 127), midi.calls)
-        eng._on_lost(cfg["gamepad"])
+        eng._on_lost(gs(cfg))
         self.assertIn(("note_off", 60), midi.calls)
         self.assertIsNone(eng.joystick)
         self.assertFalse(eng.connected)
@@ -559,7 +606,7 @@ class TestLayoutAndHotplug(unittest.TestCase):
         """回归：stop() 在十字键按下后不应 NameError（cfg 未定义）"""
         eng, midi, cfg = make_engine()
         eng.joystick._hat = (0, 1)
-        eng._handle_hat(cfg["gamepad"])
+        eng._handle_hat(gs(cfg))
         eng.stop()
         self.assertIn(("note_off", 67), midi.calls)
 
@@ -573,11 +620,11 @@ class TestModeAndLiveLog(unittest.TestCase):
         cfg["gamepad"]["l3_button"] = -1
         cfg["gamepad"]["r3_button"] = -1
         eng._resolve_layout()   # LEGACY: L3=8 R3=9
-        eng._announce_mode("xy_absolute", cfg["gamepad"])
+        eng._announce_mode("xy_absolute", gs(cfg))
         self.assertTrue(any("坐标映射模式" in m and "按钮8" in m and "按钮9" in m for m in logs))
         # 重复调用不重复输出
         n = len(logs)
-        eng._announce_mode("xy_absolute", cfg["gamepad"])
+        eng._announce_mode("xy_absolute", gs(cfg))
         self.assertEqual(len(logs), n)
 
     def test_axis_live_log_edits_in_place(self):
@@ -587,9 +634,9 @@ class TestModeAndLiveLog(unittest.TestCase):
         eng.bus.subscribe("log", lambda **kw: logs.append(kw))
         eng.bus.subscribe("log.update", lambda **kw: updates.append(kw))
         eng.joystick._axes[0] = 0.5
-        eng._handle_relative(cfg["gamepad"])
+        eng._handle_relative(gs(cfg))
         eng.joystick._axes[0] = 0.6
-        eng._handle_relative(cfg["gamepad"])
+        eng._handle_relative(gs(cfg))
         self.assertEqual(len(logs), 1)
         self.assertIsNotNone(logs[0].get("log_id"))
         self.assertIn("开始输出", logs[0]["message"])
@@ -603,11 +650,11 @@ class TestModeAndLiveLog(unittest.TestCase):
         logs = []
         eng.bus.subscribe("log", lambda **kw: logs.append(kw))
         eng.joystick._axes[0] = 0.5
-        eng._handle_relative(cfg["gamepad"])
+        eng._handle_relative(gs(cfg))
         first_id = logs[0]["log_id"]
         eng._live_last_write[cfg["gamepad"]["cc_mappings"]["left_stick_x"]] = 0.0
         eng.joystick._axes[0] = 0.7
-        eng._handle_relative(cfg["gamepad"])
+        eng._handle_relative(gs(cfg))
         self.assertEqual(len(logs), 2)
         self.assertNotEqual(logs[1]["log_id"], first_id)
 
@@ -622,5 +669,53 @@ class TestModeAndLiveLog(unittest.TestCase):
         self.assertAlmostEqual(eng._trigger_value("lt", 1.0, "sdl"), 1.0)
 
 
+class TestFramePublish(unittest.TestCase):
+    def _publish(self, eng, cfg):
+        eng._capture_frame()
+        eng._publish_frame(gs(cfg))
+        return eng.frames.latest()
+
+    def test_logical_axes_follow_resolved_layout(self):
+        eng, _, cfg = make_engine()
+        eng.axis_src = {"lx": 1, "ly": 0, "rx": 3, "ry": 2, "lt": 5, "rt": 4}
+        eng.joystick._axes = [0.25, -0.5, 0.0, 0.75, 1.0, -1.0]
+        frame = self._publish(eng, cfg)
+        self.assertEqual(frame.axis("lx"), -0.5)
+        self.assertEqual(frame.axis("ly"), -0.25)          # invert_y
+        self.assertEqual(frame.axis("ry"), 0.0)
+        self.assertEqual(frame.axis("rx"), 0.75)
+        self.assertEqual(frame.axis("lt"), 0.0)            # -1..1 语义的扳机换算到 0..1
+        self.assertEqual(frame.axis("rt"), 1.0)
+
+    def test_published_frame_is_immutable_and_versioned(self):
+        eng, _, cfg = make_engine()
+        eng.joystick._axes[0] = 0.5
+        first = self._publish(eng, cfg)
+        read_lx = eng.frames.source("lx")
+        eng.joystick._axes[0] = -0.5                       # 适配器状态变化不影响已发布帧
+        self.assertEqual(first.raw["axes"][0], 0.5)
+        self.assertEqual(read_lx(), 0.5)
+        second = self._publish(eng, cfg)
+        self.assertEqual(second.version, first.version + 1)
+        self.assertEqual(read_lx(), -0.5)
+        with self.assertRaises(ValueError):
+            eng.frames.source("bogus")
+
+    def test_snapshot_reads_store_not_adapter(self):
+        eng, _, cfg = make_engine()
+        eng.joystick._axes[0] = 0.3
+        self._publish(eng, cfg)
+        with mock.patch.object(eng.joystick, "get_axis", side_effect=AssertionError):
+            self.assertEqual(eng.state_snapshot()["axes"][0], 0.3)
+
+    def test_stop_clears_store(self):
+        eng, _, cfg = make_engine()
+        self._publish(eng, cfg)
+        read_rt = eng.frames.source("rt")
+        eng.stop()
+        self.assertIsNone(eng.frames.latest())
+        self.assertEqual(read_rt(), 0.0)
+
+
 if __name__ == "__main__":
     unittest.main()
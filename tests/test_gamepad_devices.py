@@ -1,4 +1,7 @@
 import ctypes
+import os
+import struct
+import sys
 import threading
 import time
 import unittest
@@ -8,7 +11,8 @@ from unittest import mock
 import pygame
 
 from gms.input.gamepad_devices import (
-    HidJoystick, SdlEventJoystick, XInputJoystick, _XInputState, open_gamepad,
+    EvdevJoystick, HidJoystick, SdlEventJoystick, XInputJoystick, _XInputState,
+    open_gamepad,
 )
 
 
@@ -108,6 +112,46 @@ class TestSdlEventState(unittest.TestCase):
         self.assertFalse(self.joystick.poll_refresh())
         self.assertTrue(self.joystick.get_button(0))
 
+    def test_reconcile_runs_at_configured_rate(self):
+        """对账按频率运行：间隔内的帧只合并事件，不做 SDL 直读。"""
+        joystick = SdlEventJoystick(self.raw, reconcile_hz=10.0)
+        self.assertFalse(joystick.poll_refresh())     # 首帧立即对账
+        self.raw.axes[0] = 0.9
+        self.assertFalse(joystick.poll_refresh())     # 间隔内：跳过直读
+        self.assertEqual(joystick.get_axis(0), 0.0)
+        stats = joystick.stats()
+        self.assertEqual(stats["reconcile_passes"], 1)
+        self.assertEqual(stats["frames_skipped"], 1)
+        self.assertGreater(stats["reconcile_calls"], 17)   # 6 轴 + 11 键 + 十字键
+        self.assertTrue(joystick.reconcile())
+        self.assertAlmostEqual(joystick.get_axis(0), 0.9)
+
+    def test_reconcile_backs_off_once_events_cover_all_indices(self):
+        joystick = SdlEventJoystick(self.raw, reconcile_hz=20.0)
+        for axis in range(6):
+            joystick.process_event(SimpleNamespace(
+                type=pygame.JOYAXISMOTION, instance_id=7, axis=axis, value=0.0))
+        for button in range(11):
+            joystick.process_event(SimpleNamespace(
+                type=pygame.JOYBUTTONUP, instance_id=7, button=button))
+        joystick.process_event(SimpleNamespace(
+            type=pygame.JOYHATMOTION, instance_id=7, value=(0, 0)))
+        joystick.reconcile()
+        first = joystick.stats()["reconcile_interval"]
+        joystick.reconcile()
+        self.assertGreater(joystick.stats()["reconcile_interval"], first)
+        self.assertEqual(joystick.stats()["reconcile_calls"], 6)   # 仅 3 次计数查询/次
+        for _ in range(10):
+            joystick.reconcile()
+        self.assertEqual(joystick.stats()["reconcile_interval"],
+                         SdlEventJoystick.RECONCILE_MAX_INTERVAL)
+
+    def test_reconcile_without_coverage_keeps_base_rate(self):
+        joystick = SdlEventJoystick(self.raw, reconcile_hz=20.0)
+        joystick.reconcile()
+        joystick.reconcile()
+        self.assertAlmostEqual(joystick.stats()["reconcile_interval"], 0.05)
+
     def test_open_gamepad_defaults_to_sdl_primary(self):
         adapter = open_gamepad(self.raw, 0x1234, 0x5678)
         self.assertNotIsInstance(adapter, XInputJoystick)
@@ -553,5 +597,99 @@ class TestSnapshotSourceSelection(unittest.TestCase):
         self.assertEqual(joystick.get_numbuttons(), 16)
 
 
+def _input_event(ev_type, code, value, sec=100, usec=250000):
+    return struct.pack("@llHHi", sec, usec, ev_type, code, value)
+
+
+def _syn(sec=100, usec=250000):
+    return _input_event(0, 0, 0, sec, usec)
+
+
+@unittest.skipUnless(sys.platform.startswith("linux"), "evdev 仅 Linux")
+class TestEvdevDecode(unittest.TestCase):
+    """input_event 字节经管道喂给适配器：验证 epoll 读取、SYN 原子提交与归一化。"""
+
+    ABSINFO = {0x00: (-32768, 32767), 0x01: (-32768, 32767),
+               0x03: (-32768, 32767), 0x04: (-32768, 32767),
+               0x02: (0, 1023), 0x05: (0, 1023),
+               0x10: (-1, 1), 0x11: (-1, 1)}
+    KEYS = {0x130, 0x131, 0x133, 0x134, 0x136, 0x137, 0x13A, 0x13B,
+            0x13C, 0x13D, 0x13E}
+
+    def setUp(self):
+        self.read_fd, self.write_fd = os.pipe()
+        self.joystick = EvdevJoystick(self.read_fd, "Fake evdev pad", self.ABSINFO,
+                                      self.KEYS, input_id=(3, 0x045E, 0x028E, 0x114))
+
+    def tearDown(self):
+        self.joystick.quit()
+        os.close(self.write_fd)
+
+    def test_idle_poll_reports_no_change(self):
+        self.assertFalse(self.joystick.poll_refresh())
+        self.assertFalse(self.joystick.consume_changed())
+
+    def test_events_commit_only_on_syn_report(self):
+        os.write(self.write_fd, _input_event(1, 0x130, 1) + _input_event(3, 0x00, 32767))
+        self.assertFalse(self.joystick.poll_refresh())
+        self.assertFalse(self.joystick.get_button(0))
+        os.write(self.write_fd, _syn(sec=42, usec=500000))
+        self.assertTrue(self.joystick.poll_refresh())
+        self.assertTrue(self.joystick.get_button(0))
+        self.assertAlmostEqual(self.joystick.get_axis(0), 1.0)
+        self.assertEqual(self.joystick.last_event_time(), 42.5)
+        self.assertEqual(self.joystick.last_change(), 42.5)
+        self.assertTrue(self.joystick.consume_changed())
+
+    def test_absinfo_normalization_and_xinput_order(self):
+        os.write(self.write_fd, b"".join([
+            _input_event(3, 0x01, -32768), _input_event(3, 0x02, 1023),
+            _input_event(3, 0x05, 0), _input_event(1, 0x13D, 1),
+            _input_event(1, 0x13C, 1), _syn()]))
+        self.joystick.poll_refresh()
+        axes, buttons, hat, nax, nbtn, source = self.joystick.snapshot()
+        self.assertEqual(source, "evdev")
+        self.assertAlmostEqual(axes[1], -1.0)
+        self.assertAlmostEqual(axes[4], 1.0)    # LT 0..1
+        self.assertAlmostEqual(axes[5], 0.0)
+        self.assertTrue(buttons[8])             # L3 = XInput 序 8
+        self.assertTrue(buttons[10])            # Guide 在末位
+        self.assertEqual(nbtn, 11)
+
+    def test_hat_up_is_positive(self):
+        os.write(self.write_fd, _input_event(3, 0x11, -1) + _syn())
+        self.joystick.poll_refresh()
+        self.assertEqual(self.joystick.get_hat(0), (0, 1))
+        os.write(self.write_fd, _input_event(3, 0x11, 0) + _input_event(3, 0x10, 1) + _syn())
+        self.joystick.poll_refresh()
+        self.assertEqual(self.joystick.get_hat(0), (1, 0))
+
+    def test_partial_record_is_buffered(self):
+        data = _input_event(1, 0x131, 1) + _syn()
+        os.write(self.write_fd, data[:30])
+        self.joystick.poll_refresh()
+        os.write(self.write_fd, data[30:])
+        self.assertTrue(self.joystick.poll_refresh())
+        self.assertTrue(self.joystick.get_button(1))
+
+    def test_syn_dropped_discards_partial_frame(self):
+        os.write(self.write_fd, _input_event(1, 0x130, 1) + _input_event(0, 3, 0) +
+                 _input_event(1, 0x131, 1) + _syn())
+        self.joystick.poll_refresh()
+        self.assertFalse(self.joystick.get_button(0))
+        self.assertFalse(self.joystick.get_button(1))
+        self.assertEqual(self.joystick.syn_dropped, 1)
+
+    def test_wait_input_wakes_on_data(self):
+        self.assertFalse(self.joystick.wait_input(0.0))
+        os.write(self.write_fd, _syn())
+        self.assertTrue(self.joystick.wait_input(0.5))
+
+    def test_guid_carries_vid_pid_for_layout(self):
+        from gms.input.gamepad import GamepadEngine
+        vid, pid = GamepadEngine._vid_pid_from_guid(self.joystick.get_guid())
+        self.assertEqual((vid, pid), (0x045E, 0x028E))
+
+
 if __name__ == "__main__":
     unittest.main()
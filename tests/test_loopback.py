@@ -0,0 +1,112 @@
+"""loopback / null 内核测试：环形缓冲、回显与 MidiEngine → MidiPortManager 全链路"""
+
+import threading
+import unittest
+
+from gms.bus import EventBus
+from gms.config import DEFAULTS, deep_merge
+from gms.midi.backends import MidiPortManager
+from gms.midi.engine import MidiEngine
+from gms.midi.loopback_backend import LoopbackBackend, LoopbackPort
+
+
+def make_stack(backend_name, echo=False):
+    bus = EventBus()
+    pm = MidiPortManager(bus)
+    pm.start("GMS Loopback", backend_name=backend_name, loopback_echo=echo)
+    cfg = deep_merge(DEFAULTS, {})
+    engine = MidiEngine(bus, pm, lambda: cfg)
+    return bus, pm, engine
+
+
+class TestLoopbackRing(unittest.TestCase):
+    def test_drain_returns_messages_in_order(self):
+        port = LoopbackPort("t", capacity=64, slots=8)
+        port.write(b"\x90\x3c\x64")
+        port.write(b"\xc0\x05")
+        self.assertEqual(port.drain(), [b"\x90\x3c\x64", b"\xc0\x05"])
+        self.assertEqual(port.drain(), [])
+        self.assertEqual(port.stats()["messages"], 2)
+
+    def test_wraparound_keeps_latest_and_counts_overruns(self):
+        port = LoopbackPort("t", capacity=8, slots=4)
+        for note in range(6):
+            port.write(bytes([0x90, note, 100]))
+        # 8 字节环只容得下最后两条完整消息（第 6 条跨越环尾）
+        self.assertEqual(port.drain(), [b"\x90\x04\x64", b"\x90\x05\x64"])
+        self.assertEqual(port.overruns, 4)
+
+    def test_oversized_message_dropped(self):
+        port = LoopbackPort("t", capacity=4, slots=4)
+        self.assertFalse(port.write(b"\xf0" + bytes(8) + b"\xf7"))
+        self.assertEqual(port.dropped, 1)
+
+
+class TestLoopbackStack(unittest.TestCase):
+    def test_engine_output_captured(self):
+        _, pm, engine = make_stack("loopback")
+        try:
+            engine.note_on(60, 100, channel=1)
+            engine.cc(7, 64, channel=2)
+            port = pm.backends["loopback"].last_port
+            self.assertIs(pm.virtual_handle, port)
+            self.assertEqual(port.drain(), [b"\x90\x3c\x64", b"\xb1\x07\x40"])
+        finally:
+            pm.stop()
+        self.assertFalse(port)
+
+    def test_echo_into_midi_input_without_feedback_loop(self):
+        bus, pm, engine = make_stack("loopback", echo=True)
+        received = []
+
+        def on_input(data):
+            received.append(bytes(data))
+            engine.note_on(data[1] + 12, channel=1)   # 订阅者再次发送：不应无限回显
+
+        bus.subscribe("midi.input", on_input)
+        try:
+            engine.note_on(60, 100, channel=1)
+            self.assertEqual(received, [b"\x90\x3c\x64"])
+            self.assertEqual(pm.virtual_handle.drain(), [b"\x90\x3c\x64", b"\x90\x48\x64"])
+        finally:
+            pm.stop()
+
+    def test_echo_guard_is_per_thread(self):
+        # 一个线程停在回显回调里时，另一线程的发送仍应回显
+        backend = LoopbackBackend(echo=True)
+        entered, release = threading.Event(), threading.Event()
+        received = []
+
+        def on_input(data):
+            received.append(bytes(data))
+            if data[1] == 60:
+                entered.set()
+                release.wait(2.0)
+
+        port = backend.create_port("t", on_input)
+        first = threading.Thread(target=backend.send, args=(port, b"\x90\x3c\x64"))
+        first.start()
+        self.assertTrue(entered.wait(2.0))
+        backend.send(port, b"\x90\x3e\x64")
+        release.set()
+        first.join(2.0)
+        self.assertEqual(received, [b"\x90\x3c\x64", b"\x90\x3e\x64"])
+
+    def test_null_backend_only_counts(self):
+        _, pm, engine = make_stack("null")
+        try:
+            for _ in range(50):          # 发声矩阵只放行 0↔1 变化：开关交替
+                engine.note_on(60, 100)
+                engine.note_off(60)
+            self.assertEqual(pm.state()["virtual_stats"], {"messages": 100, "bytes": 300})
+        finally:
+            pm.stop()
+
+    def test_backends_selectable(self):
+        pm = MidiPortManager(EventBus())
+        self.assertIsInstance(pm.backends["loopback"], LoopbackBackend)
+        self.assertTrue(pm.backends["null"].is_available())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+"""发声矩阵测试：引用计数只在 0↔1 时发送、多余 note_off 丢弃、panic 精确释放、重发力度、跨来源重叠"""
+
+import threading
+import unittest
+from unittest import mock
+
+from gms.bus import EventBus
+from gms.config import DEFAULTS, deep_merge
+from gms.midi.backends import MidiPortManager
+from gms.midi.engine import MidiEngine
+from gms.midi.scheduler import Scheduler
+from gms.tools.base import ToolContext
+from gms.tools.chord_arpeggiator import ChordArp
+from gms.tools.keyboard_pads import KeyboardPads
+
+
+class TestNoteMatrix(unittest.TestCase):
+    def setUp(self):
+        self.bus = EventBus()
+        self.pm = MidiPortManager(self.bus)
+        self.pm.start("GMS Notes", backend_name="loopback")
+        self.cfg = deep_merge(DEFAULTS, {})
+        self.engine = MidiEngine(self.bus, self.pm, lambda: self.cfg)
+        self.port = self.pm.backends["loopback"].last_port
+
+    def tearDown(self):
+        self.engine.close()
+        self.pm.stop()
+
+    def test_only_transitions_are_sent(self):
+        self.engine.note_on(60, 100, channel=1)
+        self.engine.note_on(60, 90, channel=1)
+        self.engine.note_off(60, channel=1)
+        self.assertTrue(self.engine.is_sounding(60, channel=1))
+        self.engine.note_off(60, channel=1)
+        self.engine.note_off(60, channel=1)            # 多余：丢弃
+        self.assertEqual(self.port.drain(), [b"\x90\x3c\x64", b"\x80\x3c\x00"])
+        self.assertFalse(self.engine.is_sounding(60, channel=1))
+
+    def test_velocity_zero_counts_as_off_and_channels_independent(self):
+        self.engine.note_on(60, 100, channel=1)
+        self.engine.note_on(60, 100, channel=2)
+        self.engine.send_message("note_on", channel=1, note=60, velocity=0)
+        self.assertEqual(self.engine.note_stats(), {"sounding": 1, "channels": {2: 1}})
+        self.assertEqual(self.port.drain(), [b"\x90\x3c\x64", b"\x91\x3c\x64",
+                                             b"\x90\x3c\x00"])
+
+    def test_panic_releases_exactly_what_sounds(self):
+        for note in (60, 64, 67):
+            self.engine.note_on(note, 100, channel=3)
+        self.engine.note_on(64, 100, channel=3)
+        self.engine.note_on(36, 100, channel=10)
+        self.port.drain()
+        self.assertEqual(self.engine.panic(), 4)
+        self.assertEqual(sorted(self.port.drain()), sorted([
+            b"\x82\x3c\x00", b"\x82\x40\x00", b"\x82\x43\x00", b"\x89\x24\x00"]))
+        self.assertEqual(self.engine.note_stats()["sounding"], 0)
+        self.engine.note_off(64, channel=3)            # 来源稍后补发的 note_off：丢弃
+        self.assertEqual(self.port.drain(), [])
+
+    def test_restrike_keeps_single_reference(self):
+        self.assertFalse(self.engine.restrike(60, 80, channel=1))     # 未发声：不发送
+        self.engine.note_on(60, 40, channel=1)
+        self.assertTrue(self.engine.restrike(60, 90, channel=1))
+        self.engine.note_off(60, channel=1)
+        self.assertEqual(self.port.drain(), [b"\x90\x3c\x28", b"\x90\x3c\x5a",
+                                             b"\x80\x3c\x00"])
+        self.assertEqual(self.engine.note_stats()["sounding"], 0)
+
+    def test_delivery_runs_outside_matrix_lock(self):
+        # midi.event 回调（UI 刷新等）期间，其他线程仍可发声；同一槽位的 note_off 排队到发送之后
+        finished = []
+
+        def on_event(type, channel, fields):
+            if type == "note_on" and fields["note"] == 60 and not finished:
+                other = threading.Thread(target=lambda: (
+                    self.engine.note_on(64, 100, channel=1),
+                    self.engine.note_off(60, channel=1)))
+                other.start()
+                other.join(1.0)
+                finished.append(not other.is_alive())
+
+        self.bus.subscribe("midi.event", on_event)
+        self.engine.note_on(60, 100, channel=1)
+        self.assertEqual(finished, [True])
+        self.assertEqual(self.port.drain(), [b"\x90\x3c\x64", b"\x90\x40\x64",
+                                             b"\x80\x3c\x00"])
+        self.assertEqual(self.engine.note_stats()["sounding"], 1)
+
+    def test_overlapping_tools_do_not_cut_each_other(self):
+        ctx = ToolContext(self.bus, self.engine, None, mock.Mock(active=False), None,
+                          lambda: self.cfg, None, scheduler=Scheduler(self.bus))
+        self.addCleanup(ctx.scheduler.close)
+        chords = ChordArp(ctx)
+        pads = KeyboardPads(ctx)
+        pads._on_key("q", {"q"})                        # 打击垫 q = 60
+        pads._on_key("q", {"q"})                        # 自动重复不再加引用
+        chords._press("a", {"chord": [60, 64]})
+        chords._press("b", {"chord": [64, 67]})
+        chords._release("a")
+        self.assertTrue(self.engine.is_sounding(60))
+        self.assertTrue(self.engine.is_sounding(64))
+        chords._release("b")
+        self.assertEqual(self.engine.note_stats()["sounding"], 1)
+        pads._on_key("q", set())
+        self.assertEqual(self.engine.note_stats()["sounding"], 0)
+        sent = self.port.drain()
+        self.assertEqual(sent.count(b"\x90\x3c\x64"), 1)
+        self.assertEqual(sent.count(b"\x80\x3c\x00"), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+"""手柄适配器并行探测测试：优先级、超时、last-known-good 缓存与落选回收"""
+
+import threading
+import time
+import unittest
+from unittest import mock
+
+from gms.bus import EventBus
+from gms.input.probe import AdapterProber, probe_gamepad
+
+
+class FakeAdapter:
+    def __init__(self, name):
+        self.name = name
+        self.released = False
+
+    def release(self):
+        self.released = True
+
+
+class TestProbeGamepad(unittest.TestCase):
+    def test_highest_priority_success_wins_and_losers_released(self):
+        hid, sdl = FakeAdapter("hid"), FakeAdapter("sdl")
+        adapter, backend, failures = probe_gamepad(
+            [("xinput", lambda: None), ("hid", lambda: hid), ("sdl", lambda: sdl)])
+        self.assertIs(adapter, hid)
+        self.assertEqual(backend, "hid")
+        self.assertEqual(failures, [])
+        self.assertTrue(sdl.released)
+        self.assertFalse(hid.released)
+
+    def test_slow_candidate_times_out_and_is_released_later(self):
+        gate = threading.Event()
+        slow, sdl = FakeAdapter("hid"), FakeAdapter("sdl")
+
+        def slow_open():
+            gate.wait(2.0)
+            return slow
+
+        started = time.monotonic()
+        adapter, backend, failures = probe_gamepad(
+            [("hid", slow_open), ("sdl", lambda: sdl)], timeout=0.1)
+        self.assertLess(time.monotonic() - started, 1.0)
+        self.assertIs(adapter, sdl)
+        self.assertEqual(failures[0][0], "hid")
+        self.assertIn("超时", failures[0][1])
+        gate.set()
+        for _ in range(100):
+            if slow.released:
+                break
+            time.sleep(0.01)
+        self.assertTrue(slow.released)
+
+    def test_exception_counts_as_failure(self):
+        def boom():
+            raise OSError("access denied")
+
+        adapter, backend, failures = probe_gamepad([("hid", boom), ("sdl", lambda: None)])
+        self.assertIsNone(adapter)
+        self.assertEqual(failures, [("hid", "OSError: access denied")])
+
+    def test_preferred_backend_tried_alone_first(self):
+        calls = []
+
+        def opener(name, result):
+            def _open():
+                calls.append(name)
+                return result
+            return _open
+
+        sdl = FakeAdapter("sdl")
+        adapter, backend, _ = probe_gamepad(
+            [("xinput", opener("xinput", None)), ("sdl", opener("sdl", sdl))],
+            preferred="sdl")
+        self.assertIs(adapter, sdl)
+        self.assertEqual(calls, ["sdl"])
+
+
+class TestAdapterProber(unittest.TestCase):
+    def test_request_is_async_and_caches_backend_per_vid_pid(self):
+        bus = EventBus()
+        logs = []
+        bus.subscribe("log", lambda message, **kw: logs.append(message))
+        prober = AdapterProber(bus)
+        first = FakeAdapter("hid")
+        with mock.patch("gms.input.probe.gamepad_candidates",
+                        return_value=[("xinput", lambda: None), ("hid", lambda: first)]):
+            self.assertTrue(prober.request(object(), 0x045E, 0x0B13))
+            self.assertTrue(prober.wait(1.0))
+        self.assertIs(prober.poll(), first)
+        self.assertIsNone(prober.poll())
+        self.assertEqual(prober.preferred_backend(0x045E, 0x0B13), "hid")
+        stats = prober.stats()
+        self.assertEqual(stats["connected"], 1)
+        self.assertEqual(stats["cache"], {"045E:0B13": "hid"})
+        self.assertTrue(any("用时" in m for m in logs))
+
+    def test_cancel_discards_in_flight_result(self):
+        gate = threading.Event()
+        adapter = FakeAdapter("sdl")
+        prober = AdapterProber(EventBus())
+
+        def slow():
+            gate.wait(1.0)
+            return adapter
+
+        with mock.patch("gms.input.probe.gamepad_candidates", return_value=[("sdl", slow)]):
+            prober.request(object(), 1, 2)
+            prober.cancel()
+            gate.set()
+            prober.wait(1.0)
+        self.assertIsNone(prober.poll())
+        self.assertTrue(adapter.released)
+
+    def test_failures_are_counted(self):
+        prober = AdapterProber(EventBus())
+
+        def boom():
+            raise RuntimeError("HID interface is not a game controller")
+
+        with mock.patch("gms.input.probe.gamepad_candidates",
+                        return_value=[("hid", boom), ("sdl", lambda: FakeAdapter("sdl"))]):
+            prober.request(object(), 1, 2)
+            prober.wait(1.0)
+        self.assertEqual(prober.stats()["failures"], {"hid": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
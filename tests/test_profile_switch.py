@@ -0,0 +1,167 @@
+"""预载 profile 热切换测试：切换不读盘、结构共享、内存修改随切换保留、组合键与 Program Change 触发"""
+
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from gms.bus import EventBus
+from gms.config import ProfileManager
+from gms.input.gamepad import GamepadEngine
+from gms.learn import LearnManager
+from gms.midi.backends import MidiPortManager
+from gms.midi.engine import MidiEngine
+from gms.midi.scheduler import Scheduler
+from gms.profile_switch import ProfileSwitcher
+from gms.tools.base import ToolContext
+from gms.tools.chord_arpeggiator import ChordArp
+from gms.tools.keyboard_pads import KeyboardPads
+
+
+class FakeGamepad:
+    def __init__(self):
+        self.button_states = {}
+        self.keys = {0: "button_a", 6: "back", 7: "start"}
+
+    def button_key(self, idx):
+        return self.keys.get(idx)
+
+
+class TestPreloadedProfiles(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.bus = EventBus()
+        self.changes = []
+        self.bus.subscribe("config.changed", lambda **kw: self.changes.append(kw["paths"]))
+        self.pm = ProfileManager(Path(self.tmp.name), bus=self.bus)
+        self.pm.update({"gamepad": {"sensitivity": 2.0}})
+        self.pm.save_profile("live")
+        self.pm.update({"midi": {"channel": 4}})
+        self.pm.flush()
+        other = ProfileManager(Path(self.tmp.name))      # 只写文件，不进入本实例内存
+        other.update({"clock": {"bpm": 90.0}})
+        other.save_profile("slow")
+        other.close()
+        self.changes.clear()
+
+    def tearDown(self):
+        self.pm.close()
+        self.tmp.cleanup()
+
+    def test_switch_after_preload_does_not_read_disk(self):
+        self.assertEqual(self.pm.preload(), ["slow"])
+        with mock.patch.object(ProfileManager, "_read_profile", side_effect=AssertionError):
+            self.assertTrue(self.pm.switch_profile("slow"))
+            self.assertTrue(self.pm.switch_profile("live"))
+        self.assertEqual(self.pm.current()["clock"]["bpm"], 120.0)
+        self.assertEqual(self.changes[0], [("clock", "bpm")])
+
+    def test_preloaded_profiles_share_equal_branches(self):
+        self.pm.preload()
+        default = self.pm.current()
+        self.pm.switch_profile("slow")
+        self.assertIs(self.pm.current()["tools"], default["tools"])
+        self.assertIs(self.pm.current()["gamepad"], default["gamepad"])
+
+    def test_memory_edits_survive_switch_and_persist(self):
+        self.pm.preload()
+        self.pm.switch_profile("slow")
+        self.pm.update({"midi": {"channel": 9}})
+        self.pm.switch_profile("default")
+        self.pm.switch_profile("slow")
+        self.assertEqual(self.pm.current()["midi"]["channel"], 9)
+        self.pm.flush()
+        self.assertEqual(self.pm.export_profile("slow")["midi"]["channel"], 9)
+
+    def test_unknown_profile_falls_back_to_disk(self):
+        self.assertTrue(self.pm.switch_profile("slow"))       # 未预载：读盘
+        self.assertFalse(self.pm.switch_profile("missing"))
+        self.assertEqual(self.pm.current_name, "slow")
+
+
+class TestProfileSwitcher(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.bus = EventBus()
+        self.pm = ProfileManager(Path(self.tmp.name), bus=self.bus)
+        self.pm.update({"profile_switch": {"combo": ["back"], "buttons": {"button_a": "live"},
+                                           "programs": {"3": "default"}, "pc_channel": 2}})
+        self.pm.save_profile("live")
+        self.gamepad = FakeGamepad()
+        self.switcher = ProfileSwitcher(self.bus, self.pm, self.gamepad)
+        self.switcher.start()
+        self.switched = []
+        self.bus.subscribe("profile.switched", lambda **kw: self.switched.append(kw))
+
+    def tearDown(self):
+        self.switcher.stop()
+        self.pm.close()
+        self.tmp.cleanup()
+
+    def test_combo_required(self):
+        self.bus.emit("gamepad.button", index=0, key="button_a")
+        self.assertEqual(self.pm.current_name, "default")
+        self.gamepad.button_states = {6: True, 0: True}
+        self.bus.emit("gamepad.button", index=0, key="button_a")
+        self.assertEqual(self.pm.current_name, "live")
+        self.assertEqual(self.switched[0]["source"], "手柄")
+        self.assertGreaterEqual(self.switched[0]["ms"], 0.0)
+        self.assertIsNotNone(self.switcher.state()["last_ms"])
+
+    def test_program_change(self):
+        self.pm.switch_profile("live")
+        self.bus.emit("midi.input", data=bytes([0xC0, 3]))     # 通道 1：忽略
+        self.assertEqual(self.pm.current_name, "live")
+        self.bus.emit("midi.input", data=bytes([0xC1, 3]))
+        self.assertEqual(self.pm.current_name, "default")
+        self.bus.emit("midi.input", data=bytes([0xC1, 1]))     # 未列出：按预设列表顺序
+        self.assertEqual(self.pm.current_name, "live")
+        self.bus.emit("midi.input", data=bytes([0xC1, 50]))
+        self.assertEqual(self.pm.current_name, "live")
+        self.assertEqual(self.switcher.switches, 2)
+
+
+class TestHeldNotesAcrossSwitch(unittest.TestCase):
+    """按住音符期间切换到 midi.channel 不同的 profile：音符在按下时的通道上释放"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.bus = EventBus()
+        self.pm = ProfileManager(Path(self.tmp.name), bus=self.bus)
+        self.pm.update({"midi": {"channel": 2}})
+        self.pm.save_profile("ch2")
+        self.pm.update({"midi": {"channel": 1}})
+        self.ports = MidiPortManager(self.bus)
+        self.ports.start("GMS Switch", backend_name="loopback")
+        self.port = self.ports.backends["loopback"].last_port
+        self.engine = MidiEngine(self.bus, self.ports, self.pm.current)
+        self.ctx = ToolContext(self.bus, self.engine, None, mock.Mock(active=False), None,
+                               self.pm.current, self.pm.update, scheduler=Scheduler(self.bus))
+
+    def tearDown(self):
+        self.ctx.scheduler.close()
+        self.engine.close()
+        self.ports.stop()
+        self.pm.close()
+        self.tmp.cleanup()
+
+    def test_notes_held_across_channel_switch_are_released(self):
+        pads = KeyboardPads(self.ctx)
+        chords = ChordArp(self.ctx)
+        gamepad = GamepadEngine(self.bus, self.engine, self.pm.current, LearnManager(self.bus))
+        pads._on_key("w", {"w"})                            # 打击垫 w = 62
+        chords._press("c", {"chord": [64, 67]})
+        gamepad._button_pressed(0, gamepad._settings())     # button_a
+        self.assertTrue(self.pm.switch_profile("ch2"))
+        self.assertEqual(self.engine.note_stats()["channels"], {1: 4})
+        pads._on_key("w", set())
+        chords._release("c")
+        gamepad._button_released(0, gamepad._settings())
+        self.assertEqual(self.engine.note_stats()["sounding"], 0)
+        sent = self.port.drain()
+        self.assertFalse([m for m in sent if m[0] & 0x0F])  # 全部在通道 1
+        self.assertEqual(sum(1 for m in sent if m[0] == 0x80), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,154 @@
+"""表演录制测试：类型数组分块增长、CC 抽稀、网格量化保持时值、停止后保存为 .mid 引用"""
+
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from gms.bus import EventBus
+from gms.config import DEFAULTS, deep_merge
+from gms.midi import recorder as recorder_mod
+from gms.midi import smf
+from gms.midi.recorder import PerformanceRecorder
+from gms.midi.scheduler import Scheduler
+from gms.tools import hotkey_clip
+from gms.tools.base import ToolContext
+from gms.tools.hotkey_clip import HotkeyClip
+
+
+class FakeClock:
+    """time.monotonic_ns 替身：每次调用返回 now，可手动推进"""
+
+    def __init__(self):
+        self.now = 1_000_000_000
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, ms):
+        self.now += int(ms * 1e6)
+
+
+class TestPerformanceRecorder(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch.object(recorder_mod.time, "monotonic_ns", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.rec = PerformanceRecorder(chunk=4)
+        self.rec.start()
+
+    def feed(self, ms, type, channel=0, **fields):
+        self.clock.now = 1_000_000_000 + int(ms * 1e6)
+        self.rec.on_event(type=type, channel=channel, fields=fields)
+
+    def test_chunked_growth_keeps_all_events(self):
+        for i in range(10):
+            self.feed(i, "control_change", control=1, value=i)
+        self.feed(10, "sysex", data=[1])               # 非 clip 消息忽略
+        self.assertEqual(len(self.rec), 10)
+        self.assertEqual(len(self.rec.status), 12)     # 3 个分块
+        self.rec.stop()
+        clip = self.rec.to_clip()
+        self.assertEqual(list(clip.data2), list(range(10)))
+        self.assertEqual(list(clip.times), [float(i) for i in range(10)])
+
+    def test_status_encoding_and_channel(self):
+        self.feed(0, "note_on", channel=4, note=60, velocity=90)
+        self.feed(5, "note_on", channel=4, note=60, velocity=0)
+        self.feed(6, "pitchwheel", channel=4, pitch=-8192)
+        self.feed(7, "pitchwheel", channel=4, pitch=8191)
+        self.clock.advance(100)
+        self.rec.stop()
+        self.feed(200, "note_on", note=1, velocity=1)  # 停止后不再记录
+        clip = self.rec.to_clip()
+        self.assertEqual(clip.channel, 5)
+        self.assertEqual(list(clip.status), [0x94, 0x84, 0xE4, 0xE4])
+        self.assertEqual((clip.data1[2], clip.data2[2]), (0, 0))
+        self.assertEqual((clip.data1[3], clip.data2[3]), (0x7F, 0x7F))
+        self.assertAlmostEqual(clip.total_ms, 107.0)
+
+    def test_multichannel_take_keeps_each_channel(self):
+        self.feed(0, "note_on", channel=0, note=60, velocity=90)
+        self.feed(1, "note_on", channel=9, note=36, velocity=100)
+        self.feed(2, "control_change", channel=1, control=7, value=64)
+        self.rec.stop()
+        clip = self.rec.to_clip()
+        self.assertEqual(clip.channel, 1)
+        self.assertEqual(list(clip.status), [0x90, 0x99, 0xB1])
+
+    def test_cc_thinning_keeps_segment_end(self):
+        for i in range(20):
+            self.feed(i, "control_change", control=74, value=i)
+        self.feed(20, "note_on", note=60, velocity=100)
+        self.feed(100, "control_change", control=74, value=50)
+        self.rec.stop()
+        clip = self.rec.to_clip(thin_ms=10)
+        ccs = [(t, v) for t, st, v in zip(clip.times, clip.status, clip.data2) if st == 0xB0]
+        self.assertEqual(ccs, [(0.0, 0), (9.0, 9), (10.0, 10), (19.0, 19), (100.0, 50)])
+        self.assertIn(0x90, list(clip.status))
+
+    def test_cc_thinning_by_delta(self):
+        for i, v in enumerate([0, 1, 2, 10, 11, 30]):
+            self.feed(i * 100, "control_change", control=1, value=v)
+        self.rec.stop()
+        clip = self.rec.to_clip(thin_delta=5)
+        self.assertEqual(list(clip.data2), [0, 2, 10, 11, 30])
+
+    def test_quantize_preserves_note_length(self):
+        self.feed(0, "control_change", control=1, value=1)
+        self.feed(110, "note_on", note=60, velocity=100)
+        self.feed(230, "note_on", note=62, velocity=100)
+        self.feed(290, "note_off", note=60)
+        self.feed(300, "note_off", note=62)
+        self.rec.stop()
+        clip = self.rec.to_clip(quantize_ms=125)
+        rows = [(round(t, 3), st, d1) for t, st, d1 in zip(clip.times, clip.status, clip.data1)]
+        self.assertEqual(rows, [(0.0, 0xB0, 1), (125.0, 0x90, 60), (250.0, 0x90, 62),
+                                (305.0, 0x80, 60), (320.0, 0x80, 62)])
+
+
+class TestHotkeyClipRecording(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.clips_dir = Path(self.dir.name) / "clips"
+        patcher = mock.patch.object(hotkey_clip, "CLIPS_DIR", self.clips_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cfg = deep_merge(DEFAULTS, {"tools": {"hotkey_clip": {
+            "clips": [], "record": {"quantize": 4, "bpm": 120.0}}}})
+
+        def update(patch):
+            self.cfg = deep_merge(self.cfg, patch)
+
+        self.bus = EventBus()
+        self.ctx = ToolContext(self.bus, mock.Mock(), None, None, None, lambda: self.cfg,
+                               update, scheduler=Scheduler(self.bus))
+        self.addCleanup(self.ctx.scheduler.close)
+        self.tool = HotkeyClip(self.ctx)
+
+    def test_record_stop_writes_file_reference(self):
+        self.tool.action("record_start", {})
+        self.assertTrue(self.tool.get_state()["recording"])
+        self.bus.emit("midi.event", type="note_on", channel=2, fields={"note": 64, "velocity": 80})
+        self.bus.emit("midi.event", type="note_off", channel=2, fields={"note": 64})
+        self.tool.action("record_stop", {})
+        self.bus.emit("midi.event", type="note_on", channel=2, fields={"note": 1, "velocity": 1})
+        self.assertFalse(self.tool.get_state()["recording"])
+        clips = self.cfg["tools"]["hotkey_clip"]["clips"]
+        self.assertEqual(len(clips), 1)
+        self.assertNotIn("events", clips[0])
+        back = smf.read_clip(self.clips_dir / clips[0]["file"])
+        self.assertEqual(list(back.status), [0x92, 0x82])       # 通道 3
+        self.assertEqual(list(back.data1), [64, 64])
+        self.assertEqual(back.times[0], 0.0)        # 量化到 125ms 网格
+        self.assertEqual(back.channel, 3)
+
+    def test_record_stop_without_start_is_noop(self):
+        self.tool.action("record_stop", {})
+        self.assertEqual(self.cfg["tools"]["hotkey_clip"]["clips"], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
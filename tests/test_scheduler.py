@@ -0,0 +1,216 @@
+"""中央调度器测试：时间顺序、同刻提交顺序、按所有者撤销、迟到统计，以及工具共用单线程"""
+
+import threading
+import time
+import unittest
+
+from gms.bus import EventBus
+from gms.config import DEFAULTS, deep_merge
+from gms.midi.scheduler import Scheduler
+from gms.tools.base import ToolContext
+from gms.tools.chord_arpeggiator import ChordArp
+from gms.tools.hotkey_clip import HotkeyClip
+from gms.tools.step_sequencer import StepSequencer
+
+
+class FakeMidi:
+    def __init__(self):
+        self.events = []
+        self.lock = threading.Lock()
+
+    def _add(self, *ev):
+        with self.lock:
+            self.events.append((time.monotonic(),) + ev)
+
+    def note_on(self, note, velocity=100, channel=None):
+        self._add("on", note)
+
+    def note_off(self, note, channel=None):
+        self._add("off", note)
+
+    def cc(self, control, value, channel=None):
+        self._add("cc", control, value)
+
+    def pitch_bend(self, value, channel=None):
+        self._add("bend", value)
+
+    def kinds(self):
+        with self.lock:
+            return [ev[1:] for ev in self.events]
+
+
+def make_ctx(tools_cfg=None):
+    cfg = deep_merge(DEFAULTS, {"tools": tools_cfg or {}})
+    bus = EventBus()
+    return ToolContext(bus, FakeMidi(), None, None, None, lambda: cfg, None,
+                       scheduler=Scheduler(bus))
+
+
+def wait_until(pred, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not pred() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return pred()
+
+
+class TestScheduler(unittest.TestCase):
+    def setUp(self):
+        self.sched = Scheduler()
+
+    def tearDown(self):
+        self.sched.close()
+
+    def test_dispatch_in_time_then_submit_order(self):
+        out = []
+        now = time.monotonic()
+        self.sched.at(now + 0.03, out.append, "c")
+        self.sched.at(now + 0.01, out.append, "a")
+        self.sched.at(now + 0.02, out.append, "b1")
+        self.sched.at(now + 0.02, out.append, "b2")
+        self.assertTrue(wait_until(lambda: len(out) == 4))
+        self.assertEqual(out, ["a", "b1", "b2", "c"])
+        stats = self.sched.stats()
+        self.assertEqual(stats["dispatched"], 4)
+        self.assertLess(stats["avg_late_ms"], 20.0)
+
+    def test_cancel_by_owner(self):
+        out = []
+        self.sched.after(0.02, out.append, "x", owner="pad1")
+        self.sched.after(0.02, out.append, "y", owner="pad2")
+        self.sched.after(0.03, out.append, "z", owner="pad1")
+        self.assertEqual(self.sched.pending("pad1"), 2)
+        self.assertEqual(self.sched.cancel("pad1"), 2)
+        self.assertTrue(wait_until(lambda: out == ["y"]))
+        time.sleep(0.03)
+        self.assertEqual(out, ["y"])
+        self.assertEqual(self.sched.stats()["cancelled"], 2)
+
+    def test_lateness_recorded_for_past_deadline(self):
+        done = threading.Event()
+        self.sched.at(time.monotonic() - 0.05, done.set)
+        self.assertTrue(done.wait(1.0))
+        stats = self.sched.stats()
+        self.assertEqual(stats["late"], 1)
+        self.assertGreaterEqual(stats["max_late_ms"], 50.0)
+
+    def test_callback_error_counted_and_loop_continues(self):
+        out = []
+        self.sched.after(0.0, lambda: 1 / 0)
+        self.sched.after(0.01, out.append, 1)
+        self.assertTrue(wait_until(lambda: out == [1]))
+        self.assertEqual(self.sched.stats()["errors"], 1)
+
+
+class TestToolsOnScheduler(unittest.TestCase):
+    def test_ten_arp_pads_share_one_thread(self):
+        pads = [{"key": str(i), "chord": [60 + i, 64 + i], "arp": True, "arp_ms": 30}
+                for i in range(10)]
+        ctx = make_ctx({"chord_arp": {"pads": pads}})
+        arp = ChordArp(ctx)
+        before = threading.active_count()
+        try:
+            for pad in pads:
+                arp._press(pad["key"], pad)
+            self.assertTrue(wait_until(lambda: len(ctx.midi.kinds()) >= 60))
+            self.assertLessEqual(threading.active_count(), before + 1)
+        finally:
+            for pad in pads:
+                arp._release(pad["key"])
+            self.assertEqual(ctx.scheduler.pending(), 0)
+            ctx.scheduler.close()
+        # 释放后所有音符都已关闭
+        held = set()
+        for ev in ctx.midi.kinds():
+            if ev[0] == "on":
+                held.add(ev[1])
+            elif ev[0] == "off":
+                held.discard(ev[1])
+        self.assertEqual(held, set())
+
+    def test_arp_steps_on_absolute_grid(self):
+        pad = {"key": "1", "chord": [60, 64, 67], "arp": True, "arp_ms": 30}
+        ctx = make_ctx()
+        arp = ChordArp(ctx)
+        try:
+            arp._press("1", pad)
+            self.assertTrue(wait_until(
+                lambda: sum(1 for e in ctx.midi.events if e[1] == "on") >= 10))
+        finally:
+            arp._release("1")
+            ctx.scheduler.close()
+        ons = [e for e in ctx.midi.events if e[1] == "on"]
+        self.assertEqual([e[2] for e in ons[:4]], [60, 64, 67, 60])
+        # 第 10 个音符相对第 1 个的时刻：9 × 30ms，不累积回调耗时
+        self.assertAlmostEqual(ons[9][0] - ons[0][0], 0.27, delta=0.02)
+
+    def test_clip_plays_and_stop_releases_notes(self):
+        clip = {"name": "c", "loop": True, "channel": 1, "events": [
+            {"type": "note_on", "note": 60, "t": 0, "duration": 20},
+            {"type": "note_off", "note": 60, "t": 20},
+            {"type": "note_on", "note": 62, "t": 30, "duration": 20},
+        ]}
+        ctx = make_ctx({"hotkey_clip": {"clips": [clip]}})
+        tool = HotkeyClip(ctx)
+        try:
+            tool._toggle(clip)
+            self.assertTrue(wait_until(lambda: ctx.midi.kinds().count(("on", 60)) >= 2))
+            tool._toggle(clip)
+            self.assertEqual(tool.get_state()["playing"], [])
+            self.assertEqual(ctx.scheduler.pending(), 0)
+        finally:
+            ctx.scheduler.close()
+        self.assertEqual(ctx.midi.kinds()[:3], [("on", 60), ("off", 60), ("on", 62)])
+        self.assertEqual(ctx.midi.kinds()[-1][0], "off")
+
+    def test_one_shot_clip_finishes(self):
+        clip = {"name": "once", "loop": False, "events": [
+            {"type": "control_change", "control": 7, "value": 100, "t": 0},
+            {"type": "control_change", "control": 7, "value": 0, "t": 10},
+        ]}
+        ctx = make_ctx()
+        tool = HotkeyClip(ctx)
+        try:
+            tool._toggle(clip)
+            self.assertTrue(wait_until(lambda: tool.get_state()["playing"] == []))
+        finally:
+            ctx.scheduler.close()
+        self.assertEqual(ctx.midi.kinds(), [("cc", 7, 100), ("cc", 7, 0)])
+
+    def test_clip_compiled_once_and_reused_across_loops(self):
+        events = [{"type": "control_change", "control": 1, "value": v, "t": v}
+                  for v in range(0, 40)] + [{"type": "pitchwheel", "pitch": 100, "t": 40}]
+        clip = {"name": "auto", "loop": True, "events": events}
+        ctx = make_ctx({"hotkey_clip": {"clips": [clip]}})
+        tool = HotkeyClip(ctx)
+        tool._compile_all()
+        compiled = tool._compiled["auto"]
+        try:
+            tool._toggle(ctx.tool_cfg("hotkey_clip")["clips"][0])
+            self.assertTrue(wait_until(lambda: ctx.midi.kinds().count(("bend", 100)) >= 2))
+            tool._toggle(clip)
+        finally:
+            ctx.scheduler.close()
+        self.assertIs(tool._compiled["auto"], compiled)
+        kinds = ctx.midi.kinds()
+        self.assertEqual(kinds[:2], [("cc", 1, 0), ("cc", 1, 1)])
+        self.assertEqual(kinds[40], ("bend", 100))
+        self.assertEqual(kinds[41], ("cc", 1, 0))      # 第二轮从头开始
+
+    def test_sequencer_runs_on_scheduler(self):
+        ctx = make_ctx({"step_sequencer": {"bpm": 400.0, "steps": 16,
+                                           "on": [True] * 16, "gates": [0.5] * 16}})
+        seq = StepSequencer(ctx)
+        try:
+            seq.action("play", {})
+            self.assertTrue(wait_until(
+                lambda: sum(1 for e in ctx.midi.kinds() if e[0] == "on") >= 4))
+        finally:
+            seq.action("stop", {})
+            ctx.scheduler.close()
+        kinds = ctx.midi.kinds()
+        self.assertEqual(kinds[:4], [("on", 60), ("off", 60), ("on", 62), ("off", 62)])
+        self.assertEqual(seq.get_state()["playing"], False)
+
+
+if __name__ == "__main__":
+    unittest.main()
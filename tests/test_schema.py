@@ -0,0 +1,144 @@
+"""配置 schema 测试：精确错误路径、无问题时保持原对象、槽位运行时对象与缓存、载入修正与导入拒绝"""
+
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from gms.bus import EventBus
+from gms.config import DEFAULTS, ProfileManager, deep_merge
+from gms.core import compile_pattern
+from gms.schema import GamepadSettings, MidiSettings, tool_settings, validate
+
+
+class TestValidate(unittest.TestCase):
+    def test_defaults_are_valid_and_kept(self):
+        cfg = deep_merge(DEFAULTS, {})
+        clean, errors = validate(cfg)
+        self.assertEqual(errors, [])
+        self.assertIs(clean, cfg)
+
+    def test_errors_carry_exact_paths(self):
+        cfg = deep_merge(DEFAULTS, {"gamepad": {"deadzone": 2, "curve": "cubic"},
+                                    "midi": {"channel": "1"}})
+        cfg["tools"]["keyboard_pads"]["pads"][1]["note"] = 300
+        clean, errors = validate(cfg)
+        self.assertEqual(sorted(e.split(":")[0] for e in errors), [
+            "gamepad.curve", "gamepad.deadzone", "midi.channel",
+            "tools.keyboard_pads.pads[1].note"])
+        self.assertEqual(clean["gamepad"]["deadzone"], 0.95)           # 越界：夹到范围内
+        self.assertEqual(clean["gamepad"]["curve"], "linear")          # 非法取值：默认值
+        self.assertEqual(clean["midi"]["channel"], 1)
+        self.assertEqual(clean["tools"]["keyboard_pads"]["pads"][1]["note"], 127)
+
+    def test_untouched_branches_are_shared(self):
+        cfg = deep_merge(DEFAULTS, {"gamepad": {"mode": 3}})
+        clean, errors = validate(cfg)
+        self.assertEqual(len(errors), 1)
+        self.assertIsNot(clean, cfg)
+        self.assertIsNot(clean["gamepad"], cfg["gamepad"])
+        self.assertIs(clean["tools"], cfg["tools"])
+        self.assertIs(clean["gamepad"]["note_mappings"], cfg["gamepad"]["note_mappings"])
+        self.assertEqual(cfg["gamepad"]["mode"], 3)                     # 原配置不被修改
+
+    def test_step_lists_keep_alignment(self):
+        cfg = deep_merge(DEFAULTS, {"tools": {"step_sequencer": {
+            "notes": [60, "x", 64], "velocities": [100] * 20 + [None],
+            "patterns": [{"name": "b", "notes": [None], "on": [True]}]}}})
+        clean, errors = validate(cfg)
+        self.assertEqual(len(errors), 3)
+        seq = clean["tools"]["step_sequencer"]
+        self.assertEqual(seq["notes"], [60, 62, 64])                   # DEFAULTS 同位置
+        self.assertEqual(seq["velocities"][20], 100)                   # 超出默认长度：fill
+        self.assertEqual(seq["patterns"][0]["notes"], [60])
+        for pattern in [seq] + seq["patterns"]:
+            self.assertEqual(len(compile_pattern(pattern, 16)), 16)
+
+    def test_map_values_fall_back_to_defaults(self):
+        cfg = deep_merge(DEFAULTS, {"gamepad": {"cc_mappings": {"left_stick_x": "a",
+                                                                "extra": 500}}})
+        cfg["midi"]["destinations"] = [{"port": "x", "channels": [1, "2", 3]}]
+        clean, errors = validate(cfg)
+        self.assertEqual(len(errors), 3)
+        self.assertEqual(clean["gamepad"]["cc_mappings"]["left_stick_x"], 1)
+        self.assertEqual(clean["gamepad"]["cc_mappings"]["extra"], 127)
+        self.assertEqual(clean["midi"]["destinations"][0]["channels"], [1, 3])
+
+    def test_bad_list_entries_are_dropped(self):
+        cfg = deep_merge(DEFAULTS, {})
+        cfg["tools"]["midi_mapper"]["rules"] = [{"action": "cc"}, "oops"]
+        clean, errors = validate(cfg)
+        self.assertEqual(errors, ["tools.midi_mapper.rules[1]: 应为对象，实际为 str"])
+        self.assertEqual(clean["tools"]["midi_mapper"]["rules"], [{"action": "cc"}])
+
+
+class TestSettings(unittest.TestCase):
+    def test_runtime_object_is_typed_and_slotted(self):
+        gp = deep_merge(DEFAULTS["gamepad"], {"sensitivity": 3})
+        s = GamepadSettings.build(gp)
+        self.assertIsInstance(s.sensitivity, float)
+        self.assertEqual(s.note_mappings, gp["note_mappings"])
+        self.assertFalse(hasattr(s, "__dict__"))
+        with self.assertRaises(AttributeError):
+            s.unknown = 1
+
+    def test_nested_section_and_tuples(self):
+        s = MidiSettings.build(deep_merge(DEFAULTS["midi"], {"shaper": {"tick_ms": 2}}))
+        self.assertEqual(s.shaper.tick_ms, 2.0)
+        self.assertIsInstance(s.destinations, tuple)
+
+    def test_of_converts_each_section_once(self):
+        gp = deep_merge(DEFAULTS["gamepad"], {})
+        first = GamepadSettings.of(gp)
+        self.assertIs(GamepadSettings.of(gp), first)
+        self.assertIsNot(GamepadSettings.of(dict(gp)), first)
+
+    def test_missing_keys_fall_back_to_defaults(self):
+        s = tool_settings("wheel_bend", {"mode": "cc"})
+        self.assertEqual((s.mode, s.cc, s.step_size), ("cc", 74, 341))
+        self.assertIsNone(tool_settings("no_such_tool", {}))
+
+
+class TestProfileValidation(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.bus = EventBus()
+        self.logs = []
+        self.bus.subscribe("log", lambda message: self.logs.append(message))
+        self.pm = ProfileManager(Path(self.tmp.name), bus=self.bus)
+
+    def tearDown(self):
+        self.pm.close()
+        self.tmp.cleanup()
+
+    def test_load_corrects_and_reports(self):
+        path = Path(self.tmp.name) / "bad.json"
+        path.write_text(json.dumps({"gamepad": {"velocity_fixed": 0}}), encoding="utf-8")
+        self.pm.load_profile("bad")
+        self.assertEqual(self.pm.current()["gamepad"]["velocity_fixed"], 1)
+        self.assertEqual(len(self.pm.last_errors), 1)
+        self.assertTrue(any("gamepad.velocity_fixed" in m for m in self.logs))
+
+    def test_corrected_profile_runs(self):
+        path = Path(self.tmp.name) / "bad.json"
+        path.write_text(json.dumps({"tools": {"step_sequencer": {"notes": [60, "x", 64]}},
+                                    "gamepad": {"cc_mappings": {"left_stick_x": None}}}),
+                        encoding="utf-8")
+        self.pm.load_profile("bad")
+        cfg = self.pm.current()
+        pattern = compile_pattern(cfg["tools"]["step_sequencer"], 16)
+        self.assertEqual(list(pattern.notes[:3]), [60, 62, 64])
+        self.assertEqual(GamepadSettings.of(cfg["gamepad"]).cc_mappings["left_stick_x"], 1)
+        self.assertEqual(len(self.pm.last_errors), 2)
+
+    def test_import_rejects_invalid(self):
+        self.assertFalse(self.pm.import_profile("x", {"midi": {"poll_ms": 0}}))
+        self.assertNotIn("x", self.pm.list_profiles())
+        self.assertTrue(self.pm.last_errors[0].startswith("midi.poll_ms"))
+        self.assertFalse(self.pm.import_profile("x", ["not", "a", "profile"]))
+        self.assertTrue(self.pm.import_profile("x", {"midi": {"poll_ms": 2}}))
+        self.assertEqual(self.pm.last_errors, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
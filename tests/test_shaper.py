@@ -0,0 +1,121 @@
+"""输出整形测试：连续控制器合并、有序消息优先、字节预算与引擎补发"""
+
+import time
+import unittest
+
+import mido
+
+from gms.bus import EventBus
+from gms.config import DEFAULTS, deep_merge
+from gms.midi.backends import MidiPortManager
+from gms.midi.engine import MidiEngine
+from gms.midi.shaper import MessageShaper, coalesce_key
+
+
+def cc(control, value, channel=0):
+    return mido.Message("control_change", channel=channel, control=control, value=value)
+
+
+class TestCoalesceKey(unittest.TestCase):
+    def test_keys(self):
+        self.assertEqual(coalesce_key(cc(74, 1, 2)), ("control_change", 2, 74))
+        self.assertEqual(coalesce_key(mido.Message("pitchwheel", channel=1, pitch=5)),
+                         ("pitchwheel", 1, -1))
+        self.assertIsNone(coalesce_key(mido.Message("note_on", note=60)))
+        self.assertIsNone(coalesce_key(cc(64, 127)))      # 延音踏板：有序
+        self.assertIsNone(coalesce_key(cc(101, 0)))       # RPN：有序
+
+
+class TestMessageShaper(unittest.TestCase):
+    def test_burst_coalesced_to_latest_per_tick(self):
+        shaper = MessageShaper(tick=0.005)
+        t = 100.0
+        self.assertEqual(len(shaper.offer(cc(1, 0), t)), 1)   # 空闲：立即发送
+        for v in range(1, 50):
+            self.assertEqual(shaper.offer(cc(1, v), t + 0.0001 * v), [])
+        self.assertEqual(shaper.due(t + 0.004), [])            # tick 未到
+        out = shaper.due(t + 0.006)
+        self.assertEqual([m.value for m in out], [49])
+        stats = shaper.stats()
+        self.assertEqual((stats["offered"], stats["sent"], stats["coalesced"]), (50, 2, 48))
+        self.assertEqual(stats["ratio"], 25.0)
+        self.assertIsNone(shaper.wait_time(t + 0.006))
+
+    def test_keys_independent_and_ordered_messages_pass(self):
+        shaper = MessageShaper(tick=0.005)
+        t = 10.0
+        self.assertEqual(len(shaper.offer(cc(1, 10), t)), 1)
+        self.assertEqual(len(shaper.offer(cc(2, 10), t)), 1)
+        self.assertEqual(len(shaper.offer(cc(1, 11, channel=1), t)), 1)
+        self.assertEqual(shaper.offer(cc(1, 12), t + 0.001), [])
+        note = mido.Message("note_on", note=60)
+        self.assertEqual(shaper.offer(note, t + 0.001), [note])
+        sysex = mido.Message("sysex", data=[1, 2, 3])
+        self.assertEqual(shaper.offer(sysex, t + 0.001), [sysex])
+        self.assertAlmostEqual(shaper.wait_time(t + 0.001), 0.004)
+
+    def test_bandwidth_defers_continuous_but_not_notes(self):
+        shaper = MessageShaper(tick=0.0, bandwidth=300)       # 100 条 3 字节消息/秒
+        t = 50.0
+        sent = 0
+        for v in range(20):
+            sent += len(shaper.offer(cc(7, v), t))
+        self.assertLess(sent, 20)
+        self.assertEqual(shaper.pending, 1)                    # 积压合并为单条最新值
+        note = mido.Message("note_on", note=60)
+        self.assertEqual(shaper.offer(note, t), [note])        # 预算耗尽时音符仍放行
+        self.assertEqual(shaper.due(t), [])
+        self.assertGreater(shaper.wait_time(t), 0)
+        out = shaper.due(t + 0.5)
+        self.assertEqual([m.value for m in out], [19])
+
+    def test_flush_returns_pending(self):
+        shaper = MessageShaper(tick=1.0)
+        shaper.offer(cc(1, 1), 0.0)
+        shaper.offer(cc(1, 2), 0.1)
+        self.assertEqual([m.value for m in shaper.flush()], [2])
+        self.assertEqual(shaper.pending, 0)
+
+
+class TestEngineShaping(unittest.TestCase):
+    def setUp(self):
+        self.bus = EventBus()
+        self.pm = MidiPortManager(self.bus)
+        self.pm.start("GMS Shaper", backend_name="loopback")
+        self.cfg = deep_merge(DEFAULTS, {"midi": {"shaper": {"tick_ms": 20}}})
+        self.engine = MidiEngine(self.bus, self.pm, lambda: self.cfg)
+        self.port = self.pm.backends["loopback"].last_port
+
+    def tearDown(self):
+        self.engine.close()
+        self.pm.stop()
+
+    def test_sweep_coalesced_and_final_value_delivered(self):
+        events = []
+        self.bus.subscribe("midi.event", lambda type, channel, fields: events.append(fields))
+        for v in range(100):
+            self.engine.cc(74, v, channel=1)
+            self.engine.pitch_bend(v * 10, channel=1)
+        self.engine.note_on(60, 100, channel=1)
+        deadline = time.monotonic() + 2.0
+        while self.engine.shaper.pending and time.monotonic() < deadline:
+            time.sleep(0.005)
+        sent = self.port.drain()
+        self.assertEqual(sent[0], b"\xb0\x4a\x00")
+        self.assertIn(b"\x90\x3c\x64", sent[:3])               # 音符不排在合并积压之后
+        self.assertEqual(sent[-2:], [b"\xb0\x4a\x63", bytes(mido.Message(
+            "pitchwheel", pitch=990).bytes())])
+        self.assertLess(len(sent), 20)
+        self.assertEqual(len(events), len(sent))
+        self.assertGreater(self.engine.shaper_stats()["ratio"], 10)
+
+    def test_disabled_sends_everything(self):
+        midi = self.cfg["midi"]
+        self.cfg["midi"] = dict(midi, shaper=dict(midi["shaper"], enabled=False))
+        for v in range(10):
+            self.engine.cc(1, v)
+        self.assertEqual(len(self.port.drain()), 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,233 @@
+"""SMF 流式读写测试：type 0/1 往返、tempo 换算、running status、clip 文件导入/导出/延迟加载"""
+
+import os
+import struct
+import tempfile
+import unittest
+from collections import Counter
+from pathlib import Path
+from unittest import mock
+
+from gms.bus import EventBus
+from gms.config import DEFAULTS, deep_merge
+from gms.core import compile_clip
+from gms.midi import smf
+from gms.midi.scheduler import Scheduler
+from gms.tools import hotkey_clip
+from gms.tools.base import ToolContext
+from gms.tools.hotkey_clip import HotkeyClip
+
+EVENTS = [
+    {"type": "note_on", "note": 60, "velocity": 100, "t": 0},
+    {"type": "control_change", "control": 74, "value": 10, "t": 250},
+    {"type": "note_off", "note": 60, "t": 500},
+    {"type": "pitchwheel", "pitch": 4096, "t": 750, "duration": 250},
+]
+
+
+def track(body: bytes) -> bytes:
+    return b"MTrk" + struct.pack(">I", len(body)) + body
+
+
+class TestSmfRoundTrip(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.dir.name) / "clip.mid"
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def _roundtrip(self, fmt):
+        clip = compile_clip(EVENTS)
+        smf.write_clip(self.path, clip, channel=3, fmt=fmt)
+        fmt_read, division, tracks = smf.read_header(self.path)
+        self.assertEqual((fmt_read, division, len(tracks)), (fmt, 480, 1 if fmt == 0 else 2))
+        back = smf.read_clip(self.path)
+        self.assertEqual([round(t) for t in back.times], [0, 250, 500, 750])
+        self.assertEqual(list(back.status), [s | 2 for s in clip.status])    # 通道 3
+        self.assertEqual(list(back.data1), list(clip.data1))
+        self.assertEqual(list(back.data2), list(clip.data2))
+        self.assertAlmostEqual(back.total_ms, 1000.0, places=3)
+        self.assertEqual(back.channel, 3)
+
+    def test_type0_roundtrip(self):
+        self._roundtrip(0)
+
+    def test_type1_roundtrip(self):
+        self._roundtrip(1)
+
+    def test_type1_tempo_map_and_running_status(self):
+        # 音轨 0：tick 0 设 120 BPM，tick 480 改为 60 BPM；音轨 1 使用 running status
+        conductor = (b"\x00\xFF\x51\x03\x07\xA1\x20"
+                     b"\x83\x60\xFF\x51\x03\x0F\x42\x40"
+                     b"\x00\xFF\x2F\x00")
+        notes = (b"\x00\x90\x3C\x64"
+                 b"\x83\x60\x3E\x64"        # running status：tick 480
+                 b"\x83\x60\x3C\x00"        # tick 960，力度 0 = note off
+                 b"\x00\xF0\x03\x7E\x00\xF7"
+                 b"\x00\xFF\x2F\x00")
+        self.path.write_bytes(b"MThd" + struct.pack(">IHHH", 6, 1, 2, 480)
+                              + track(conductor) + track(notes))
+        events = [e for e in smf.iter_events(self.path)]
+        self.assertEqual([(round(ms), st, d1, d2) for ms, st, d1, d2 in events[:-1]],
+                         [(0, 0x90, 60, 100), (500, 0x90, 62, 100), (1500, 0x90, 60, 0)])
+        self.assertEqual(round(events[-1][0]), 1500)
+        clip = smf.read_clip(self.path)
+        self.assertEqual(list(clip.status), [0x90, 0x90, 0x80])
+
+    def test_multichannel_file_keeps_event_channels(self):
+        notes = (b"\x00\x90\x3C\x64"
+                 b"\x00\x99\x24\x64"        # 通道 10（鼓）
+                 b"\x60\x99\x24\x00"        # 力度 0：通道 10 的 note off
+                 b"\x00\x80\x3C\x00"
+                 b"\x00\xFF\x2F\x00")
+        self.path.write_bytes(b"MThd" + struct.pack(">IHHH", 6, 0, 1, 480) + track(notes))
+        clip = smf.read_clip(self.path)
+        self.assertEqual(list(clip.status), [0x90, 0x99, 0x89, 0x80])
+        self.assertEqual(clip.channel, 1)
+        out = Path(self.dir.name) / "out.mid"
+        smf.write_clip(out, clip)
+        self.assertEqual(list(smf.read_clip(out).status), list(clip.status))
+
+    def test_large_file_streams_in_blocks(self):
+        clip = compile_clip([{"type": "control_change", "control": 1, "value": i % 128, "t": i}
+                             for i in range(50000)])
+        smf.write_clip(self.path, clip)
+        self.assertGreater(os.path.getsize(self.path), smf.BLOCK)
+        back = smf.read_clip(self.path)
+        self.assertEqual(len(back), 50000)
+        self.assertEqual(back.data2[49999], 49999 % 128)
+
+    def test_invalid_file_rejected(self):
+        self.path.write_bytes(b"RIFF0000")
+        with self.assertRaises(smf.SmfError):
+            smf.read_header(self.path)
+
+    def test_truncated_track_raises_smf_error(self):
+        smf.write_clip(self.path, compile_clip(EVENTS), channel=3)
+        data = self.path.read_bytes()
+        for cut in (1, 2, 5):
+            self.path.write_bytes(data[:-cut])
+            with self.assertRaises(smf.SmfError):
+                smf.read_clip(self.path)
+            with self.assertRaises(smf.SmfError):
+                smf.check_file(self.path)
+
+
+class TestClipFiles(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.clips_dir = Path(self.dir.name) / "clips"
+        patcher = mock.patch.object(hotkey_clip, "CLIPS_DIR", self.clips_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cfg = deep_merge(DEFAULTS, {"tools": {"hotkey_clip": {"clips": [
+            {"name": "jam", "hotkey": "", "loop": False, "channel": 2, "events": EVENTS}]}}})
+
+        def update(patch):
+            self.cfg = deep_merge(self.cfg, patch)
+
+        bus = EventBus()
+        self.logs = []
+        bus.subscribe("log", lambda message: self.logs.append(message))
+        self.ctx = ToolContext(bus, mock.Mock(), None, None, None, lambda: self.cfg, update,
+                               scheduler=Scheduler(bus))
+        self.tool = HotkeyClip(self.ctx)
+
+    def tearDown(self):
+        self.ctx.scheduler.close()
+        self.dir.cleanup()
+
+    def test_export_link_moves_events_out_of_profile(self):
+        self.tool.action("export_smf", {"name": "jam", "link": True})
+        clip = self.cfg["tools"]["hotkey_clip"]["clips"][0]
+        self.assertNotIn("events", clip)
+        self.assertEqual(clip["file"], "jam.mid")
+        self.assertTrue((self.clips_dir / "jam.mid").exists())
+        compiled = self.tool._compiled_for(clip)
+        self.assertEqual(len(compiled), 4)
+        self.assertIs(self.tool._compiled_for(clip), compiled)    # 文件未变：复用
+
+    def test_import_is_lazy_until_triggered(self):
+        src = Path(self.dir.name) / "take.mid"
+        smf.write_clip(src, compile_clip(EVENTS), channel=5, fmt=1)
+        self.tool.action("import_smf", {"path": str(src)})
+        clips = self.cfg["tools"]["hotkey_clip"]["clips"]
+        self.assertEqual(clips[-1]["file"], "take.mid")
+        self.tool._compile_all()
+        self.assertNotIn("take", self.tool._compiled)
+        with mock.patch.object(hotkey_clip, "read_clip", wraps=smf.read_clip) as reader:
+            self.tool._start_player("take", clips[-1])
+            self.assertEqual(reader.call_count, 1)
+        state = self.tool._players["take"]
+        self.assertIsNone(state["channel"])                      # 按文件中各事件的通道发送
+        self.tool._send_compiled(state["compiled"], 0, state)
+        self.ctx.midi.note_on.assert_called_with(60, 100, channel=5)
+        self.tool._stop_player("take")
+
+    def test_stop_releases_on_clip_channel(self):
+        clip = self.cfg["tools"]["hotkey_clip"]["clips"][0]
+        self.tool._start_player("jam", clip)
+        self.tool._players["jam"]["notes"][(60, 2)] += 1     # 停止时 note 60 仍在发声
+        self.tool._stop_player("jam")
+        self.ctx.midi.note_off.assert_called_with(60, channel=2)
+
+    def test_stop_releases_overlapping_same_pitch_notes(self):
+        events = [{"type": "note_on", "note": 60, "velocity": 100, "t": 0},
+                  {"type": "note_on", "note": 60, "velocity": 90, "t": 10},
+                  {"type": "note_off", "note": 60, "t": 20},
+                  {"type": "note_on", "note": 62, "velocity": 90, "t": 30}]
+        compiled = compile_clip(events)
+        state = {"channel": 2, "notes": Counter()}
+        for i in range(len(compiled)):
+            self.tool._send_compiled(compiled, i, state)
+        self.tool._players["x"] = state
+        self.ctx.midi.reset_mock()
+        self.tool._stop_player("x")
+        offs = sorted(c.args[0] for c in self.ctx.midi.note_off.call_args_list)
+        self.assertEqual(offs, [60, 62])
+
+    def test_clip_channel_overrides_event_channels(self):
+        multi = compile_clip(EVENTS[:1] + EVENTS[2:3])
+        multi.status[0] |= 9                                    # note_on 在通道 10
+        multi.channel = 10
+        for override, expect in ((None, 10), (4, 4)):
+            self.ctx.midi.reset_mock()
+            state = {"channel": override, "notes": Counter()}
+            self.tool._send_compiled(multi, 0, state)
+            self.tool._players["x"] = state
+            self.tool._stop_player("x")
+            self.ctx.midi.note_on.assert_called_with(60, 100, channel=expect)
+            self.ctx.midi.note_off.assert_called_with(60, channel=expect)
+
+    def test_import_invalid_logged(self):
+        bad = Path(self.dir.name) / "bad.mid"
+        bad.write_bytes(b"nope")
+        self.tool.action("import_smf", {"path": str(bad)})
+        self.assertEqual(len(self.cfg["tools"]["hotkey_clip"]["clips"]), 1)
+        self.assertTrue(any("导入 MIDI 文件失败" in m for m in self.logs))
+
+    def test_import_rejects_corrupt_tracks(self):
+        src = Path(self.dir.name) / "cut.mid"
+        smf.write_clip(src, compile_clip(EVENTS), channel=5)
+        src.write_bytes(src.read_bytes()[:-2])
+        self.tool.action("import_smf", {"path": str(src)})
+        self.assertEqual(len(self.cfg["tools"]["hotkey_clip"]["clips"]), 1)
+        self.assertTrue(any("导入 MIDI 文件失败" in m for m in self.logs))
+
+    def test_truncated_file_logged_not_raised(self):
+        self.clips_dir.mkdir(parents=True)
+        path = self.clips_dir / "cut.mid"
+        smf.write_clip(path, compile_clip(EVENTS), channel=5)
+        path.write_bytes(path.read_bytes()[:-2])
+        self.assertEqual(len(self.tool._compiled_for({"name": "cut", "file": "cut.mid"})), 0)
+        self.assertTrue(any("Clip 文件读取失败" in m for m in self.logs))
+
+    def test_missing_file_logged_not_raised(self):
+        clip = {"name": "gone", "file": "missing.mid"}
+        self.assertEqual(len(self.tool._compiled_for(clip)), 0)
+        self.assertTrue(any("Clip 文件读取失败" in m for m in self.logs))
+
+
+if __name__ == "__main__":
+    unittest.main()
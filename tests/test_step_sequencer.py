@@ -0,0 +1,203 @@
+"""步进音序器测试：绝对时间网格、gate 独立于步进、swing 偏移与速度误差测量、pattern 库切换与串联"""
+
+import time
+import unittest
+from types import SimpleNamespace
+
+from gms.bus import EventBus
+from gms.config import DEFAULTS, deep_merge, merge_patch
+from gms.core import compile_pattern
+from gms.input.frame_store import FrameStore
+from gms.midi.scheduler import Scheduler
+from gms.tools.base import ToolContext
+from gms.tools.step_sequencer import StepSequencer
+
+
+class FakeMidi:
+    def __init__(self):
+        self.events = []
+
+    def note_on(self, note, velocity=100, channel=None):
+        self.events.append((time.monotonic(), "on", note))
+
+    def note_off(self, note, channel=None):
+        self.events.append((time.monotonic(), "off", note))
+
+    def cc(self, control, value, channel=None):
+        self.events.append((time.monotonic(), "cc", control))
+
+
+def run_sequencer(seconds, **overrides):
+    tool_cfg = {"bpm": 240.0, "steps": 16, "swing": 0.0,
+                "on": [True] * 16, "gates": [0.9] * 16}
+    tool_cfg.update(overrides)
+    cfg = deep_merge(DEFAULTS, {"tools": {"step_sequencer": tool_cfg}})
+    bus = EventBus()
+    ctx = ToolContext(bus, FakeMidi(), None, None, None, lambda: cfg, None,
+                      scheduler=Scheduler(bus))
+    seq = StepSequencer(ctx)
+    seq.action("play", {})
+    time.sleep(seconds)
+    state = seq.get_state()
+    seq.action("stop", {})
+    ctx.scheduler.close()
+    return ctx.midi.events, state
+
+
+class TestStepGrid(unittest.TestCase):
+    def test_step_interval_independent_of_gate(self):
+        # 240 BPM、16 步：每步 62.5ms；gate 0.9 不应拉长步长
+        events, state = run_sequencer(0.7)
+        ons = [t for t, kind, _ in events if kind == "on"]
+        self.assertGreaterEqual(len(ons), 10)
+        span = ons[-1] - ons[0]
+        self.assertAlmostEqual(span / (len(ons) - 1), 0.0625, delta=0.003)
+        self.assertIsNotNone(state["bpm_error"])
+        self.assertLess(abs(state["bpm_error"]), 5.0)
+
+    def test_note_off_at_step_time_plus_gate(self):
+        events, _ = run_sequencer(0.3, gates=[0.5] * 16)
+        first_on = next(t for t, kind, n in events if kind == "on" and n == 60)
+        first_off = next(t for t, kind, n in events if kind == "off" and n == 60)
+        self.assertAlmostEqual(first_off - first_on, 0.03125, delta=0.005)
+
+    def test_swing_shifts_odd_steps_without_drift(self):
+        events, _ = run_sequencer(0.6, swing=0.3)
+        ons = [t for t, kind, _ in events if kind == "on"]
+        t0 = ons[0]
+        base = 0.0625
+        # 偶数步落在网格上，奇数步提前 base * swing
+        self.assertAlmostEqual(ons[2] - t0, 2 * base, delta=0.004)
+        self.assertAlmostEqual(ons[1] - t0, base * 0.7, delta=0.004)
+        self.assertAlmostEqual(ons[8] - t0, 8 * base, delta=0.004)
+
+    def test_stop_releases_held_notes(self):
+        events, state = run_sequencer(0.1, gates=[1.0] * 16)
+        held = set()
+        for _, kind, note in events:
+            if kind == "on":
+                held.add(note)
+            elif kind == "off":
+                held.discard(note)
+        self.assertEqual(held, set())
+        self.assertTrue(state["playing"])
+
+
+def make_sequencer(**overrides):
+    tool_cfg = {"bpm": 400.0, "steps": 8, "on": [True] * 8, "gates": [0.5] * 8,
+                "notes": [60] * 8,
+                "patterns": [{"name": "B", "notes": [72] * 8, "on": [True] * 8},
+                             {"name": "C", "notes": [84] * 8, "on": [True] * 8}]}
+    tool_cfg.update(overrides)
+    cfg = deep_merge(DEFAULTS, {"tools": {"step_sequencer": tool_cfg}})
+    bus = EventBus()
+    # update_config 为 None：切换 pattern 若写配置会直接报错
+    ctx = ToolContext(bus, FakeMidi(), None, None, None, lambda: cfg, None,
+                      scheduler=Scheduler(bus))
+    return StepSequencer(ctx), ctx
+
+
+class TestPatternBank(unittest.TestCase):
+    def test_compile_pattern_defaults(self):
+        pattern = compile_pattern({"notes": [60, 62, 64], "on": [True, False, True, True],
+                                   "ccs": [None, 74]}, 4)
+        self.assertEqual(list(pattern.on), [1, 0, 1, 0])     # 超出 notes 长度的步关闭
+        self.assertEqual(list(pattern.velocities), [100] * 4)
+        self.assertEqual(list(pattern.gates), [0.5] * 4)
+        self.assertEqual(list(pattern.ccs), [-1, 74, -1, -1])
+
+    def test_switch_applies_at_next_bar_without_config_write(self):
+        seq, ctx = make_sequencer()
+        seq.start()
+        try:
+            seq.action("play", {})
+            seq.action("select_pattern", {"index": 1})
+            self.assertEqual(seq.get_state()["queued"], 1)
+            deadline = time.monotonic() + 3.0
+            while (sum(1 for e in ctx.midi.events if e[1] == "on") < 10
+                   and time.monotonic() < deadline):
+                time.sleep(0.01)
+        finally:
+            seq.stop()
+            ctx.scheduler.close()
+        ons = [n for _, kind, n in ctx.midi.events if kind == "on"]
+        self.assertEqual(ons[:8], [60] * 8)
+        self.assertEqual(ons[8:10], [72, 72])
+        self.assertEqual(seq.get_state()["pattern"], 1)
+
+    def test_chain_advances_per_bar_and_bank_is_reused(self):
+        seq, ctx = make_sequencer(chain=[2, 0])
+        seq.start()
+        bank = list(seq._bank)
+        seq._start_playback()
+        ctx.scheduler.cancel(seq.id)
+        self.assertEqual(seq._current, 2)
+        cfg = ctx.tool_cfg(seq.id)
+        seq._bar_boundary(cfg)
+        self.assertEqual(seq._current, 0)
+        seq._bar_boundary(cfg)
+        self.assertEqual(seq._current, 2)
+        seq.action("chain", {"chain": [1]})                  # 运行时串联，不写配置
+        seq._bar_boundary(cfg)
+        self.assertEqual(seq._current, 1)
+        self.assertEqual([p is q for p, q in zip(seq._bank, bank)], [True] * 3)
+        seq.stop()
+        ctx.scheduler.close()
+
+    def test_gamepad_button_switches_pattern(self):
+        seq, ctx = make_sequencer(pattern_buttons={"rb": "next", "lb": "prev", "button_y": 2})
+        seq.start()
+        ctx.bus.emit("gamepad.button", index=5, key="rb")
+        self.assertEqual(seq.get_state()["pattern"], 1)      # 停止时立即生效
+        ctx.bus.emit("gamepad.button", index=4, key="lb")
+        ctx.bus.emit("gamepad.button", index=4, key="lb")
+        self.assertEqual(seq.get_state()["pattern"], 2)      # 越界循环
+        ctx.bus.emit("gamepad.button", index=0, key="button_a")
+        ctx.bus.emit("gamepad.button", index=3, key="button_y")
+        self.assertEqual(seq.get_state()["pattern"], 2)
+        seq.stop()
+        ctx.bus.emit("gamepad.button", index=5, key="rb")    # 停用后不再响应
+        self.assertEqual(seq.get_state()["pattern"], 2)
+        ctx.scheduler.close()
+
+
+class TestApplyConfig(unittest.TestCase):
+    def test_recompiles_only_changed_pattern(self):
+        seq, ctx = make_sequencer(modulate_source="ry")
+        seq.start()
+        before = list(seq._bank)
+        seq._mod = lambda: 0.0
+        cfg, paths = merge_patch(ctx.get_config(), {"tools": {"step_sequencer": {
+            "notes": [48] * 8, "modulate_source": "lx"}}})
+        ctx.get_config = lambda: cfg
+        self.assertTrue(seq.apply_config([p[2:] for p in paths]))
+        self.assertEqual(seq._bank[0].notes[0], 48)
+        self.assertIs(seq._bank[1], before[1])       # patterns 分支共享：沿用编译结果
+        self.assertIs(seq._bank[2], before[2])
+        self.assertIsNone(seq._mod)                  # 调制源下次读取时重新解析
+        seq.stop()
+        ctx.scheduler.close()
+
+
+class TestModulationSource(unittest.TestCase):
+    def test_modulation_reads_published_logical_axis(self):
+        seq, ctx = make_sequencer(modulate="note", modulate_source="ry")
+        ctx.gamepad = SimpleNamespace(frames=FrameStore())
+        ctx.gamepad.frames.publish({"axes": [0.0] * 4}, {"lx": -1.0, "ry": 1.0})
+        cfg = ctx.tool_cfg(seq.id)
+        seq._play_step(0, ctx.tool_settings(seq.id), seq._pattern_for(cfg, 0), 120.0,
+                       time.monotonic())
+        self.assertEqual(ctx.midi.events[0][1:], ("on", 72))
+        ctx.scheduler.close()
+
+    def test_no_gamepad_reads_zero(self):
+        seq, ctx = make_sequencer(modulate="note")
+        cfg = ctx.tool_cfg(seq.id)
+        seq._play_step(0, ctx.tool_settings(seq.id), seq._pattern_for(cfg, 0), 120.0,
+                       time.monotonic())
+        self.assertEqual(ctx.midi.events[0][1:], ("on", 60))
+        ctx.scheduler.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
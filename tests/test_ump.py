@@ -0,0 +1,80 @@
+"""UMP 编解码测试：MIDI 1.0 类型 2、MIDI 2.0 类型 4 高分辨率、SysEx7 分块与往返"""
+
+import unittest
+
+from gms.midi.ump import (
+    UmpDecoder,
+    decode,
+    encode,
+    midi2_control_change,
+    midi2_note_on,
+    packet_words,
+    scale_up,
+)
+
+
+class TestScaling(unittest.TestCase):
+    def test_min_center_max(self):
+        self.assertEqual(scale_up(0, 7, 16), 0)
+        self.assertEqual(scale_up(64, 7, 16), 0x8000)
+        self.assertEqual(scale_up(127, 7, 16), 0xFFFF)
+        self.assertEqual(scale_up(127, 7, 32), 0xFFFFFFFF)
+        self.assertEqual(scale_up(0x2000, 14, 32), 0x80000000)
+        self.assertEqual(scale_up(0x3FFF, 14, 32), 0xFFFFFFFF)
+
+
+class TestEncode(unittest.TestCase):
+    def test_midi1_channel_voice_has_type_and_group(self):
+        self.assertEqual(encode(b"\x90\x3c\x64"), [0x20903C64])
+        self.assertEqual(encode(b"\xc3\x05", group=2), [0x22C30500])
+
+    def test_multiple_messages_and_running_status(self):
+        self.assertEqual(encode(b"\x90\x3c\x64\x40\x50\xb0\x07\x7f"),
+                         [0x20903C64, 0x20904050, 0x20B0077F])
+
+    def test_system_messages(self):
+        self.assertEqual(encode(b"\xf8"), [0x10F80000])
+        self.assertEqual(encode(b"\xf2\x10\x20"), [0x10F21020])
+
+    def test_midi2_high_resolution(self):
+        words = encode(b"\x91\x3c\x7f\xb1\x07\x40", protocol="midi2")
+        self.assertEqual(words, [0x40913C00, 0xFFFF0000, 0x40B10700, 0x80000000])
+        self.assertEqual(midi2_note_on(0, 1, 60, 0x1234), (0x40913C00, 0x12340000))
+        self.assertEqual(midi2_control_change(3, 0, 74, 0xDEADBEEF), (0x43B04A00, 0xDEADBEEF))
+
+    def test_midi2_note_on_velocity_zero_is_note_off(self):
+        w0, _ = encode(b"\x90\x3c\x00", protocol="midi2")
+        self.assertEqual((w0 >> 20) & 0xF, 0x8)
+
+    def test_sysex7_chunking(self):
+        words = encode(b"\xf0" + bytes(range(1, 14)) + b"\xf7")
+        self.assertEqual(len(words), 6)                       # 13 字节 → 3 个 64 位包
+        self.assertEqual([(w >> 20) & 0xF for w in words[::2]], [1, 2, 3])
+        self.assertEqual([(w >> 16) & 0xF for w in words[::2]], [6, 6, 1])
+        self.assertEqual(encode(b"\xf0\x7e\x7f\xf7"), [0x30027E7F, 0x00000000])
+        self.assertEqual(packet_words(words[0]), 2)
+
+
+class TestDecode(unittest.TestCase):
+    def test_round_trip_midi1(self):
+        data = [b"\x90\x3c\x64", b"\xc0\x05", b"\xe0\x00\x40", b"\xf8"]
+        self.assertEqual(decode(encode(b"".join(data))), data)
+
+    def test_round_trip_midi2_downscales(self):
+        data = [b"\x90\x3c\x64", b"\xb2\x07\x7f", b"\xe0\x7f\x7f", b"\xd0\x10"]
+        self.assertEqual(decode(encode(b"".join(data), protocol="midi2")), data)
+
+    def test_midi2_program_change_with_bank(self):
+        msgs = decode([0x40C00001, (5 << 24) | (1 << 8) | 2])
+        self.assertEqual(msgs, [b"\xb0\x00\x01", b"\xb0\x20\x02", b"\xc0\x05"])
+
+    def test_sysex_reassembled_across_feeds(self):
+        sysex = b"\xf0" + bytes(range(1, 20)) + b"\xf7"
+        words = encode(sysex)
+        dec = UmpDecoder()
+        self.assertEqual(dec.feed(words[:2]), [])
+        self.assertEqual(dec.feed(words[2:]), [sysex])
+
+
+if __name__ == "__main__":
+    unittest.main()
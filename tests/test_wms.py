@@ -75,5 +75,114 @@ class TestBackendSelection(unittest.TestCase):
             pm.stop()
 
 
+class FakeEvent:
+    def __init__(self):
+        self.handlers = []
+
+    def __iadd__(self, handler):
+        self.handlers.append(handler)
+        return self
+
+    def fire(self, *args):
+        for h in self.handlers:
+            h(*args)
+
+
+class FakeArgs:
+    def __init__(self, words):
+        self.words = list(words)
+
+    def fill_words(self):
+        padded = self.words + [0] * (4 - len(self.words))
+        return (len(self.words), *padded)
+
+
+class FakeConnection:
+    def __init__(self):
+        self.sent = []
+        self.message_received = FakeEvent()
+
+    def open(self):
+        return True
+
+    def send_multiple_messages_word_list(self, timestamp, words):
+        self.sent.append((timestamp, list(words)))
+        return 0
+
+
+class FakeSession:
+    @classmethod
+    def create_session(cls, name):
+        return cls()
+
+    def create_endpoint_connection(self, endpoint_id):
+        self.conn = FakeConnection()
+        return self.conn
+
+
+class FakeEndpoint:
+    endpoint_device_id = "\\\\?\\loopback-a"
+
+
+class FakeManager:
+    def create_loopback_endpoint(self, name, flags):
+        return FakeEndpoint()
+
+
+class FakeProjection:
+    MidiLoopbackEndpointManager = FakeManager
+    MidiSession = FakeSession
+
+
+def make_wms(protocol="midi1"):
+    backend = WindowsMidiServicesBackend.__new__(WindowsMidiServicesBackend)
+    backend._mod = FakeProjection
+    backend._err = ""
+    backend.protocol = protocol
+    backend.group = 0
+    return backend
+
+
+class TestWmsUmpTransport(unittest.TestCase):
+    def test_send_batches_valid_type2_packets(self):
+        backend = make_wms()
+        handle = backend.create_port("GMS UMP", on_input=lambda data: None)
+        self.assertTrue(backend.send(handle, bytearray(b"\x90\x3c\x64\x80\x3c\x00")))
+        conn = handle["conn"]
+        self.assertEqual(conn.sent, [(0, [0x20903C64, 0x20803C00])])
+
+    def test_send_midi2_and_sysex_in_one_call(self):
+        backend = make_wms(protocol="midi2")
+        handle = backend.create_port("GMS UMP", on_input=lambda data: None)
+        self.assertTrue(backend.send_many(handle, [b"\xb0\x07\x7f", b"\xf0\x7e\x7f\xf7"]))
+        _, words = handle["conn"].sent[0]
+        self.assertEqual(words, [0x40B00700, 0xFFFFFFFF, 0x30027E7F, 0x00000000])
+
+    def test_single_word_projection_rejects_long_packets(self):
+        backend = make_wms(protocol="midi2")
+        sent = []
+
+        class WordOnly:
+            def send_word(self, word):
+                sent.append(word)
+
+        handle = {"conn": WordOnly()}
+        self.assertFalse(backend.send(handle, b"\x90\x3c\x64"))
+        backend.protocol = "midi1"
+        self.assertTrue(backend.send(handle, b"\x90\x3c\x64"))
+        self.assertEqual(sent, [0x20903C64])
+
+    def test_input_decoded_into_midi1_bytes(self):
+        backend = make_wms()
+        received = []
+        handle = backend.create_port("GMS UMP", on_input=received.append)
+        event = handle["conn"].message_received
+        event.fire(None, FakeArgs([0x20903C64]))
+        event.fire(None, FakeArgs([0x40B10700, 0x80000000]))
+        event.fire(None, FakeArgs([0x30127E7F, 0]))
+        event.fire(None, FakeArgs([0x30317F00, 0]))
+        self.assertEqual(received, [b"\x90\x3c\x64", b"\xb1\x07\x40", b"\xf0\x7e\x7f\x7f\xf7"])
+
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file